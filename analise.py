@@ -0,0 +1,145 @@
+"""
+Tabelas da "Análise Detalhada" materializadas por estado de filtro.
+
+Para cada estado de filtro (modo, zona, locais selecionados) as tabelas dos três
+níveis (bairro, zona eleitoral e local de votação) são montadas uma única vez a
+partir do cubo, com os votos de cada candidato, o total, a diferença e a
+diferença percentual, junto com a ordem das linhas para cada opção de
+"Ordenar por". Um rerun só escolhe a ordem pronta, aplica a busca como máscara e
+recorta a página visível; a tabela inteira nunca passa pelo Styler nem é
+enviada ao navegador.
+
+As tabelas ficam em um cache LRU compartilhado entre sessões e não devem ser
+modificadas. Com um `CacheCompartilhado` (ver cache_compartilhado.py) elas são
+montadas uma única vez entre todos os processos do host, por versão dos dados,
+e abertas mapeadas em memória pelos demais.
+"""
+import numpy as np
+import pandas as pd
+
+from filtros import CAPACIDADE_PADRAO, CacheLRU
+from metricas import metricas_par
+
+NIVEIS_ANALISE = {
+    "Bairro": "NOME_BAIRRO",
+    "Zona Eleitoral": "NR_ZONA",
+    "Local de Votação": "NM_LOCAL_VOTACAO",
+}
+COLUNA_TOTAL = "Total de Votos"
+COLUNA_DIFERENCA_PERCENTUAL = "Diferença (%)"
+ORDEM_INDICE = "index"  # ordena pelo rótulo do grupo
+TAMANHO_PAGINA = 50
+
+
+def montar_tabela(agregado, colunas_votos, coluna_diferenca):
+    """
+    Votos de cada candidato (renomeados pelos rótulos de `colunas_votos`), total,
+    diferença entre o primeiro e o segundo e a diferença percentual.
+    """
+    (candidato_a, rotulo_a), (candidato_b, rotulo_b) = colunas_votos.items()
+    tabela = pd.DataFrame(index=agregado.index)
+    # Colunas de votos na ordem dos candidatos no cubo; as que faltam entram zeradas no fim
+    presentes = [candidato for candidato in agregado.columns if candidato in colunas_votos]
+    for candidato in presentes + [candidato for candidato in colunas_votos if candidato not in presentes]:
+        tabela[colunas_votos[candidato]] = agregado[candidato] if candidato in presentes else 0
+    par = metricas_par(tabela[rotulo_a].to_numpy(), tabela[rotulo_b].to_numpy())
+    tabela[COLUNA_TOTAL] = par.total
+    tabela[coluna_diferenca] = par.diferenca
+    tabela[COLUNA_DIFERENCA_PERCENTUAL] = par.diferenca_percentual
+    return tabela
+
+
+def n_paginas(n_linhas, tamanho=TAMANHO_PAGINA):
+    return max(1, -(-n_linhas // tamanho))
+
+
+class TabelaOrdenada:
+    """Tabela de um nível com a ordem das linhas de cada opção de ordenação"""
+
+    def __init__(self, tabela, ordenacoes):
+        self.tabela = tabela
+        self.ordens = {nome: self._ordem(coluna, ascendente) for nome, (coluna, ascendente) in ordenacoes.items()}
+        for ordem in self.ordens.values():
+            ordem.setflags(write=False)
+
+    def _ordem(self, coluna, ascendente):
+        """Posições das linhas ordenadas (estável, como `sort_values(kind='stable')`)"""
+        valores = self.tabela.index if coluna == ORDEM_INDICE else self.tabela[coluna]
+        serie = pd.Series(np.asarray(valores))
+        return serie.sort_values(ascending=ascendente, kind='stable').index.to_numpy()
+
+    @classmethod
+    def pronta(cls, tabela, ordens):
+        """Tabela com as ordens já calculadas (ex.: lidas do cache compartilhado)"""
+        tabela_ordenada = cls.__new__(cls)
+        tabela_ordenada.tabela = tabela
+        tabela_ordenada.ordens = ordens
+        return tabela_ordenada
+
+    def __len__(self):
+        return len(self.tabela)
+
+    def linhas(self, ordenacao, selecionadas=None):
+        """Posições na ordem pedida, restritas às linhas da máscara `selecionadas`"""
+        ordem = self.ordens[ordenacao]
+        return ordem if selecionadas is None else ordem[selecionadas[ordem]]
+
+    def pagina(self, linhas, pagina, tamanho=TAMANHO_PAGINA):
+        """Linhas da página (a partir de 0) na ordem dada"""
+        return self.tabela.iloc[linhas[pagina * tamanho:(pagina + 1) * tamanho]]
+
+
+class AnaliseMemoizada:
+    """Tabelas ordenadas dos três níveis por estado de filtro, em um cache LRU"""
+
+    def __init__(self, cubo, colunas_votos, coluna_diferenca, ordenacoes, capacidade=CAPACIDADE_PADRAO,
+                 compartilhado=None, versao=None):
+        self.cubo = cubo
+        self.colunas_votos = dict(colunas_votos)
+        self.coluna_diferenca = coluna_diferenca
+        self.ordenacoes = dict(ordenacoes)
+        self.cache = CacheLRU(capacidade)
+        self.compartilhado = compartilhado
+        self.versao = versao  # versão dos dados do cubo, usada nas chaves do cache compartilhado
+
+    def _montar(self, mascara, candidatos):
+        return {
+            coluna: TabelaOrdenada(montar_tabela(self.cubo.agregar(coluna, mascara, candidatos),
+                                                 self.colunas_votos, self.coluna_diferenca),
+                                   self.ordenacoes)
+            for coluna in NIVEIS_ANALISE.values()
+        }
+
+    def _montar_compartilhado(self, chave_filtro, mascara, candidatos):
+        """Tabelas gravadas por qualquer processo para o mesmo estado de filtro e versão dos dados"""
+        def partes():
+            partes = {}
+            for coluna, tabela in self._montar(mascara, candidatos).items():
+                partes[f'tabela_{coluna}'] = tabela.tabela
+                for i, ordem in enumerate(tabela.ordens.values()):
+                    partes[f'ordem_{coluna}_{i}'] = ordem
+            return partes
+
+        chave = ('analise', tuple(self.colunas_votos.items()), self.coluna_diferenca, tuple(self.ordenacoes),
+                 chave_filtro)
+        partes = self.compartilhado.obter(self.versao, chave, partes)
+        return {
+            coluna: TabelaOrdenada.pronta(partes[f'tabela_{coluna}'], {
+                nome: partes[f'ordem_{coluna}_{i}'] for i, nome in enumerate(self.ordenacoes)
+            })
+            for coluna in NIVEIS_ANALISE.values()
+        }
+
+    def tabelas(self, chave_filtro, mascara, candidatos):
+        """Nível → TabelaOrdenada; `mascara` só é usada quando o estado ainda não foi calculado"""
+        def construir():
+            if self.compartilhado is None:
+                return self._montar(mascara, candidatos)
+            return self._montar_compartilhado(chave_filtro, mascara, candidatos)
+        return self.cache.obter(chave_filtro, construir)
+
+    def invalidar(self, cubo, alteracao):
+        """Passa a usar o cubo atualizado; só os estados de filtro afetados são descartados"""
+        self.cubo = cubo
+        self.versao = alteracao.versao_dados
+        self.cache.descartar(alteracao.afeta)
@@ -0,0 +1,460 @@
+"""
+API HTTP de agregados, ao lado da interface do Streamlit.
+
+Serve em JSON ou CSV os mesmos números que o painel calcula, a partir do mesmo
+carregamento (artefato mapeado em memória e cache compartilhado do host, ver
+`abrir_votacao` em atualizacao.py) e das mesmas agregações (cubo, análise
+detalhada e indicadores.py), sobre as partições por município (ver particoes.py):
+- `/municipios`: municípios com votos (nome, identificador, linhas e zonas);
+- `/totais`: votos e participação de cada candidato;
+- `/bairros`: votos por bairro, com Sinergia, Forca_Conjunta, Margem e Numero_Efetivo
+  de candidatos na visão geral;
+- `/tabela`: tabela da análise detalhada por bairro, zona ou local, ordenada e
+  opcionalmente paginada;
+- `/ranking`: os 5 bairros de maior e de menor sinergia (ou força conjunta);
+- `/estado`: versão dos dados e contadores dos caches (sem cache HTTP).
+
+Parâmetros de filtro: `municipio` (nome ou identificador, ex.: `rio-de-janeiro`;
+por padrão o mesmo município que o painel abre), `modo` (geral, paes, armelau),
+`zona`, `local` (repetido para vários locais) e, conforme a rota, `nivel`,
+`ordenacao`, `pagina`, `tamanho` e `metrica`. O formato vem de
+`formato=json|csv` ou do cabeçalho Accept (JSON por padrão); com
+`Accept-Encoding: gzip` o corpo vai compactado.
+
+Cada resposta pronta (corpo já serializado, ETag e data dos dados) fica em um
+cache LRU em memória por rota, município, estado de filtro e parâmetros, então
+uma consulta repetida só copia bytes. Como no painel, só os municípios pedidos
+têm partição aberta (LRU), e os filtros e tabelas de cada um saem com ela. A
+cada requisição o atualizador confere o CSV (um `stat`); quando ele muda só as
+respostas dos municípios e estados de filtro afetados saem do cache. Clientes
+que reenviam o ETag (If-None-Match) ou a data (If-Modified-Since) recebem 304
+sem corpo.
+
+Só usa a biblioteca padrão (`http.server`). Localmente:
+
+    python api.py --porta 8000
+    curl 'http://127.0.0.1:8000/ranking?municipio=rio-de-janeiro&metrica=sinergia&formato=csv'
+
+Na Vercel a classe `handler` atende as rotas sob `/api/` (ver vercel.json).
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import threading
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from analise import NIVEIS_ANALISE, TAMANHO_PAGINA, AnaliseMemoizada
+from atualizacao import abrir_votacao
+from cache_compartilhado import CacheCompartilhado
+from dados import ARQUIVO_ARTEFATO, ARQUIVO_CSV
+from exportacao import TIPOS_MIME, escrever_csv, escrever_json
+from filtros import CAPACIDADE_PADRAO, CacheLRU, FiltrosMemoizados, chave_filtro
+from geometrias import carregar_divisoes_municipio
+from indicadores import (BAIRRO_MAIS_PROXIMO, CANDIDATOS_POR_MODO, COLUNA_DIFERENCA_ANALISE, COLUNAS_VOTOS_ANALISE,
+                         NOME_FERNANDO, NOME_INDIA, OPCOES_ORDENACAO, criar_ranking_sinergia, sinergia_bairros)
+from metricas import metricas_candidatos
+from particoes import MUNICIPIO_PADRAO, PARTICOES_ABERTAS, ParticoesMunicipios, identificador_municipio
+
+PREFIXO = '/api'  # rotas publicadas sob /api/ na Vercel
+MODOS = {
+    'geral': "Visão Geral",
+    'paes': "Apenas Fernando Paes",
+    'armelau': "Apenas Índia Armelau",
+}
+NIVEIS = dict(zip(('bairro', 'zona', 'local'), NIVEIS_ANALISE.values()))
+ORDENACOES = dict(zip(('alfabetica', 'votos_paes', 'votos_armelau', 'total', 'vantagem_paes', 'vantagem_armelau'),
+                      OPCOES_ORDENACAO))
+# Métrica do ranking → tipo de mancha do painel
+METRICAS_RANKING = {'forca_conjunta': "Força Conjunta", 'sinergia': "Apenas Sinergia"}
+FORMATOS = {'json': 'JSON', 'csv': 'CSV'}
+TAMANHO_MAXIMO = 1000  # linhas por página em /tabela
+CAPACIDADE_RESPOSTAS = 4 * CAPACIDADE_PADRAO
+
+
+@dataclass(frozen=True)
+class ContextoMunicipio:
+    """O que as rotas usam do município pedido: o cubo da partição e a análise memoizada dela"""
+    municipio: str
+    cubo: object
+    analise: AnaliseMemoizada
+
+
+class ErroParametro(ValueError):
+    """Parâmetro ausente ou inválido (400)"""
+
+
+class RotaDesconhecida(LookupError):
+    """Rota que a API não serve (404)"""
+
+
+@dataclass(frozen=True)
+class Resposta:
+    """Corpo já serializado de uma rota, com o que vai nos cabeçalhos"""
+    corpo: bytes
+    tipo: str
+    etag: str
+    modificado: int  # data de modificação do CSV de onde vieram os dados (segundos)
+    comprimida: bool = False
+
+
+def _parametro(parametros, nome, opcoes=None, padrao=None):
+    """Último valor de `nome` na query string, conferido contra `opcoes`"""
+    valores = parametros.get(nome)
+    if not valores:
+        return padrao
+    valor = valores[-1]
+    if opcoes is not None and valor not in opcoes:
+        raise ErroParametro(f"{nome}={valor!r} inválido; use um de: {', '.join(opcoes)}")
+    return valor
+
+
+def _inteiro(parametros, nome, padrao=None, minimo=None, maximo=None):
+    valor = _parametro(parametros, nome)
+    if valor is None:
+        return padrao
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ErroParametro(f"{nome}={valor!r} não é um número inteiro") from None
+    if (minimo is not None and numero < minimo) or (maximo is not None and numero > maximo):
+        raise ErroParametro(f"{nome}={numero} fora do intervalo [{minimo}, {maximo}]")
+    return numero
+
+
+def formato_pedido(parametros, aceita=None):
+    """'JSON' ou 'CSV', do parâmetro `formato` ou do cabeçalho Accept"""
+    formato = _parametro(parametros, 'formato', FORMATOS)
+    if formato is not None:
+        return FORMATOS[formato]
+    return 'CSV' if aceita and 'text/csv' in aceita else 'JSON'
+
+
+def _serializar(df, formato, comprimir, modificado):
+    destino = io.BytesIO()
+    (escrever_csv if formato == 'CSV' else escrever_json)(destino, df)
+    corpo = destino.getvalue()
+    if comprimir:
+        corpo = gzip.compress(corpo, mtime=0)  # sem data no cabeçalho: mesmo conteúdo, mesmo ETag
+    etag = '"' + hashlib.blake2b(corpo, digest_size=12).hexdigest() + '"'
+    return Resposta(corpo, f'{TIPOS_MIME[formato]}; charset=utf-8', etag, modificado, comprimir)
+
+
+class ServicoAgregados:
+    """
+    Partições por município com os filtros e tabelas da análise memoizados em cada uma
+    (como no painel), as divisões internas dos municípios pedidos e o cache LRU das
+    respostas serializadas. Seguro entre threads.
+    """
+
+    def __init__(self, votacao, capacidade=CAPACIDADE_RESPOSTAS):
+        self.votacao = votacao
+        self.particoes = ParticoesMunicipios(votacao)
+        self.atributos_bairros = CacheLRU(PARTICOES_ABERTAS)  # município → atributos das divisões internas
+        self.respostas = CacheLRU(capacidade)
+        self.rotas = {
+            '/municipios': self._municipios,
+            '/totais': self._totais,
+            '/bairros': self._bairros,
+            '/tabela': self._tabela,
+            '/ranking': self._ranking,
+        }
+
+    @classmethod
+    def carregar(cls, compartilhado=None, caminho_csv=ARQUIVO_CSV, caminho_artefato=ARQUIVO_ARTEFATO,
+                 capacidade=CAPACIDADE_RESPOSTAS):
+        """Serviço sobre os dados abertos como no painel"""
+        votacao = abrir_votacao(compartilhado or CacheCompartilhado(), BAIRRO_MAIS_PROXIMO, caminho_csv,
+                                caminho_artefato)
+        return cls(votacao, capacidade)
+
+    def atualizar(self):
+        """Confere o CSV e descarta só as respostas dos municípios e estados de filtro afetados"""
+        alteracao = self.votacao.atualizar()
+        if alteracao is None:
+            return None
+        abertas = self.particoes.atualizar(alteracao)
+        for particao, alteracao_municipio in abertas.values():
+            for nome in ('filtros', 'analise'):
+                derivado = particao.derivados.get(nome)
+                if derivado is not None:
+                    derivado.invalidar(particao.cubo, alteracao_municipio)
+
+        def afetada(chave):
+            rota, municipio, filtro = chave[:3]
+            if rota == '/municipios':
+                return True
+            if municipio not in alteracao.municipios:
+                return False
+            return municipio not in abertas or abertas[municipio][1].afeta(filtro)
+        self.respostas.descartar(afetada)
+        return alteracao
+
+    def municipio_pedido(self, parametros):
+        """Município do parâmetro `municipio` (nome nos dados ou identificador), ou o padrão"""
+        municipios = self.particoes.municipios()
+        valor = _parametro(parametros, 'municipio')
+        if valor is None:
+            return MUNICIPIO_PADRAO if MUNICIPIO_PADRAO in municipios else municipios[0]
+        identificador = identificador_municipio(valor)
+        for municipio in municipios:
+            if identificador_municipio(municipio) == identificador:
+                return municipio
+        raise ErroParametro(f"municipio={valor!r} sem votos nos dados; veja /municipios")
+
+    def _particao(self, municipio):
+        """Partição do município com os filtros e a análise montados sobre o cubo dela"""
+        particao = self.particoes.abrir(municipio)
+        filtros = particao.derivado('filtros', lambda: FiltrosMemoizados(particao.cubo))
+        analise = particao.derivado('analise', lambda: AnaliseMemoizada(
+            particao.cubo, COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE, OPCOES_ORDENACAO,
+            compartilhado=self.votacao.compartilhado, versao=particao.versao_dados))
+        return particao, filtros, analise
+
+    def _bairros_sinergia(self, cubo, atributos, mascara, candidatos):
+        """Bairros da camada com votos, Sinergia e Forca_Conjunta, como na mancha de sinergia do painel"""
+        agregado = sinergia_bairros(cubo.agregar('NOME_BAIRRO', mascara, candidatos))
+        bairros = atributos.merge(agregado, left_on='nome', right_index=True, how='left').fillna(0)
+        inteiras = [NOME_FERNANDO, NOME_INDIA, 'Total_Votos', 'Diferenca_Absoluta']
+        return bairros.astype(dict.fromkeys(inteiras, 'int64'))
+
+    def _atributos_bairros(self, municipio):
+        return self.atributos_bairros.obter(municipio, lambda: carregar_divisoes_municipio(municipio).atributos)
+
+    def _municipios(self, parametros, modo):
+        def montar(contexto, mascara, candidatos, chave):
+            catalogo = self.particoes.catalogo['municipios']
+            return pd.DataFrame({
+                'municipio': catalogo.index,
+                'identificador': [identificador_municipio(municipio) for municipio in catalogo.index],
+                'linhas': catalogo['linhas'].to_numpy(),
+                'zonas': catalogo['zonas'].to_numpy(),
+            })
+        return (), montar
+
+    def _totais(self, parametros, modo):
+        def montar(contexto, mascara, candidatos, chave):
+            totais = contexto.cubo.totais(mascara, candidatos)
+            metricas = metricas_candidatos(totais.to_numpy()[None, :], par=None)
+            return pd.DataFrame({'candidato': totais.index, 'votos': totais.to_numpy(),
+                                 'participacao': metricas.participacao[0]})
+        return (), montar
+
+    def _bairros(self, parametros, modo):
+        def montar(contexto, mascara, candidatos, chave):
+            atributos = self._atributos_bairros(contexto.municipio)
+            if modo == 'geral':
+                return self._bairros_sinergia(contexto.cubo, atributos, mascara, candidatos)
+            # Candidato individual: votos por bairro, como na mancha do candidato
+            votos = contexto.cubo.agregar('NOME_BAIRRO', mascara, candidatos).sum(axis=1).rename('QT_VOTOS_TOTAL')
+            bairros = atributos.merge(votos, left_on='nome', right_index=True, how='left').fillna(0)
+            return bairros.astype({'QT_VOTOS_TOTAL': 'int64'})
+        return (), montar
+
+    def _tabela(self, parametros, modo):
+        nivel = _parametro(parametros, 'nivel', NIVEIS, 'bairro')
+        ordenacao = _parametro(parametros, 'ordenacao', ORDENACOES, 'alfabetica')
+        pagina = _inteiro(parametros, 'pagina', minimo=1)
+        tamanho = _inteiro(parametros, 'tamanho', TAMANHO_PAGINA, 1, TAMANHO_MAXIMO) if pagina else None
+
+        def montar(contexto, mascara, candidatos, chave):
+            tabela = contexto.analise.tabelas(chave, mascara, candidatos)[NIVEIS[nivel]]
+            linhas = tabela.linhas(ORDENACOES[ordenacao])
+            recorte = tabela.tabela.iloc[linhas] if pagina is None else tabela.pagina(linhas, pagina - 1, tamanho)
+            return recorte.reset_index()
+        return (nivel, ordenacao, pagina, tamanho), montar
+
+    def _ranking(self, parametros, modo):
+        if modo != 'geral':
+            raise ErroParametro("o ranking de sinergia só existe com os dois candidatos (modo=geral)")
+        metrica = _parametro(parametros, 'metrica', METRICAS_RANKING, 'forca_conjunta')
+
+        def montar(contexto, mascara, candidatos, chave):
+            bairros = self._bairros_sinergia(contexto.cubo, self._atributos_bairros(contexto.municipio), mascara,
+                                             candidatos)
+            maior, menor = criar_ranking_sinergia(bairros, METRICAS_RANKING[metrica])
+            colunas = ['grupo', 'posicao', 'nome', 'Sinergia', 'Forca_Conjunta', 'Total_Votos',
+                       NOME_FERNANDO, NOME_INDIA, 'Margem', 'Numero_Efetivo']
+            if maior is None:
+                return pd.DataFrame(columns=colunas)
+            grupos = [grupo.assign(grupo=nome, posicao=range(1, len(grupo) + 1))
+                      for nome, grupo in (('maior', maior), ('menor', menor))]
+            return pd.concat(grupos, ignore_index=True)[colunas]
+        return (metrica,), montar
+
+    def responder(self, rota, parametros, formato='JSON', comprimir=False):
+        """Resposta da rota para os parâmetros (dicionário de listas, como o de `parse_qs`)"""
+        if rota not in self.rotas:
+            raise RotaDesconhecida(rota)
+        modo = _parametro(parametros, 'modo', MODOS, 'geral')
+        candidatos = CANDIDATOS_POR_MODO[MODOS[modo]]
+        zona = _inteiro(parametros, 'zona')
+        locais = parametros.get('local', ())
+        municipio = self.municipio_pedido(parametros) if rota != '/municipios' else None
+        # Parâmetros da rota já validados e normalizados: entram na chave da resposta
+        extras, montar = self.rotas[rota](parametros, modo)
+        filtro = chave_filtro(candidatos, zona, locais) if municipio is not None else None
+        modificado = (self.votacao.assinatura or {}).get('mtime', 0)
+
+        def construir():
+            if municipio is None:
+                return _serializar(montar(None, None, None, None), formato, comprimir, modificado)
+            particao, filtros, analise = self._particao(municipio)
+            contexto = ContextoMunicipio(municipio, particao.cubo, analise)
+            df = montar(contexto, filtros.mascara(candidatos, zona, locais), candidatos, filtro)
+            return _serializar(df, formato, comprimir, modificado)
+        return self.respostas.obter((rota, municipio, filtro, extras, formato, comprimir), construir)
+
+    def estado(self):
+        """Resumo para diagnóstico"""
+        return {
+            'dados': self.votacao.estado(),
+            'particoes': self.particoes.estado(),
+            'respostas': {'itens': len(self.respostas), 'acertos': self.respostas.acertos,
+                          'falhas': self.respostas.falhas},
+            'filtros': {municipio: particao.derivados['filtros'].estatisticas()
+                        for _, (_, municipio), particao in self.particoes.abertas.itens()
+                        if 'filtros' in particao.derivados},
+            'compartilhado': self.votacao.compartilhado.estado() if self.votacao.compartilhado else None,
+        }
+
+
+_servico = None
+_trava_servico = threading.Lock()
+
+
+def obter_servico():
+    """Serviço do processo, carregado na primeira requisição"""
+    global _servico
+    with _trava_servico:
+        if _servico is None:
+            _servico = ServicoAgregados.carregar()
+        return _servico
+
+
+def _mesmo_etag(cabecalho, etag):
+    return any(valor.strip() in ('*', etag, f'W/{etag}') for valor in cabecalho.split(','))
+
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    """Requisições GET/HEAD da API; o serviço vem do servidor ou é carregado no processo"""
+    protocol_version = 'HTTP/1.1'  # conexões persistentes nos testes de carga
+    # Cabeçalhos e corpo saem juntos: sem isso o ACK atrasado do cliente segura cada resposta ~40 ms
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    registrar = False  # log de cada requisição no stderr
+
+    def do_GET(self):
+        self._responder(enviar_corpo=True)
+
+    def do_HEAD(self):
+        self._responder(enviar_corpo=False)
+
+    def log_message(self, formato, *args):
+        if self.registrar:
+            super().log_message(formato, *args)
+
+    def _enviar(self, status, corpo, cabecalhos, enviar_corpo=True):
+        self.send_response(status)
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if enviar_corpo:
+            self.wfile.write(corpo)
+
+    def _enviar_json(self, status, valor, enviar_corpo=True):
+        corpo = json.dumps(valor, ensure_ascii=False, default=str).encode('utf-8')
+        self._enviar(status, corpo, {'Content-Type': 'application/json; charset=utf-8',
+                                     'Cache-Control': 'no-store'}, enviar_corpo)
+
+    def _responder(self, enviar_corpo):
+        url = urlsplit(self.path)
+        rota = url.path.rstrip('/') or '/'
+        if rota == PREFIXO or rota.startswith(PREFIXO + '/'):
+            rota = rota[len(PREFIXO):] or '/'
+        parametros = parse_qs(url.query)
+        servico = getattr(self.server, 'servico', None) or obter_servico()
+        servico.atualizar()
+
+        if rota == '/':
+            self._enviar_json(HTTPStatus.OK, {'rotas': [*servico.rotas, '/estado']}, enviar_corpo)
+            return
+        if rota == '/estado':
+            self._enviar_json(HTTPStatus.OK, servico.estado(), enviar_corpo)
+            return
+        try:
+            resposta = servico.responder(rota, parametros, formato_pedido(parametros, self.headers.get('Accept')),
+                                         'gzip' in self.headers.get('Accept-Encoding', ''))
+        except RotaDesconhecida:
+            self._enviar_json(HTTPStatus.NOT_FOUND, {'erro': f"rota desconhecida: {rota}"}, enviar_corpo)
+            return
+        except ErroParametro as erro:
+            self._enviar_json(HTTPStatus.BAD_REQUEST, {'erro': str(erro)}, enviar_corpo)
+            return
+
+        cabecalhos = {
+            'ETag': resposta.etag,
+            'Last-Modified': formatdate(resposta.modificado, usegmt=True),
+            'Cache-Control': 'no-cache',  # guarda, mas revalida com o ETag
+            'Vary': 'Accept, Accept-Encoding',
+        }
+        if self._nao_modificada(resposta):
+            self._enviar(HTTPStatus.NOT_MODIFIED, b'', cabecalhos, enviar_corpo=False)
+            return
+        cabecalhos['Content-Type'] = resposta.tipo
+        if resposta.comprimida:
+            cabecalhos['Content-Encoding'] = 'gzip'
+        self._enviar(HTTPStatus.OK, resposta.corpo, cabecalhos, enviar_corpo)
+
+    def _nao_modificada(self, resposta):
+        """Requisição condicional cujo ETag ou data ainda valem (If-None-Match tem precedência)"""
+        etag = self.headers.get('If-None-Match')
+        if etag is not None:
+            return _mesmo_etag(etag, resposta.etag)
+        data = self.headers.get('If-Modified-Since')
+        if data is None:
+            return False
+        try:
+            return parsedate_to_datetime(data).timestamp() >= resposta.modificado
+        except (TypeError, ValueError):
+            return False
+
+
+handler = ManipuladorAPI  # nome procurado pelo runtime Python da Vercel
+
+
+def criar_servidor(endereco='127.0.0.1', porta=8000, servico=None):
+    """Servidor com uma thread por conexão sobre o serviço dado (ou carregado agora)"""
+    servidor = ThreadingHTTPServer((endereco, porta), ManipuladorAPI)
+    servidor.servico = servico or ServicoAgregados.carregar()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--endereco', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--log', action='store_true', help="registra cada requisição no stderr")
+    args = parser.parse_args()
+
+    ManipuladorAPI.registrar = args.log
+    servidor = criar_servidor(args.endereco, args.porta)
+    print(f"API de agregados em http://{args.endereco}:{servidor.server_address[1]}/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,144 +1,389 @@
 import streamlit as st
 import pandas as pd
 import pydeck as pdk
-import geopandas as gpd
 import numpy as np
-import base64
-from io import BytesIO
-import json
-import plotly.graph_objects as go
-import plotly.express as px
+import uuid
+from atualizacao import abrir_votacao
+from cache_compartilhado import CacheCompartilhado
+from cubo import CHAVE_PONTO
+from filtros import FiltrosMemoizados, chave_filtro
+from fronteiras import COLUNA_NOME_MUNICIPIO
+from geometrias import NIVEL_COMPLETO, NIVEL_PADRAO, carregar_geometrias_municipio
+from instrumentacao import Instrumentacao, instrumentacao_ativa, registrar_execucao, tamanho_dataframe
+from memoria import MonitorMemoria
+from particoes import MUNICIPIO_PADRAO, PARTICOES_ABERTAS, ParticoesMunicipios
+from exportacao import (FORMATOS_GEOGRAFICOS, FORMATOS_TABELA, aceita_gzip, contexto_exportacao, exportar,
+                        nome_arquivo, tipo_mime)
+from estilos import (RGB_SINERGIA, RGBA_SEM_VALOR, cores_mancha_classes, cores_mancha_sinergia,
+                     estilizar_mancha_candidato, estilizar_pontos_candidato, estilizar_pontos_comparativo,
+                     paleta_classes, tooltips_mancha_sinergia)
+from metricas import metricas_par
+from classificacao import METODOS, QuebrasMemoizadas, intervalos
+from grade import LIMITE_PONTOS, PiramideGrade, SomasGrade
+from densidade import BANDA_PADRAO, BANDAS, TAMANHO_PIXEL, DensidadeMemoizada, SuperficiesDensidade
+from busca import IndiceBusca
+from analise import NIVEIS_ANALISE, AnaliseMemoizada, n_paginas
+from indicadores import (BAIRRO_MAIS_PROXIMO, CANDIDATOS_POR_MODO, COLUNA_DIFERENCA_ANALISE, COLUNAS_VOTOS_ANALISE,
+                         NOME_FERNANDO, NOME_INDIA, OPCOES_ORDENACAO, criar_ranking_sinergia, sinergia_bairros)
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 
 st.set_page_config(
-    page_title="Análise Interativa de Votação - Município do Rio de Janeiro",
+    page_title="Análise Interativa de Votação",
     page_icon="📈",
     layout="wide",
 )
 
-st.title("Análise Interativa de Votação - Município do Rio de Janeiro")
+# Preenchido com o nome do município depois que ele é escolhido
+titulo = st.empty()
+
+# Instrumentação opcional do rerun (PAINEL_DEBUG=1 ou ?debug=1; ver instrumentacao.py)
+instrumentacao = Instrumentacao(instrumentacao_ativa(st.query_params),
+                                sessao=st.session_state.setdefault('id_sessao', uuid.uuid4().hex[:8]))
 
 # --- FUNÇÕES AUXILIARES ---
-def create_download_link(data, filename, file_type):
-    """Cria link de download para arquivos"""
-    if file_type == "json":
-        b64 = base64.b64encode(data.encode()).decode()
-        href = f'<a href="data:application/json;base64,{b64}" download="{filename}">Baixar {filename}</a>'
-    elif file_type == "csv":
-        b64 = base64.b64encode(data.encode()).decode()
-        href = f'<a href="data:text/csv;base64,{b64}" download="{filename}">Baixar {filename}</a>'
-    return href
-
-def export_map_data(df, tipo_visualizacao, candidato_selecionado):
-    """Exporta dados do mapa para diferentes formatos"""
-    timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
-    
-    # Preparar dados para exportação
-    export_data = df.copy()
-    
-    # Adicionar informações de contexto
-    export_data['Tipo_Visualizacao'] = tipo_visualizacao
-    export_data['Candidato'] = candidato_selecionado if candidato_selecionado != "Visão Geral" else "Ambos"
-    export_data['Data_Exportacao'] = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    return export_data, timestamp
-
-def criar_ranking_sinergia(df_bairros, tipo_mancha):
-    """Cria ranking de sinergia por bairro"""
-    if df_bairros.empty:
-        return None, None
-    
-    # Prepara dados para ranking
-    ranking_data = df_bairros[['nome', 'Sinergia', 'Forca_Conjunta', 'Total_Votos', NOME_FERNANDO, NOME_INDIA]].copy()
-    ranking_data = ranking_data[ranking_data['Total_Votos'] > 0]  # Remove bairros sem votos
-    
-    if ranking_data.empty:
-        return None, None
-    
-    # Define coluna para ranking baseado no tipo
-    coluna_ranking = 'Sinergia' if tipo_mancha == 'Apenas Sinergia' else 'Forca_Conjunta'
-    
-    # Top 5 maior
-    top_5_maior = ranking_data.nlargest(5, coluna_ranking)
-    
-    # Top 5 menor
-    top_5_menor = ranking_data.nsmallest(5, coluna_ranking)
-    
-    return top_5_maior, top_5_menor
+def botoes_exportacao(df, chave, prefixo, tipo_visualizacao, candidato_selecionado, geometrias=None):
+    """Escolha do formato e geração do arquivo de exportação (ver exportacao.py)"""
+    formato = st.selectbox("Formato da exportação", FORMATOS_GEOGRAFICOS if geometrias is not None else FORMATOS_TABELA,
+                           key=f"formato_{chave}")
+    comprimir = st.checkbox("Compactar (gzip)", key=f"gzip_{chave}", disabled=not aceita_gzip(formato))
+    if st.button("Exportar Dados", key=f"export_{chave}"):
+        arquivo = exportar(df, formato, contexto_exportacao(tipo_visualizacao, candidato_selecionado), comprimir, geometrias)
+        nome = nome_arquivo(prefixo, formato, comprimir)
+        with arquivo:
+            st.download_button(f"Baixar {nome}", data=arquivo.read(), file_name=nome,
+                               mime=tipo_mime(formato, comprimir), key=f"download_{chave}")
+
+def _amostra_cor(rgba, rotulo, margem=5):
+    r, g, b, a = rgba
+    return (f'<div style="display: flex; align-items: center; margin-bottom: {margem}px;"><div style="width: 20px; height: 20px; '
+            f'background-color: rgba({r}, {g}, {b}, {a / 255:.2f}); border: 1px solid #ccc; border-radius: 5px; margin-right: 10px;"></div>'
+            f'<span>{rotulo}</span></div>')
+
+def legenda_classes(quebras, paleta, formatar):
+    """Faixas reais de cada classe da mancha (calculadas em classificacao.py), com a cor usada no mapa"""
+    linhas = [_amostra_cor(RGBA_SEM_VALOR, "Sem votos")]
+    for (inicio, fim), cor in zip(intervalos(quebras), paleta.tolist()):
+        if inicio is not None and fim is not None and fim <= inicio:
+            continue  # classe vazia (quebras repetidas)
+        if inicio is None:
+            faixa = f"até {formatar(fim)}"
+        elif fim is None:
+            faixa = f"acima de {formatar(inicio)}"
+        else:
+            faixa = f"{formatar(inicio)} – {formatar(fim)}"
+        linhas.append(_amostra_cor(cor, faixa))
+    st.markdown("**Classes:**" + "".join(linhas), unsafe_allow_html=True)
+
+def formatar_votos(valor):
+    return f"{valor:,.0f}".replace(",", ".")
+
+def formatar_percentual(valor):
+    return f"{valor:.1%}"
+
+def exibir_mapa(deck):
+    """st.pydeck_chart medido pela instrumentação (tempo de envio e bytes do payload)"""
+    with instrumentacao.etapa('pydeck_chart'):
+        st.pydeck_chart(deck)
+    instrumentacao.payload('mapa', lambda: len(deck.to_json().encode()))
 
 # --- CONSTANTES ---
 COLUNA_CANDIDATO = 'NM_VOTAVEL'
-NOME_FERNANDO = 'FERNANDO CESAR CAMPOS PAES'
-NOME_INDIA = 'AMANDA BRANDAO ARMELAU'
-URL_GEOJSON_ESTADO_RIO = "https://raw.githubusercontent.com/tbrugz/geodata-br/master/geojson/geojs-33-mun.json"
-URL_GEOJSON_BAIRROS_RIO = "https://pgeo3.rio.rj.gov.br/arcgis/rest/services/Cartografia/Limites_administrativos/MapServer/4/query?where=1%3D1&outFields=*&outSR=4326&f=geojson"
 COR_FERNANDO = "#1E90FF"  # Azul
 COR_INDIA = "#FF0000"     # Vermelho
 RGB_FERNANDO = [30, 144, 255]
 RGB_INDIA = [255, 0, 0]
+# Mancha de um candidato: alfa proporcional aos votos, sem classes
+CLASSIFICACAO_CONTINUA = "Contínua (linear)"
+# Motores da mancha: polígonos dos bairros ou superfície contínua de densidade (ver densidade.py)
+MOTOR_BAIRROS = "Bairros"
+MOTOR_DENSIDADE = "Densidade contínua"
+# Vistas iniciais ajustadas à mão (latitude, longitude, zoom); os demais municípios são enquadrados pelos locais
+VISTAS_MUNICIPIOS = {'RIO DE JANEIRO': (-22.9068, -43.1729, 9.5)}
+LARGURA_MAPA_PX = 500  # largura aproximada do mapa, para o zoom que enquadra um município
+
+# O column_config não colore o texto das células: a cor de cada candidato vai no cabeçalho
+CONFIG_COLUNAS_ANALISE = {
+    "Votos F. Paes": st.column_config.NumberColumn("🔵 Votos F. Paes", format="%d", help=f"Votos de {NOME_FERNANDO}"),
+    "Votos Í. Armelau": st.column_config.NumberColumn("🔴 Votos Í. Armelau", format="%d", help=f"Votos de {NOME_INDIA}"),
+    "Total de Votos": st.column_config.NumberColumn(format="%d"),
+    "Diferença (Paes - Armelau)": st.column_config.NumberColumn(format="%d"),
+    "Diferença (%)": st.column_config.NumberColumn(format="%.1f%%"),
+}
 
 
 # --- FUNÇÕES AUXILIARES ---
-# --- FUNÇÕES AUXILIARES ---
-@st.cache_data
-def carregar_dados():
+@st.cache_resource
+def carregar_compartilhado():
     """
-    Carrega e pré-processa os dados de votação e os geojsons do município e bairros do Rio de Janeiro.
-    A função também corrige erros de formatação nas coordenadas e associa cada local de votação a um bairro.
+    Cache em disco compartilhado entre as réplicas do host: cubo, índice de busca e tabelas
+    da análise são montados uma vez por versão dos dados e abertos mapeados em memória pelas
+    demais réplicas (ver cache_compartilhado.py).
     """
-    def corrigir_coordenada(coord):
-        s = str(coord).replace(',', '.').strip()
-        try:
-            return float(s)
-        except ValueError:
-            is_neg = s.startswith('-')
-            digits = ''.join(filter(str.isdigit, s))
-            if not digits: return None
-            # Ajuste para diferentes formatos de coordenadas sem ponto decimal
-            s_clean = f"{'-' if is_neg else ''}{s.replace('-', '').replace('.', '')}"
-            if len(s_clean) > 8: # Provavelmente formato com muitos decimais
-                 s_clean = f"{s_clean[:3]}.{s_clean[3:]}"
-            else:
-                 s_clean = f"{s_clean[:2]}.{s_clean[2:]}"
-            return pd.to_numeric(s_clean, errors='coerce')
+    compartilhado = CacheCompartilhado()
+    carregar_memoria().registrar_dados('compartilhado', compartilhado)
+    return compartilhado
 
+@st.cache_resource
+def carregar_memoria():
+    """
+    Contabilidade da memória do processo: dados compartilhados, caches derivados e sessões,
+    com o despejo dos itens frios acima de PAINEL_ORCAMENTO_MEMORIA_MB (ver memoria.py).
+    """
+    return MonitorMemoria()
 
-    df = pd.read_csv('votacao_com_coordenadas.csv', sep=';', encoding='utf-8-sig', on_bad_lines='skip')
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-    df.columns = [col.strip() for col in df.columns]
+@st.cache_resource
+def carregar_dados():
+    """
+    Carrega os dados de votação já associados aos bairros do Rio de Janeiro, do artefato gerado por
+    `construir_dados.py` (mapeado em memória) ou, sem ele, processando o CSV uma vez por host
+    (ver `abrir_votacao` em atualizacao.py).
+    Retorna o atualizador (ver atualizacao.py), que guarda a tabela da versão atual;
+    compartilhado entre sessões, seus dados não devem ser modificados.
+    """
+    registrar_execucao('carregar_dados')
+    votacao = abrir_votacao(carregar_compartilhado(), BAIRRO_MAIS_PROXIMO)
+    carregar_memoria().registrar_dados('votacao', votacao)
+    return votacao
 
-    df['LATITUDE'] = df['LATITUDE'].apply(corrigir_coordenada)
-    df['LONGITUDE'] = df['LONGITUDE'].apply(corrigir_coordenada)
-    df.dropna(subset=['LATITUDE', 'LONGITUDE'], inplace=True)
-    df.rename(columns={'LATITUDE': 'lat', 'LONGITUDE': 'lon'}, inplace=True)
+@st.cache_resource
+def carregar_particoes():
+    """
+    Catálogo dos municípios (com os votos por candidato de cada um, para os totais do estado) e
+    as partições por município, abertas no primeiro acesso e despejadas por LRU (ver particoes.py).
+    """
+    registrar_execucao('carregar_particoes')
+    particoes = ParticoesMunicipios(carregar_dados())
+    carregar_memoria().registrar_dados('particoes', particoes)
+    carregar_memoria().registrar_cache('particoes.abertas', particoes.abertas)
+    return particoes
+
+# As estruturas de cada município vivem na partição dele e saem da memória junto com ela (ver particoes.py)
+def carregar_filtros(municipio):
+    """
+    Filtros memoizados (máscaras e listas de opções) compartilhados entre todas as sessões,
+    com despejo LRU (ver filtros.py).
+    """
+    particao = carregar_particoes().abrir(municipio)
+
+    def construir():
+        registrar_execucao('carregar_filtros')
+        filtros = FiltrosMemoizados(particao.cubo)
+        carregar_memoria().registrar_cache(f'filtros.opcoes[{municipio}]', filtros.opcoes)
+        carregar_memoria().registrar_cache(f'filtros.mascaras[{municipio}]', filtros.mascaras)
+        return filtros
+    return particao.derivado('filtros', construir)
+
+@st.cache_resource(max_entries=PARTICOES_ABERTAS)
+def carregar_geometrias(municipio):
+    """
+    Contorno do município e os seus bairros (vazios se ele não tiver uma camada de bairros)
+    simplificados e convertidos para GeoJSON uma única vez, lidos das geometrias pré-serializadas
+    pelo build quando estão atualizadas; a cada rerun só as cores e tooltips são anexadas às
+    feições (ver geometrias.py). Não dependem dos votos, então não ficam na partição.
+    """
+    registrar_execucao('carregar_geometrias')
+    geometrias = carregar_geometrias_municipio(municipio)
+    carregar_memoria().registrar_dados(f'geometrias[{municipio}]', geometrias)
+    return geometrias
+
+def _pesos_candidatos(cubo):
+    pesos = pd.DataFrame(cubo.votos, columns=cubo.candidatos)
+    for nome in (NOME_FERNANDO, NOME_INDIA):
+        if nome not in pesos: pesos[nome] = 0
+    return pesos
+
+def carregar_grade(municipio):
+    """
+    Pirâmide de grades dos locais do cubo (ver grade.py), com os votos de cada candidato
+    e o Sinergia_Peso de cada local como pesos somados por célula.
+    """
+    particao = carregar_particoes().abrir(municipio)
+
+    def construir():
+        registrar_execucao('carregar_grade')
+        cubo = particao.cubo
+        pesos = _pesos_candidatos(cubo)
+        pesos['Sinergia_Peso'] = metricas_par(pesos[NOME_FERNANDO].to_numpy(), pesos[NOME_INDIA].to_numpy()).sinergia_peso
+        piramide = PiramideGrade(cubo.locais['lat'], cubo.locais['lon'], pesos)
+        carregar_memoria().registrar_dados(f'grade[{municipio}]', piramide)
+        return piramide
+    return particao.derivado('grade', construir)
+
+def carregar_densidade(municipio):
+    """
+    Grades de densidade sobre o município (uma por largura de banda) e as superfícies já
+    pintadas por estado de filtro, compartilhadas entre sessões (ver densidade.py).
+    """
+    particao = carregar_particoes().abrir(municipio)
+
+    def construir():
+        registrar_execucao('carregar_densidade')
+        cubo = particao.cubo
+        pesos = _pesos_candidatos(cubo)
+        geometrias_municipio, _ = carregar_geometrias(municipio)
+        # Sem o polígono do município na camada de limites, a grade cobre a extensão dos locais
+        limites = geometrias_municipio.limites() or carregar_particoes().limites(municipio)
+        densidade = DensidadeMemoizada(limites, cubo.locais['lat'], cubo.locais['lon'], pesos[[NOME_FERNANDO, NOME_INDIA]])
+        carregar_memoria().registrar_dados(f'densidade[{municipio}]', densidade)
+        carregar_memoria().registrar_cache(f'densidade.rasters[{municipio}]', densidade.cache)
+        return densidade
+    return particao.derivado('densidade', construir)
+
+def carregar_classificacao(municipio):
+    """Quebras das classes das manchas por (filtro, métrica, método), compartilhadas entre sessões (ver classificacao.py)"""
+    def construir():
+        classificacoes = QuebrasMemoizadas()
+        carregar_memoria().registrar_cache(f'quebras[{municipio}]', classificacoes.cache)
+        return classificacoes
+    return carregar_particoes().abrir(municipio).derivado('classificacao', construir)
+
+def carregar_busca(municipio):
+    """
+    Índice de busca (sem acentos, por prefixo e por trecho, particionado por zona) sobre o nome,
+    o endereço, o bairro e a zona dos locais do cubo (ver busca.py).
+    """
+    particao = carregar_particoes().abrir(municipio)
+
+    def construir():
+        registrar_execucao('carregar_busca')
+        partes = carregar_compartilhado().obter(particao.versao_dados, 'busca',
+                                                lambda: IndiceBusca(particao.cubo.locais).partes())
+        busca = IndiceBusca.de_partes(partes)
+        carregar_memoria().registrar_dados(f'busca[{municipio}]', busca)
+        return busca
+    return particao.derivado('busca', construir)
+
+def carregar_analise(municipio):
+    """
+    Tabelas da análise detalhada (bairro, zona e local) com as ordens de cada opção de ordenação,
+    montadas uma vez por estado de filtro e compartilhadas entre sessões (ver analise.py).
+    """
+    particao = carregar_particoes().abrir(municipio)
+
+    def construir():
+        registrar_execucao('carregar_analise')
+        analise = AnaliseMemoizada(particao.cubo, COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE, OPCOES_ORDENACAO,
+                                   compartilhado=carregar_compartilhado(), versao=particao.versao_dados)
+        carregar_memoria().registrar_cache(f'analise[{municipio}]', analise.cache)
+        return analise
+    return particao.derivado('analise', construir)
 
-    gdf_bairros = gpd.read_file(URL_GEOJSON_BAIRROS_RIO)
-    gdf_votacao = gpd.GeoDataFrame(
-        df, geometry=gpd.points_from_xy(df.lon, df.lat), crs="EPSG:4326"
+def aplicar_atualizacao(votacao):
+    """
+    Processa o que mudou no CSV desde o último rerun (só um `stat` quando nada mudou) e, nos
+    municípios com partição aberta, descarta apenas os caches derivados afetados pelas zonas,
+    candidatos e locais alterados; os demais municípios não têm nada montado além do catálogo.
+    """
+    alteracao = votacao.atualizar()
+    if alteracao is None:
+        return None
+    abertas = carregar_particoes().atualizar(alteracao)
+    for particao, alteracao_municipio in abertas.values():
+        filtros, analise, classificacoes = (particao.derivados.get(nome) for nome in ('filtros', 'analise', 'classificacao'))
+        for derivado in (filtros, analise):
+            if derivado is not None:
+                derivado.invalidar(particao.cubo, alteracao_municipio)
+        if classificacoes is not None:
+            classificacoes.invalidar(alteracao_municipio)
+        if alteracao_municipio.vazia():
+            continue
+        particao.descartar('grade', 'densidade')  # pesos por local: refeitos com os votos novos
+        if alteracao_municipio.locais_alterados:
+            particao.descartar('busca')
+    return alteracao if alteracao.municipios else None
+
+def vista_inicial(particoes, municipio):
+    """Vista inicial do mapa: a ajustada para o município ou a que enquadra os seus locais de votação"""
+    if municipio in VISTAS_MUNICIPIOS:
+        latitude, longitude, zoom = VISTAS_MUNICIPIOS[municipio]
+    else:
+        oeste, sul, leste, norte = particoes.limites(municipio)
+        latitude, longitude = (sul + norte) / 2, (oeste + leste) / 2
+        # Em Web Mercator um grau de latitude ocupa 1/cos(lat) vezes a largura de um grau de longitude
+        extensao = max(leste - oeste, (norte - sul) / np.cos(np.radians(latitude)), 0.01)
+        zoom = float(np.clip(np.log2(360 * LARGURA_MAPA_PX / (256 * extensao)), 7, 14))
+    return pdk.ViewState(latitude=latitude, longitude=longitude, zoom=zoom, pitch=0)
+
+def somas_grade_sessao(piramide):
+    """Somas por célula desta sessão; atualizadas incrementalmente a cada mudança de filtro"""
+    somas = st.session_state.get('somas_grade')
+    if somas is None or somas.piramide is not piramide:
+        somas = st.session_state['somas_grade'] = SomasGrade(piramide)
+    return somas
+
+def superficies_densidade_sessao(grade):
+    """
+    Superfícies de densidade desta sessão para a banda da grade; atualizadas pela diferença de locais.
+    Só a banda atual fica na sessão (ver memoria.py): voltar a outra banda refaz as superfícies do zero.
+    """
+    superficies = st.session_state.setdefault('superficies_densidade', {})
+    if grade.banda not in superficies or superficies[grade.banda].grade is not grade:
+        superficies.clear()
+        superficies[grade.banda] = SuperficiesDensidade(grade)
+    return superficies[grade.banda]
+
+def raster_densidade(chave, nome, banda, rgb, mascara):
+    """Superfície `nome` pintada para o filtro atual, em cache por filtro (None sem votos)"""
+    densidade = carregar_densidade(municipio)
+    return densidade.raster(chave, nome, banda, rgb, superficies_densidade_sessao(densidade.grade(banda)), mascara)
+
+def camadas_densidade(raster, gdf_bairros):
+    """
+    Superfície pintada (BitmapLayer recortado à área com votos) sob os contornos dos
+    bairros, que continuam levando os tooltips por bairro.
+    """
+    contornos = pdk.Layer(
+        "GeoJsonLayer", data=geometrias_bairros.registros(NIVEL_PADRAO, gdf_bairros[['nome', 'tooltip']]), pickable=True,
+        get_fill_color=[0, 0, 0, 0], get_line_color=[0, 0, 0, 60], get_line_width=15,
     )
-    gdf_bairros = gdf_bairros.to_crs(gdf_votacao.crs)
-    gdf_merged = gpd.sjoin(gdf_votacao, gdf_bairros, how="left", predicate='intersects')
-    
-    df_com_bairro = pd.DataFrame(gdf_merged.drop(columns=['geometry', 'index_right']))
-    df_com_bairro.rename(columns={'nome': 'NOME_BAIRRO'}, inplace=True)
-    
-    # --- LINHA DE CÓDIGO ADICIONADA PARA A CORREÇÃO ---
-    # Preenche os bairros não encontrados com um valor padrão para evitar que sejam descartados.
-    # df_com_bairro['NOME_BAIRRO'].fillna('Bairro não identificado', inplace=True)
-    # --- FIM DA CORREÇÃO ---
-
-    gdf_estado = gpd.read_file(URL_GEOJSON_ESTADO_RIO)
-    gdf_municipio = gdf_estado[gdf_estado['name'] == 'Rio de Janeiro']
-    return df_com_bairro, gdf_municipio, gdf_bairros
+    if raster is None:
+        return [contornos]
+    return [pdk.Layer("BitmapLayer", data=None, image=raster.imagem, bounds=list(raster.limites), opacity=0.9), contornos]
 
 # --- CARREGAMENTO DOS DADOS ---
-df_original, municipio_rj_geo, bairros_rj_geo = carregar_dados()
+with instrumentacao.etapa('carregar_dados', funcao_cache='carregar_dados'):
+    votacao = carregar_dados()
+with instrumentacao.etapa('carregar_particoes', funcao_cache='carregar_particoes'):
+    particoes = carregar_particoes()
+with instrumentacao.etapa('atualizacao_dados'):
+    alteracao_dados = aplicar_atualizacao(votacao)
+if alteracao_dados is not None:
+    st.toast(f"Dados atualizados: {alteracao_dados.linhas_novas} linhas processadas, "
+             f"{len(alteracao_dados.municipios)} municípios com votos alterados.")
+
+# --- MUNICÍPIO ---
+# Só as linhas do município escolhido são carregadas (partição aberta no primeiro acesso)
+municipios = particoes.municipios()
+municipio = MUNICIPIO_PADRAO if MUNICIPIO_PADRAO in municipios else municipios[0]
+if len(municipios) > 1:
+    municipio = st.selectbox(
+        "Município:", municipios, index=municipios.index(municipio), key='municipio',
+        # Os locais selecionados são de outro município
+        on_change=lambda: st.session_state.pop('locais_selecionados', None),
+    )
+with instrumentacao.etapa('abrir_particao'):
+    particao = particoes.abrir(municipio)
+cubo = particao.cubo
+with instrumentacao.etapa('carregar_filtros', funcao_cache='carregar_filtros'):
+    filtros = carregar_filtros(municipio)
+with instrumentacao.etapa('carregar_geometrias', funcao_cache='carregar_geometrias'):
+    geometrias_municipio, geometrias_bairros = carregar_geometrias(municipio)
+with instrumentacao.etapa('carregar_busca', funcao_cache='carregar_busca'):
+    busca = carregar_busca(municipio)
+with instrumentacao.etapa('carregar_analise', funcao_cache='carregar_analise'):
+    analise = carregar_analise(municipio)
+classificacoes = carregar_classificacao(municipio)
+
+nomes_contorno = geometrias_municipio.atributos.get(COLUNA_NOME_MUNICIPIO)
+nome_municipio = nomes_contorno.iloc[0] if nomes_contorno is not None and len(nomes_contorno) else municipio.title()
+titulo.title(f"Análise Interativa de Votação - {nome_municipio}")
 
 
 # --- EXIBIÇÃO DOS TOTAIS DE VOTOS ---
-votos_fernando = int(df_original[df_original[COLUNA_CANDIDATO] == NOME_FERNANDO]['QT_VOTOS_TOTAL'].sum())
-votos_india = int(df_original[df_original[COLUNA_CANDIDATO] == NOME_INDIA]['QT_VOTOS_TOTAL'].sum())
+totais_candidatos = cubo.totais()
+votos_fernando = int(totais_candidatos.get(NOME_FERNANDO, 0))
+votos_india = int(totais_candidatos.get(NOME_INDIA, 0))
 
 # **CORREÇÃO APLICADA AQUI**
 # Formata o número com ponto como separador de milhar antes de exibi-lo.
@@ -188,6 +433,12 @@ with col2:
         <div class="metric-value" style="color: {COR_INDIA};">{formatted_votos_india}</div>
     </div>
     """, unsafe_allow_html=True)
+if len(municipios) > 1:
+    # Totais do estado a partir dos resumos por município, sem abrir as demais partições
+    totais_estado = particoes.totais_estado()
+    st.caption(f"No estado ({len(municipios)} municípios): {NOME_FERNANDO} "
+               f"{formatar_votos(totais_estado.get(NOME_FERNANDO, 0))} · {NOME_INDIA} "
+               f"{formatar_votos(totais_estado.get(NOME_INDIA, 0))} votos.")
 st.divider()
 
 # --- FILTROS NA PÁGINA PRINCIPAL ---
@@ -202,53 +453,58 @@ with filt_col1:
         index=0
     )
 
-df_pre_filtro = df_original.copy()
-if modo_analise == "Apenas Fernando Paes":
-    df_pre_filtro = df_original[df_original[COLUNA_CANDIDATO] == NOME_FERNANDO]
-elif modo_analise == "Apenas Índia Armelau":
-    df_pre_filtro = df_original[df_original[COLUNA_CANDIDATO] == NOME_INDIA]
-
+# Os filtros são máscaras somente-leitura sobre os locais do cubo, memoizadas por
+# (modo, zona, locais); o modo define os candidatos considerados
+candidatos_modo = CANDIDATOS_POR_MODO[modo_analise]
 
 with filt_col2:
-    zonas_disponiveis = sorted(df_pre_filtro['NR_ZONA'].unique())
-    zona_selecionada = st.selectbox("Filtrar por Zona Eleitoral:", options=['Todas'] + zonas_disponiveis)
+    with instrumentacao.etapa('opcoes_zona'):
+        zonas_disponiveis = filtros.zonas(candidatos_modo)
+    zona_selecionada = st.selectbox("Filtrar por Zona Eleitoral:", options=['Todas', *zonas_disponiveis])
 
-df_filtrado = df_pre_filtro.copy()
-if zona_selecionada != 'Todas':
-    df_filtrado = df_pre_filtro[df_pre_filtro['NR_ZONA'] == zona_selecionada]
+zona_filtro = None if zona_selecionada == 'Todas' else zona_selecionada
 
 with filt_col3:
-    locais_disponiveis = sorted(df_filtrado['NM_LOCAL_VOTACAO'].unique())
-    locais_selecionados = st.multiselect("Pesquisar por Local de Votação:", options=locais_disponiveis, placeholder="Digite o nome de um local...")
-
-if locais_selecionados:
-    df_filtrado = df_filtrado[df_filtrado['NM_LOCAL_VOTACAO'].isin(locais_selecionados)]
+    with instrumentacao.etapa('opcoes_locais'):
+        locais_disponiveis = filtros.locais(candidatos_modo, zona_filtro)
+    busca_local = st.text_input("Buscar local (nome, endereço ou bairro):", placeholder="Ex.: escola, rua, copacabana...")
+    if busca_local:
+        # As opções ficam restritas aos locais encontrados, sem perder os já selecionados
+        with instrumentacao.etapa('busca_locais'):
+            encontrados = set(cubo.locais['NM_LOCAL_VOTACAO'].iloc[busca.buscar(busca_local, zona_filtro)])
+            encontrados.update(st.session_state.get('locais_selecionados', []))
+            locais_disponiveis = [local for local in locais_disponiveis if local in encontrados]
+    locais_selecionados = st.multiselect("Pesquisar por Local de Votação:", options=locais_disponiveis, placeholder="Digite o nome de um local...", key='locais_selecionados')
+
+with instrumentacao.etapa('filtros'):
+    mascara_filtro = filtros.mascara(candidatos_modo, zona_filtro, locais_selecionados)
+    tem_dados = len(filtros.indices(candidatos_modo, zona_filtro, locais_selecionados)) > 0
 
 st.divider()
 
 # --- PRÉ-CÁLCULO DOS DADOS PARA O MAPA DE PONTOS ---
 df_mapa = pd.DataFrame()
-if not df_filtrado.empty and 'NOME_BAIRRO' in df_filtrado.columns:
-    if modo_analise in ["Apenas Fernando Paes", "Apenas Índia Armelau"]:
-        df_mapa = df_filtrado[['NM_LOCAL_VOTACAO', 'lat', 'lon', 'QT_VOTOS_TOTAL']].copy()
-        df_mapa.rename(columns={'QT_VOTOS_TOTAL': 'Votos_Candidato_Unico'}, inplace=True)
-    else: # modo_analise == "Visão Geral"
-        df_mapa = df_filtrado.pivot_table(index=['NM_LOCAL_VOTACAO', 'lat', 'lon'], columns=COLUNA_CANDIDATO, values='QT_VOTOS_TOTAL', aggfunc='sum').reset_index().fillna(0)
-        if NOME_FERNANDO not in df_mapa: df_mapa[NOME_FERNANDO] = 0
-        if NOME_INDIA not in df_mapa: df_mapa[NOME_INDIA] = 0
-        df_mapa[NOME_FERNANDO] = df_mapa[NOME_FERNANDO].astype(int)
-        df_mapa[NOME_INDIA] = df_mapa[NOME_INDIA].astype(int)
-        df_mapa['Diferença'] = df_mapa[NOME_FERNANDO] - df_mapa[NOME_INDIA]
-        df_mapa['Total_Votos'] = df_mapa[NOME_FERNANDO] + df_mapa[NOME_INDIA]
-        df_mapa['Diferenca_Absoluta'] = df_mapa['Diferença'].abs()
-        epsilon = 1e-9
-        proporcao_diferenca = df_mapa['Diferenca_Absoluta'] / (df_mapa['Total_Votos'] + epsilon)
-        fator_sinergia = 1 - proporcao_diferenca
-        fator_sinergia_ajustado = fator_sinergia ** 0.5
-        df_mapa['Sinergia_Peso'] = df_mapa['Total_Votos'] * fator_sinergia_ajustado
+df_grade = gdf_bairros_mancha = df_display = None  # frames do rerun, contabilizados por sessão (ver memoria.py)
+if tem_dados:
+    with instrumentacao.etapa('agregacao_pontos'):
+        if modo_analise in ["Apenas Fernando Paes", "Apenas Índia Armelau"]:
+            df_mapa = cubo.agregar('ponto', mascara_filtro, candidatos_modo)
+            df_mapa.columns = CHAVE_PONTO + ['Votos_Candidato_Unico']
+        else: # modo_analise == "Visão Geral"
+            df_mapa = cubo.agregar('ponto', mascara_filtro, candidatos_modo)
+            if NOME_FERNANDO not in df_mapa: df_mapa[NOME_FERNANDO] = 0
+            if NOME_INDIA not in df_mapa: df_mapa[NOME_INDIA] = 0
+            # Métricas do par em uma passada sobre os votos por ponto (ver metricas.py)
+            metricas_pontos = metricas_par(df_mapa[NOME_FERNANDO].to_numpy(), df_mapa[NOME_INDIA].to_numpy())
+            df_mapa['Diferença'] = metricas_pontos.diferenca
+            df_mapa['Total_Votos'] = metricas_pontos.total
+            df_mapa['Diferenca_Absoluta'] = metricas_pontos.diferenca_absoluta
+            df_mapa['Sinergia_Peso'] = metricas_pontos.sinergia_peso
 
 # --- MAPA E LEGENDA INTERATIVA ---
 map_col, legend_col = st.columns([4, 1])
+exibicao_pontos = "Automático"
+motor_mancha = MOTOR_BAIRROS
 
 with legend_col:
     st.header("Legenda do Mapa")
@@ -269,14 +525,43 @@ with legend_col:
             modo_cor = st.radio("Colorir pontos por:", ("Sinergia (Relativa %)", "Sinergia (Absoluta)", "Magnitude da Vitória", "Volume de Votos (Ponderado)"))
             st.markdown(f'<div style="display: flex; align-items: center; margin-bottom: 5px;"><div style="width: 20px; height: 20px; background-color: {COR_FERNANDO}; border-radius: 50%; margin-right: 10px;"></div><span>Fernando Paes</span></div>', unsafe_allow_html=True)
             st.markdown(f'<div style="display: flex; align-items: center; margin-bottom: 15px;"><div style="width: 20px; height: 20px; background-color: {COR_INDIA}; border-radius: 50%; margin-right: 10px;"></div><span>Índia Armelau</span></div>', unsafe_allow_html=True)
+        exibicao_pontos = st.radio(
+            "Exibir locais como:",
+            ("Automático", "Pontos", "Grade"),
+            horizontal=True,
+            help=f"'Automático': pontos até {LIMITE_PONTOS:,} locais e grade de células acima disso.".replace(",", ".")
+        )
 
     elif tipo_visualizacao == "Mancha de Votos":
+        if len(geometrias_bairros) == 0:
+            st.info(f"Não há limites de bairros para {nome_municipio}: a mancha é desenhada pela densidade contínua.")
+        motor_mancha = st.radio(
+            "Desenhar a mancha por:",
+            (MOTOR_BAIRROS, MOTOR_DENSIDADE) if len(geometrias_bairros) else (MOTOR_DENSIDADE,),
+            horizontal=True,
+            help="'Bairros': votos somados em cada polígono. 'Densidade contínua': votos espalhados por um núcleo "
+                 f"gaussiano em uma grade de {TAMANHO_PIXEL} m sobre o município, sem depender dos limites dos bairros."
+        )
+        if motor_mancha == MOTOR_DENSIDADE:
+            banda_densidade = st.select_slider(
+                "Raio do núcleo (m):",
+                options=BANDAS,
+                value=BANDA_PADRAO,
+                help="Desvio padrão do núcleo gaussiano: raios maiores suavizam a superfície."
+            )
+
         if modo_analise in ["Apenas Fernando Paes", "Apenas Índia Armelau"]:
             candidato_selecionado = "Fernando Paes" if modo_analise == "Apenas Fernando Paes" else "Índia Armelau"
             cor_base_html = COR_FERNANDO if candidato_selecionado == "Fernando Paes" else COR_INDIA
             st.markdown(f"**Mancha de Votos - {candidato_selecionado}**")
             st.markdown(f'<div style="display: flex; align-items: center; margin-bottom: 5px;"><div style="width: 20px; height: 20px; background-color: {cor_base_html}; border-radius: 5px; margin-right: 10px;"></div><span>Força Eleitoral</span></div>', unsafe_allow_html=True)
-            st.markdown("**Escala de Intensidade:**<p style='font-size: 0.9em;'>Cada bairro é colorido conforme a <b>força eleitoral</b> do candidato. Quanto mais <b>intensa</b> a cor, <b>maior</b> o número de votos na região.</p>", unsafe_allow_html=True)
+            metodo_classificacao = CLASSIFICACAO_CONTINUA
+            if motor_mancha == MOTOR_BAIRROS:
+                metodo_classificacao = st.selectbox(
+                    "Classificação:",
+                    (CLASSIFICACAO_CONTINUA,) + METODOS,
+                    help="Como os votos por bairro viram intensidade de cor; com classes, as faixas aparecem na legenda."
+                )
         else:
             st.markdown("**Mancha de Sinergia - Parceria Eleitoral**")
             
@@ -289,54 +574,68 @@ with legend_col:
             
             if tipo_mancha == "Força Conjunta":
                 st.markdown(f'<div style="display: flex; align-items: center; margin-bottom: 5px;"><div style="width: 20px; height: 20px; background-color: #1E90FF; border-radius: 5px; margin-right: 10px;"></div><span>Força da Parceria</span></div>', unsafe_allow_html=True)
-                st.markdown("**Escala de Intensidade:**<p style='font-size: 0.9em;'>Escala de <b>azul</b> com intensidades diferentes. Quanto mais <b>intenso</b> o azul, maior a <b>força conjunta</b> (sinergia + volume de votos) entre Fernando Paes e Índia Armelau.</p>", unsafe_allow_html=True)
             else:
                 st.markdown(f'<div style="display: flex; align-items: center; margin-bottom: 5px;"><div style="width: 20px; height: 20px; background-color: #1E90FF; border-radius: 5px; margin-right: 10px;"></div><span>Transferência de Votos</span></div>', unsafe_allow_html=True)
-                st.markdown("**Escala de Sinergia:**<p style='font-size: 0.9em;'>Escala de <b>azul</b> focada na <b>transferência de votos</b> entre os candidatos. Quanto mais <b>intenso</b> o azul, maior a <b>sinergia eleitoral</b> na região, independente do volume total.</p>", unsafe_allow_html=True)
+            metodo_classificacao = METODOS[0]
+            if motor_mancha == MOTOR_BAIRROS:
+                metodo_classificacao = st.selectbox(
+                    "Classificação:",
+                    METODOS,
+                    help="Como as quebras entre as classes de cor são calculadas sobre os bairros com votos."
+                )
 
 # --- RENDERIZAÇÃO DO MAPA ---
 with map_col:
-    view_state = pdk.ViewState(latitude=-22.9068, longitude=-43.1729, zoom=9.5, pitch=0)
-    polygon_layer = pdk.Layer("GeoJsonLayer", data=municipio_rj_geo, get_fill_color="[220, 220, 220, 40]", get_line_color="[0, 0, 0, 100]", get_line_width=30)
+    view_state = vista_inicial(particoes, municipio)
+    polygon_layer = pdk.Layer("GeoJsonLayer", data=geometrias_municipio.registros(NIVEL_PADRAO), get_fill_color="[220, 220, 220, 40]", get_line_color="[0, 0, 0, 100]", get_line_width=30)
 
-    if not df_filtrado.empty and 'NOME_BAIRRO' in df_filtrado.columns:
+    if tem_dados:
         if tipo_visualizacao == "Pontos":
-            if modo_analise in ["Apenas Fernando Paes", "Apenas Índia Armelau"]:
-                max_votos_unico = df_mapa['Votos_Candidato_Unico'].max() or 1
-                cor_base_rgb = RGB_FERNANDO if modo_analise == "Apenas Fernando Paes" else RGB_INDIA
-                df_mapa['cor'] = df_mapa['Votos_Candidato_Unico'].apply(lambda x: cor_base_rgb + [int(50 + (x / max_votos_unico) * 205)])
-                df_mapa['raio'] = df_mapa['Votos_Candidato_Unico'].apply(lambda x: 100 + (x / max_votos_unico * 400))
-                df_mapa['tooltip'] = df_mapa.apply(lambda r: f"<b>{r['NM_LOCAL_VOTACAO']}</b><br>Votos: {r['Votos_Candidato_Unico']}", axis=1)
-            else: # modo_analise == "Visão Geral"
-                max_abs_diff = df_mapa['Diferença'].abs().max() or 1
-                max_total_votos = df_mapa['Total_Votos'].max() or 1
-                df_mapa['Diff_Relativa'] = (df_mapa['Diferença'].abs() / (df_mapa['Total_Votos'] + 1e-9)).fillna(0)
-                def get_color(row, mode):
-                    diff, total, diff_rel = row['Diferença'], row['Total_Votos'], row['Diff_Relativa']
-                    base_color = RGB_FERNANDO if diff > 0 else (RGB_INDIA if diff < 0 else [128, 128, 128])
-                    alpha = 128
-                    if mode == "Sinergia (Relativa %)": alpha = int(100 + (1 - diff_rel) * 155)
-                    elif mode == "Sinergia (Absoluta)": alpha = int(100 + (1 - (abs(diff) / max_abs_diff)) * 155) if max_abs_diff > 0 else 100
-                    elif mode == "Magnitude da Vitória": alpha = int(100 + (abs(diff) / max_abs_diff) * 155) if max_abs_diff > 0 else 100
-                    elif mode == "Volume de Votos (Ponderado)": base_color, alpha = [0, 0, 255], int(50 + (total / max_total_votos) * 205) if max_total_votos > 0 else 50
-                    return base_color + [alpha]
-                df_mapa['cor'] = df_mapa.apply(lambda row: get_color(row, modo_cor), axis=1)
-                df_mapa['raio'] = df_mapa['Total_Votos'].apply(lambda x: 100 + (x / max_total_votos * 400) if max_total_votos > 0 else 100)
-                df_mapa['tooltip'] = df_mapa.apply(lambda r: f"<b>{r['NM_LOCAL_VOTACAO']}</b><br>F. Paes: {r[NOME_FERNANDO]}<br>Í. Armelau: {r[NOME_INDIA]}<br><b>Diferença: {r['Diferença']}</b><br>Total: {r['Total_Votos']}", axis=1)
-
-            scatterplot_layer = pdk.Layer("ScatterplotLayer", data=df_mapa, get_position='[lon, lat]', get_color='cor', get_radius='raio', pickable=True)
-            st.pydeck_chart(pdk.Deck(layers=[polygon_layer, scatterplot_layer], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT, tooltip={"html": "{tooltip}"}))
+            # Com muitos locais o mapa recebe as somas por célula da pirâmide de grades (ver grade.py)
+            usar_grade = exibicao_pontos == "Grade" or (exibicao_pontos == "Automático" and len(df_mapa) > LIMITE_PONTOS)
+            if usar_grade:
+                with instrumentacao.etapa('agregacao_grade', funcao_cache='carregar_grade'):
+                    somas_grade = somas_grade_sessao(carregar_grade(municipio))
+                    somas_grade.atualizar(cubo.com_votos(mascara_filtro, candidatos_modo))
+                    nivel_grade = somas_grade.escolher_nivel(view_state.zoom, view_state.latitude)
+                    df_grade = somas_grade.tabela(nivel_grade)
+                with instrumentacao.etapa('estilo_grade'):
+                    lado_celula = somas_grade.piramide.tamanho_celula(nivel_grade)
+                    nomes_celulas = (f"Célula de {lado_celula / 1000:g} km · " + df_grade['locais'].astype(str)
+                                     + np.where(df_grade['locais'] == 1, " local", " locais"))
+                    if modo_analise in ["Apenas Fernando Paes", "Apenas Índia Armelau"]:
+                        candidato_grade, cor_base_rgb = (NOME_FERNANDO, RGB_FERNANDO) if modo_analise == "Apenas Fernando Paes" else (NOME_INDIA, RGB_INDIA)
+                        cores, _, tooltips = estilizar_pontos_candidato(nomes_celulas, df_grade[candidato_grade], cor_base_rgb)
+                    else: # modo_analise == "Visão Geral"
+                        cores, _, tooltips = estilizar_pontos_comparativo(
+                            nomes_celulas, df_grade[NOME_FERNANDO], df_grade[NOME_INDIA],
+                            "F. Paes", "Í. Armelau", modo_cor, RGB_FERNANDO, RGB_INDIA)
+                        tooltips = tooltips + "<br>Sinergia ponderada: " + df_grade['Sinergia_Peso'].round().astype(np.int64).astype(str)
+                    df_grade['cor'] = cores.tolist()
+                    df_grade['tooltip'] = tooltips.to_numpy()
+                camada_pontos = pdk.Layer("PolygonLayer", data=df_grade[['poligono', 'cor', 'tooltip']], get_polygon='poligono', get_fill_color='cor', stroked=False, pickable=True)
+            else:
+                with instrumentacao.etapa('estilo_pontos'):
+                    if modo_analise in ["Apenas Fernando Paes", "Apenas Índia Armelau"]:
+                        cor_base_rgb = RGB_FERNANDO if modo_analise == "Apenas Fernando Paes" else RGB_INDIA
+                        cores, raios, tooltips = estilizar_pontos_candidato(df_mapa['NM_LOCAL_VOTACAO'], df_mapa['Votos_Candidato_Unico'], cor_base_rgb)
+                        df_mapa['cor'] = cores.tolist()
+                        df_mapa['raio'] = raios
+                        df_mapa['tooltip'] = tooltips.to_numpy()
+                    else: # modo_analise == "Visão Geral"
+                        df_mapa['Diff_Relativa'] = metricas_pontos.diferenca_relativa
+                        cores, raios, tooltips = estilizar_pontos_comparativo(
+                            df_mapa['NM_LOCAL_VOTACAO'], df_mapa[NOME_FERNANDO], df_mapa[NOME_INDIA],
+                            "F. Paes", "Í. Armelau", modo_cor, RGB_FERNANDO, RGB_INDIA)
+                        df_mapa['cor'] = cores.tolist()
+                        df_mapa['raio'] = raios
+                        df_mapa['tooltip'] = tooltips.to_numpy()
+
+                camada_pontos = pdk.Layer("ScatterplotLayer", data=df_mapa, get_position='[lon, lat]', get_color='cor', get_radius='raio', pickable=True)
+            exibir_mapa(pdk.Deck(layers=[polygon_layer, camada_pontos], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT, tooltip={"html": "{tooltip}"}))
 
             # Botões de exportação
-            if st.button("Exportar Dados (CSV)", key="export_csv_pontos"):
-                export_data, timestamp = export_map_data(df_mapa, "Pontos", modo_analise)
-                csv_data = export_data.to_csv(index=False, encoding='utf-8-sig')
-                st.markdown(create_download_link(csv_data, f"dados_pontos_{timestamp}.csv", "csv"), unsafe_allow_html=True)
-            
-            if st.button("Exportar Dados (JSON)", key="export_json_pontos"):
-                export_data, timestamp = export_map_data(df_mapa, "Pontos", modo_analise)
-                json_data = export_data.to_json(orient='records', force_ascii=False, indent=2)
-                st.markdown(create_download_link(json_data, f"dados_pontos_{timestamp}.json", "json"), unsafe_allow_html=True)
+            botoes_exportacao(df_mapa, "pontos", "dados_pontos", "Pontos", modo_analise)
             
             if st.button("Salvar como PDF", key="export_pdf_pontos"):
                 st.info("Use Ctrl+P no navegador para salvar o mapa como PDF")
@@ -352,40 +651,51 @@ with map_col:
                     cor_base_rgb = RGB_FERNANDO if modo_analise == "Apenas Fernando Paes" else RGB_INDIA
                 
                     # Agrupa votos por bairro
-                    df_bairros_mancha = df_filtrado.groupby('NOME_BAIRRO')['QT_VOTOS_TOTAL'].sum().reset_index()
-                    gdf_bairros_mancha = bairros_rj_geo.merge(df_bairros_mancha, left_on='nome', right_on='NOME_BAIRRO', how='left').fillna(0)
+                    with instrumentacao.etapa('agregacao_bairros'):
+                        df_bairros_mancha = cubo.agregar('NOME_BAIRRO', mascara_filtro, candidatos_modo).sum(axis=1).rename('QT_VOTOS_TOTAL').reset_index()
+                        gdf_bairros_mancha = geometrias_bairros.atributos.merge(df_bairros_mancha, left_on='nome', right_on='NOME_BAIRRO', how='left').fillna(0)
                 
-                    # Calcula intensidade da mancha (0 a 1)
-                    max_votos = gdf_bairros_mancha['QT_VOTOS_TOTAL'].max() or 1
-                    gdf_bairros_mancha['intensidade'] = gdf_bairros_mancha['QT_VOTOS_TOTAL'] / max_votos
-                    
-                    # Cria cor baseada na intensidade
-                    def get_mancha_color_unico(intensidade):
-                        alpha = int(50 + intensidade * 205)  # Transparência baseada na intensidade
-                        return cor_base_rgb + [alpha]
-                    
-                    gdf_bairros_mancha['cor'] = gdf_bairros_mancha['intensidade'].apply(get_mancha_color_unico)
-                    gdf_bairros_mancha['tooltip'] = gdf_bairros_mancha.apply(
-                        lambda r: f"<b>Bairro: {r['nome']}</b><br>"
-                                f"Votos: {int(r['QT_VOTOS_TOTAL'])}<br>"
-                                f"Força Eleitoral: {r['intensidade']:.1%}", axis=1)
-                    
-                    mancha_layer = pdk.Layer(
-                        "GeoJsonLayer", data=gdf_bairros_mancha, opacity=0.8, pickable=True,
-                        get_fill_color='cor', get_line_color=[0, 0, 0, 100], get_line_width=15,
-                    )
-                    st.pydeck_chart(pdk.Deck(layers=[polygon_layer, mancha_layer], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT, tooltip={"html": "{tooltip}"}))
+                    # Intensidade da mancha (0 a 1), cor e tooltip calculados por coluna (ver estilos.py)
+                    with instrumentacao.etapa('estilo_mancha'):
+                        intensidade, cores, tooltips = estilizar_mancha_candidato(
+                            gdf_bairros_mancha['nome'], gdf_bairros_mancha['QT_VOTOS_TOTAL'], cor_base_rgb)
+                        if metodo_classificacao != CLASSIFICACAO_CONTINUA:
+                            # Classes de votos por bairro em vez da escala linear (ver classificacao.py)
+                            quebras = classificacoes.quebras(chave_filtro(candidatos_modo, zona_filtro, locais_selecionados),
+                                                             'QT_VOTOS_TOTAL', metodo_classificacao, gdf_bairros_mancha['QT_VOTOS_TOTAL'])
+                            cores = cores_mancha_classes(gdf_bairros_mancha['QT_VOTOS_TOTAL'], quebras, cor_base_rgb)
+                        gdf_bairros_mancha['intensidade'] = intensidade
+                        gdf_bairros_mancha['cor'] = cores.tolist()
+                        gdf_bairros_mancha['tooltip'] = tooltips.to_numpy()
+
+                    if motor_mancha == MOTOR_DENSIDADE:
+                        # Superfície contínua dos votos do candidato (ver densidade.py)
+                        with instrumentacao.etapa('densidade', funcao_cache='carregar_densidade'):
+                            raster = raster_densidade(chave_filtro(candidatos_modo, zona_filtro, locais_selecionados),
+                                                      candidato_selecionado, banda_densidade, cor_base_rgb, mascara_filtro)
+                        camadas_mancha = camadas_densidade(raster, gdf_bairros_mancha)
+                    else:
+                        camadas_mancha = [pdk.Layer(
+                            "GeoJsonLayer", data=geometrias_bairros.registros(NIVEL_PADRAO, gdf_bairros_mancha[['nome', 'cor', 'tooltip']]), opacity=0.8, pickable=True,
+                            get_fill_color='cor', get_line_color=[0, 0, 0, 100], get_line_width=15,
+                        )]
+
+                    with legend_col:
+                        if motor_mancha == MOTOR_DENSIDADE:
+                            maximo_km2 = raster.maximo / (TAMANHO_PIXEL / 1000) ** 2 if raster else 0
+                            st.markdown(f"**Escala:** intensidade proporcional à densidade de votos, de 0 a "
+                                        f"{formatar_votos(maximo_km2)} votos/km² (núcleo de {banda_densidade} m).")
+                        elif metodo_classificacao == CLASSIFICACAO_CONTINUA:
+                            st.markdown(f"**Escala:** intensidade proporcional aos votos, de 0 a "
+                                        f"{formatar_votos(gdf_bairros_mancha['QT_VOTOS_TOTAL'].max())} votos por bairro.")
+                        else:
+                            legenda_classes(quebras, paleta_classes(cor_base_rgb), formatar_votos)
+
+                    exibir_mapa(pdk.Deck(layers=[polygon_layer, *camadas_mancha], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT, tooltip={"html": "{tooltip}"}))
                 
                     # Botões de exportação para candidato individual
-                    if st.button("Exportar Dados (CSV)", key="export_csv_mancha_individual"):
-                        export_data, timestamp = export_map_data(gdf_bairros_mancha, "Mancha de Votos", modo_analise)
-                        csv_data = export_data.to_csv(index=False, encoding='utf-8-sig')
-                        st.markdown(create_download_link(csv_data, f"dados_mancha_{timestamp}.csv", "csv"), unsafe_allow_html=True)
-                    
-                    if st.button("Exportar Dados (JSON)", key="export_json_mancha_individual"):
-                        export_data, timestamp = export_map_data(gdf_bairros_mancha, "Mancha de Votos", modo_analise)
-                        json_data = export_data.to_json(orient='records', force_ascii=False, indent=2)
-                        st.markdown(create_download_link(json_data, f"dados_mancha_{timestamp}.json", "json"), unsafe_allow_html=True)
+                    botoes_exportacao(gdf_bairros_mancha, "mancha_individual", "dados_mancha", "Mancha de Votos", modo_analise,
+                                      geometrias=geometrias_bairros.feicoes[NIVEL_COMPLETO])
                     
                     if st.button("Salvar como PDF", key="export_pdf_mancha_individual"):
                         st.info("Use Ctrl+P no navegador para salvar o mapa como PDF")
@@ -395,95 +705,54 @@ with map_col:
                 
                 else: # modo_analise == "Visão Geral" - MANCHA DE SINERGIA
                     # Agrupa votos por bairro para cada candidato
-                    df_bairros_mancha = df_filtrado.pivot_table(index='NOME_BAIRRO', columns=COLUNA_CANDIDATO, values='QT_VOTOS_TOTAL', aggfunc='sum').fillna(0)
-                    if NOME_FERNANDO not in df_bairros_mancha: df_bairros_mancha[NOME_FERNANDO] = 0
-                    if NOME_INDIA not in df_bairros_mancha: df_bairros_mancha[NOME_INDIA] = 0
-                    
-                    # Calcula SINERGIA - força conjunta dos candidatos
-                    df_bairros_mancha['Total_Votos'] = df_bairros_mancha[NOME_FERNANDO] + df_bairros_mancha[NOME_INDIA]
-                    df_bairros_mancha['Diferenca_Absoluta'] = abs(df_bairros_mancha[NOME_FERNANDO] - df_bairros_mancha[NOME_INDIA])
-                
-                    # SINERGIA: quanto mais equilibrados os votos, maior a sinergia
-                    # Sinergia = 1 - (diferença absoluta / total de votos)
-                    epsilon = 1e-9
-                    df_bairros_mancha['Sinergia'] = 1 - (df_bairros_mancha['Diferenca_Absoluta'] / (df_bairros_mancha['Total_Votos'] + epsilon))
-                
-                    # Calcula força conjunta (sinergia + volume)
-                    max_total = df_bairros_mancha['Total_Votos'].max() or 1
-                    df_bairros_mancha['Forca_Conjunta'] = df_bairros_mancha['Sinergia'] * (df_bairros_mancha['Total_Votos'] / max_total)
-                
-                    # Define qual valor usar baseado na opção selecionada
-                    if tipo_mancha == "Apenas Sinergia":
-                        df_bairros_mancha['Valor_Visualizacao'] = df_bairros_mancha['Sinergia']
-                    else:  # Força Conjunta
-                        df_bairros_mancha['Valor_Visualizacao'] = df_bairros_mancha['Forca_Conjunta']
+                    with instrumentacao.etapa('agregacao_bairros'):
+                        # Sinergia e força conjunta por bairro (ver indicadores.py)
+                        df_bairros_mancha = sinergia_bairros(cubo.agregar('NOME_BAIRRO', mascara_filtro, candidatos_modo))
+
+                        # Define qual valor usar baseado na opção selecionada
+                        if tipo_mancha == "Apenas Sinergia":
+                            df_bairros_mancha['Valor_Visualizacao'] = df_bairros_mancha['Sinergia']
+                        else:  # Força Conjunta
+                            df_bairros_mancha['Valor_Visualizacao'] = df_bairros_mancha['Forca_Conjunta']
                     
-                    gdf_bairros_mancha = bairros_rj_geo.merge(df_bairros_mancha, left_on='nome', right_index=True, how='left').fillna(0)
+                        gdf_bairros_mancha = geometrias_bairros.atributos.merge(df_bairros_mancha, left_on='nome', right_index=True, how='left').fillna(0)
                 
-                    # Calcula percentis dos dados reais para criar escala baseada na distribuição
-                    valores_para_escala = df_bairros_mancha['Valor_Visualizacao'].values
-                    valores_para_escala = valores_para_escala[valores_para_escala > 0]  # Remove zeros
-                    
-                    if len(valores_para_escala) > 0:
-                        # Calcula percentis para criar escala baseada na distribuição real
-                        p25 = np.percentile(valores_para_escala, 25)
-                        p50 = np.percentile(valores_para_escala, 50)
-                        p75 = np.percentile(valores_para_escala, 75)
-                        p90 = np.percentile(valores_para_escala, 90)
-                        p95 = np.percentile(valores_para_escala, 95)
-                        p99 = np.percentile(valores_para_escala, 99)
+                    with instrumentacao.etapa('estilo_mancha'):
+                        # Quebras da distribuição real dos bairros com votos, em cache por filtro, métrica e método
+                        metrica = 'Sinergia' if tipo_mancha == "Apenas Sinergia" else 'Forca_Conjunta'
+                        quebras = classificacoes.quebras(chave_filtro(candidatos_modo, zona_filtro, locais_selecionados),
+                                                         metrica, metodo_classificacao, df_bairros_mancha['Valor_Visualizacao'])
+
+                        # ESCALA EXPONENCIAL - SEPARAÇÃO MÁXIMA DOS VALORES ALTOS (classes em estilos.py)
+                        gdf_bairros_mancha['cor'] = cores_mancha_sinergia(gdf_bairros_mancha['Valor_Visualizacao'], quebras).tolist()
+                        gdf_bairros_mancha['tooltip'] = tooltips_mancha_sinergia(
+                            gdf_bairros_mancha['nome'], gdf_bairros_mancha[NOME_FERNANDO], gdf_bairros_mancha[NOME_INDIA],
+                            gdf_bairros_mancha['Total_Votos'], gdf_bairros_mancha['Sinergia'], gdf_bairros_mancha['Forca_Conjunta'],
+                            gdf_bairros_mancha['Valor_Visualizacao'], "F. Paes", "Í. Armelau", tipo_mancha).to_numpy()
+
+                    if motor_mancha == MOTOR_DENSIDADE:
+                        # Sinergia ou força conjunta pixel a pixel, a partir das superfícies dos dois candidatos
+                        with instrumentacao.etapa('densidade', funcao_cache='carregar_densidade'):
+                            raster = raster_densidade(chave_filtro(candidatos_modo, zona_filtro, locais_selecionados),
+                                                      metrica, banda_densidade, RGB_SINERGIA, mascara_filtro)
+                        camadas_mancha = camadas_densidade(raster, gdf_bairros_mancha)
+                        with legend_col:
+                            st.markdown(f"**Escala:** {'sinergia' if metrica == 'Sinergia' else 'força conjunta'} por pixel, "
+                                        f"de 0 a {formatar_percentual(raster.maximo if raster else 0)} "
+                                        f"(núcleo de {banda_densidade} m; tooltips por bairro).")
                     else:
-                        p25 = p50 = p75 = p90 = p95 = p99 = 0.01
-                
-                
-                    # Cria cor com ESCALA EXPONENCIAL - SEPARAÇÃO MÁXIMA DOS VALORES ALTOS
-                    def get_mancha_color_sinergia(row):
-                        valor_base = row['Valor_Visualizacao']
-                        
-                        # ESCALA EXPONENCIAL PARA SEPARAR MELHOR OS VALORES ALTOS
-                        if valor_base <= 0:
-                            return [200, 200, 200, 5]  # Cinza quase invisível
-                        elif valor_base <= p25:
-                            return [30, 144, 255, 10]  # Azul MUITO claro
-                        elif valor_base <= p50:
-                            return [30, 144, 255, 25]  # Azul claro
-                        elif valor_base <= p75:
-                            return [30, 144, 255, 50]  # Azul médio
-                        elif valor_base <= p90:
-                            return [30, 144, 255, 100]  # Azul forte
-                        elif valor_base <= p95:
-                            return [30, 144, 255, 160]  # Azul muito forte
-                        elif valor_base <= p99:
-                            return [30, 144, 255, 200]  # Azul intenso
-                        else:
-                            return [30, 144, 255, 255]  # Azul máximo
-                
-                    gdf_bairros_mancha['cor'] = gdf_bairros_mancha.apply(get_mancha_color_sinergia, axis=1)
-                    gdf_bairros_mancha['tooltip'] = gdf_bairros_mancha.apply(
-                        lambda r: f"<b>Bairro: {r['nome']}</b><br>"
-                                f"F. Paes: {int(r[NOME_FERNANDO])}<br>"
-                                f"Í. Armelau: {int(r[NOME_INDIA])}<br>"
-                                f"<b>Total: {int(r['Total_Votos'])}</b><br>"
-                                f"<b>Sinergia: {r['Sinergia']:.1%}</b><br>"
-                                f"Força Conjunta: {r['Forca_Conjunta']:.1%}<br>"
-                                f"<b>{tipo_mancha}: {r['Valor_Visualizacao']:.1%}</b>", axis=1)
-                    
-                    mancha_layer = pdk.Layer(
-                        "GeoJsonLayer", data=gdf_bairros_mancha, opacity=0.8, pickable=True,
-                        get_fill_color='cor', get_line_color=[0, 0, 0, 100], get_line_width=15,
-                    )
-                    st.pydeck_chart(pdk.Deck(layers=[polygon_layer, mancha_layer], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT, tooltip={"html": "{tooltip}"}))
+                        camadas_mancha = [pdk.Layer(
+                            "GeoJsonLayer", data=geometrias_bairros.registros(NIVEL_PADRAO, gdf_bairros_mancha[['nome', 'cor', 'tooltip']]), opacity=0.8, pickable=True,
+                            get_fill_color='cor', get_line_color=[0, 0, 0, 100], get_line_width=15,
+                        )]
+                        with legend_col:
+                            legenda_classes(quebras, paleta_classes(), formatar_percentual)
+
+                    exibir_mapa(pdk.Deck(layers=[polygon_layer, *camadas_mancha], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT, tooltip={"html": "{tooltip}"}))
                 
                     # Botões de exportação para sinergia
-                    if st.button("Exportar Dados (CSV)", key="export_csv_sinergia"):
-                        export_data, timestamp = export_map_data(gdf_bairros_mancha, f"Mancha de Sinergia - {tipo_mancha}", "Visão Geral")
-                        csv_data = export_data.to_csv(index=False, encoding='utf-8-sig')
-                        st.markdown(create_download_link(csv_data, f"dados_sinergia_{timestamp}.csv", "csv"), unsafe_allow_html=True)
-                    
-                    if st.button("Exportar Dados (JSON)", key="export_json_sinergia"):
-                        export_data, timestamp = export_map_data(gdf_bairros_mancha, f"Mancha de Sinergia - {tipo_mancha}", "Visão Geral")
-                        json_data = export_data.to_json(orient='records', force_ascii=False, indent=2)
-                        st.markdown(create_download_link(json_data, f"dados_sinergia_{timestamp}.json", "json"), unsafe_allow_html=True)
+                    botoes_exportacao(gdf_bairros_mancha, "sinergia", "dados_sinergia", f"Mancha de Sinergia - {tipo_mancha}", "Visão Geral",
+                                      geometrias=geometrias_bairros.feicoes[NIVEL_COMPLETO])
                     
                     if st.button("Salvar como PDF", key="export_pdf_sinergia"):
                         st.info("Use Ctrl+P no navegador para salvar o mapa como PDF")
@@ -495,8 +764,11 @@ with map_col:
             with col_ranking:
                 st.subheader("Ranking de Sinergia")
                 
-                # Cria ranking baseado na seleção atual
-                top_5_maior, top_5_menor = criar_ranking_sinergia(gdf_bairros_mancha, tipo_mancha)
+                # Cria ranking baseado na seleção atual (sinergia só existe com os dois candidatos)
+                top_5_maior = top_5_menor = None
+                if modo_analise == "Visão Geral":
+                    with instrumentacao.etapa('ranking_sinergia'):
+                        top_5_maior, top_5_menor = criar_ranking_sinergia(gdf_bairros_mancha, tipo_mancha)
                 
                 if top_5_maior is not None and not top_5_maior.empty:
                     # Top 5 Maior Sinergia
@@ -518,7 +790,7 @@ with map_col:
                     st.info("Nenhum dado disponível para ranking")
         
     else:
-        st.pydeck_chart(pdk.Deck(layers=[polygon_layer], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT))
+        exibir_mapa(pdk.Deck(layers=[polygon_layer], initial_view_state=view_state, map_style=pdk.map_styles.CARTO_LIGHT))
         st.info("Nenhum dado para exibir no mapa com os filtros atuais.")
 
 # --- SEÇÃO DE ANÁLISE DETALHADA ---
@@ -527,35 +799,21 @@ st.header("Análise Detalhada por Agrupamento")
 
 # **ALTERAÇÃO AQUI: A seção inteira foi reescrita para ser interativa e mais completa**
 if modo_analise == "Visão Geral":
-    if not df_filtrado.empty:
+    if tem_dados:
         analysis_col1, analysis_col2 = st.columns([1, 3])
 
         with analysis_col1:
-            mapa_agrupamento = {
-                "Bairro": "NOME_BAIRRO",
-                "Zona Eleitoral": "NR_ZONA",
-                "Local de Votação": "NM_LOCAL_VOTACAO"
-            }
             nivel_analise = st.radio(
                 "Analisar por:",
-                options=list(mapa_agrupamento.keys()),
+                options=list(NIVEIS_ANALISE.keys()),
                 horizontal=False,
                 key="nivel_analise_radio"
             )
-            coluna_agrupamento = mapa_agrupamento[nivel_analise]
-
-            # Dicionário de opções de ordenação
-            opcoes_ordenacao = {
-                "Padrão (Alfabética)": ("index", True),
-                "Mais Votos (F. Paes)": ("Votos F. Paes", False),
-                "Mais Votos (Í. Armelau)": ("Votos Í. Armelau", False),
-                "Maior Volume Total de Votos": ("Total de Votos", False),
-                "Maior Vantagem (F. Paes)": ("Diferença (Paes - Armelau)", False),
-                "Maior Vantagem (Í. Armelau)": ("Diferença (Paes - Armelau)", True),
-            }
+            coluna_agrupamento = NIVEIS_ANALISE[nivel_analise]
+
             ordenacao_selecionada = st.selectbox(
                 "Ordenar por:",
-                options=list(opcoes_ordenacao.keys())
+                options=list(OPCOES_ORDENACAO.keys())
             )
 
         with analysis_col2:
@@ -564,56 +822,70 @@ if modo_analise == "Visão Geral":
                 placeholder="Digite para filtrar a tabela...",
                 key=f"search_{nivel_analise}"
             )
-            
-            df_analise = df_filtrado.pivot_table(
-                index=coluna_agrupamento,
-                columns=COLUNA_CANDIDATO,
-                values='QT_VOTOS_TOTAL',
-                aggfunc='sum'
-            ).fillna(0).astype(int)
-
-            if NOME_FERNANDO not in df_analise.columns: df_analise[NOME_FERNANDO] = 0
-            if NOME_INDIA not in df_analise.columns: df_analise[NOME_INDIA] = 0
-                
-            df_analise.rename(columns={
-                NOME_FERNANDO: "Votos F. Paes",
-                NOME_INDIA: "Votos Í. Armelau"
-            }, inplace=True)
-
-            # Adiciona colunas para total e diferença
-            df_analise["Total de Votos"] = df_analise["Votos F. Paes"] + df_analise["Votos Í. Armelau"]
-            df_analise["Diferença (Paes - Armelau)"] = df_analise["Votos F. Paes"] - df_analise["Votos Í. Armelau"]
-
-                        # Adiciona a coluna com a porcentagem da diferença
-            epsilon = 1e-9 # Evita divisão por zero
-            df_analise["Diferença (%)"] = (df_analise["Diferença (Paes - Armelau)"].abs() / (df_analise["Total de Votos"] + epsilon)) * 100
-
-            # Aplica o filtro de pesquisa
-            if search_term:
-                df_analise = df_analise[
-                    df_analise.index.astype(str).str.contains(search_term, case=False, na=False)
-                ]
-
-            # Aplica a ordenação selecionada
-            coluna_sort, ascendente = opcoes_ordenacao[ordenacao_selecionada]
-            if coluna_sort == "index":
-                df_display = df_analise.sort_index(ascending=ascendente)
-            else:
-                df_display = df_analise.sort_values(by=coluna_sort, ascending=ascendente)
-
-            # Estilização do DataFrame com cores
-            def color_paes(val):
-                return f'color: {COR_FERNANDO}'
-            def color_india(val):
-                return f'color: {COR_INDIA}'
 
-            styled_df = df_display.style.applymap(color_paes, subset=['Votos F. Paes']) \
-                                        .applymap(color_india, subset=['Votos Í. Armelau']) \
-                                        .format({"Diferença (%)": "{:.1f}%"})
-            
-            st.dataframe(styled_df, use_container_width=True)
+            with instrumentacao.etapa('agregacao_analise'):
+                # Tabelas e ordenações prontas para o estado de filtro; aqui só a busca e o recorte da página
+                tabela_nivel = analise.tabelas(chave_filtro(candidatos_modo, zona_filtro, locais_selecionados),
+                                               mascara_filtro, candidatos_modo)[coluna_agrupamento]
+                selecionadas = None
+                if search_term:
+                    posicoes = busca.buscar(search_term, zona_filtro, campos=[coluna_agrupamento], trechos_curtos=True)
+                    encontrados = cubo.locais[coluna_agrupamento].iloc[posicoes].unique()
+                    selecionadas = tabela_nivel.tabela.index.isin(encontrados)
+                linhas = tabela_nivel.linhas(ordenacao_selecionada, selecionadas)
+
+                total_paginas = n_paginas(len(linhas))
+                chave_pagina = f"pagina_{nivel_analise}"
+                if st.session_state.get(chave_pagina, 1) > total_paginas:
+                    st.session_state[chave_pagina] = total_paginas
+                pagina = st.session_state.get(chave_pagina, 1)
+                df_display = tabela_nivel.pagina(linhas, pagina - 1)
+
+            with instrumentacao.etapa('tabela_analise'):
+                st.dataframe(df_display, column_config=CONFIG_COLUNAS_ANALISE, use_container_width=True)
+            instrumentacao.payload('tabela_analise', lambda: tamanho_dataframe(df_display))
+
+            if total_paginas > 1:
+                pagina_col, info_col = st.columns([1, 3])
+                with pagina_col:
+                    st.number_input("Página", min_value=1, max_value=total_paginas, step=1, key=chave_pagina)
+                with info_col:
+                    st.caption(f"Página {pagina} de {total_paginas} · {len(linhas)} linhas")
 
     else:
         st.info("Nenhum dado para exibir na análise detalhada com os filtros atuais.")
 else:
     st.info("Selecione o modo 'Visão Geral' para ver a análise detalhada por agrupamento.")
+
+# --- MEMÓRIA (ver memoria.py) ---
+memoria = carregar_memoria()
+with instrumentacao.etapa('memoria'):
+    uso_memoria = memoria.contabilizar(instrumentacao.sessao, {
+        'estado_sessao': dict(st.session_state), 'df_mapa': df_mapa, 'df_grade': df_grade,
+        'gdf_bairros_mancha': gdf_bairros_mancha, 'df_display': df_display,
+    })
+if memoria.orcamento is not None:
+    st.caption(f"Memória: {uso_memoria['total']['privados_mb']:.0f} MB de {uso_memoria['orcamento_mb']:.0f} MB "
+               f"({uso_memoria['sessoes']['ativas']} sessões ativas; "
+               f"{uso_memoria['itens_despejados']} itens de cache despejados)")
+
+# --- DIAGNÓSTICO DE DESEMPENHO (PAINEL_DEBUG=1 ou ?debug=1) ---
+if instrumentacao.ativa:
+    registro = instrumentacao.registro()
+    registro['memoria'] = uso_memoria
+    with st.expander("Diagnóstico de desempenho"):
+        st.caption(f"Rerun em {registro['total_ms']:.0f} ms · sessão {registro['sessao']} · processo {registro['pid']}")
+        st.dataframe(instrumentacao.tabela(), hide_index=True, use_container_width=True)
+        st.markdown("**Payloads enviados ao navegador (bytes)**")
+        st.json(registro['payloads_bytes'])
+        st.markdown("**Cache de filtros**")
+        st.json(filtros.estatisticas())
+        st.markdown("**Atualização dos dados**")
+        st.json(votacao.estado())
+        st.markdown("**Cache compartilhado entre réplicas**")
+        st.json(carregar_compartilhado().estado())
+        st.markdown("**Cache de quebras das manchas**")
+        st.json({'itens': len(classificacoes.cache), 'acertos': classificacoes.cache.acertos, 'falhas': classificacoes.cache.falhas})
+        st.markdown("**Memória contabilizada**")
+        st.json(uso_memoria)
+    instrumentacao.emitir_log(registro)
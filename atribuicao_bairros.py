@@ -0,0 +1,123 @@
+"""
+Índice persistente de atribuição ponto → bairro.
+
+Cada local de votação aparece uma vez por candidato, então o mesmo par
+(lat, lon) se repete muitas vezes no CSV. Em vez de rodar `gpd.sjoin` em todas
+as linhas a cada carga, este índice resolve cada coordenada distinta uma única
+vez contra uma árvore STRtree dos polígonos de bairro e grava o mapeamento
+coordenada → NOME_BAIRRO em `dados/cache/`. Nas cargas seguintes apenas as
+coordenadas ainda não vistas são resolvidas.
+
+Pontos que não caem em nenhum polígono recebem, na mesma passada, o bairro mais
+próximo como alternativa; ela só é usada quando `vizinho_mais_proximo=True`.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+DIRETORIO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'cache')
+ARQUIVO_INDICE = os.path.join(DIRETORIO_CACHE, 'atribuicao_bairros.parquet')
+CHAVE_VERSAO = b'versao_bairros'
+
+METODO_POLIGONO = 'poligono'
+METODO_VIZINHO = 'vizinho'
+
+
+class IndiceBairros:
+    """Mapeamento (lat, lon) → bairro, resolvido uma vez por coordenada distinta"""
+
+    def __init__(self, gdf_bairros, versao=None, caminho=ARQUIVO_INDICE, coluna_nome='nome'):
+        self.nomes = gdf_bairros[coluna_nome].to_numpy()
+        self.geometrias = gdf_bairros.geometry.to_numpy()
+        self.versao = versao
+        self.caminho = caminho
+        self._arvore = None
+        self.mapeamento = self._ler()
+
+    @property
+    def arvore(self):
+        if self._arvore is None:
+            self._arvore = shapely.STRtree(self.geometrias)
+        return self._arvore
+
+    def _ler(self):
+        vazio = pd.DataFrame({
+            'lat': pd.Series(dtype='float64'), 'lon': pd.Series(dtype='float64'),
+            'NOME_BAIRRO': pd.Series(dtype=object), 'metodo': pd.Series(dtype=object),
+        })
+        if self.caminho is None or not os.path.exists(self.caminho):
+            return vazio
+        tabela = pq.read_table(self.caminho)
+        versao_gravada = (tabela.schema.metadata or {}).get(CHAVE_VERSAO, b'').decode()
+        if self.versao is not None and versao_gravada != self.versao:
+            # A camada de bairros mudou: o mapeamento antigo não vale mais
+            return vazio
+        return tabela.to_pandas()
+
+    def _gravar(self):
+        if self.caminho is None:
+            return
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        tabela = pa.Table.from_pandas(self.mapeamento, preserve_index=False)
+        tabela = tabela.replace_schema_metadata({
+            **(tabela.schema.metadata or {}), CHAVE_VERSAO: (self.versao or '').encode(),
+        })
+        temporario = f"{self.caminho}.tmp"
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, self.caminho)
+
+    def resolver(self, lat, lon):
+        """
+        Resolve coordenadas distintas contra os polígonos.
+        Retorna (nomes, métodos); pontos fora de qualquer polígono ficam com o
+        bairro mais próximo e método `vizinho`.
+        """
+        pontos = shapely.points(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+        nomes = np.full(len(pontos), None, dtype=object)
+        metodos = np.full(len(pontos), None, dtype=object)
+        if len(pontos) == 0 or len(self.geometrias) == 0:
+            return nomes, metodos
+
+        idx_pontos, idx_bairros = self.arvore.query(pontos, predicate='intersects')
+        # Um ponto na divisa entre dois bairros fica com o primeiro polígono, como no sjoin
+        idx_pontos, primeiro = np.unique(idx_pontos, return_index=True)
+        nomes[idx_pontos] = self.nomes[idx_bairros[primeiro]]
+        metodos[idx_pontos] = METODO_POLIGONO
+
+        sem_bairro = np.flatnonzero(metodos == None)  # noqa: E711
+        if len(sem_bairro):
+            idx_vizinhos, idx_proximos = self.arvore.query_nearest(pontos[sem_bairro], all_matches=False)
+            nomes[sem_bairro[idx_vizinhos]] = self.nomes[idx_proximos]
+            metodos[sem_bairro[idx_vizinhos]] = METODO_VIZINHO
+        return nomes, metodos
+
+    def atualizar(self, lat, lon):
+        """Resolve e grava apenas as coordenadas ainda ausentes do mapeamento; retorna quantas eram novas"""
+        coords = pd.DataFrame({'lat': np.asarray(lat, dtype=float), 'lon': np.asarray(lon, dtype=float)})
+        coords = coords.drop_duplicates()
+        conhecidas = pd.MultiIndex.from_frame(self.mapeamento[['lat', 'lon']])
+        novas = coords[~pd.MultiIndex.from_frame(coords).isin(conhecidas)]
+        if novas.empty:
+            return 0
+
+        nomes, metodos = self.resolver(novas['lat'], novas['lon'])
+        resolvidas = novas.assign(NOME_BAIRRO=nomes, metodo=metodos)
+        self.mapeamento = pd.concat([self.mapeamento, resolvidas], ignore_index=True)
+        self._gravar()
+        return len(novas)
+
+    def atribuir(self, lat, lon, vizinho_mais_proximo=False):
+        """Retorna o NOME_BAIRRO de cada linha (NaN quando o ponto não cai em nenhum bairro)"""
+        self.atualizar(lat, lon)
+        mapeamento = self.mapeamento
+        if not vizinho_mais_proximo:
+            mapeamento = mapeamento.assign(
+                NOME_BAIRRO=mapeamento['NOME_BAIRRO'].where(mapeamento['metodo'] == METODO_POLIGONO)
+            )
+        chaves = pd.MultiIndex.from_arrays([np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)])
+        posicoes = pd.MultiIndex.from_frame(mapeamento[['lat', 'lon']]).get_indexer(chaves)
+        return mapeamento['NOME_BAIRRO'].to_numpy(dtype=object)[posicoes]
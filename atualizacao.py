@@ -0,0 +1,382 @@
+"""
+Atualização incremental dos dados de votação a partir do CSV.
+
+Em noite de apuração o CSV recebe linhas novas a cada poucos minutos. Em vez de
+refazer tudo (leitura do CSV inteiro, correção das coordenadas, camadas de
+limites e junção espacial), o atualizador guarda os blocos do arquivo já
+processados (ver `blocos_csv` em dados.py) e, a cada verificação:
+- compara tamanho e data de modificação do CSV (um `stat`, sem ler o arquivo);
+- se mudaram, confere o hash de cada bloco conhecido: o primeiro bloco alterado
+  (ou o fim do último, se só houve acréscimo) marca onde o reprocessamento
+  começa;
+- processa só as linhas a partir desse ponto (os bairros de coordenadas já
+  vistas vêm do índice persistente de atribuicao_bairros.py), junta com as
+  linhas anteriores e remonta o cubo de votos;
+- compara o cubo novo com o anterior célula a célula e devolve uma `Alteracao`
+  com as zonas, candidatos e locais cujos votos mudaram.
+
+Com a `Alteracao` os caches derivados (opções e máscaras de filtro, tabelas da
+análise, quebras das manchas) descartam só os estados de filtro afetados. Os
+caches que guardam posições de locais só são descartados por inteiro quando o
+conjunto de locais muda.
+
+Com várias réplicas no mesmo host (`caminho_artefato` e `compartilhado`, ver
+cache_compartilhado.py) só a primeira que nota a mudança reprocessa o CSV,
+sob uma trava entre processos, e regrava o artefato; as demais encontram o
+artefato já gravado para o CSV atual e apenas o abrem mapeado em memória. O cubo
+de cada versão dos dados também é montado uma única vez no host.
+
+O cubo do estado inteiro só é montado no primeiro acesso: o painel trabalha com
+as partições por município (ver particoes.py) e nunca o abre. Sem o cubo do
+estado a `Alteracao` sai sem as diferenças por célula, que as partições apuram
+município a município.
+"""
+import contextlib
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cache_compartilhado import DIRETORIO_COMPARTILHADO, trava
+from carga import carga_inicial
+from cubo import CHAVE_LOCAL, CuboVotos
+from dados import (ARQUIVO_ARTEFATO, ARQUIVO_CSV, abrir_artefato, artefato_compativel, assinatura_csv, blocos_csv,
+                   concatenar_votacao, gravar_artefato, hashes_trechos, ler_metadados_artefato, mapear_artefato,
+                   preparar_blocos, tabela_para_pandas, termina_linha, versao_dados)
+from fronteiras import versao_camada
+
+
+@dataclass
+class Alteracao:
+    """O que mudou em uma atualização e quais estados de filtro ela afeta"""
+    versao: int
+    linhas_removidas: int = 0
+    linhas_novas: int = 0
+    blocos_reprocessados: int = 0
+    zonas: set = field(default_factory=set)
+    candidatos: set = field(default_factory=set)
+    locais: set = field(default_factory=set)
+    locais_alterados: bool = False  # o conjunto (ou os atributos) dos locais do cubo mudou
+    versao_dados: str = None  # ver `versao_dados` em dados.py
+    municipios: set = None  # municípios cujas linhas mudaram (None: não apurado, ver particoes.py)
+    ms: float = 0.0
+
+    def vazia(self):
+        """Nenhum voto nem local mudou (ex.: partição de um município que ficou igual)"""
+        return not (self.zonas or self.candidatos or self.locais or self.locais_alterados)
+
+    def afeta(self, chave):
+        """O estado de filtro `chave` (ver `chave_filtro` em filtros.py) depende de algo que mudou?"""
+        if self.vazia():
+            return False
+        candidatos, zona, nomes_locais = chave
+        if candidatos is not None and self.candidatos.isdisjoint(candidatos):
+            return False
+        if zona is not None and zona not in self.zonas:
+            return False
+        if nomes_locais and self.locais.isdisjoint(nomes_locais):
+            return False
+        return True
+
+    def __str__(self):
+        if self.municipios is not None:
+            alterados = f"{len(self.municipios)} municípios alterados"
+        else:
+            alterados = (f"{len(self.zonas)} zonas, {len(self.candidatos)} candidatos e {len(self.locais)} locais "
+                         f"alterados")
+        return (f"versão {self.versao}: {self.linhas_novas} linhas processadas ({self.linhas_removidas} substituídas) "
+                f"em {self.blocos_reprocessados} blocos; {alterados} em {self.ms:.0f} ms")
+
+
+def _mesmos_locais(antigo, novo):
+    """Mesmos locais, na mesma ordem e com os mesmos atributos?"""
+    if len(antigo.locais) != len(novo.locais) or list(antigo.locais.columns) != list(novo.locais.columns):
+        return False
+    return all(antigo.locais[coluna].astype(object).equals(novo.locais[coluna].astype(object))
+               for coluna in antigo.locais.columns)
+
+
+def diferencas_cubos(antigo, novo):
+    """
+    Zonas, candidatos e nomes de local das células (local, candidato) cujos votos
+    diferem entre os dois cubos; locais e candidatos que só existem em um deles
+    contam como alterados.
+    """
+    chaves_antigas = pd.MultiIndex.from_frame(antigo.locais[CHAVE_LOCAL])
+    chaves_novas = pd.MultiIndex.from_frame(novo.locais[CHAVE_LOCAL])
+    chaves = chaves_antigas.union(chaves_novas)
+    candidatos = pd.Index(antigo.candidatos).union(pd.Index(novo.candidatos))
+
+    def alinhar(cubo, chaves_cubo):
+        votos = np.zeros((len(chaves), len(candidatos)), dtype=np.int64)
+        linhas = chaves.get_indexer(chaves_cubo)
+        colunas = candidatos.get_indexer(cubo.candidatos)
+        votos[np.ix_(linhas, colunas)] = cubo.votos
+        return votos
+
+    diferentes = alinhar(antigo, chaves_antigas) != alinhar(novo, chaves_novas)
+    linhas = diferentes.any(axis=1)
+    locais = chaves[linhas].to_frame(index=False)
+    return (
+        {int(zona) for zona in locais['NR_ZONA']},
+        set(candidatos[diferentes.any(axis=0)]),
+        set(locais['NM_LOCAL_VOTACAO'].astype(str)),
+    )
+
+
+def alteracao_cubos(antigo, novo, **campos):
+    """`Alteracao` com as zonas, candidatos e locais que diferem entre os dois cubos"""
+    zonas, candidatos, locais = diferencas_cubos(antigo, novo)
+    return Alteracao(zonas=zonas, candidatos=candidatos, locais=locais,
+                     locais_alterados=not _mesmos_locais(antigo, novo), **campos)
+
+
+def _primeiro_diferente(blocos_antigos, blocos_novos):
+    """Índice do primeiro bloco com hash diferente entre as duas listas"""
+    for i, (antigo, novo) in enumerate(zip(blocos_antigos, blocos_novos)):
+        if antigo['hash'] != novo['hash']:
+            return i
+    return min(len(blocos_antigos), len(blocos_novos))
+
+
+class AtualizadorVotacao:
+    """
+    Dados de votação atuais (cubo e, sem artefato, o DataFrame compactado) mais os
+    blocos do CSV de onde vieram. Compartilhado entre sessões; `atualizar` é seguro
+    entre threads e só uma delas processa cada mudança do arquivo. Com
+    `caminho_artefato` o mesmo vale entre processos: a tabela do artefato de cada
+    versão fica mapeada (sem cópia) e o DataFrame só é montado a partir dela quando
+    preciso, para um cubo que ainda não está no cache compartilhado.
+    """
+
+    def __init__(self, df, blocos, assinatura=None, caminho_csv=ARQUIVO_CSV, vizinho_mais_proximo=False,
+                 caminho_artefato=None, compartilhado=None):
+        self.df = df  # None: está no artefato
+        self.blocos = list(blocos)
+        self.assinatura = assinatura  # None: confere os blocos na primeira verificação
+        self.caminho_csv = caminho_csv
+        self.vizinho_mais_proximo = vizinho_mais_proximo
+        self.caminho_artefato = caminho_artefato
+        self.compartilhado = compartilhado
+        self.versao_dados = versao_dados(self.blocos, vizinho_mais_proximo)
+        # Mapeada aqui, sob a trava do artefato (ver `do_artefato`): sempre a versão de `versao_dados`
+        self._tabela = mapear_artefato(caminho_artefato) if df is None else None
+        self._cubo = None  # montado no primeiro acesso a `cubo`
+        self.versao = 0
+        self.ultima_alteracao = None
+        self._bairros = None
+        self._trava = threading.Lock()
+
+    @classmethod
+    def do_artefato(cls, caminho_artefato, caminho_csv=ARQUIVO_CSV, vizinho_mais_proximo=False, compartilhado=None):
+        """
+        Atualizador na versão gravada no artefato, lida sob a trava entre processos para
+        que outra réplica não troque o arquivo entre a leitura dos blocos e a do cubo.
+        """
+        with trava('artefato', compartilhado.diretorio if compartilhado else DIRETORIO_COMPARTILHADO):
+            metadados = ler_metadados_artefato(caminho_artefato)
+            return cls(None, metadados['blocos'], metadados['csv'], caminho_csv, vizinho_mais_proximo,
+                       caminho_artefato, compartilhado)
+
+    @property
+    def cubo(self):
+        """Cubo de votos do estado inteiro, montado (ou aberto do cache compartilhado) no primeiro acesso"""
+        if self._cubo is None:
+            with self._trava:
+                if self._cubo is None:
+                    self._cubo = self._montar_cubo(self.versao_dados, self.df, self._tabela)
+        return self._cubo
+
+    def tabela(self):
+        """Dados da versão atual como tabela Arrow (a do artefato, mapeada, ou a do DataFrame em memória)"""
+        if self.df is not None:
+            return pa.Table.from_pandas(self.df, preserve_index=False)
+        return self._tabela
+
+    def versao_atual(self):
+        """(versao_dados, tabela) da mesma versão, mesmo com uma atualização em curso em outra thread"""
+        with self._trava:
+            return self.versao_dados, self.tabela()
+
+    def _montar_cubo(self, versao, df, tabela):
+        def construir():
+            return CuboVotos(df if df is not None else tabela_para_pandas(tabela))
+        if self.compartilhado is None:
+            return construir()
+        return CuboVotos.de_partes(self.compartilhado.obter(versao, 'cubo', lambda: construir().partes()))
+
+    def _camada_bairros(self):
+        # Só carregada (com geopandas) na primeira vez que há linhas para processar
+        if self._bairros is None:
+            from fronteiras import carregar_camada
+            self._bairros = carregar_camada('bairros')
+        return self._bairros
+
+    def _trava_processos(self):
+        if self.caminho_artefato is None:
+            return contextlib.nullcontext()
+        return trava('artefato', self.compartilhado.diretorio if self.compartilhado else DIRETORIO_COMPARTILHADO)
+
+    def _metadados_compativeis(self):
+        """Metadados do artefato se ele foi gravado com a camada de bairros atual e a mesma atribuição"""
+        metadados = ler_metadados_artefato(self.caminho_artefato)
+        if metadados and 'blocos' in metadados \
+                and metadados.get('versao_bairros') == versao_camada('bairros') \
+                and metadados.get('vizinho_mais_proximo') == self.vizinho_mais_proximo:
+            return metadados
+        return None
+
+    def _base(self):
+        """
+        DataFrame e blocos de onde o reprocessamento parte: os em memória, os do artefato
+        (que outra réplica pode ter adiantado) ou, se o artefato foi gravado com outra
+        camada de bairros, os da versão que este processo tem mapeada.
+        """
+        if self.df is not None:
+            return self.df, self.blocos
+        metadados = self._metadados_compativeis()
+        if metadados is None:
+            return tabela_para_pandas(self._tabela), self.blocos
+        return abrir_artefato(self.caminho_artefato), metadados['blocos']
+
+    def _primeiro_bloco_alterado(self, blocos, tamanho):
+        """Índice do primeiro bloco que mudou no CSV (len(blocos) se nenhum mudou)"""
+        atuais = hashes_trechos(self.caminho_csv, [(bloco['inicio'], bloco['fim']) for bloco in blocos])
+        for i, (bloco, atual) in enumerate(zip(blocos, atuais)):
+            if atual != bloco['hash']:
+                return i
+        # Um último bloco sem fim de linha pode ter tido a linha completada pelo acréscimo
+        if blocos and tamanho > blocos[-1]['fim']:
+            if not termina_linha(self.caminho_csv, blocos[-1]['fim']):
+                return len(blocos) - 1
+        return len(blocos)
+
+    def _artefato_publicado(self, assinatura):
+        """Blocos do artefato se outro processo já o gravou a partir do CSV atual e da camada de bairros atual"""
+        if self.caminho_artefato is None:
+            return None
+        metadados = self._metadados_compativeis()
+        if metadados and metadados.get('csv') == assinatura:
+            return metadados['blocos']
+        return None
+
+    def _reprocessar(self, assinatura):
+        """
+        Reprocessa o CSV a partir do primeiro bloco alterado e, com artefato, o regrava.
+        Retorna o DataFrame novo, os blocos e se o DataFrame ficou só no artefato.
+        """
+        df_base, blocos_base = self._base()
+        primeiro = self._primeiro_bloco_alterado(blocos_base, assinatura['tamanho'])
+        if primeiro == 0:
+            a_partir_de = None  # o cabeçalho pode ter mudado de tamanho: recomeça logo após ele
+        elif primeiro < len(blocos_base):
+            a_partir_de = blocos_base[primeiro]['inicio']
+        else:
+            a_partir_de = blocos_base[-1]['fim'] if blocos_base else None
+        novos_blocos = blocos_csv(self.caminho_csv, a_partir_de)
+        if primeiro == len(blocos_base) and not novos_blocos:
+            return df_base, blocos_base, self.df is None  # arquivo regravado com o mesmo conteúdo
+
+        mantidas = sum(bloco['linhas'] for bloco in blocos_base[:primeiro])
+        novas, novos_blocos = preparar_blocos(self.caminho_csv, novos_blocos, self._camada_bairros(),
+                                              self.vizinho_mais_proximo)
+        df = concatenar_votacao([df_base.iloc[:mantidas], novas])
+        blocos = blocos_base[:primeiro] + novos_blocos
+        if self.caminho_artefato is not None:
+            try:
+                gravar_artefato(df, blocos, assinatura, self.caminho_artefato, self.vizinho_mais_proximo)
+                return df, blocos, True
+            except OSError:
+                pass  # sem onde gravar: segue com a cópia em memória
+        return df, blocos, False
+
+    def atualizar(self):
+        """
+        Processa o que mudou no CSV desde a última verificação. Retorna a `Alteracao`
+        para a thread que aplicou a mudança e None quando não há nada novo.
+        """
+        if assinatura_csv(self.caminho_csv) == self.assinatura:
+            return None
+        with self._trava, self._trava_processos():
+            assinatura = assinatura_csv(self.caminho_csv)
+            if assinatura == self.assinatura:
+                return None
+            inicio = time.perf_counter()
+            blocos = self._artefato_publicado(assinatura)
+            if blocos is not None:
+                df, no_artefato = None, True  # outra réplica já processou esta versão do CSV
+            else:
+                df, blocos, no_artefato = self._reprocessar(assinatura)
+            versao = versao_dados(blocos, self.vizinho_mais_proximo)
+            if versao == self.versao_dados:
+                # Arquivo regravado com o mesmo conteúdo
+                self.assinatura = assinatura
+                return None
+
+            primeiro = _primeiro_diferente(self.blocos, blocos)
+            tabela = mapear_artefato(self.caminho_artefato) if no_artefato else None
+            campos = dict(
+                versao=self.versao + 1,
+                linhas_removidas=sum(bloco['linhas'] for bloco in self.blocos[primeiro:]),
+                linhas_novas=sum(bloco['linhas'] for bloco in blocos[primeiro:]),
+                blocos_reprocessados=len(blocos) - primeiro,
+                versao_dados=versao,
+            )
+            cubo = None
+            if self._cubo is not None:
+                cubo = self._montar_cubo(versao, None if no_artefato else df, tabela)
+                alteracao = alteracao_cubos(self._cubo, cubo, **campos)
+            else:
+                # Sem o cubo do estado neste processo, as diferenças ficam com as partições (ver particoes.py)
+                alteracao = Alteracao(**campos)
+            self.df = None if no_artefato else df
+            self._tabela = tabela
+            self.blocos, self.assinatura, self.versao_dados = blocos, assinatura, versao
+            if self.compartilhado is not None:
+                self.compartilhado.descartar_versoes_antigas()
+            if cubo is not None and alteracao.vazia():
+                # Nada visível mudou (ex.: linha ainda incompleta): o cubo e os caches continuam valendo
+                self._cubo = cubo
+                return None
+
+            self.versao += 1
+            self._cubo = cubo
+            alteracao.ms = (time.perf_counter() - inicio) * 1000
+            self.ultima_alteracao = alteracao
+            return alteracao
+
+    def estado(self):
+        """Resumo para diagnóstico"""
+        return {
+            'versao': self.versao,
+            'linhas': sum(bloco['linhas'] for bloco in self.blocos),
+            'locais': self._cubo.n_locais if self._cubo is not None else None,
+            'blocos': len(self.blocos),
+            'versao_dados': self.versao_dados,
+            'csv': self.assinatura,
+            'ultima_alteracao': str(self.ultima_alteracao) if self.ultima_alteracao else None,
+        }
+
+
+def abrir_votacao(compartilhado=None, vizinho_mais_proximo=False, caminho_csv=ARQUIVO_CSV,
+                  caminho_artefato=ARQUIVO_ARTEFATO):
+    """
+    Atualizador dos dados de votação como o painel e a API os abrem. Se o artefato gerado
+    por `construir_dados.py` foi feito com a camada de bairros atual ele é aberto mapeado em
+    memória (sem geopandas nem shapely), mesmo que o CSV tenha mudado depois: as diferenças
+    são processadas na primeira verificação. Sem artefato, o primeiro processo do host roda
+    a carga a frio (ver carga.py), que grava o artefato e as geometrias sob uma trava entre
+    processos; os demais esperam e os abrem. Sem onde gravar, o CSV é processado só para
+    este processo.
+    """
+    with trava('artefato', compartilhado.diretorio if compartilhado else DIRETORIO_COMPARTILHADO):
+        if not artefato_compativel(caminho_artefato, vizinho_mais_proximo):
+            df, blocos, assinatura, gravado = carga_inicial(caminho_csv, caminho_artefato,
+                                                            vizinho_mais_proximo).resultados['votacao']
+            if not gravado:
+                return AtualizadorVotacao(df, blocos, assinatura, caminho_csv, vizinho_mais_proximo,
+                                          compartilhado=compartilhado)
+    return AtualizadorVotacao.do_artefato(caminho_artefato, caminho_csv, vizinho_mais_proximo, compartilhado)
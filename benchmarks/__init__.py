@@ -0,0 +1 @@
+"""Scripts de benchmark do painel (executar a partir da raiz: `python -m benchmarks.<nome>`)."""
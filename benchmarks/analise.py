@@ -0,0 +1,101 @@
+"""
+Compara o caminho antigo da tabela da "Análise Detalhada" (agregação, ordenação e
+Styler com applymap sobre a tabela inteira a cada rerun) com as tabelas
+materializadas de analise.py (ordens pré-calculadas e só a página visível),
+em cubos sintéticos com cada vez mais locais. Mede o tempo por rerun e o
+tamanho (Arrow) da tabela enviada ao navegador.
+
+    python -m benchmarks.analise --locais 1600 15000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from analise import NIVEIS_ANALISE, ORDEM_INDICE, AnaliseMemoizada, montar_tabela
+from cubo import CuboVotos
+
+CANDIDATOS = {"CANDIDATO A": "Votos A", "CANDIDATO B": "Votos B"}
+COLUNA_DIFERENCA = "Diferença (A - B)"
+ORDENACOES = {
+    "Padrão (Alfabética)": (ORDEM_INDICE, True),
+    "Mais Votos (A)": ("Votos A", False),
+    "Mais Votos (B)": ("Votos B", False),
+    "Maior Volume Total de Votos": ("Total de Votos", False),
+    "Maior Vantagem (A)": (COLUNA_DIFERENCA, False),
+    "Maior Vantagem (B)": (COLUNA_DIFERENCA, True),
+}
+
+
+def _votacao_sintetica(n_locais, semente=0):
+    """Dois candidatos por local, locais espalhados em zonas e bairros"""
+    gerador = np.random.default_rng(semente)
+    locais = pd.DataFrame({
+        'NR_ZONA': gerador.integers(1, max(n_locais // 60, 2), n_locais),
+        'NM_LOCAL_VOTACAO': [f"LOCAL {i}" for i in range(n_locais)],
+        'lat': gerador.uniform(-23.1, -22.7, n_locais),
+        'lon': gerador.uniform(-43.8, -43.1, n_locais),
+        'NOME_BAIRRO': [f"BAIRRO {i}" for i in gerador.integers(0, max(n_locais // 20, 1), n_locais)],
+    })
+    return pd.concat([
+        locais.assign(NM_VOTAVEL=candidato, QT_VOTOS_TOTAL=gerador.poisson(40, n_locais)) for candidato in CANDIDATOS
+    ], ignore_index=True)
+
+
+def _tamanho_arrow(df):
+    return pa.Table.from_pandas(df).nbytes
+
+
+def _rerun_antigo(cubo, coluna, ordenacao):
+    """Agregação, ordenação e Styler sobre a tabela inteira, como o app fazia a cada rerun"""
+    tabela = montar_tabela(cubo.agregar(coluna), CANDIDATOS, COLUNA_DIFERENCA)
+    coluna_sort, ascendente = ORDENACOES[ordenacao]
+    if coluna_sort == ORDEM_INDICE:
+        tabela = tabela.sort_index(ascending=ascendente)
+    else:
+        tabela = tabela.sort_values(by=coluna_sort, ascending=ascendente)
+    styler = tabela.style.map(lambda _: 'color: #1E90FF', subset=['Votos A']) \
+                         .map(lambda _: 'color: #FF0000', subset=['Votos B']) \
+                         .format({"Diferença (%)": "{:.1f}%"})
+    styler._compute()  # o st.dataframe calcula o estilo de cada célula antes de serializar
+    return _tamanho_arrow(tabela)
+
+
+def _rerun_novo(analise, coluna, ordenacao):
+    tabela = analise.tabelas('filtro', None, None)[coluna]
+    pagina = tabela.pagina(tabela.linhas(ordenacao), 0)
+    return _tamanho_arrow(pagina)
+
+
+def _cronometrar(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locais', type=int, nargs='+', default=[1_600, 15_000, 100_000])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    ordenacao = "Maior Volume Total de Votos"
+    for n in args.locais:
+        cubo = CuboVotos(_votacao_sintetica(n))
+        analise = AnaliseMemoizada(cubo, CANDIDATOS, COLUNA_DIFERENCA, ORDENACOES)
+        _, ms_materializar = _cronometrar(lambda: analise.tabelas('filtro', None, None), 1)
+        print(f"--- {n} locais (materialização dos três níveis por estado de filtro: {ms_materializar:.0f} ms)")
+        print(f"{'nível':<18} {'linhas':>7} {'antes (ms)':>11} {'antes (KB)':>11} {'depois (ms)':>12} {'depois (KB)':>12}")
+        for nome, coluna in NIVEIS_ANALISE.items():
+            bytes_antes, ms_antes = _cronometrar(lambda: _rerun_antigo(cubo, coluna, ordenacao), args.repeticoes)
+            bytes_depois, ms_depois = _cronometrar(lambda: _rerun_novo(analise, coluna, ordenacao), args.repeticoes)
+            linhas = len(analise.tabelas('filtro', None, None)[coluna])
+            print(f"{nome:<18} {linhas:>7} {ms_antes:>11.1f} {bytes_antes / 1024:>11.1f} "
+                  f"{ms_depois:>12.2f} {bytes_depois / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Teste de carga local da API de agregados (api.py): sobe o servidor em um
+processo próprio e dispara requisições de vários clientes simultâneos, cada um
+com a sua conexão persistente, sobre uma mistura de rotas e filtros (totais,
+bairros, tabelas paginadas, ranking, em JSON e CSV). Mede a primeira
+requisição de cada URL (resposta montada), a carga repetida com o cache de
+respostas e sem ele (capacidade 0: cada requisição agrega e serializa de novo)
+e as revalidações com If-None-Match (304). Com `--fator` os dados são o CSV
+sintético de benchmarks/suite.py em vez do CSV do repositório.
+
+    python -m benchmarks.api --clientes 8 --requisicoes 4000
+    python -m benchmarks.api --fator 50
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+
+from api import CAPACIDADE_RESPOSTAS
+from benchmarks.suite import gerar_votacao_sintetica
+from dados import ARQUIVO_ARTEFATO, ARQUIVO_CSV, ler_votacao_csv
+
+
+def _servidor(caminho_csv, caminho_artefato, diretorio, capacidade, fila):
+    from api import ServicoAgregados, criar_servidor
+    from cache_compartilhado import CacheCompartilhado
+
+    compartilhado = CacheCompartilhado(diretorio) if diretorio else None
+    servico = ServicoAgregados.carregar(compartilhado, caminho_csv, caminho_artefato, capacidade)
+    servidor = criar_servidor(porta=0, servico=servico)
+    fila.put((servidor.server_address[1], list(servico.votacao.cubo.zonas(None)[:5]),
+              list(servico.votacao.cubo.locais['NM_LOCAL_VOTACAO'][:3])))
+    servidor.serve_forever()
+
+
+def _urls(zonas, locais):
+    """Mistura de rotas e filtros como a de um cliente que raspa o painel"""
+    urls = ['/totais', '/bairros', '/ranking', '/ranking?metrica=sinergia', '/bairros?formato=csv',
+            '/totais?modo=paes', '/bairros?modo=armelau']
+    for nivel in ('bairro', 'zona', 'local'):
+        urls += [f'/tabela?nivel={nivel}', f'/tabela?nivel={nivel}&ordenacao=total&pagina=1',
+                 f'/tabela?nivel={nivel}&ordenacao=vantagem_paes&formato=csv']
+    for zona in zonas:
+        urls += [f'/ranking?zona={zona}', f'/tabela?nivel=local&zona={zona}&pagina=1', f'/totais?zona={zona}']
+    urls.append('/bairros?' + '&'.join(f'local={quote(local)}' for local in locais))
+    return urls
+
+
+def _cliente(porta, urls, n, etags=None):
+    """Faz `n` requisições percorrendo `urls`; retorna as latências (ms) e os status"""
+    conexao = http.client.HTTPConnection('127.0.0.1', porta)
+    latencias, status = [], []
+    for i in range(n):
+        url = urls[i % len(urls)]
+        cabecalhos = {'If-None-Match': etags[url]} if etags else {}
+        inicio = time.perf_counter()
+        conexao.request('GET', url, headers=cabecalhos)
+        resposta = conexao.getresponse()
+        resposta.read()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        status.append(resposta.status)
+    conexao.close()
+    return latencias, status
+
+
+def _carga(porta, urls, clientes, requisicoes, etags=None):
+    por_cliente = max(1, requisicoes // clientes)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(clientes) as executor:
+        # Cada cliente começa em um ponto diferente da lista de URLs
+        resultados = list(executor.map(
+            lambda i: _cliente(porta, urls[i % len(urls):] + urls[:i % len(urls)], por_cliente, etags),
+            range(clientes)))
+    segundos = time.perf_counter() - inicio
+    latencias = np.concatenate([latencias for latencias, _ in resultados])
+    status = sorted({s for _, lista in resultados for s in lista})
+    return latencias, len(latencias) / segundos, status
+
+
+def _linha(nome, latencias, por_segundo, status):
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+    print(f"{nome:<28} {len(latencias):>7} {por_segundo:>9.0f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}   {status}")
+
+
+def _rodada(caminho_csv, caminho_artefato, diretorio, capacidade, clientes, requisicoes, rotulo):
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_servidor, args=(caminho_csv, caminho_artefato, diretorio, capacidade, fila),
+                                daemon=True)
+    processo.start()
+    try:
+        porta, zonas, locais = fila.get(timeout=600)
+        urls = _urls(zonas, locais)
+        frio = []
+        etags = {}
+        conexao = http.client.HTTPConnection('127.0.0.1', porta)
+        for url in urls:
+            inicio = time.perf_counter()
+            conexao.request('GET', url)
+            resposta = conexao.getresponse()
+            resposta.read()
+            frio.append((time.perf_counter() - inicio) * 1000)
+            etags[url] = resposta.getheader('ETag')
+        conexao.close()
+        _linha(f'{rotulo}: primeira', np.array(frio), len(frio) / (sum(frio) / 1000), [200])
+        _linha(f'{rotulo}: repetidas', *_carga(porta, urls, clientes, requisicoes))
+        _linha(f'{rotulo}: If-None-Match', *_carga(porta, urls, clientes, requisicoes, etags))
+    finally:
+        processo.terminate()
+        processo.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=4000)
+    parser.add_argument('--fator', type=int, default=None, help="usa o CSV sintético com este fator")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        if args.fator:
+            caminho_csv = os.path.join(diretorio, 'votacao.csv')
+            gerar_votacao_sintetica(ler_votacao_csv(), args.fator).to_csv(caminho_csv, sep=';', index=False,
+                                                                          encoding='utf-8')
+            caminho_artefato, compartilhado = os.path.join(diretorio, 'votacao.arrow'), os.path.join(diretorio, 'c')
+        else:
+            caminho_csv, caminho_artefato, compartilhado = ARQUIVO_CSV, ARQUIVO_ARTEFATO, None
+        print(f"{args.clientes} clientes, {args.requisicoes} requisições por rodada")
+        print(f"{'rodada':<28} {'req':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}   status")
+        for rotulo, capacidade in (('com cache', CAPACIDADE_RESPOSTAS), ('sem cache', 0)):
+            _rodada(caminho_csv, caminho_artefato, compartilhado, capacidade, args.clientes, args.requisicoes,
+                    rotulo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Mede o tempo até `df_original` ficar disponível e a memória residente do
+processo em dois caminhos: processamento completo do CSV (como o antigo
+`carregar_dados`) e abertura do artefato gerado por `construir_dados.py`.
+Cada medição roda em um processo separado para que a memória não se misture.
+
+    python -m benchmarks.artefato --fatores 1 10 100
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+
+def _rss_mb():
+    """Memória residente atual do processo (Linux), em MB"""
+    with open('/proc/self/status') as f:
+        for linha in f:
+            if linha.startswith('VmRSS:'):
+                return int(linha.split()[1]) / 1024
+    return float('nan')
+
+
+def _medir(modo, caminho_csv, caminho_artefato):
+    from dados import abrir_artefato, compactar_tipos, ler_votacao_csv, memoria_dataframe, preparar_votacao
+    from fronteiras import carregar_camada
+
+    gdf_bairros = carregar_camada('bairros')
+    rss_inicial = _rss_mb()
+    inicio = time.perf_counter()
+    if modo == 'csv':
+        df = preparar_votacao(ler_votacao_csv(caminho_csv), gdf_bairros)
+    elif modo == 'csv_compacto':
+        df = compactar_tipos(preparar_votacao(ler_votacao_csv(caminho_csv), gdf_bairros))
+    else:
+        df = abrir_artefato(caminho_artefato)
+    duracao = time.perf_counter() - inicio
+    return {
+        'modo': modo,
+        'linhas': len(df),
+        'segundos': round(duracao, 4),
+        'rss_delta_mb': round(_rss_mb() - rss_inicial, 1),
+        'dataframe_mb': round(memoria_dataframe(df) / 1e6, 1),
+    }
+
+
+def _preparar_fixture(fator, diretorio):
+    from dados import ARQUIVO_CSV, construir_artefato
+
+    caminho_csv = os.path.join(diretorio, f'votacao_x{fator}.csv')
+    caminho_artefato = os.path.join(diretorio, f'votacao_x{fator}.arrow')
+    base = pd.read_csv(ARQUIVO_CSV, sep=';', encoding='utf-8-sig', dtype=str)
+    pd.concat([base] * fator, ignore_index=True).to_csv(caminho_csv, sep=';', index=False, encoding='utf-8-sig')
+    construir_artefato(caminho_csv, caminho_artefato)
+    return caminho_csv, caminho_artefato
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fatores', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--medir', nargs=3, metavar=('MODO', 'CSV', 'ARTEFATO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(_medir(*args.medir)))
+        return
+
+    print(f"{'modo':>14} {'linhas':>10} {'tempo (s)':>10} {'RSS Δ (MB)':>11} {'df (MB)':>8}")
+    with tempfile.TemporaryDirectory() as diretorio:
+        for fator in args.fatores:
+            caminho_csv, caminho_artefato = _preparar_fixture(fator, diretorio)
+            for modo in ('csv', 'csv_compacto', 'artefato'):
+                saida = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.artefato', '--medir', modo, caminho_csv, caminho_artefato],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                r = json.loads(saida.strip().splitlines()[-1])
+                print(f"{r['modo']:>14} {r['linhas']:>10} {r['segundos']:>10.3f} {r['rss_delta_mb']:>11.1f} {r['dataframe_mb']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Mede a atualização incremental de atualizacao.py contra o reprocessamento
+completo do CSV: gera um CSV sintético (cópias deslocadas do original, ver
+benchmarks/suite.py), acrescenta lotes de linhas como numa noite de apuração e
+cronometra cada verificação (só `stat`, acréscimo e edição no meio do arquivo),
+conferindo que o resultado é igual ao de processar o arquivo inteiro.
+
+    python -m benchmarks.atualizacao --fatores 1 10 50 --lote 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from atualizacao import AtualizadorVotacao
+from benchmarks.suite import gerar_votacao_sintetica
+from cubo import CuboVotos
+from dados import ARQUIVO_CSV, assinatura_csv, blocos_csv, compactar_tipos, ler_votacao_csv, preparar_blocos
+from fronteiras import carregar_camada
+
+
+def _gravar_csv(df, caminho, modo='w'):
+    df.to_csv(caminho, sep=';', index=False, header=modo == 'w', mode=modo, encoding='utf-8')
+    # A data de modificação tem resolução de segundos na assinatura: garante que ela mude
+    estado = os.stat(caminho)
+    os.utime(caminho, (estado.st_atime, estado.st_mtime + 1))
+
+
+def _completo(caminho, gdf_bairros):
+    df, blocos = preparar_blocos(caminho, blocos_csv(caminho), gdf_bairros)
+    df = compactar_tipos(df)
+    return df, blocos, CuboVotos(df)
+
+
+def _cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--csv', default=ARQUIVO_CSV)
+    parser.add_argument('--fatores', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--lote', type=int, default=200, help="linhas acrescentadas por atualização")
+    args = parser.parse_args()
+
+    base = ler_votacao_csv(args.csv)
+    gdf_bairros = carregar_camada('bairros')
+    gerador = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as diretorio:
+        for fator in args.fatores:
+            caminho = os.path.join(diretorio, f'votacao_{fator}.csv')
+            sintetico = gerar_votacao_sintetica(base, fator)
+            _gravar_csv(sintetico, caminho)
+            df, blocos, _ = _completo(caminho, gdf_bairros)
+            atualizador = AtualizadorVotacao(df, blocos, assinatura_csv(caminho), caminho_csv=caminho)
+            print(f"--- fator {fator}: {len(df)} linhas, {os.path.getsize(caminho) / 2**20:.1f} MB, {len(blocos)} blocos")
+
+            _, ms_stat = _cronometrar(atualizador.atualizar)
+            print(f"{'verificação sem mudança':<30} {ms_stat:>10.3f} ms")
+
+            # Lote acrescentado: votos novos em locais existentes
+            lote = sintetico.iloc[gerador.choice(len(sintetico), args.lote, replace=False)].copy()
+            lote['QT_VOTOS_TOTAL'] = gerador.integers(1, 50, len(lote))
+            _gravar_csv(lote, caminho, modo='a')
+            alteracao, ms_incremental = _cronometrar(atualizador.atualizar)
+            (df_ref, _, cubo_ref), ms_completo = _cronometrar(lambda: _completo(caminho, gdf_bairros))
+            assert np.array_equal(atualizador.cubo.votos, cubo_ref.votos) and len(atualizador.df) == len(df_ref)
+            print(f"{f'acréscimo de {args.lote} linhas':<30} {ms_incremental:>10.1f} ms   "
+                  f"(completo: {ms_completo:.0f} ms; {len(alteracao.zonas)} zonas, {len(alteracao.locais)} locais)")
+
+            # Edição no meio do arquivo: reprocessa a partir do bloco alterado
+            with open(caminho, 'r+b') as arquivo:
+                conteudo = arquivo.read()
+                meio = conteudo.index(b'\n', len(conteudo) // 2) + 1
+                fim = conteudo.index(b'\n', meio)
+                campos = conteudo[meio:fim].split(b';')
+                campos[5] = b'%d' % (int(campos[5]) + 1)
+                arquivo.seek(0)
+                arquivo.write(conteudo[:meio] + b';'.join(campos) + conteudo[fim:])
+                arquivo.truncate()
+            estado = os.stat(caminho)
+            os.utime(caminho, (estado.st_atime, estado.st_mtime + 1))
+            alteracao, ms_edicao = _cronometrar(atualizador.atualizar)
+            (df_ref, _, cubo_ref), ms_completo = _cronometrar(lambda: _completo(caminho, gdf_bairros))
+            assert np.array_equal(atualizador.cubo.votos, cubo_ref.votos) and len(atualizador.df) == len(df_ref)
+            print(f"{'edição no meio do arquivo':<30} {ms_edicao:>10.1f} ms   "
+                  f"(completo: {ms_completo:.0f} ms; {alteracao.blocos_reprocessados} blocos reprocessados)")
+
+
+if __name__ == '__main__':
+    main()
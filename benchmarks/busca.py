@@ -0,0 +1,100 @@
+"""
+Mede o índice de busca de busca.py em conjuntos sintéticos de locais (nome,
+endereço, bairro e zona): tempo de montagem e latência por consulta contra a
+varredura com str.contains usada antes, com e sem filtro de zona; confere que o
+índice devolve os mesmos locais que uma varredura sobre os textos normalizados.
+
+    python -m benchmarks.busca --locais 1600 15000 50000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from busca import CAMPOS_BUSCA, IndiceBusca, normalizar
+
+PALAVRAS_NOME = ["ESCOLA", "MUNICIPAL", "ESTADUAL", "COLÉGIO", "CIEP", "CRECHE", "SÃO", "JOSÉ", "MARIA",
+                 "ÍNDIA", "PRESIDENTE", "GETÚLIO", "VARGAS", "CONCEIÇÃO", "NOSSA", "SENHORA", "BRASIL"]
+PALAVRAS_ENDERECO = ["RUA", "AVENIDA", "ESTRADA", "TRAVESSA", "PRAÇA", "DAS", "DOS", "FLORES", "JOÃO",
+                     "AMÉRICAS", "ATLÂNTICA", "GUANABARA", "PAVUNA", "MARÉ", "LARANJEIRAS"]
+BAIRROS = ["COPACABANA", "SÃO CRISTÓVÃO", "MADUREIRA", "MARÉ", "JACAREPAGUÁ", "GÁVEA", "IPANEMA",
+           "CAMPO GRANDE", "SANTA CRUZ", "PAVUNA", "TIJUCA", "MÉIER", "BANGU", "PENHA", "IRAJÁ"]
+CONSULTAS = ["sao", "SÃO JOSÉ", "escola municipal", "rua das", "avenida atlantica", "madureira", "e m", "india", "xyz"]
+
+
+def _locais_sinteticos(n, semente=0):
+    gerador = np.random.default_rng(semente)
+
+    def frases(palavras, n_palavras):
+        escolhidas = np.asarray(palavras)[gerador.integers(0, len(palavras), (n, n_palavras))]
+        return [" ".join(linha) for linha in escolhidas]
+
+    return pd.DataFrame({
+        'NR_ZONA': gerador.integers(1, max(n // 60, 2), n),
+        'NM_LOCAL_VOTACAO': [f"{nome} {i}" for i, nome in enumerate(frases(PALAVRAS_NOME, 3))],
+        'DS_LOCAL_VOTACAO_ENDERECO': [f"{rua}, {numero}" for rua, numero in
+                                      zip(frases(PALAVRAS_ENDERECO, 3), gerador.integers(1, 3000, n))],
+        'NOME_BAIRRO': np.asarray(BAIRROS)[gerador.integers(0, len(BAIRROS), n)],
+    })
+
+
+def _varredura(locais, consulta, zona=None):
+    """Busca antiga: str.contains sem normalização, campo a campo"""
+    mascara = np.zeros(len(locais), dtype=bool)
+    for campo in CAMPOS_BUSCA:
+        mascara |= locais[campo].astype(str).str.contains(consulta, case=False, regex=False).to_numpy()
+    if zona is not None:
+        mascara &= locais['NR_ZONA'].to_numpy() == zona
+    return np.flatnonzero(mascara)
+
+
+def _referencia(normalizados, consulta, zona, zonas):
+    """Varredura sobre os textos normalizados com a mesma regra do índice"""
+    mascara = np.ones(len(zonas), dtype=bool) if zona is None else zonas == zona
+    for termo in normalizar(consulta).split():
+        presente = np.zeros(len(zonas), dtype=bool)
+        for textos in normalizados.values():
+            if len(termo) < 3:
+                presente |= np.array([any(p.startswith(termo) for p in t.split()) for t in textos])
+            else:
+                presente |= np.array([termo in t for t in textos])
+        mascara &= presente
+    return np.flatnonzero(mascara)
+
+
+def _tempo_ms(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locais', type=int, nargs='+', default=[1_600, 15_000, 50_000])
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args()
+
+    for n in args.locais:
+        locais = _locais_sinteticos(n)
+        inicio = time.perf_counter()
+        indice = IndiceBusca(locais)
+        print(f"--- {n} locais (montagem do índice: {(time.perf_counter() - inicio) * 1000:.0f} ms)")
+
+        zonas = locais['NR_ZONA'].to_numpy()
+        zona = int(zonas[0])
+        normalizados = {campo: locais[campo].astype(str).map(normalizar).to_numpy() for campo in CAMPOS_BUSCA}
+        print(f"{'consulta':<20} {'zona':>5} {'achados':>8} {'índice (ms)':>12} {'str.contains (ms)':>18}")
+        for consulta in CONSULTAS:
+            for filtro in (None, zona):
+                encontrados = indice.buscar(consulta, filtro)
+                assert np.array_equal(encontrados, _referencia(normalizados, consulta, filtro, zonas)), consulta
+                ms_indice = _tempo_ms(lambda: indice.buscar(consulta, filtro), args.repeticoes)
+                ms_varredura = _tempo_ms(lambda: _varredura(locais, consulta, filtro), max(args.repeticoes // 10, 1))
+                print(f"{consulta:<20} {'-' if filtro is None else filtro:>5} {len(encontrados):>8} "
+                      f"{ms_indice:>12.3f} {ms_varredura:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
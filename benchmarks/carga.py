@@ -0,0 +1,175 @@
+"""
+Mede a carga a frio (sem artefato, geometrias nem camadas de limites no disco)
+com as etapas em sequência e no pipeline paralelo de carga.py. As camadas são
+servidas por um servidor HTTP local com latência configurável (e, opcionalmente,
+algumas respostas 503 antes da boa, para exercitar as novas tentativas), a
+partir das camadas já gravadas em dados/fronteiras/. Cada medição roda em uma
+cópia nova dos módulos do app, em um processo novo:
+- `partida`: até os dados de votação e as geometrias do município e dos bairros
+  (tudo o que o primeiro mapa precisa) estarem prontos;
+- `pintura`: primeira execução completa do app (AppTest), importações incluídas.
+Por fim, com a origem fora do ar, confere que a atualização das camadas segue
+com a última cópia local.
+
+    python -m benchmarks.carga --latencia 1.5 --repeticoes 3
+    python -m benchmarks.carga --fator 10 --falhas 1
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.suite import gerar_votacao_sintetica
+from dados import ARQUIVO_CSV, ler_votacao_csv
+from fronteiras import CAMADAS, carregar_camada
+
+DIRETORIO_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODOS = {'sequencial': '1', 'paralelo': None}  # valor de PAINEL_THREADS_CARGA
+
+_CODIGO = """
+import json, time
+inicio = time.perf_counter()
+import fronteiras
+fronteiras.CAMADAS.update({urls!r})
+fronteiras.ESPERA_ENTRE_TENTATIVAS = 0.2
+resultado = {{}}
+{corpo}
+print(json.dumps(resultado))
+"""
+
+_PARTIDA = """
+from atualizacao import abrir_votacao
+from cache_compartilhado import CacheCompartilhado
+from geometrias import carregar_geometrias_camada
+abrir_votacao(CacheCompartilhado())
+carregar_geometrias_camada('municipio')
+carregar_geometrias_camada('bairros')
+resultado['partida'] = time.perf_counter() - inicio
+"""
+
+_PINTURA = """
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('app.py', default_timeout=600).run()
+resultado['pintura'] = time.perf_counter() - inicio
+resultado['excecoes'] = len(app.exception)
+"""
+
+_QUEDA = """
+import logging
+logging.basicConfig(level=logging.WARNING, format='  %(message)s')
+municipio, bairros = fronteiras.carregar_fronteiras(atualizar=True)
+resultado['queda'] = time.perf_counter() - inicio
+resultado['feicoes'] = len(municipio) + len(bairros)
+"""
+
+
+class _Origem(BaseHTTPRequestHandler):
+    """Serve as camadas como GeoJSON com latência, falhas iniciais e modo fora do ar"""
+    conteudos = {}
+    latencia = 0.0
+    falhas = 0
+    fora_do_ar = False
+    _pedidos = {}
+    _trava = threading.Lock()
+
+    def do_GET(self):
+        time.sleep(self.latencia)
+        with self._trava:
+            pedido = self._pedidos[self.path] = self._pedidos.get(self.path, 0) + 1
+        if self.fora_do_ar or pedido <= self.falhas:
+            self.send_error(503)
+            return
+        corpo = self.conteudos[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def _copia_nova(destino, caminho_csv):
+    """Módulos do app e o CSV, sem nada em dados/"""
+    os.makedirs(destino)
+    for arquivo in glob.glob(os.path.join(DIRETORIO_APP, '*.py')):
+        shutil.copy(arquivo, destino)
+    shutil.copy(caminho_csv, os.path.join(destino, os.path.basename(ARQUIVO_CSV)))
+
+
+def _executar(diretorio, corpo, urls, threads=None):
+    ambiente = dict(os.environ)
+    ambiente.pop('PAINEL_CACHE_COMPARTILHADO', None)
+    if threads is not None:
+        ambiente['PAINEL_THREADS_CARGA'] = threads
+    resultado = subprocess.run([sys.executable, '-c', _CODIGO.format(urls=urls, corpo=corpo)], cwd=diretorio,
+                               env=ambiente, capture_output=True, text=True)
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr)
+    sys.stderr.write(''.join(linha + '\n' for linha in resultado.stderr.splitlines() if linha.startswith('  ')))
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latencia', type=float, default=1.5, help="segundos até cada resposta da origem")
+    parser.add_argument('--falhas', type=int, default=0, help="respostas 503 por camada antes da boa")
+    parser.add_argument('--fator', type=int, default=1, help="tamanho do CSV sintético (1 = CSV original)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="cópias novas por medição (vale o menor tempo)")
+    parser.add_argument('--sem-app', action='store_true', help="Não mede a primeira execução do app")
+    args = parser.parse_args()
+
+    _Origem.conteudos = {f'/{camada}.geojson': carregar_camada(camada).to_json().encode() for camada in CAMADAS}
+    _Origem.latencia, _Origem.falhas = args.latencia, args.falhas
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Origem)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    urls = {camada: f'http://127.0.0.1:{servidor.server_address[1]}/{camada}.geojson' for camada in CAMADAS}
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_csv = ARQUIVO_CSV
+        if args.fator > 1:
+            caminho_csv = os.path.join(diretorio, 'votacao.csv')
+            gerar_votacao_sintetica(ler_votacao_csv(), args.fator).to_csv(caminho_csv, sep=';', index=False,
+                                                                          encoding='utf-8')
+        print(f"origem com {args.latencia:.1f}s de latência e {args.falhas} falha(s) por camada; "
+              f"CSV {os.path.getsize(caminho_csv) / 2**20:.1f} MB")
+        print(f"{'modo':<12} {'partida (s)':>12} {'pintura (s)':>12}")
+        copias = 0
+        for modo, threads in MODOS.items():
+            medidas = []
+            for _ in range(args.repeticoes):
+                copias += 1
+                copia = os.path.join(diretorio, f'app{copias}')
+                _copia_nova(copia, caminho_csv)
+                _Origem._pedidos = {}
+                medida = _executar(copia, _PARTIDA, urls, threads)
+                if not args.sem_app:
+                    copias += 1
+                    copia = os.path.join(diretorio, f'app{copias}')
+                    _copia_nova(copia, caminho_csv)
+                    _Origem._pedidos = {}
+                    medida.update(_executar(copia, _PINTURA, urls, threads))
+                medidas.append(medida)
+            pintura = f"{min(m['pintura'] for m in medidas):>12.2f}" if not args.sem_app else f"{'-':>12}"
+            excecoes = sum(m.get('excecoes', 0) for m in medidas)
+            print(f"{modo:<12} {min(m['partida'] for m in medidas):>12.2f} {pintura}"
+                  + (f"   ({excecoes} exceções no app)" if excecoes else ''))
+
+        # Origem fora do ar: a atualização segue com a última cópia boa gravada
+        _Origem.fora_do_ar = True
+        medida = _executar(copia, _QUEDA, urls)
+        print(f"origem fora do ar: atualização das camadas caiu na cópia local em {medida['queda']:.2f}s "
+              f"({medida['feicoes']} feições)")
+    servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
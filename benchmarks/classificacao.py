@@ -0,0 +1,53 @@
+"""
+Mede o cálculo das quebras de cada método de classificacao.py e o custo por
+rerun com o cache (acerto) contra o recálculo, em conjuntos sintéticos de
+valores de mancha; confere que o método de percentis reproduz a escala
+original (np.percentile p25…p99 sobre os valores positivos).
+
+    python -m benchmarks.classificacao --valores 160 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from classificacao import METODO_PERCENTIS, METODOS, PERCENTIS_PADRAO, QuebrasMemoizadas, calcular_quebras, classificar
+
+
+def _valores_sinteticos(n, semente=0):
+    """Distribuição assimétrica com zeros, como a força conjunta por bairro"""
+    gerador = np.random.default_rng(semente)
+    return gerador.beta(0.6, 3.0, n) * (gerador.random(n) > 0.1)
+
+
+def _tempo_ms(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--valores', type=int, nargs='+', default=[160, 10_000, 100_000])
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'valores':>8} {'método':<26} {'cálculo (ms)':>13} {'em cache (ms)':>14} {'classificação (ms)':>19}")
+    for n in args.valores:
+        valores = _valores_sinteticos(n)
+        positivos = valores[valores > 0]
+        assert np.array_equal(calcular_quebras(valores, METODO_PERCENTIS), np.percentile(positivos, PERCENTIS_PADRAO))
+        for metodo in METODOS:
+            repeticoes = 1 if n > 10_000 and metodo != METODO_PERCENTIS else args.repeticoes
+            calculo = _tempo_ms(lambda: calcular_quebras(valores, metodo), repeticoes)
+            cache = QuebrasMemoizadas()
+            cache.quebras('filtro', 'metrica', metodo, valores)
+            em_cache = _tempo_ms(lambda: cache.quebras('filtro', 'metrica', metodo, valores), args.repeticoes)
+            quebras = cache.quebras('filtro', 'metrica', metodo, valores)
+            classificacao = _tempo_ms(lambda: classificar(valores, quebras), args.repeticoes)
+            print(f"{n:>8} {metodo:<26} {calculo:>13.3f} {em_cache:>14.4f} {classificacao:>19.3f}")
+
+
+if __name__ == '__main__':
+    main()
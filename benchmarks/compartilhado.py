@@ -0,0 +1,137 @@
+"""
+Mede várias réplicas do painel carregando os mesmos dados com e sem o cache
+compartilhado de cache_compartilhado.py. Com o cache, a primeira réplica monta
+artefato, cubo, índice de busca e tabelas da análise e as demais os abrem
+mapeados em memória; sem ele, cada réplica processa o CSV e monta tudo sozinha
+(como cada `st.cache_resource` fazia). Cada réplica roda em um processo
+próprio; as réplicas de uma rodada sobem juntas e uma última sobe depois
+(partida a quente). A memória é lida de
+/proc/self/smaps_rollup (Linux): `anônima` é a memória que só aquele processo
+pode usar (heap, cópias), e `pss` soma a ela a parte de cada página de arquivo
+mapeado dividida entre os processos que a mapeiam.
+
+    python -m benchmarks.compartilhado --fatores 10 50 --replicas 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.suite import gerar_votacao_sintetica
+from dados import ler_votacao_csv
+
+CANDIDATOS = 2  # colunas de votos da tabela da análise: os dois primeiros candidatos do cubo
+ORDENACOES = {"Padrão (Alfabética)": ("index", True), "Maior Volume Total de Votos": ("Total de Votos", False)}
+
+
+def _memoria_mb():
+    """Memória anônima e PSS do processo (Linux), em MB"""
+    campos = {}
+    try:
+        with open('/proc/self/smaps_rollup') as arquivo:
+            for linha in arquivo:
+                partes = linha.split()
+                if len(partes) == 3 and partes[2] == 'kB':
+                    campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    except OSError:
+        return float('nan'), float('nan')
+    return campos['Anonymous'], campos['Pss']
+
+
+def _replica(modo, caminho_csv, caminho_artefato, diretorio, inicio_comum, fila):
+    """Carga de uma réplica: dados, cubo, índice de busca e tabelas da análise sem filtro"""
+    from analise import AnaliseMemoizada
+    from atualizacao import AtualizadorVotacao
+    from busca import IndiceBusca
+    from cache_compartilhado import CacheCompartilhado, trava
+    from dados import (artefato_compativel, assinatura_csv, blocos_csv, compactar_tipos, construir_artefato,
+                       preparar_blocos)
+    from filtros import chave_filtro
+    from fronteiras import carregar_camada
+
+    carregar_camada('bairros')  # importações e leitura da camada ficam fora da medição
+    anonima_inicial, pss_inicial = _memoria_mb()
+    while time.time() < inicio_comum:
+        time.sleep(0.001)
+    inicio = time.perf_counter()
+    if modo == 'isolado':
+        df, blocos = preparar_blocos(caminho_csv, blocos_csv(caminho_csv), carregar_camada('bairros'))
+        votacao = AtualizadorVotacao(compactar_tipos(df), blocos, assinatura_csv(caminho_csv), caminho_csv=caminho_csv)
+        busca = IndiceBusca(votacao.cubo.locais)
+        compartilhado = None
+    else:
+        compartilhado = CacheCompartilhado(diretorio)
+        with trava('artefato', diretorio):
+            if not artefato_compativel(caminho_artefato):
+                construir_artefato(caminho_csv, caminho_artefato)
+        votacao = AtualizadorVotacao.do_artefato(caminho_artefato, caminho_csv, compartilhado=compartilhado)
+        busca = IndiceBusca.de_partes(compartilhado.obter(votacao.versao_dados, 'busca',
+                                                          lambda: IndiceBusca(votacao.cubo.locais).partes()))
+    cubo = votacao.cubo
+    colunas_votos = {candidato: f"Votos {i}" for i, candidato in enumerate(cubo.candidatos[:CANDIDATOS])}
+    analise = AnaliseMemoizada(cubo, colunas_votos, "Diferença", ORDENACOES,
+                               compartilhado=compartilhado, versao=votacao.versao_dados)
+    tabelas = analise.tabelas(chave_filtro(None, None, None), None, None)
+    ms = (time.perf_counter() - inicio) * 1000
+
+    # Uso típico depois da carga: consultas que tocam o cubo, o índice e as tabelas
+    cubo.agregar('NOME_BAIRRO')
+    busca.buscar('escola')
+    for tabela in tabelas.values():
+        tabela.pagina(tabela.linhas("Maior Volume Total de Votos"), 0)
+    anonima, pss = _memoria_mb()
+    fila.put({'ms': ms, 'anonima': anonima - anonima_inicial, 'pss': pss - pss_inicial,
+              'estado': compartilhado.estado() if compartilhado else None})
+
+
+def _rodada(modo, n_replicas, caminho_csv, caminho_artefato, diretorio):
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    # As réplicas esperam um instante comum para disputar a carga ao mesmo tempo
+    inicio_comum = time.time() + 8
+    processos = [contexto.Process(target=_replica, args=(modo, caminho_csv, caminho_artefato, diretorio,
+                                                         inicio_comum, fila))
+                 for _ in range(n_replicas)]
+    for processo in processos:
+        processo.start()
+    resultados = [fila.get() for _ in processos]
+    for processo in processos:
+        processo.join()
+    # Réplica que sobe depois, com as demais já carregadas
+    tardia = contexto.Process(target=_replica, args=(modo, caminho_csv, caminho_artefato, diretorio, 0, fila))
+    tardia.start()
+    resultado_tardia = fila.get()
+    tardia.join()
+    return resultados, resultado_tardia
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fatores', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--replicas', type=int, default=4)
+    args = parser.parse_args()
+
+    base = ler_votacao_csv()
+    for fator in args.fatores:
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_csv = os.path.join(diretorio, 'votacao.csv')
+            gerar_votacao_sintetica(base, fator).to_csv(caminho_csv, sep=';', index=False, encoding='utf-8')
+            print(f"--- fator {fator}: {args.replicas} réplicas simultâneas + 1 depois")
+            print(f"{'modo':<15} {'carga (ms)':>22} {'anônima (MB)':>14} {'pss (MB)':>10} "
+                  f"{'tardia (ms)':>12} {'tardia anônima (MB)':>20}")
+            for modo in ('isolado', 'compartilhado'):
+                resultados, tardia = _rodada(modo, args.replicas, caminho_csv,
+                                             os.path.join(diretorio, 'votacao.arrow'),
+                                             os.path.join(diretorio, 'compartilhado'))
+                ms = np.array([r['ms'] for r in resultados])
+                print(f"{modo:<15} {f'{ms.min():.0f}–{ms.max():.0f}':>22} "
+                      f"{np.mean([r['anonima'] for r in resultados]):>14.1f} "
+                      f"{np.mean([r['pss'] for r in resultados]):>10.1f} "
+                      f"{tardia['ms']:>12.0f} {tardia['anonima']:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compara a correção de coordenadas linha a linha (`Series.apply`) com a versão
+vetorizada de coordenadas.py, conferindo que os resultados são idênticos.
+
+    python -m benchmarks.coordenadas --fatores 1 10 100 1000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from coordenadas import corrigir_coordenada, reparar_coordenadas
+
+ARQUIVO_CSV = 'votacao_com_coordenadas.csv'
+
+
+def _ler_csv():
+    df = pd.read_csv(ARQUIVO_CSV, sep=';', encoding='utf-8-sig', on_bad_lines='skip')
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    df.columns = [col.strip() for col in df.columns]
+    return df
+
+
+def _caminho_apply(df):
+    df = df.copy()
+    df['LATITUDE'] = df['LATITUDE'].apply(corrigir_coordenada)
+    df['LONGITUDE'] = df['LONGITUDE'].apply(corrigir_coordenada)
+    df.dropna(subset=['LATITUDE', 'LONGITUDE'], inplace=True)
+    return df
+
+
+def _cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fatores', type=int, nargs='+', default=[1, 10, 100],
+                        help="Quantas vezes replicar o CSV original")
+    args = parser.parse_args()
+
+    base = _ler_csv()
+    print(f"{'linhas':>10} {'apply (s)':>10} {'vetorizado (s)':>15} {'ganho':>7}  relatório")
+    for fator in args.fatores:
+        df = pd.concat([base] * fator, ignore_index=True)
+        esperado, t_apply = _cronometrar(_caminho_apply, df)
+        (obtido, relatorio), t_vetor = _cronometrar(reparar_coordenadas, df)
+
+        for coluna in ('LATITUDE', 'LONGITUDE'):
+            if not np.array_equal(esperado[coluna].to_numpy(float), obtido[coluna].to_numpy(float), equal_nan=True):
+                raise AssertionError(f"Resultados divergentes na coluna {coluna} (fator {fator})")
+
+        print(f"{len(df):>10} {t_apply:>10.3f} {t_vetor:>15.3f} {t_apply / t_vetor:>6.1f}x  {relatorio}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Mede a superfície de densidade de densidade.py em conjuntos sintéticos de locais
+no município do Rio de Janeiro: montagem da grade, superfície de todos os
+locais do zero, trocas de filtro incrementais (núcleos somados e subtraídos só na
+região afetada) contra a convolução da grade inteira, e a pintura + PNG de cada
+superfície. Confere também que a superfície incremental é igual à da grade inteira.
+
+    python -m benchmarks.densidade --locais 1600 20000 200000 --bandas 250 500 2000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.grade import _cronometrar
+from densidade import (BANDA_PADRAO, FORCA_CONJUNTA, SINERGIA, GradeDensidade, SuperficiesDensidade, codificar_png,
+                       convoluir, pintar, recortar)
+
+# Extensão aproximada do município do Rio de Janeiro (oeste, sul, leste, norte)
+LIMITES = (-43.8, -23.09, -43.1, -22.74)
+N_ZONAS = 100
+TROCAS = 20
+
+
+def _locais_sinteticos(n, semente=0):
+    """Locais em torno de centros de bairro, com a zona definida pelo centro e votos de dois candidatos"""
+    gerador = np.random.default_rng(semente)
+    oeste, sul, leste, norte = LIMITES
+    centros = np.column_stack([gerador.uniform(sul, norte, N_ZONAS), gerador.uniform(oeste, leste, N_ZONAS)])
+    zona = gerador.integers(0, N_ZONAS, n)
+    lat = np.clip(centros[zona, 0] + gerador.normal(0, 0.01, n), sul, norte)
+    lon = np.clip(centros[zona, 1] + gerador.normal(0, 0.01, n), oeste, leste)
+    pesos = pd.DataFrame({'A': gerador.poisson(60, n), 'B': gerador.poisson(45, n)})
+    return lat, lon, zona, pesos
+
+
+def _grade_inteira(grade, mascara):
+    """Referência sem incremento: rasteriza os locais da máscara e convolui a grade toda"""
+    locais = np.flatnonzero(mascara & grade.dentro)
+    grades = np.stack([np.bincount(grade.pixel[locais], weights=grade.pesos[locais, j],
+                                   minlength=grade.n_linhas * grade.n_colunas).reshape(grade.formato)
+                       for j in range(len(grade.colunas))])
+    return convoluir(grades, grade.nucleo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locais', type=int, nargs='+', default=[1_600, 20_000, 200_000])
+    parser.add_argument('--bandas', type=int, nargs='+', default=[BANDA_PADRAO])
+    args = parser.parse_args()
+
+    for n in args.locais:
+        lat, lon, zona, pesos = _locais_sinteticos(n)
+        for banda in args.bandas:
+            grade, ms_grade = _cronometrar(lambda: GradeDensidade(LIMITES, lat, lon, pesos, banda=banda))
+            print(f"--- {n} locais, núcleo de {banda} m, grade {grade.n_linhas}×{grade.n_colunas}")
+            print(f"{'montagem da grade (uma vez)':<40} {ms_grade:>10.1f} ms")
+
+            superficies = SuperficiesDensidade(grade)
+            _, ms_completo = _cronometrar(lambda: superficies.atualizar(np.ones(n, dtype=bool)))
+            print(f"{'todos os locais do zero':<40} {ms_completo:>10.1f} ms")
+
+            # Sequências de filtros, como um usuário trocando de zona ou tirando uma zona do total
+            gerador = np.random.default_rng(1)
+            zonas = gerador.integers(0, N_ZONAS, TROCAS)
+            cenarios = {
+                'zona → zona': [zona == z for z in zonas],
+                'todas ↔ todas menos uma zona': [zona != z if i % 2 == 0 else np.ones(n, dtype=bool)
+                                                 for i, z in enumerate(zonas)],
+            }
+            for cenario, mascaras in cenarios.items():
+                incremental, inteira, alterados, erro = [], [], [], 0.0
+                for mascara in mascaras:
+                    total, ms = _cronometrar(lambda: superficies.atualizar(mascara))
+                    incremental.append(ms)
+                    alterados.append(total)
+                    referencia, ms = _cronometrar(lambda: _grade_inteira(grade, mascara))
+                    inteira.append(ms)
+                    erro = max(erro, float(np.abs(superficies.superficies - referencia).max()))
+                print(f"{cenario} (~{int(np.median(alterados))} locais alterados)")
+                print(f"{'  incremental':<40} {np.median(incremental):>10.1f} ms (p95 {np.percentile(incremental, 95):.1f})")
+                print(f"{'  grade inteira':<40} {np.median(inteira):>10.1f} ms (p95 {np.percentile(inteira, 95):.1f})")
+                print(f"{'  diferença máxima':<40} {erro:>10.1e}")
+
+            superficies.atualizar(np.ones(n, dtype=bool))
+            for nome in ('A', SINERGIA, FORCA_CONJUNTA):
+                def pintar_png():
+                    rgba, _ = pintar(superficies.superficie(nome), [30, 144, 255])
+                    janela = recortar(rgba)
+                    return codificar_png(rgba[janela]) if janela else b''
+                png, ms = _cronometrar(pintar_png)
+                print(f"{f'pintura + PNG ({nome})':<40} {ms:>10.1f} ms {len(png) / 1024:>8.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
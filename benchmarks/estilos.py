@@ -0,0 +1,166 @@
+"""
+Compara cores, raios e tooltips das camadas do mapa calculados linha a linha
+(`apply`) com a versão vetorizada de estilos.py, conferindo que são idênticos.
+As versões linha a linha (`*_apply`) e `dados_sinteticos` são a referência
+também de tests/test_estilos.py.
+
+    python -m benchmarks.estilos --pontos 10000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from estilos import (MODOS_COR, cores_mancha_sinergia, estilizar_mancha_candidato, estilizar_pontos_candidato,
+                     estilizar_pontos_comparativo, tooltips_mancha_sinergia)
+
+RGB_A = [255, 0, 0]
+RGB_B = [0, 255, 0]
+
+
+def dados_sinteticos(n, semente=0):
+    gerador = np.random.default_rng(semente)
+    # Muitos zeros e empates, como nos locais onde só um candidato teve votos
+    votos_a = gerador.integers(0, 400, n) * (gerador.random(n) > 0.1)
+    votos_b = np.where(gerador.random(n) > 0.2, gerador.integers(0, 400, n), votos_a)
+    return pd.DataFrame({
+        'nome': pd.Categorical([f"LOCAL {i % 5000}" for i in range(n)]),
+        'a': votos_a.astype(np.int64),
+        'b': votos_b.astype(np.int64),
+    })
+
+
+def pontos_candidato_apply(df):
+    maximo = df['a'].max() or 1
+    cor = df['a'].apply(lambda x: RGB_A + [int(50 + (x / maximo) * 205)])
+    raio = df['a'].apply(lambda x: 100 + (x / maximo * 400))
+    tooltip = df[['nome', 'a']].apply(lambda r: f"<b>{r['nome']}</b><br>Votos: {r['a']}", axis=1)
+    return cor.tolist(), raio.to_numpy(), tooltip.tolist()
+
+
+def pontos_comparativo_apply(df, modo):
+    df = df.assign(dif=df['a'] - df['b'], total=df['a'] + df['b'])
+    max_abs_diff = df['dif'].abs().max() or 1
+    max_total = df['total'].max() or 1
+    df['rel'] = (df['dif'].abs() / (df['total'] + 1e-9)).fillna(0)
+
+    def cor(row):
+        diff, total, diff_rel = row['dif'], row['total'], row['rel']
+        base = RGB_A if diff > 0 else (RGB_B if diff < 0 else [128, 128, 128])
+        alpha = 128
+        if modo == "Sinergia (Relativa %)": alpha = int(100 + (1 - diff_rel) * 155)
+        elif modo == "Sinergia (Absoluta)": alpha = int(100 + (1 - (abs(diff) / max_abs_diff)) * 155)
+        elif modo == "Magnitude da Vitória": alpha = int(100 + (abs(diff) / max_abs_diff) * 155)
+        elif modo == "Volume de Votos (Ponderado)": base, alpha = [0, 0, 255], int(50 + (total / max_total) * 205)
+        return base + [alpha]
+
+    cores = df.apply(cor, axis=1)
+    raio = df['total'].apply(lambda x: 100 + (x / max_total * 400))
+    tooltip = df.apply(lambda r: f"<b>{r['nome']}</b><br>A: {r['a']}<br>B: {r['b']}<br><b>Diferença: {r['dif']}</b><br>Total: {r['total']}", axis=1)
+    return cores.tolist(), raio.to_numpy(), tooltip.tolist()
+
+
+def mancha_apply(df):
+    votos = df['a'].astype(float)
+    intensidade = votos / (votos.max() or 1)
+    cor = intensidade.apply(lambda x: RGB_A + [int(50 + x * 205)])
+    tooltip = pd.DataFrame({'nome': df['nome'], 'v': votos, 'i': intensidade}).apply(
+        lambda r: f"<b>Bairro: {r['nome']}</b><br>Votos: {int(r['v'])}<br>Força Eleitoral: {r['i']:.1%}", axis=1)
+    return cor.tolist(), tooltip.tolist()
+
+
+def sinergia_apply(valores, quebras):
+    p25, p50, p75, p90, p95, p99 = quebras
+    alfas = [10, 25, 50, 100, 160, 200]
+
+    def cor(v):
+        if v <= 0:
+            return [200, 200, 200, 5]
+        for limite, alfa in zip((p25, p50, p75, p90, p95, p99), alfas):
+            if v <= limite:
+                return [30, 144, 255, alfa]
+        return [30, 144, 255, 255]
+    return valores.apply(cor).tolist()
+
+
+def tooltips_sinergia_apply(df, total, sinergia):
+    tabela = df.assign(total=total, s=sinergia)
+    return tabela.apply(
+        lambda r: f"<b>Bairro: {r['nome']}</b><br>"
+                  f"A: {int(r['a'])}<br>"
+                  f"B: {int(r['b'])}<br>"
+                  f"<b>Total: {int(r['total'])}</b><br>"
+                  f"<b>Sinergia: {r['s']:.1%}</b><br>"
+                  f"Força Conjunta: {r['s']:.1%}<br>"
+                  f"<b>Sinergia: {r['s']:.1%}</b>", axis=1).tolist()
+
+
+def _cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def _conferir(nome, esperado, obtido):
+    if isinstance(esperado, np.ndarray):
+        iguais = np.array_equal(esperado, np.asarray(obtido))
+    else:
+        iguais = esperado == list(obtido)
+    if not iguais:
+        raise AssertionError(f"Resultados divergentes em {nome}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pontos', type=int, nargs='+', default=[10_000, 1_000_000],
+                        help="Quantidade de pontos/polígonos sintéticos")
+    args = parser.parse_args()
+
+    print(f"{'pontos':>10} {'camada':<38} {'apply (s)':>10} {'vetorizado (s)':>15} {'ganho':>7}")
+    for n in args.pontos:
+        df = dados_sinteticos(n)
+        casos = []
+
+        (cor, raio, tip), t_apply = _cronometrar(pontos_candidato_apply, df)
+        (cores, raios, tips), t_vetor = _cronometrar(estilizar_pontos_candidato, df['nome'], df['a'], RGB_A)
+        _conferir('pontos/candidato', cor, cores.tolist())
+        _conferir('pontos/candidato raio', raio, raios)
+        _conferir('pontos/candidato tooltip', tip, tips)
+        casos.append(("Pontos - candidato único", t_apply, t_vetor))
+
+        for modo in MODOS_COR:
+            (cor, raio, tip), t_apply = _cronometrar(pontos_comparativo_apply, df, modo)
+            (cores, raios, tips), t_vetor = _cronometrar(
+                estilizar_pontos_comparativo, df['nome'], df['a'], df['b'], "A", "B", modo, RGB_A, RGB_B)
+            _conferir(f'pontos/{modo}', cor, cores.tolist())
+            _conferir(f'pontos/{modo} raio', raio, raios)
+            _conferir(f'pontos/{modo} tooltip', tip, tips)
+            casos.append((f"Pontos - {modo}", t_apply, t_vetor))
+
+        (cor, tip), t_apply = _cronometrar(mancha_apply, df)
+        (_, cores, tips), t_vetor = _cronometrar(estilizar_mancha_candidato, df['nome'], df['a'].astype(float), RGB_A)
+        _conferir('mancha/candidato', cor, cores.tolist())
+        _conferir('mancha/candidato tooltip', tip, tips)
+        casos.append(("Mancha - candidato único", t_apply, t_vetor))
+
+        total = df['a'] + df['b']
+        sinergia = 1 - ((df['a'] - df['b']).abs() / (total + 1e-9))
+        positivos = sinergia[sinergia > 0].to_numpy()
+        quebras = np.percentile(positivos, [25, 50, 75, 90, 95, 99])
+        cor, t_apply = _cronometrar(sinergia_apply, sinergia, quebras)
+        cores, t_vetor = _cronometrar(cores_mancha_sinergia, sinergia, quebras)
+        _conferir('mancha/sinergia', cor, cores.tolist())
+        casos.append(("Mancha - sinergia (cores)", t_apply, t_vetor))
+        tip, t_apply = _cronometrar(tooltips_sinergia_apply, df, total, sinergia)
+        tips, t_vetor = _cronometrar(tooltips_mancha_sinergia, df['nome'], df['a'], df['b'], total, sinergia,
+                                     sinergia, sinergia, "A", "B", "Sinergia")
+        _conferir('mancha/sinergia tooltip', tip, tips)
+        casos.append(("Mancha - sinergia (tooltips)", t_apply, t_vetor))
+
+        for nome, t_apply, t_vetor in casos:
+            print(f"{n:>10} {nome:<38} {t_apply:>10.3f} {t_vetor:>15.3f} {t_apply / t_vetor:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Compara o pico de memória e o tempo da exportação antiga (cópia da tabela,
+texto completo e link base64) com os escritores em blocos de exportacao.py.
+
+    python -m benchmarks.exportacao --linhas 100000 1000000
+"""
+import argparse
+import base64
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from exportacao import FORMATOS_TABELA, aceita_gzip, contexto_exportacao, exportar
+
+
+def _tabela_sintetica(n, semente=0):
+    """Tabela com as colunas de df_mapa na visão geral"""
+    gerador = np.random.default_rng(semente)
+    a = gerador.integers(0, 400, n)
+    b = gerador.integers(0, 400, n)
+    return pd.DataFrame({
+        'NM_LOCAL_VOTACAO': pd.Categorical([f"LOCAL {i % 5000}" for i in range(n)]),
+        'lat': gerador.uniform(-23.1, -22.7, n),
+        'lon': gerador.uniform(-43.8, -43.1, n),
+        'FERNANDO': a,
+        'AMANDA': b,
+        'Diferença': a - b,
+        'Total_Votos': a + b,
+        'cor': [[30, 144, 255, 200]] * n,
+        'tooltip': [f"<b>LOCAL {i % 5000}</b><br>Votos: {v}" for i, v in enumerate(a)],
+    })
+
+
+def _exportacao_antiga(df, formato, contexto):
+    """Tamanho do link HTML gerado pelo caminho antigo"""
+    dados = df.copy()
+    for coluna, valor in contexto.items():
+        dados[coluna] = valor
+    texto = dados.to_csv(index=False, encoding='utf-8-sig') if formato == 'CSV' else \
+        dados.to_json(orient='records', force_ascii=False, indent=2)
+    b64 = base64.b64encode(texto.encode()).decode()
+    return len(f'<a href="data:text/csv;base64,{b64}" download="x">Baixar</a>')
+
+
+def _exportacao_nova(df, formato, contexto, comprimir):
+    """Tamanho do arquivo gerado (sem trazê-lo inteiro para a memória)"""
+    with exportar(df, formato, contexto, comprimir) as arquivo:
+        return arquivo.seek(0, 2)
+
+
+def _medir(funcao, *args):
+    """(bytes da saída, pico de memória alocada pelo Python/numpy, tempo)"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    tamanho = funcao(*args)
+    tempo = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tamanho, pico, tempo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    contexto = contexto_exportacao("Pontos", "Visão Geral")
+    print(f"{'linhas':>9} {'formato':<8} {'versão':<14} {'saída (MB)':>11} {'pico (MB)':>10} {'tempo (s)':>10}")
+    for n in args.linhas:
+        df = _tabela_sintetica(n)
+        for formato in FORMATOS_TABELA:
+            casos = []
+            if formato != 'Parquet':
+                casos.append(('link base64', _exportacao_antiga, (df, formato, contexto)))
+            casos.append(('blocos', _exportacao_nova, (df, formato, contexto, False)))
+            if aceita_gzip(formato):
+                casos.append(('blocos + gzip', _exportacao_nova, (df, formato, contexto, True)))
+            for versao, funcao, argumentos in casos:
+                tamanho, pico, tempo = _medir(funcao, *argumentos)
+                print(f"{n:>9} {formato:<8} {versao:<14} {tamanho / 2**20:>11.1f} {pico / 2**20:>10.1f} {tempo:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
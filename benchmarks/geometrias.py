@@ -0,0 +1,102 @@
+"""
+Compara o tamanho do payload e o tempo de montagem/serialização das camadas
+GeoJSON do mapa: GeoDataFrame completo (como antes) contra as geometrias
+simplificadas e pré-convertidas de geometrias.py, em cada nível de tolerância.
+
+    python -m benchmarks.geometrias --repeticoes 20
+    python -m benchmarks.geometrias --densificar 0.00002   # limites sintéticos com mais vértices
+"""
+import argparse
+import time
+
+import numpy as np
+import pydeck as pdk
+import shapely
+
+from estilos import cores_mancha_sinergia, estilizar_mancha_candidato, tooltips_mancha_sinergia
+from fronteiras import carregar_fronteiras
+from geometrias import TOLERANCIAS, GeometriasSimplificadas
+
+
+def _atributos_mancha(gdf_bairros, modo, semente=0):
+    """Colunas 'cor' e 'tooltip' sintéticas para um dos modos de mancha"""
+    gerador = np.random.default_rng(semente)
+    a = gerador.integers(0, 5000, len(gdf_bairros)).astype(float)
+    b = gerador.integers(0, 5000, len(gdf_bairros)).astype(float)
+    tabela = gdf_bairros.copy()
+    if modo == 'candidato':
+        _, cores, tooltips = estilizar_mancha_candidato(tabela['nome'], a, [30, 144, 255])
+    else:
+        total = a + b
+        sinergia = 1 - np.abs(a - b) / (total + 1e-9)
+        cores = cores_mancha_sinergia(sinergia, np.percentile(sinergia, [25, 50, 75, 90, 95, 99]))
+        tooltips = tooltips_mancha_sinergia(tabela['nome'], a, b, total, sinergia, sinergia, sinergia, "A", "B", "Sinergia")
+    tabela['cor'] = cores.tolist()
+    tabela['tooltip'] = tooltips.to_numpy()
+    return tabela
+
+
+def _densificar(gdf, passo):
+    """
+    Insere vértices a cada `passo` graus com um deslocamento que depende só da
+    coordenada (fronteiras compartilhadas continuam iguais), imitando limites
+    detalhados quando só há camadas simplificadas disponíveis.
+    """
+    def ondular(coordenadas):
+        deslocamento = passo * 0.5 * np.sin(coordenadas[:, :1] * 7919 + coordenadas[:, 1:] * 104729)
+        return coordenadas + deslocamento
+
+    geometrias = shapely.transform(shapely.segmentize(gdf.geometry.to_numpy(), passo), ondular)
+    return gdf.set_geometry(geometrias)
+
+
+def _vertices(gdf):
+    return int(shapely.get_num_coordinates(gdf.geometry.to_numpy()).sum())
+
+
+def _deck(dados, **estilo):
+    camada = pdk.Layer("GeoJsonLayer", data=dados, pickable=True, get_fill_color='cor', **estilo)
+    return pdk.Deck(layers=[camada], map_style=None, tooltip={"html": "{tooltip}"})
+
+
+def _medir(montar, repeticoes):
+    """(bytes do JSON do deck, tempo médio de montagem + serialização em ms)"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        texto = _deck(montar()).to_json()
+    return len(texto.encode()), (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=20, help="Reruns simulados por medição")
+    parser.add_argument('--densificar', type=float, default=0.0, metavar='GRAUS',
+                        help="Densifica os limites com vértices a cada GRAUS (0 = usa os limites como estão)")
+    args = parser.parse_args()
+
+    gdf_municipio, gdf_bairros = carregar_fronteiras()
+    if args.densificar > 0:
+        gdf_municipio, gdf_bairros = _densificar(gdf_municipio, args.densificar), _densificar(gdf_bairros, args.densificar)
+    inicio = time.perf_counter()
+    geometrias_municipio = GeometriasSimplificadas(gdf_municipio)
+    geometrias_bairros = GeometriasSimplificadas(gdf_bairros, coluna_nome='nome')
+    print(f"preparação das geometrias: {(time.perf_counter() - inicio) * 1000:.0f} ms (uma vez por processo)\n")
+
+    casos = [('municipio', lambda: gdf_municipio, geometrias_municipio, None)]
+    for modo in ('candidato', 'sinergia'):
+        tabela = _atributos_mancha(gdf_bairros, modo)
+        casos.append((f"mancha {modo}", lambda tabela=tabela: tabela, geometrias_bairros, tabela[['nome', 'cor', 'tooltip']]))
+
+    print(f"{'camada':<18} {'versão':<22} {'vértices':>9} {'payload (KB)':>13} {'render (ms)':>12}")
+    for nome, antes, geometrias, propriedades in casos:
+        vertices = _vertices(antes())
+        tamanho, tempo = _medir(antes, args.repeticoes)
+        print(f"{nome:<18} {'GeoDataFrame':<22} {vertices:>9} {tamanho / 1024:>13.1f} {tempo:>12.2f}")
+        for nivel, tolerancia in TOLERANCIAS.items():
+            tamanho, tempo = _medir(lambda: geometrias.registros(nivel, propriedades), args.repeticoes)
+            print(f"{'':<18} {f'{nivel} ({tolerancia:g}°)':<22} {geometrias.vertices[nivel]:>9} "
+                  f"{tamanho / 1024:>13.1f} {tempo:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Compara a camada de pontos (um registro por local com cor, raio e tooltip) com a
+pirâmide de grades de grade.py em conjuntos sintéticos de locais: tamanho do
+JSON do deck, tempo de estilo + serialização por rerun e o custo de atualizar as
+somas por célula quando um filtro muda (incremental contra recálculo completo).
+
+    python -m benchmarks.grade --locais 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from estilos import estilizar_pontos_comparativo
+from grade import PiramideGrade, SomasGrade
+from metricas import sinergia_peso
+
+# Extensão aproximada do estado do Rio de Janeiro
+LATITUDES = (-23.4, -20.8)
+LONGITUDES = (-44.9, -40.9)
+ZOOM, LATITUDE_VISAO = 7.0, -22.1
+
+
+def _locais_sinteticos(n, semente=0):
+    """Locais concentrados em alguns centros urbanos, com votos de dois candidatos"""
+    gerador = np.random.default_rng(semente)
+    centros = np.column_stack([gerador.uniform(*LATITUDES, 40), gerador.uniform(*LONGITUDES, 40)])
+    centro = gerador.integers(0, len(centros), n)
+    lat = np.clip(centros[centro, 0] + gerador.normal(0, 0.08, n), *LATITUDES)
+    lon = np.clip(centros[centro, 1] + gerador.normal(0, 0.08, n), *LONGITUDES)
+    a = gerador.poisson(60, n)
+    b = gerador.poisson(45, n)
+    return pd.DataFrame({
+        'NM_LOCAL_VOTACAO': [f"LOCAL {i}" for i in range(n)], 'lat': lat, 'lon': lon,
+        'zona': gerador.integers(0, 250, n), 'A': a, 'B': b,
+    })
+
+
+def _cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def _deck_pontos(df):
+    cores, raios, tooltips = estilizar_pontos_comparativo(df['NM_LOCAL_VOTACAO'], df['A'], df['B'], "A", "B",
+                                                          "Sinergia (Relativa %)", [30, 144, 255], [255, 0, 0])
+    dados = df[['NM_LOCAL_VOTACAO', 'lat', 'lon']].assign(cor=cores.tolist(), raio=raios, tooltip=tooltips.to_numpy())
+    camada = pdk.Layer("ScatterplotLayer", data=dados, get_position='[lon, lat]', get_color='cor', get_radius='raio')
+    return pdk.Deck(layers=[camada], map_style=None).to_json()
+
+
+def _deck_grade(somas):
+    nivel = somas.escolher_nivel(ZOOM, LATITUDE_VISAO)
+    tabela = somas.tabela(nivel)
+    nomes = "Célula · " + tabela['locais'].astype(str) + " locais"
+    cores, _, tooltips = estilizar_pontos_comparativo(nomes, tabela['A'], tabela['B'], "A", "B",
+                                                      "Sinergia (Relativa %)", [30, 144, 255], [255, 0, 0])
+    dados = tabela[['poligono']].assign(cor=cores.tolist(), tooltip=tooltips.to_numpy())
+    camada = pdk.Layer("PolygonLayer", data=dados, get_polygon='poligono', get_fill_color='cor')
+    return nivel, len(tabela), pdk.Deck(layers=[camada], map_style=None).to_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locais', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for n in args.locais:
+        df = _locais_sinteticos(n)
+        pesos = df[['A', 'B']].assign(Sinergia_Peso=sinergia_peso(df['A'], df['B']))
+        print(f"--- {n} locais")
+
+        texto, ms = _cronometrar(lambda: _deck_pontos(df))
+        print(f"{'pontos':<34} {len(texto) / 2**20:>9.1f} MB {ms:>10.0f} ms")
+
+        piramide, ms_piramide = _cronometrar(lambda: PiramideGrade(df['lat'], df['lon'], pesos))
+        somas = SomasGrade(piramide)
+        _, ms_completo = _cronometrar(lambda: somas.atualizar(np.ones(n, dtype=bool)))
+        (nivel, celulas, texto), ms = _cronometrar(lambda: _deck_grade(somas))
+        print(f"{f'grade ({piramide.tamanho_celula(nivel)} m, {celulas} células)':<34} "
+              f"{len(texto) / 2**20:>9.1f} MB {ms:>10.0f} ms")
+        print(f"{'montagem da pirâmide (uma vez)':<34} {'':>12} {ms_piramide:>10.0f} ms")
+
+        # Troca de filtro: uma zona sai da seleção (incremental) contra somar tudo de novo
+        mascara = df['zona'].to_numpy() != 0
+        alterados, ms_incremental = _cronometrar(lambda: somas.atualizar(mascara))
+        _, ms_recalculo = _cronometrar(lambda: SomasGrade(piramide).atualizar(mascara))
+        print(f"{'somas: todos os locais do zero':<34} {'':>12} {ms_completo:>10.1f} ms")
+        print(f"{f'somas: filtro incremental ({alterados} locais)':<34} {'':>12} {ms_incremental:>10.1f} ms")
+        print(f"{'somas: filtro recalculado':<34} {'':>12} {ms_recalculo:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Mede o custo de inicialização do app: tempo de importação de cada dependência,
+das importações do app antes e depois do caminho sem geopandas, e a primeira
+execução completa do app (AppTest) em um processo novo, listando quais
+bibliotecas pesadas acabaram carregadas. Cada medição roda em um processo
+separado para que os módulos já importados não se misturem.
+
+    python construir_dados.py   # grava o artefato e as geometrias pré-serializadas
+    python -m benchmarks.inicializacao --repeticoes 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+DIRETORIO_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ('geopandas', 'shapely', 'pyogrio', 'fiona', 'pyproj')
+
+DEPENDENCIAS = ('streamlit', 'pandas', 'numpy', 'pyarrow', 'pydeck', 'shapely', 'geopandas')
+
+# Importações do topo de app.py antes (geopandas via fronteiras) e depois do caminho sem geopandas;
+# o plotly, que também era importado no topo, saiu das dependências
+IMPORTACOES = {
+    'antes': "import streamlit, pandas, pydeck, numpy, json, io, geopandas, shapely, fronteiras, dados, cubo, filtros, "
+             "geometrias, instrumentacao, exportacao, estilos",
+    'depois': "import streamlit, pandas, pydeck, numpy, uuid, fronteiras, dados, cubo, filtros, geometrias, "
+              "instrumentacao, exportacao, estilos",
+}
+
+_CODIGO_IMPORTACAO = """
+import sys, time, json
+inicio = time.perf_counter()
+{importacao}
+tempo = time.perf_counter() - inicio
+print(json.dumps({{'segundos': tempo, 'pesados': sorted({{m.split('.')[0] for m in sys.modules}} & set({pesados!r}))}}))
+"""
+
+_CODIGO_APP = """
+import sys, time, json
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({app!r}, default_timeout=600).run()
+tempo = time.perf_counter() - inicio
+print(json.dumps({{'segundos': tempo, 'excecoes': len(app.exception),
+                  'pesados': sorted({{m.split('.')[0] for m in sys.modules}} & set({pesados!r}))}}))
+"""
+
+
+def _executar(codigo):
+    """Roda o código em um interpretador novo (no diretório do app) e devolve o JSON impresso"""
+    resultado = subprocess.run([sys.executable, '-c', codigo], cwd=DIRETORIO_APP, capture_output=True, text=True,
+                               check=True)
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def _medir_importacao(importacao, repeticoes):
+    medidas = [_executar(_CODIGO_IMPORTACAO.format(importacao=importacao, pesados=MODULOS_PESADOS))
+               for _ in range(repeticoes)]
+    return min(m['segundos'] for m in medidas), medidas[-1]['pesados']
+
+
+def _estado_artefatos():
+    """Artefato de votação e geometrias gravados a partir das versões atuais?"""
+    sys.path.insert(0, DIRETORIO_APP)
+    from dados import artefato_atualizado
+    from fronteiras import versao_camada
+    from geometrias import CAMADAS_GEOMETRIAS, caminho_geometrias, versao_gravada
+
+    geometrias = all(versao_camada(camada) is not None and versao_gravada(caminho_geometrias(camada)) == versao_camada(camada)
+                     for camada in CAMADAS_GEOMETRIAS)
+    return artefato_atualizado(), geometrias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5, help="Processos por medição (vale o menor tempo)")
+    parser.add_argument('--sem-app', action='store_true', help="Não mede a primeira execução do app")
+    args = parser.parse_args()
+
+    print(f"{'dependência':<16} {'importação (ms)':>16}")
+    for modulo in DEPENDENCIAS:
+        segundos, _ = _medir_importacao(f"import {modulo}", args.repeticoes)
+        print(f"{modulo:<16} {segundos * 1000:>16.0f}")
+
+    print(f"\n{'importações do app':<20} {'tempo (ms)':>11}  bibliotecas pesadas carregadas")
+    for nome, importacao in IMPORTACOES.items():
+        segundos, pesados = _medir_importacao(importacao, args.repeticoes)
+        print(f"{nome:<20} {segundos * 1000:>11.0f}  {', '.join(pesados) or '-'}")
+
+    if not args.sem_app:
+        artefato, geometrias = _estado_artefatos()
+        print(f"\nartefato de votação atualizado: {'sim' if artefato else 'não'}; "
+              f"geometrias pré-serializadas atualizadas: {'sim' if geometrias else 'não'}")
+        medidas = [_executar(_CODIGO_APP.format(app=os.path.join(DIRETORIO_APP, 'app.py'), pesados=MODULOS_PESADOS))
+                   for _ in range(args.repeticoes)]
+        print(f"primeira execução do app: {min(m['segundos'] for m in medidas) * 1000:.0f} ms "
+              f"(exceções: {medidas[-1]['excecoes']}; bibliotecas pesadas: {', '.join(medidas[-1]['pesados']) or '-'})")
+
+
+if __name__ == '__main__':
+    main()
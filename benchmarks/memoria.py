@@ -0,0 +1,82 @@
+"""
+Mede a memória contabilizada (memoria.py) com várias sessões simultâneas no mesmo
+processo, sem orçamento e com os orçamentos dados: cada sessão (AppTest) escolhe
+uma zona e passa por pontos, mancha por bairros e mancha por densidade, enchendo os
+caches derivados. Informa, após a última sessão, a memória privada e mapeada de
+cada parte, os itens de cache despejados, a memória residente do processo e o
+tempo mediano da contabilidade por rerun. Cada orçamento roda em um processo novo.
+
+    python construir_dados.py   # grava o artefato e as geometrias pré-serializadas
+    python -m benchmarks.memoria --sessoes 8 --orcamentos 40 60
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from instrumentacao import VARIAVEL_AMBIENTE
+from memoria import VARIAVEL_ORCAMENTO
+
+DIRETORIO_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CODIGO = """
+from streamlit.testing.v1 import AppTest
+excecoes = 0
+for i in range({sessoes}):
+    app = AppTest.from_file({app!r}, default_timeout=600).run()
+    zona = next(s for s in app.selectbox if s.label == "Filtrar por Zona Eleitoral:")
+    zona.set_value(zona.options[1 + i % (len(zona.options) - 1)]).run()
+    visualizacao = next(r for r in app.radio if r.label == "Tipo de Visualização:")
+    visualizacao.set_value("Mancha de Votos").run()
+    for motor in next(r for r in app.radio if r.label == "Desenhar a mancha por:").options:
+        next(r for r in app.radio if r.label == "Desenhar a mancha por:").set_value(motor).run()
+    excecoes += len(app.exception)
+print(excecoes)
+"""
+
+
+def _executar(sessoes, orcamento):
+    """Roda as sessões em um processo novo e devolve os registros de desempenho e o número de exceções"""
+    ambiente = dict(os.environ)
+    ambiente[VARIAVEL_AMBIENTE] = '1'
+    ambiente[VARIAVEL_ORCAMENTO] = str(orcamento)
+    resultado = subprocess.run([sys.executable, '-c', _CODIGO.format(sessoes=sessoes, app='app.py')],
+                               cwd=DIRETORIO_APP, env=ambiente, capture_output=True, text=True)
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr)
+    registros = []
+    for linha in resultado.stderr.splitlines():
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            continue
+        if isinstance(registro, dict) and 'memoria' in registro:
+            registros.append(registro)
+    return registros, int(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessoes', type=int, default=8)
+    parser.add_argument('--orcamentos', type=float, nargs='*', default=[], help="MB (0 = só contabiliza)")
+    args = parser.parse_args()
+
+    for orcamento in [0, *args.orcamentos]:
+        registros, excecoes = _executar(args.sessoes, orcamento)
+        memoria = registros[-1]['memoria']
+        tempos = sorted(etapa['ms'] for registro in registros for etapa in registro['etapas']
+                        if etapa['etapa'] == 'memoria')
+        print(f"--- {args.sessoes} sessões, orçamento {f'{orcamento:.0f} MB' if orcamento else 'nenhum'}"
+              + (f" ({excecoes} exceções no app)" if excecoes else ''))
+        print(f"{'parte':<36} {'privados (MB)':>14} {'mapeados (MB)':>14}")
+        partes = {'total': memoria['total'], **memoria['dados'], **memoria['caches'], 'sessões': memoria['sessoes']}
+        for nome, pegada in partes.items():
+            print(f"{nome:<36} {pegada['privados_mb']:>14.2f} {pegada['mapeados_mb']:>14.2f}")
+        print(f"itens despejados: {memoria['itens_despejados']}; residente no processo: "
+              f"{memoria['rss_processo_mb']} MB; contabilidade por rerun: mediana "
+              f"{tempos[len(tempos) // 2]:.1f} ms, máxima {tempos[-1]:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Confere e mede o núcleo de métricas de metricas.py. A conferência sorteia matrizes
+de votos (inclusive grupos sem votos, um único candidato, empates, totais enormes e
+nenhum grupo) e compara cada métrica do núcleo com a implementação de referência
+em Python puro e com as fórmulas em pandas que o app usava antes do núcleo. A
+medição compara, em milhões de grupos, o núcleo com as mesmas fórmulas em colunas
+de DataFrame, a partir da matriz já somada e dos votos por local com o grupo de
+cada local. Com divergências o comando termina com erro; o núcleo contra a referência
+também é conferido em tests/test_metricas.py.
+
+    python -m benchmarks.metricas --casos 500 --grupos 100000 1000000 5000000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.grade import _cronometrar
+from metricas import (EPSILON, MetricasCandidatos, MetricasPar, metricas_candidatos, metricas_candidatos_referencia,
+                      metricas_par)
+
+LOCAIS_POR_GRUPO = 4
+CAMPOS_INTEIROS = ('votos', 'total', 'vencedor')
+CAMPOS_INTEIROS_PAR = ('total', 'diferenca', 'diferenca_absoluta')
+
+
+def _caso(gerador):
+    """Matriz de votos sorteada, com a forma e os extremos variando de caso para caso"""
+    n_grupos = int(gerador.choice([0, 1, 2, 7, 50, 300]))
+    n_candidatos = int(gerador.integers(1, 9))
+    maximo = int(gerador.choice([1, 3, 100, 10**6, 10**12]))
+    votos = gerador.integers(0, maximo + 1, size=(n_grupos, n_candidatos))
+    if n_grupos:
+        votos[gerador.random(n_grupos) < 0.1] = 0  # grupos sem votos
+        empatados = gerador.random(n_grupos) < 0.1
+        votos[empatados, -1] = votos[empatados].max(axis=1)  # empate no primeiro lugar
+        votos[gerador.random(votos.shape) < 0.2] = 0  # candidatos sem votos no grupo
+    par = tuple(int(c) for c in gerador.choice(n_candidatos, size=2, replace=n_candidatos < 2))
+    return votos, par
+
+
+def _divergencias(nucleo, referencia, campos, inteiros):
+    """Campos em que o núcleo e a referência diferem (inteiros exatos, reais até 1e-12 relativo)"""
+    divergentes = []
+    for campo in campos:
+        a, b = getattr(nucleo, campo), getattr(referencia, campo)
+        if a.shape != b.shape:
+            divergentes.append(campo)
+        elif campo in inteiros:
+            if not np.array_equal(a, b):
+                divergentes.append(campo)
+        elif not np.allclose(a, b, rtol=1e-12, atol=0, equal_nan=True):
+            divergentes.append(campo)
+    return divergentes
+
+
+def _formulas_pandas(df, a, b):
+    """As fórmulas do par como o app as calculava, coluna a coluna em um DataFrame"""
+    df['Diferença'] = df[a] - df[b]
+    df['Total_Votos'] = df[a] + df[b]
+    df['Diferenca_Absoluta'] = df['Diferença'].abs()
+    fator = 1 - df['Diferenca_Absoluta'] / (df['Total_Votos'] + EPSILON)
+    df['Sinergia_Peso'] = df['Total_Votos'] * fator ** 0.5
+    df['Sinergia'] = 1 - (df['Diferenca_Absoluta'] / (df['Total_Votos'] + EPSILON))
+    df['Forca_Conjunta'] = df['Sinergia'] * (df['Total_Votos'] / (df['Total_Votos'].max() or 1))
+    df['Diferença (%)'] = df['Diferença'].abs() / (df['Total_Votos'] + EPSILON) * 100
+    return df
+
+
+def conferir(casos, semente=0):
+    """Compara núcleo, referência e fórmulas antigas em `casos` matrizes sorteadas; devolve as divergências"""
+    gerador = np.random.default_rng(semente)
+    divergencias = []
+    for caso in range(casos):
+        votos, par = _caso(gerador)
+        nucleo = metricas_candidatos(votos, par)
+        referencia = metricas_candidatos_referencia(votos, par)
+        campos = [campo for campo in MetricasCandidatos.__dataclass_fields__ if campo != 'par']
+        divergentes = _divergencias(nucleo, referencia, campos, CAMPOS_INTEIROS)
+        divergentes += [f'par.{campo}' for campo in _divergencias(
+            nucleo.par, referencia.par, MetricasPar.__dataclass_fields__, CAMPOS_INTEIROS_PAR)]
+
+        # As fórmulas antigas precisam dar exatamente o mesmo que o núcleo (o mapa não pode mudar)
+        antigas = _formulas_pandas(pd.DataFrame({'A': votos[:, par[0]], 'B': votos[:, par[1]]}), 'A', 'B')
+        for coluna, valores in (('Diferença', nucleo.par.diferenca), ('Total_Votos', nucleo.par.total),
+                                ('Sinergia_Peso', nucleo.par.sinergia_peso), ('Sinergia', nucleo.par.sinergia),
+                                ('Forca_Conjunta', nucleo.par.forca_conjunta),
+                                ('Diferença (%)', nucleo.par.diferenca_percentual)):
+            if not np.array_equal(antigas[coluna].to_numpy(), valores):
+                divergentes.append(f'pandas.{coluna}')
+
+        # Agrupar os votos por local dentro do núcleo dá o mesmo que agrupar antes
+        if len(votos):
+            codigos = gerador.integers(-1, len(votos), size=len(votos) * LOCAIS_POR_GRUPO)
+            locais = gerador.integers(0, 1000, size=(len(codigos), votos.shape[1]))
+            somados = metricas_candidatos(locais, par, codigos=codigos, n_grupos=len(votos))
+            esperado = np.zeros_like(votos)
+            np.add.at(esperado, codigos[codigos >= 0], locais[codigos >= 0])
+            if not np.array_equal(somados.votos, esperado):
+                divergentes.append('codigos')
+        if divergentes:
+            divergencias.append((caso, votos.shape, par, divergentes))
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--casos', type=int, default=500, help="matrizes sorteadas na conferência")
+    parser.add_argument('--grupos', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--candidatos', type=int, default=4)
+    args = parser.parse_args()
+
+    divergencias = conferir(args.casos)
+    print(f"conferência: {args.casos} casos, {len(divergencias)} com divergência")
+    for caso, forma, par, campos in divergencias[:10]:
+        print(f"  caso {caso} {forma} par {par}: {', '.join(campos)}")
+
+    gerador = np.random.default_rng(1)
+    print(f"{'grupos':>10} {'etapa':<40} {'ms':>10} {'Mgrupos/s':>10}")
+    for n_grupos in args.grupos:
+        votos = gerador.integers(0, 500, size=(n_grupos, args.candidatos))
+        votos[gerador.random(n_grupos) < 0.05] = 0
+        df = pd.DataFrame(votos[:, :2], columns=['A', 'B'])
+
+        def linha(etapa, ms):
+            print(f"{n_grupos:>10} {etapa:<40} {ms:>10.1f} {n_grupos / ms / 1e3:>10.1f}")
+        _, ms = _cronometrar(lambda: _formulas_pandas(df.copy(), 'A', 'B'))
+        linha("par, fórmulas em pandas", ms)
+        _, ms = _cronometrar(lambda: metricas_par(votos[:, 0], votos[:, 1]))
+        linha("par, núcleo", ms)
+        _, ms = _cronometrar(lambda: metricas_candidatos(votos))
+        linha(f"{args.candidatos} candidatos + par, núcleo", ms)
+
+        codigos = gerador.integers(0, n_grupos, size=n_grupos * LOCAIS_POR_GRUPO)
+        locais = gerador.integers(0, 200, size=(len(codigos), args.candidatos))
+        por_local = pd.DataFrame(locais, columns=[f'c{i}' for i in range(args.candidatos)]).assign(grupo=codigos)
+        _, ms = _cronometrar(lambda: metricas_candidatos(locais, codigos=codigos, n_grupos=n_grupos))
+        linha(f"{len(codigos)} locais agrupados, núcleo", ms)
+        _, ms = _cronometrar(lambda: _formulas_pandas(por_local.groupby('grupo').sum(), 'c0', 'c1'))
+        linha(f"{len(codigos)} locais agrupados, groupby pandas", ms)
+
+    if divergencias:
+        raise SystemExit(f"{len(divergencias)} casos divergem da referência")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Mede as partições por município de particoes.py em um estado sintético: o artefato
+replicado em vários municípios (coordenadas deslocadas e votos sorteados em torno
+dos originais), gravado em Arrow IPC e mapeado como o artefato real. Compara a
+montagem do catálogo, os totais do estado a partir dos resumos contra os do cubo
+do estado inteiro e contra um agrupamento de todas as linhas, a abertura de uma
+partição (montada, aberta do cache compartilhado por outro processo e já aberta)
+e a memória do cubo do estado contra a de uma partição. Confere também que os
+totais batem e que o LRU mantém só as partições mais recentes.
+
+    python construir_dados.py   # grava o artefato
+    python -m benchmarks.particoes --municipios 10 92 --abertas 4
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.grade import _cronometrar
+from cache_compartilhado import CacheCompartilhado
+from cubo import COLUNA_CANDIDATO, COLUNA_VOTOS, CuboVotos
+from dados import abrir_artefato, mapear_artefato, tabela_para_pandas
+from memoria import MedidorBytes
+from particoes import COLUNA_MUNICIPIO, MUNICIPIO_PADRAO, ParticoesMunicipios
+
+REPETICOES = 5
+
+
+class _Votacao:
+    """O que `ParticoesMunicipios` usa do atualizador (ver atualizacao.py): a tabela da versão e o cache"""
+
+    def __init__(self, versao, tabela, compartilhado):
+        self.versao, self.tabela, self.compartilhado = versao, tabela, compartilhado
+
+    def versao_atual(self):
+        return self.versao, self.tabela
+
+
+def _estado_sintetico(base, n_municipios, semente=0):
+    """`n_municipios` cópias do artefato; a cópia 0 é o Rio original e as demais ficam lado a lado a oeste dele"""
+    gerador = np.random.default_rng(semente)
+    copias = []
+    for i in range(n_municipios):
+        copia = base.copy()
+        if i:
+            copia[COLUNA_MUNICIPIO] = f"MUNICIPIO SINTETICO {i:02d}"
+            copia['lat'] = copia['lat'] + 0.4 * (i % 10)
+            copia['lon'] = copia['lon'] - 0.8 * (i // 10 + 1)
+            copia[COLUNA_VOTOS] = gerador.poisson(copia[COLUNA_VOTOS].to_numpy()).astype(np.int32)
+        copias.append(copia)
+    df = pd.concat(copias, ignore_index=True)
+    for coluna in base.columns:
+        if isinstance(base[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype(str).astype('category')
+    return df
+
+
+def _gravar_e_mapear(df, caminho):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(caminho, 'wb') as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return mapear_artefato(caminho)
+
+
+def _mediana(funcao, repeticoes=REPETICOES):
+    medidas = [_cronometrar(funcao) for _ in range(repeticoes)]
+    return medidas[-1][0], float(np.median([ms for _, ms in medidas]))
+
+
+def _mb(objeto):
+    pegada = MedidorBytes().medir(objeto)
+    return (pegada.privados + pegada.mapeados) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--municipios', type=int, nargs='+', default=[10, 92])
+    parser.add_argument('--abertas', type=int, default=4, help="partições mantidas abertas (LRU)")
+    args = parser.parse_args()
+
+    base = abrir_artefato()
+    for n_municipios in args.municipios:
+        with tempfile.TemporaryDirectory() as diretorio:
+            tabela = _gravar_e_mapear(_estado_sintetico(base, n_municipios), os.path.join(diretorio, 'estado.arrow'))
+            print(f"--- {n_municipios} municípios, {tabela.num_rows} linhas")
+            compartilhado = CacheCompartilhado(os.path.join(diretorio, 'compartilhado'))
+            votacao = _Votacao('sintetico', tabela, compartilhado)
+
+            particoes, ms = _cronometrar(lambda: ParticoesMunicipios(votacao, capacidade=args.abertas))
+            print(f"{'catálogo (montado e gravado)':<44} {ms:>10.1f} ms")
+            _, ms = _cronometrar(lambda: ParticoesMunicipios(votacao, capacidade=args.abertas))
+            print(f"{'catálogo (aberto do cache compartilhado)':<44} {ms:>10.1f} ms")
+
+            # Totais do estado: resumos do catálogo × cubo do estado × agrupamento de todas as linhas
+            resumos, ms_resumos = _mediana(particoes.totais_estado)
+            cubo_estado, ms_cubo = _cronometrar(lambda: CuboVotos(tabela_para_pandas(tabela)))
+            pelo_cubo, ms_totais_cubo = _mediana(cubo_estado.totais)
+
+            def agrupar_linhas():
+                df = tabela.select([COLUNA_CANDIDATO, COLUNA_VOTOS]).to_pandas()
+                return df.groupby(COLUNA_CANDIDATO, observed=True)[COLUNA_VOTOS].sum()
+            pelas_linhas, ms_linhas = _mediana(agrupar_linhas)
+            iguais = (resumos.sort_index().to_dict() == pelo_cubo.astype(np.int64).sort_index().to_dict()
+                      == pelas_linhas.astype(np.int64).sort_index().to_dict())
+            print(f"{'totais do estado pelos resumos':<44} {ms_resumos:>10.2f} ms")
+            print(f"{'totais do estado pelo cubo do estado':<44} {ms_totais_cubo:>10.2f} ms "
+                  f"(+ {ms_cubo:.0f} ms para montar o cubo)")
+            print(f"{'totais do estado agrupando as linhas':<44} {ms_linhas:>10.2f} ms")
+            print(f"{'  totais iguais':<44} {'sim' if iguais else 'NÃO':>10}")
+
+            # Abertura de uma partição: montada, aberta por outro processo (cache compartilhado) e em memória
+            particao, ms_montada = _cronometrar(lambda: particoes.abrir(MUNICIPIO_PADRAO))
+            outra_replica = ParticoesMunicipios(votacao, capacidade=args.abertas)
+            _, ms_mapeada = _cronometrar(lambda: outra_replica.abrir(MUNICIPIO_PADRAO))
+            _, ms_aberta = _mediana(lambda: particoes.abrir(MUNICIPIO_PADRAO))
+            print(f"{'partição montada (1º processo do host)':<44} {ms_montada:>10.1f} ms")
+            print(f"{'partição do cache compartilhado':<44} {ms_mapeada:>10.1f} ms")
+            print(f"{'partição já aberta (LRU)':<44} {ms_aberta:>10.3f} ms")
+            print(f"{'memória do cubo do estado':<44} {_mb(cubo_estado):>10.2f} MB")
+            print(f"{'memória de uma partição':<44} {_mb(particao.cubo):>10.2f} MB")
+
+            for municipio in particoes.municipios():
+                particoes.abrir(municipio)
+            abertas = particoes.estado()['abertas']
+            print(f"{'partições abertas após abrir todas':<44} {len(abertas):>10} "
+                  f"({'as mais recentes' if abertas == particoes.municipios()[-args.abertas:] else 'ORDEM ERRADA'})")
+
+
+if __name__ == '__main__':
+    main()
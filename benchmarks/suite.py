@@ -0,0 +1,357 @@
+"""
+Suíte de benchmark do painel, sem rede: gera conjuntos de votação sintéticos
+em várias escalas a partir do CSV real e cronometra cada etapa do caminho do
+app (leitura do CSV, correção de coordenadas, junção espacial, filtros,
+agregações, cores/tooltips, classificação por percentis e serialização do
+payload do pydeck). O resultado é gravado em JSON para comparar commits.
+
+Os limites também são sintéticos: bairros de Voronoi cobrindo a área dos locais
+e o contorno do município, importados por fronteiras.py para um diretório
+temporário (--bairros/--municipio trocam uma camada por um GeoJSON local e
+--fronteiras usa um diretório de camadas já importadas). O índice de bairros
+também é gravado no diretório temporário: nada é baixado nem escrito em dados/.
+
+    python -m benchmarks.suite --fatores 1 10 100 1000
+    python -m benchmarks.suite --bairros bairros.geojson --municipio estado.json
+    python -m benchmarks.suite --fronteiras dados/fronteiras
+    python -m benchmarks.suite --comparar benchmarks/resultados/suite-abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+import shapely
+
+from atribuicao_bairros import IndiceBairros
+from coordenadas import corrigir_coordenadas, reparar_coordenadas
+from cubo import CHAVE_PONTO, CuboVotos
+from dados import ARQUIVO_CSV, compactar_tipos, ler_votacao_csv
+from estilos import (cores_mancha_sinergia, estilizar_mancha_candidato, estilizar_pontos_comparativo,
+                     tooltips_mancha_sinergia)
+from filtros import FiltrosMemoizados
+from fronteiras import (COLUNA_NOME_MUNICIPIO, CRS_PADRAO, NOME_MUNICIPIO_RIO, atualizar_camada, carregar_camada,
+                        ler_manifesto, versao_camada)
+from geometrias import NIVEL_PADRAO, GeometriasSimplificadas
+from metricas import diferenca_relativa, metricas_par
+
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+DESLOCAMENTO_PADRAO = 0.002  # graus (~200 m) entre as cópias de um mesmo local
+BAIRROS_SINTETICOS = 160
+MARGEM_FRONTEIRAS = 0.05  # graus além dos locais mais afastados (cobre os deslocamentos das cópias)
+QUEBRAS_PERCENTIS = [25, 50, 75, 90, 95, 99]
+
+
+# --- DADOS SINTÉTICOS ---
+
+def _texto_coordenada(valores):
+    """Codifica coordenadas no formato quebrado do CSV do TSE (ex.: -22.9482419 → "-229.482.419")"""
+    inteiros = pd.Series(np.round(np.abs(valores) * 1e7).astype(np.int64))
+    return '-' + inteiros.map('{:,}'.format).str.replace(',', '.', regex=False)
+
+
+def gerar_votacao_sintetica(base, fator, candidatos_extras=2, deslocamento=DESLOCAMENTO_PADRAO, semente=0):
+    """
+    Replica o CSV bruto `fator` vezes. A cópia 0 é o original; nas demais cada
+    local ganha um sufixo no nome, um deslocamento aleatório (o mesmo para todos
+    os candidatos do local) e votos sorteados em torno dos originais. Também
+    acrescenta `candidatos_extras` candidatos fictícios em todos os locais.
+    """
+    gerador = np.random.default_rng(semente)
+    base = base.assign(QT_VOTOS_TOTAL=pd.to_numeric(base['QT_VOTOS_TOTAL']).astype(np.int64))
+    lat, _ = corrigir_coordenadas(base['LATITUDE'])
+    lon, _ = corrigir_coordenadas(base['LONGITUDE'])
+    utilizaveis = (lat.notna() & lon.notna()).to_numpy()
+    base, lat, lon = base[utilizaveis].reset_index(drop=True), lat[utilizaveis].to_numpy(), lon[utilizaveis].to_numpy()
+
+    if candidatos_extras:
+        modelo = base.drop_duplicates(['NR_ZONA', 'NM_LOCAL_VOTACAO', 'LATITUDE', 'LONGITUDE'])
+        extras = [
+            modelo.assign(NM_VOTAVEL=f"CANDIDATO SINTETICO {i + 1}",
+                          QT_VOTOS_TOTAL=gerador.poisson(modelo['QT_VOTOS_TOTAL'].to_numpy()))
+            for i in range(candidatos_extras)
+        ]
+        posicoes = np.concatenate([np.arange(len(base)), *[modelo.index.to_numpy()] * candidatos_extras])
+        base = pd.concat([base, *extras], ignore_index=True)
+        lat, lon = lat[posicoes], lon[posicoes]
+
+    n = len(base)
+    id_local = base.groupby(['NR_ZONA', 'NM_LOCAL_VOTACAO', 'LATITUDE', 'LONGITUDE'], sort=False).ngroup().to_numpy()
+    linhas = np.tile(np.arange(n), fator)
+    copia = np.repeat(np.arange(fator), n)
+    original = copia == 0
+
+    deslocamentos = gerador.normal(0, deslocamento, size=(int(id_local.max()) + 1, fator, 2))
+    deslocamentos[:, 0] = 0
+    desloc = deslocamentos[id_local[linhas], copia]
+
+    df = base.iloc[linhas].reset_index(drop=True)
+    sufixo = pd.Series(np.char.mod(' #%d', copia), dtype=object).where(~original, '')
+    df['NM_LOCAL_VOTACAO'] = df['NM_LOCAL_VOTACAO'].astype(str) + sufixo
+    df['QT_VOTOS_TOTAL'] = np.where(original, df['QT_VOTOS_TOTAL'], gerador.poisson(df['QT_VOTOS_TOTAL'].to_numpy()))
+    for coluna, valores, eixo in (('LATITUDE', lat, 0), ('LONGITUDE', lon, 1)):
+        novos = _texto_coordenada(valores[linhas] + desloc[:, eixo])
+        df[coluna] = df[coluna].astype(str).where(original, novos)
+    return df
+
+
+# --- FRONTEIRAS ---
+
+def gerar_fronteiras_sinteticas(lat, lon, n_bairros=BAIRROS_SINTETICOS, semente=0):
+    """
+    GeoJSON (bytes) das duas camadas: o município é o retângulo que cobre os locais
+    (com margem) e os bairros são células de Voronoi de pontos sorteados dentro dele.
+    Um município vizinho entra na camada do estado para o recorte ter o que descartar.
+    """
+    gerador = np.random.default_rng(semente)
+    oeste, sul = np.nanmin(lon) - MARGEM_FRONTEIRAS, np.nanmin(lat) - MARGEM_FRONTEIRAS
+    leste, norte = np.nanmax(lon) + MARGEM_FRONTEIRAS, np.nanmax(lat) + MARGEM_FRONTEIRAS
+    contorno = shapely.box(oeste, sul, leste, norte)
+    sementes = shapely.points(gerador.uniform(oeste, leste, n_bairros), gerador.uniform(sul, norte, n_bairros))
+    celulas = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(sementes), extend_to=contorno))
+    bairros = gpd.GeoDataFrame({'nome': [f"BAIRRO SINTETICO {i + 1:03d}" for i in range(len(celulas))]},
+                               geometry=shapely.intersection(celulas, contorno), crs=CRS_PADRAO)
+    vizinho = shapely.box(leste, sul, leste + (leste - oeste) / 4, norte)
+    municipios = gpd.GeoDataFrame({COLUNA_NOME_MUNICIPIO: [NOME_MUNICIPIO_RIO, "MUNICIPIO SINTETICO"]},
+                                  geometry=[contorno, vizinho], crs=CRS_PADRAO)
+    return municipios.to_json().encode(), bairros.to_json().encode()
+
+
+def preparar_fronteiras(diretorio, bairros=None, municipio=None, sinteticas=None):
+    """
+    Importa para `diretorio` as camadas sintéticas (`sinteticas`, saída de
+    `gerar_fronteiras_sinteticas`) ou os GeoJSON passados, que têm precedência,
+    e confere que as duas camadas existem.
+    """
+    municipio_sintetico, bairros_sintetico = sinteticas or (None, None)
+    for camada, arquivo, sintetica in (('bairros', bairros, bairros_sintetico),
+                                       ('municipio', municipio, municipio_sintetico)):
+        if arquivo:
+            with open(arquivo, 'rb') as f:
+                atualizar_camada(camada, diretorio, conteudo=f.read())
+        elif sintetica is not None:
+            atualizar_camada(camada, diretorio, conteudo=sintetica)
+    faltando = [camada for camada in ('bairros', 'municipio') if camada not in ler_manifesto(diretorio)]
+    if faltando:
+        raise SystemExit(f"Camadas ausentes em {diretorio}: {', '.join(faltando)}. "
+                         "Importe com `python fronteiras.py --origem` ou rode sem --fronteiras.")
+    return carregar_camada('municipio', diretorio=diretorio), carregar_camada('bairros', diretorio=diretorio)
+
+
+# --- ETAPAS ---
+
+class Cronometro:
+    """Guarda o melhor tempo (e metadados) de cada etapa"""
+
+    def __init__(self, repeticoes=1):
+        self.repeticoes = repeticoes
+        self.etapas = {}
+
+    def medir(self, nome, funcao, *args, repeticoes=None, **kwargs):
+        melhor = float('inf')
+        for _ in range(repeticoes or self.repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao(*args, **kwargs)
+            melhor = min(melhor, time.perf_counter() - inicio)
+        self.etapas[nome] = {'segundos': round(melhor, 6)}
+        return resultado
+
+    def anotar(self, nome, **valores):
+        self.etapas[nome].update(valores)
+
+
+def _payload_pydeck(camadas):
+    texto = pdk.Deck(layers=camadas, map_style=None, tooltip={"html": "{tooltip}"}).to_json()
+    return len(texto.encode())
+
+
+def executar_etapas(caminho_csv, gdf_municipio, gdf_bairros, diretorio_fronteiras, diretorio_trabalho, repeticoes=1):
+    """Roda o caminho do app sobre um CSV e devolve {etapa: {segundos, ...}} e um resumo"""
+    c = Cronometro(repeticoes)
+
+    df = c.medir('leitura_csv', ler_votacao_csv, caminho_csv, repeticoes=1)
+    df, relatorio = c.medir('reparo_coordenadas', reparar_coordenadas, df)
+    c.anotar('reparo_coordenadas', reparadas=relatorio.reparadas, descartadas=relatorio.descartadas)
+    df = df.rename(columns={'LATITUDE': 'lat', 'LONGITUDE': 'lon'})
+
+    # Índice de bairros frio (arquivo novo) e quente (mapeamento já gravado)
+    caminho_indice = os.path.join(diretorio_trabalho, 'atribuicao_bairros.parquet')
+    versao = versao_camada('bairros', diretorio_fronteiras)
+
+    def juncao():
+        return IndiceBairros(gdf_bairros, versao=versao, caminho=caminho_indice).atribuir(df['lat'], df['lon'])
+    nomes = c.medir('juncao_espacial', juncao, repeticoes=1)
+    c.medir('juncao_espacial_indice_gravado', juncao)
+    df = c.medir('compactacao_tipos', compactar_tipos, df.assign(NOME_BAIRRO=nomes))
+
+    cubo = c.medir('cubo', CuboVotos, df)
+    filtros = FiltrosMemoizados(cubo)
+    zona = filtros.zonas()[0] if len(cubo.zona) else None
+    c.medir('filtro_zona', lambda: cubo.mascara(zona=zona))
+    c.medir('filtro_zona_memoizado', filtros.mascara, None, zona)
+    mascara = filtros.mascara()
+
+    agregados = {}
+    for nivel, nome in (('ponto', 'ponto'), ('NOME_BAIRRO', 'bairro'), ('NR_ZONA', 'zona'), ('NM_LOCAL_VOTACAO', 'local')):
+        agregados[nome] = c.medir(f'agregacao_{nome}', cubo.agregar, nivel, mascara)
+
+    # Comparação entre os dois candidatos com mais votos, como na "Visão Geral"
+    a, b = cubo.totais().nlargest(2).index
+    df_mapa = agregados['ponto'][CHAVE_PONTO + [a, b]].copy()
+    df_mapa['Diferença'] = df_mapa[a] - df_mapa[b]
+    df_mapa['Total_Votos'] = df_mapa[a] + df_mapa[b]
+
+    def estilo_pontos():
+        df_mapa['Diff_Relativa'] = diferenca_relativa(df_mapa['Diferença'], df_mapa['Total_Votos'])
+        cores, raios, tooltips = estilizar_pontos_comparativo(
+            df_mapa['NM_LOCAL_VOTACAO'], df_mapa[a], df_mapa[b], "A", "B", "Sinergia (Relativa %)", [30, 144, 255], [255, 0, 0])
+        df_mapa['cor'], df_mapa['raio'], df_mapa['tooltip'] = cores.tolist(), raios, tooltips.to_numpy()
+    c.medir('estilo_pontos', estilo_pontos)
+
+    bairros = gdf_bairros[['nome']].merge(agregados['bairro'][[a, b]], left_on='nome', right_index=True, how='left').fillna(0)
+    par = metricas_par(bairros[a].to_numpy(), bairros[b].to_numpy())
+    total, sinergia, forca = (pd.Series(valores, index=bairros.index)
+                              for valores in (par.total, par.sinergia, par.forca_conjunta))
+
+    def estilo_mancha():
+        _, cores, _ = estilizar_mancha_candidato(bairros['nome'], bairros[a], [30, 144, 255])
+        tooltips = tooltips_mancha_sinergia(bairros['nome'], bairros[a], bairros[b], total, sinergia, forca, forca,
+                                            "A", "B", "Força Conjunta")
+        return cores, tooltips
+    _, tooltips_bairros = c.medir('estilo_mancha', estilo_mancha)
+
+    def classificacao():
+        valores = forca.to_numpy()
+        positivos = valores[valores > 0]
+        quebras = np.percentile(positivos, QUEBRAS_PERCENTIS) if len(positivos) else [0.01] * len(QUEBRAS_PERCENTIS)
+        return cores_mancha_sinergia(valores, quebras)
+    cores_bairros = c.medir('classificacao_percentis', classificacao)
+    bairros = bairros.assign(cor=cores_bairros.tolist(), tooltip=tooltips_bairros.to_numpy())
+
+    geometrias_municipio = c.medir('geometrias', GeometriasSimplificadas, gdf_municipio, repeticoes=1)
+    geometrias_bairros = GeometriasSimplificadas(gdf_bairros, coluna_nome='nome')
+    contorno = pdk.Layer("GeoJsonLayer", data=geometrias_municipio.registros(NIVEL_PADRAO))
+
+    def payload_pontos():
+        pontos = pdk.Layer("ScatterplotLayer", data=df_mapa, get_position='[lon, lat]', get_color='cor',
+                           get_radius='raio', pickable=True)
+        return _payload_pydeck([contorno, pontos])
+
+    def payload_mancha():
+        mancha = pdk.Layer("GeoJsonLayer", data=geometrias_bairros.registros(NIVEL_PADRAO, bairros[['nome', 'cor', 'tooltip']]),
+                           get_fill_color='cor', pickable=True)
+        return _payload_pydeck([contorno, mancha])
+    c.anotar('serializacao_pontos', bytes=c.medir('serializacao_pontos', payload_pontos))
+    c.anotar('serializacao_mancha', bytes=c.medir('serializacao_mancha', payload_mancha))
+
+    resumo = {
+        'linhas': int(len(df)),
+        'locais': int(cubo.n_locais),
+        'pontos': int(len(df_mapa)),
+        'candidatos': int(len(cubo.candidatos)),
+        'bairros': int(len(gdf_bairros)),
+    }
+    return c.etapas, resumo
+
+
+# --- RESULTADOS ---
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(anterior, atual):
+    """Imprime a razão atual/anterior do tempo de cada etapa nos fatores presentes nos dois resultados"""
+    por_fator = {r['fator']: r['etapas'] for r in anterior['resultados']}
+    print(f"\nComparação com {anterior.get('commit') or '?'} (atual / anterior; > 1 = mais lento)")
+    for resultado in atual['resultados']:
+        etapas_anteriores = por_fator.get(resultado['fator'])
+        if not etapas_anteriores:
+            continue
+        for etapa, medida in resultado['etapas'].items():
+            if etapa in etapas_anteriores and etapas_anteriores[etapa]['segundos'] > 0:
+                razao = medida['segundos'] / etapas_anteriores[etapa]['segundos']
+                print(f"{resultado['fator']:>6}x {etapa:<32} {razao:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fatores', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help="Escalas do conjunto sintético em relação ao CSV original")
+    parser.add_argument('--candidatos-extras', type=int, default=2, help="Candidatos fictícios acrescentados")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções por etapa (vale o melhor tempo)")
+    parser.add_argument('--csv', default=ARQUIVO_CSV, help="CSV de votação usado como base")
+    parser.add_argument('--fronteiras', help="Diretório com as camadas já importadas (padrão: camadas sintéticas)")
+    parser.add_argument('--bairros', help="GeoJSON local da camada de bairros (no lugar da sintética)")
+    parser.add_argument('--municipio', help="GeoJSON local dos municípios do estado (no lugar da sintética)")
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (padrão: benchmarks/resultados/suite-<commit>.json)")
+    parser.add_argument('--comparar', help="Resultado anterior para comparar etapa a etapa")
+    args = parser.parse_args()
+
+    commit = _commit_atual()
+    saida = args.saida or os.path.join(DIRETORIO_RESULTADOS, f"suite-{commit or 'local'}.json")
+    base = pd.read_csv(args.csv, sep=';', encoding='utf-8-sig', dtype=str, on_bad_lines='skip')
+    base = base.loc[:, ~base.columns.str.contains('^Unnamed')]
+
+    with tempfile.TemporaryDirectory() as temporario:
+        if args.fronteiras:
+            diretorio_fronteiras, sinteticas = args.fronteiras, None
+        else:
+            diretorio_fronteiras = os.path.join(temporario, 'fronteiras')
+            lat, _ = corrigir_coordenadas(base['LATITUDE'])
+            lon, _ = corrigir_coordenadas(base['LONGITUDE'])
+            sinteticas = gerar_fronteiras_sinteticas(lat.to_numpy(dtype=float), lon.to_numpy(dtype=float))
+        gdf_municipio, gdf_bairros = preparar_fronteiras(diretorio_fronteiras, args.bairros, args.municipio,
+                                                         sinteticas)
+
+        resultados = []
+        for fator in args.fatores:
+            trabalho = os.path.join(temporario, f"x{fator}")
+            os.makedirs(trabalho)
+            caminho_csv = os.path.join(trabalho, 'votacao.csv')
+            gerar_votacao_sintetica(base, fator, args.candidatos_extras).to_csv(
+                caminho_csv, sep=';', index=False, encoding='utf-8-sig')
+
+            etapas, resumo = executar_etapas(caminho_csv, gdf_municipio, gdf_bairros, diretorio_fronteiras,
+                                             trabalho, args.repeticoes)
+            resultados.append({'fator': fator, **resumo, 'etapas': etapas})
+            print(f"\n{fator}x: {resumo['linhas']} linhas, {resumo['locais']} locais, {resumo['candidatos']} candidatos")
+            for etapa, medida in etapas.items():
+                extra = f"  ({medida['bytes'] / 1024:.0f} KB)" if 'bytes' in medida else ''
+                print(f"  {etapa:<32} {medida['segundos'] * 1000:>10.1f} ms{extra}")
+            os.remove(caminho_csv)
+
+    relatorio = {
+        'commit': commit,
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'versoes': {'pandas': pd.__version__, 'numpy': np.__version__, 'pydeck': pdk.__version__},
+        'repeticoes': args.repeticoes,
+        'candidatos_extras': args.candidatos_extras,
+        'resultados': resultados,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em {saida}", file=sys.stderr)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), relatorio)
+
+
+if __name__ == '__main__':
+    main()
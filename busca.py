@@ -0,0 +1,181 @@
+"""
+Índice de busca sobre os locais de votação (nome, endereço, bairro e zona).
+
+Os textos são normalizados uma única vez (sem acentos, em minúsculas, com
+pontuação virando espaço), de modo que "india" encontra "ÍNDIA" e "sao" encontra
+"SÃO". Para cada campo o índice guarda:
+- listas de trigramas → locais, usadas nas buscas por trecho (substring): os
+  candidatos são a interseção das listas dos trigramas do termo, conferidos
+  depois no texto normalizado;
+- o vocabulário ordenado de palavras, usado nas buscas por prefixo de termos
+  curtos (uma ou duas letras), com busca binária.
+
+A busca da tabela da análise pede `trechos_curtos`: lá os termos curtos também são
+procurados como trecho, como no `str.contains` que a tabela usava ("4" encontra a
+zona 14), com uma varredura dos textos normalizados só da faixa da zona.
+
+Os locais são numerados internamente em ordem de zona, então cada zona ocupa
+uma faixa contígua de identificadores e toda lista de trigramas é particionada
+por zona sem cópia: filtrar por zona é uma busca binária nas pontas da faixa.
+Os resultados são posições das linhas de `cubo.locais`.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+CAMPOS_BUSCA = ('NM_LOCAL_VOTACAO', 'DS_LOCAL_VOTACAO_ENDERECO', 'NOME_BAIRRO', 'NR_ZONA')
+TAMANHO_NGRAMA = 3
+_VAZIO = np.zeros(0, dtype=np.int32)
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    """Minúsculas sem acentos; qualquer caractere que não seja letra ou dígito vira um espaço"""
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+    return _SEPARADORES.sub(' ', sem_acentos).strip()
+
+
+def ngramas(texto, tamanho=TAMANHO_NGRAMA):
+    return {texto[i:i + tamanho] for i in range(len(texto) - tamanho + 1)}
+
+
+class IndiceBusca:
+    """Trigramas e vocabulário de prefixos por campo, particionados por zona"""
+
+    def __init__(self, locais, campos=CAMPOS_BUSCA, coluna_zona='NR_ZONA'):
+        zona = locais[coluna_zona].to_numpy()
+        self.ordem = np.argsort(zona, kind='stable')  # identificador interno → posição em `locais`
+        zonas, inicios = np.unique(zona[self.ordem], return_index=True)
+        fins = np.r_[inicios[1:], len(zona)]
+        self.faixas = {z: (int(i), int(f)) for z, i, f in zip(zonas.tolist(), inicios, fins)}
+        self.n_locais = len(zona)
+
+        self.campos = tuple(campo for campo in campos if campo in locais.columns)
+        self.textos = {}
+        self.trigramas = {}
+        self.vocabulario = {}
+        for campo in self.campos:
+            valores = locais[campo].to_numpy()[self.ordem]
+            # Textos repetidos (bairros, endereços de um mesmo prédio) são normalizados uma vez
+            unicos, inversos = np.unique(valores.astype(str), return_inverse=True)
+            normalizados = np.array([normalizar(texto) for texto in unicos], dtype=str)
+            textos = normalizados[inversos.ravel()]
+            self.textos[campo] = textos
+
+            listas = defaultdict(list)
+            palavras, donos = [], []
+            for identificador, texto in enumerate(textos):
+                for trigrama in ngramas(texto):
+                    listas[trigrama].append(identificador)
+                for palavra in set(texto.split()):
+                    palavras.append(palavra)
+                    donos.append(identificador)
+            self.trigramas[campo] = {t: np.asarray(ids, dtype=np.int32) for t, ids in listas.items()}
+            ordem_palavras = np.lexsort((donos, palavras))
+            self.vocabulario[campo] = (np.asarray(palavras, dtype=str)[ordem_palavras],
+                                       np.asarray(donos, dtype=np.int32)[ordem_palavras])
+
+    def partes(self):
+        """
+        Arrays do índice para o cache compartilhado (ver cache_compartilhado.py); as
+        listas de trigramas de cada campo viram um único array com ponteiros.
+        """
+        zonas = list(self.faixas)
+        partes = {
+            'campos': list(self.campos), 'n_locais': self.n_locais, 'ordem': self.ordem,
+            'zonas': np.asarray(zonas, dtype=np.int64),
+            'faixas': np.asarray([self.faixas[z] for z in zonas], dtype=np.int64).reshape(-1, 2),
+        }
+        for i, campo in enumerate(self.campos):
+            trigramas = sorted(self.trigramas[campo])
+            listas = [self.trigramas[campo][t] for t in trigramas]
+            partes[f'textos_{i}'] = self.textos[campo]
+            partes[f'trigramas_{i}'] = np.asarray(trigramas, dtype=str)
+            partes[f'ponteiros_{i}'] = np.cumsum([0] + [len(lista) for lista in listas], dtype=np.int64)
+            partes[f'identificadores_{i}'] = np.concatenate(listas) if listas else _VAZIO
+            partes[f'palavras_{i}'], partes[f'donos_{i}'] = self.vocabulario[campo]
+        return partes
+
+    @classmethod
+    def de_partes(cls, partes):
+        """Índice a partir de `partes()`; as listas de trigramas são fatias do array único"""
+        indice = cls.__new__(cls)
+        indice.ordem = partes['ordem']
+        indice.n_locais = partes['n_locais']
+        indice.faixas = {int(z): (int(i), int(f)) for z, (i, f) in zip(partes['zonas'], partes['faixas'])}
+        indice.campos = tuple(partes['campos'])
+        indice.textos, indice.trigramas, indice.vocabulario = {}, {}, {}
+        for i, campo in enumerate(indice.campos):
+            ponteiros, identificadores = partes[f'ponteiros_{i}'], partes[f'identificadores_{i}']
+            indice.textos[campo] = partes[f'textos_{i}']
+            indice.trigramas[campo] = {t: identificadores[a:b] for t, a, b in
+                                       zip(partes[f'trigramas_{i}'].tolist(), ponteiros[:-1], ponteiros[1:])}
+            indice.vocabulario[campo] = (partes[f'palavras_{i}'], partes[f'donos_{i}'])
+        return indice
+
+    def _faixa(self, zona):
+        if zona is None:
+            return 0, self.n_locais
+        return self.faixas.get(zona, (0, 0))
+
+    @staticmethod
+    def _recortar(identificadores, inicio, fim):
+        """Parte (ordenada) da lista que pertence à faixa da zona"""
+        a, b = np.searchsorted(identificadores, [inicio, fim])
+        return identificadores[a:b]
+
+    def _por_prefixo(self, campo, termo, inicio, fim):
+        """Locais com alguma palavra começando pelo termo (podem vir repetidos)"""
+        palavras, donos = self.vocabulario[campo]
+        a = np.searchsorted(palavras, termo, side='left')
+        b = np.searchsorted(palavras, termo + '\uffff', side='left')
+        encontrados = donos[a:b]
+        return encontrados[(encontrados >= inicio) & (encontrados < fim)]
+
+    def _por_trecho(self, campo, termo, inicio, fim):
+        """Locais que contêm o termo: têm todos os seus trigramas e, conferido no texto, o termo inteiro"""
+        trigramas = ngramas(termo)
+        contagem = np.zeros(fim - inicio, dtype=np.int32)
+        for trigrama in trigramas:
+            lista = self._recortar(self.trigramas[campo].get(trigrama, _VAZIO), inicio, fim)
+            if len(lista) == 0:
+                return _VAZIO
+            contagem[lista - inicio] += 1
+        candidatos = np.flatnonzero(contagem == len(trigramas)) + inicio
+        if len(termo) == TAMANHO_NGRAMA or len(candidatos) == 0:
+            return candidatos
+        return candidatos[np.char.find(self.textos[campo][candidatos], termo) >= 0]
+
+    def _por_varredura(self, campo, termo, inicio, fim):
+        """Locais da faixa que contêm o termo, conferidos texto a texto (termos curtos demais para trigramas)"""
+        return np.flatnonzero(np.char.find(self.textos[campo][inicio:fim], termo) >= 0) + inicio
+
+    def _buscar_termo(self, campo, termo, inicio, fim, trechos_curtos=False):
+        if len(termo) < TAMANHO_NGRAMA:
+            if trechos_curtos:
+                return self._por_varredura(campo, termo, inicio, fim)
+            return self._por_prefixo(campo, termo, inicio, fim)
+        return self._por_trecho(campo, termo, inicio, fim)
+
+    def buscar(self, consulta, zona=None, campos=None, trechos_curtos=False):
+        """
+        Posições (ordenadas) dos locais em que cada termo da consulta aparece em algum
+        dos campos: como trecho a partir de três letras, como início de palavra abaixo
+        disso (ou também como trecho, com `trechos_curtos`). Uma consulta vazia devolve
+        todos os locais da zona.
+        """
+        inicio, fim = self._faixa(zona)
+        campos = [campo for campo in (campos or self.campos) if campo in self.textos]
+        # Máscaras sobre a faixa da zona: união entre campos e interseção entre termos sem ordenar listas
+        resultado = np.ones(fim - inicio, dtype=bool)
+        for termo in normalizar(consulta).split():
+            presente = np.zeros(fim - inicio, dtype=bool)
+            for campo in campos:
+                presente[self._buscar_termo(campo, termo, inicio, fim, trechos_curtos) - inicio] = True
+            resultado &= presente
+            if not resultado.any():
+                break
+        return np.sort(self.ordem[np.flatnonzero(resultado) + inicio])
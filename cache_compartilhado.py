@@ -0,0 +1,175 @@
+"""
+Cache em disco compartilhado entre os processos do painel no mesmo host.
+
+Cada réplica (worker) do Streamlit tem o seu próprio `st.cache_resource`: sem
+este módulo, todas refazem o processamento do CSV, o cubo, o índice de busca e
+as tabelas da análise e guardam cópias próprias de tudo. Aqui cada estrutura
+derivada é gravada uma única vez em `DIRETORIO_COMPARTILHADO` e as demais
+réplicas a abrem mapeada em memória, só leitura:
+- arrays numpy em `.npy` (abertos com `mmap_mode='r'`, sem cópia);
+- DataFrames em Arrow IPC sem compressão (colunas numéricas sem nulos não são
+  copiadas);
+- valores simples (números, textos, listas) em um JSON ao lado.
+
+As páginas mapeadas ficam no cache de páginas do sistema operacional, de modo
+que a memória usada por réplica não cresce com o número de réplicas.
+
+Quem constrói uma entrada segura uma trava exclusiva entre processos (`flock`)
+com o nome da entrada; quem chega depois espera a trava e abre o que foi
+gravado. As entradas ficam sob a versão dos dados que as originou (ver
+`versao_dados` em dados.py), então uma atualização do CSV nunca serve uma
+entrada velha. Sem diretório gravável (ou sem `fcntl`, fora de sistemas POSIX)
+cada processo volta a construir tudo em memória.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+DIRETORIO_COMPARTILHADO = os.environ.get(
+    'PAINEL_CACHE_COMPARTILHADO',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'cache', 'compartilhado'),
+)
+ARQUIVO_VALORES = '_valores.json'
+VERSOES_MANTIDAS = 3  # versões dos dados mantidas em disco (réplicas podem estar uma versão atrás)
+
+
+def _digest(chave):
+    return hashlib.blake2b(repr(chave).encode(), digest_size=12).hexdigest()
+
+
+@contextlib.contextmanager
+def trava(nome, diretorio=DIRETORIO_COMPARTILHADO):
+    """Trava exclusiva entre processos do mesmo host (`flock` em `<diretorio>/travas/<nome>.lock`)"""
+    pasta = os.path.join(diretorio, 'travas')
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        arquivo = open(os.path.join(pasta, f'{nome}.lock'), 'a+')
+    except OSError:
+        arquivo = None  # diretório só leitura: cada processo faz o próprio trabalho
+    if arquivo is None or fcntl is None:
+        yield
+        return
+    with arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def _gravar_partes(partes, pasta):
+    valores = {}
+    for nome, valor in partes.items():
+        if isinstance(valor, pd.DataFrame):
+            tabela = pa.Table.from_pandas(valor)
+            with pa.OSFile(os.path.join(pasta, f'{nome}.arrow'), 'wb') as destino, \
+                    pa.ipc.new_file(destino, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+        elif isinstance(valor, np.ndarray):
+            # Arrays de objetos (textos) viram texto de largura fixa, que pode ser mapeado
+            np.save(os.path.join(pasta, f'{nome}.npy'), valor.astype(str) if valor.dtype == object else valor)
+        else:
+            valores[nome] = valor
+    with open(os.path.join(pasta, ARQUIVO_VALORES), 'w') as arquivo:
+        json.dump(valores, arquivo)
+
+
+def _abrir_partes(pasta):
+    with open(os.path.join(pasta, ARQUIVO_VALORES)) as arquivo:
+        partes = json.load(arquivo)
+    for nome_arquivo in os.listdir(pasta):
+        nome, extensao = os.path.splitext(nome_arquivo)
+        caminho = os.path.join(pasta, nome_arquivo)
+        if extensao == '.npy':
+            partes[nome] = np.asarray(np.load(caminho, mmap_mode='r'))
+        elif extensao == '.arrow':
+            tabela = pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+            partes[nome] = tabela.to_pandas(split_blocks=True, self_destruct=False)
+    # Os buffers temporários da conversão para pandas ficariam retidos pelo alocador do Arrow
+    pa.default_memory_pool().release_unused()
+    return partes
+
+
+class CacheCompartilhado:
+    """
+    Entradas (dicionários de arrays, DataFrames e valores simples) gravadas uma vez
+    por versão dos dados e abertas mapeadas em memória pelos demais processos.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_COMPARTILHADO, versoes_mantidas=VERSOES_MANTIDAS):
+        self.diretorio = diretorio
+        self.versoes_mantidas = versoes_mantidas
+        self.abertas = 0  # entradas gravadas por outro processo (ou antes) e abertas do disco
+        self.construidas = 0  # entradas construídas e gravadas por este processo
+        self.em_memoria = 0  # construídas sem conseguir gravar (diretório só leitura)
+        self._trava = threading.Lock()
+
+    def _pasta(self, versao, chave):
+        return os.path.join(self.diretorio, str(versao), _digest(chave))
+
+    def _contar(self, contador):
+        with self._trava:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def obter(self, versao, chave, construir):
+        """
+        Partes da entrada `chave` da versão `versao` dos dados; `construir()` só roda
+        no primeiro processo que pede a entrada e deve devolver um dicionário de
+        nome → array numpy, DataFrame ou valor serializável em JSON. Os arrays e
+        DataFrames devolvidos são só leitura.
+        """
+        pasta = self._pasta(versao, chave)
+        if os.path.isdir(pasta):
+            self._contar('abertas')
+            return _abrir_partes(pasta)
+        # Trava por entrada dentro da pasta da versão: some junto com ela em `descartar_versoes_antigas`
+        with trava(_digest(chave), os.path.join(self.diretorio, str(versao))):
+            if os.path.isdir(pasta):
+                self._contar('abertas')
+                return _abrir_partes(pasta)
+            partes = construir()
+            temporaria = f'{pasta}.tmp-{os.getpid()}-{threading.get_ident()}'
+            try:
+                os.makedirs(temporaria)
+                _gravar_partes(partes, temporaria)
+                os.rename(temporaria, pasta)
+            except OSError:
+                shutil.rmtree(temporaria, ignore_errors=True)
+                self._contar('em_memoria')
+                return partes
+        self._contar('construidas')
+        # Mesmo quem construiu passa a usar a cópia mapeada: a memória própria é liberada
+        return _abrir_partes(pasta)
+
+    def descartar_versoes_antigas(self):
+        """Apaga as versões dos dados além das `versoes_mantidas` mais recentes"""
+        try:
+            versoes = [entrada for entrada in os.scandir(self.diretorio)
+                       if entrada.is_dir() and entrada.name != 'travas']
+        except OSError:
+            return
+        versoes.sort(key=lambda entrada: entrada.stat().st_mtime, reverse=True)
+        for entrada in versoes[self.versoes_mantidas:]:
+            # Arquivos já mapeados por outros processos continuam válidos até serem fechados
+            shutil.rmtree(entrada.path, ignore_errors=True)
+
+    def estado(self):
+        """Resumo para diagnóstico"""
+        return {
+            'diretorio': self.diretorio,
+            'abertas': self.abertas,
+            'construidas': self.construidas,
+            'em_memoria': self.em_memoria,
+        }
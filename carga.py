@@ -0,0 +1,122 @@
+"""
+Carga a frio dos dados do painel como um pequeno pipeline de etapas com
+dependências.
+
+Sem artefato nem geometrias gravados (primeiro deploy, camada de bairros nova),
+o carregamento fazia tudo em sequência: camada de bairros (download, se ainda
+não estava no disco), leitura do CSV e correção das coordenadas, atribuição de
+bairros e gravação do artefato e, só depois, a camada do município e as
+geometrias simplificadas. Aqui cada etapa declara de quais outras depende e
+roda em um pool de threads assim que elas terminam:
+
+    bairros ──────────────┬──> votacao (atribuição de bairros, artefato)
+    csv (leitura, coords) ┘
+    bairros ───> geometrias_bairros
+    municipio ─> geometrias_municipio
+
+Os dois downloads correm juntos e em paralelo com a leitura do CSV, e as
+geometrias do município não esperam a atribuição de bairros. Downloads e
+leitura de arquivos liberam o GIL, assim como boa parte do pandas e do shapely.
+Com `PAINEL_THREADS_CARGA=1` as etapas rodam uma a uma, na ordem em que foram
+declaradas (a ordem antiga), o que serve de comparação em
+benchmarks/carga.py.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dados import (ARQUIVO_ARTEFATO, ARQUIVO_CSV, assinatura_csv, atribuir_bairros, blocos_csv, compactar_tipos,
+                   contar_blocos, gravar_artefato, ler_blocos)
+from fronteiras import carregar_camada
+from geometrias import (CAMADAS_GEOMETRIAS, DIRETORIO_GEOMETRIAS, construir_geometrias, geometrias_atualizadas,
+                        preparar_geometrias)
+
+THREADS_CARGA = int(os.environ.get('PAINEL_THREADS_CARGA', '4'))
+
+
+class PipelineCarga:
+    """
+    Etapas com dependências executadas em um pool de threads. As etapas são
+    submetidas na ordem em que foram declaradas e cada uma só é declarada depois das
+    suas dependências, então uma etapa à espera nunca bloqueia outra de que depende.
+    """
+
+    def __init__(self, threads=THREADS_CARGA):
+        self.threads = threads
+        self.etapas = {}  # nome → (função, dependências)
+        self.tempos = {}  # nome → (início, fim) em segundos desde o início da execução
+        self.resultados = {}
+
+    def etapa(self, nome, funcao, *dependencias):
+        """Declara a etapa `nome`: `funcao` recebe os resultados das dependências, na ordem dada"""
+        faltando = [dependencia for dependencia in dependencias if dependencia not in self.etapas]
+        if faltando:
+            raise ValueError(f"Etapa '{nome}' depende de etapas ainda não declaradas: {faltando}")
+        self.etapas[nome] = (funcao, dependencias)
+
+    def executar(self):
+        """Roda todas as etapas e devolve nome → resultado; o erro de uma etapa sobe aqui"""
+        inicio = time.perf_counter()
+
+        def rodar(nome, funcao, futuros):
+            argumentos = [futuro.result() for futuro in futuros]
+            comeco = time.perf_counter() - inicio
+            try:
+                return funcao(*argumentos)
+            finally:
+                self.tempos[nome] = (comeco, time.perf_counter() - inicio)
+
+        futuros = {}
+        with ThreadPoolExecutor(max(1, min(self.threads, len(self.etapas)))) as executor:
+            for nome, (funcao, dependencias) in self.etapas.items():
+                futuros[nome] = executor.submit(rodar, nome, funcao, [futuros[d] for d in dependencias])
+        self.resultados = {nome: futuro.result() for nome, futuro in futuros.items()}
+        return self.resultados
+
+    def resumo(self):
+        """Linha do tempo das etapas, para o log do build e os benchmarks"""
+        return '\n'.join(f"{nome:<22} {inicio:>7.2f}s → {fim:>7.2f}s ({fim - inicio:.2f}s)"
+                         for nome, (inicio, fim) in sorted(self.tempos.items(), key=lambda item: item[1]))
+
+
+def carga_inicial(caminho_csv=ARQUIVO_CSV, caminho_artefato=ARQUIVO_ARTEFATO, vizinho_mais_proximo=False,
+                  diretorio_geometrias=DIRETORIO_GEOMETRIAS, reconstruir_geometrias=False, threads=THREADS_CARGA):
+    """
+    Processa o CSV e grava o artefato e as geometrias que estiverem desatualizadas
+    (todas, com `reconstruir_geometrias`). Devolve o pipeline executado: em
+    `resultados['votacao']` ficam o DataFrame compactado, os blocos, a assinatura do
+    CSV e se o artefato foi gravado (False sem onde gravar).
+    """
+    pipeline = PipelineCarga(threads)
+
+    def ler_csv():
+        assinatura = assinatura_csv(caminho_csv)
+        blocos = blocos_csv(caminho_csv)
+        return assinatura, blocos, ler_blocos(caminho_csv, blocos)
+
+    def votacao(csv, gdf_bairros):
+        assinatura, blocos, df = csv
+        df, blocos = contar_blocos(atribuir_bairros(df, gdf_bairros, vizinho_mais_proximo), blocos)
+        df = compactar_tipos(df)
+        try:
+            gravar_artefato(df, blocos, assinatura, caminho_artefato, vizinho_mais_proximo)
+        except OSError:
+            return df, blocos, assinatura, False  # sem onde gravar: o CSV fica só neste processo
+        return df, blocos, assinatura, True
+
+    def geometrias(camada):
+        if reconstruir_geometrias:
+            return lambda gdf: construir_geometrias(camada, diretorio_geometrias, gdf)
+        return lambda gdf: preparar_geometrias(camada, gdf, diretorio_geometrias)
+
+    # Declaradas na ordem do carregamento sequencial antigo
+    pipeline.etapa('bairros', lambda: carregar_camada('bairros'))
+    pipeline.etapa('csv', ler_csv)
+    pipeline.etapa('votacao', votacao, 'csv', 'bairros')
+    for camada in CAMADAS_GEOMETRIAS:
+        if reconstruir_geometrias or not geometrias_atualizadas(camada, diretorio_geometrias):
+            if camada != 'bairros':
+                pipeline.etapa(camada, lambda camada=camada: carregar_camada(camada))
+            pipeline.etapa(f'geometrias_{camada}', geometrias(camada), camada)
+    pipeline.executar()
+    return pipeline
@@ -0,0 +1,133 @@
+"""
+Classificação dos valores das manchas (por bairro) em classes de cor.
+
+As quebras entre classes podem vir de percentis fixos (p25, p50, p75, p90, p95 e
+p99, a escala original da mancha de sinergia), de quantis com o mesmo número de
+bairros por classe, de intervalos iguais ou de quebras naturais (Jenks, pela
+programação dinâmica de Fisher; acima de `LIMITE_JENKS` valores ela roda sobre
+uma amostra). Só os valores positivos entram no cálculo: bairros sem votos
+ficam fora da escala.
+
+As quebras são guardadas em um cache LRU por (estado de filtro, métrica,
+método), então trocar de visualização e voltar não refaz o cálculo, e a
+atribuição das classes é uma única busca binária vetorizada. As mesmas quebras
+alimentam a legenda.
+"""
+import numpy as np
+
+from filtros import CAPACIDADE_PADRAO, CacheLRU
+
+PERCENTIS_PADRAO = (25, 50, 75, 90, 95, 99)
+N_CLASSES = len(PERCENTIS_PADRAO) + 1
+QUEBRA_SEM_VALORES = 0.01  # quebras usadas quando nenhum bairro tem valor positivo
+LIMITE_JENKS = 1000  # acima disso as quebras naturais são calculadas sobre uma amostra
+
+METODO_PERCENTIS = "Percentis (p25…p99)"
+METODO_QUANTIS = "Quantis"
+METODO_INTERVALOS = "Intervalos iguais"
+METODO_JENKS = "Quebras naturais (Jenks)"
+METODOS = (METODO_PERCENTIS, METODO_QUANTIS, METODO_INTERVALOS, METODO_JENKS)
+
+
+def quebras_percentis(valores, percentis=PERCENTIS_PADRAO):
+    return np.percentile(valores, percentis)
+
+
+def quebras_quantis(valores, n_classes=N_CLASSES):
+    """Quebras com (aproximadamente) o mesmo número de valores em cada classe"""
+    return np.quantile(valores, np.arange(1, n_classes) / n_classes)
+
+
+def quebras_intervalos_iguais(valores, n_classes=N_CLASSES):
+    minimo, maximo = np.min(valores), np.max(valores)
+    return minimo + (maximo - minimo) * np.arange(1, n_classes) / n_classes
+
+
+def quebras_jenks(valores, n_classes=N_CLASSES, limite_amostra=LIMITE_JENKS, semente=0):
+    """
+    Quebras naturais de Fisher-Jenks (mínima soma dos desvios quadráticos dentro das
+    classes). A programação dinâmica é O(k·n²) e vetorizada por classe; com mais de
+    `limite_amostra` valores ela usa uma amostra fixa que inclui o mínimo e o máximo.
+    """
+    valores = np.sort(np.asarray(valores, dtype=float))
+    if len(valores) > limite_amostra:
+        amostra = np.random.default_rng(semente).choice(len(valores) - 2, limite_amostra - 2, replace=False) + 1
+        valores = np.sort(np.r_[valores[0], valores[amostra], valores[-1]])
+    n = len(valores)
+    if n <= n_classes:
+        return np.r_[valores, np.full(n_classes - n, valores[-1])][:n_classes - 1]
+
+    # Soma dos desvios quadráticos de cada segmento valores[m..i] (infinito para m > i)
+    soma = np.r_[0, np.cumsum(valores)]
+    soma_quadrados = np.r_[0, np.cumsum(valores ** 2)]
+    m, i = np.arange(n)[:, None], np.arange(n)[None, :]
+    contagem = np.maximum(i - m + 1, 1)
+    s1 = soma[i + 1] - soma[m]
+    desvios = soma_quadrados[i + 1] - soma_quadrados[m] - s1 ** 2 / contagem
+    desvios = np.where(m <= i, np.maximum(desvios, 0), np.inf)
+
+    custo = desvios[0]
+    inicios = []  # por classe j ≥ 1: início da classe j que minimiza o custo até cada i
+    for _ in range(1, n_classes):
+        candidatos = np.full((n, n), np.inf)
+        candidatos[1:] = custo[:-1, None] + desvios[1:]
+        melhor = np.argmin(candidatos, axis=0)
+        custo = candidatos[melhor, np.arange(n)]
+        inicios.append(melhor)
+
+    quebras = []
+    fim = n - 1
+    for melhor in reversed(inicios):
+        inicio = melhor[fim]
+        quebras.append(valores[inicio - 1])
+        fim = inicio - 1
+    return np.array(quebras[::-1])
+
+
+_CALCULOS = {
+    METODO_PERCENTIS: quebras_percentis,
+    METODO_QUANTIS: quebras_quantis,
+    METODO_INTERVALOS: quebras_intervalos_iguais,
+    METODO_JENKS: quebras_jenks,
+}
+
+
+def calcular_quebras(valores, metodo=METODO_PERCENTIS):
+    """`N_CLASSES - 1` quebras crescentes a partir dos valores positivos"""
+    if metodo not in _CALCULOS:
+        raise ValueError(f"Método de classificação desconhecido: {metodo}")
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[valores > 0]
+    if len(valores) == 0:
+        return np.full(N_CLASSES - 1, QUEBRA_SEM_VALORES)
+    return np.asarray(_CALCULOS[metodo](valores), dtype=float)
+
+
+def classificar(valores, quebras):
+    """Classe (0 … len(quebras)) de cada valor; um valor igual à quebra fica na classe de baixo"""
+    return np.searchsorted(np.asarray(quebras, dtype=float), np.asarray(valores, dtype=float), side='left')
+
+
+def intervalos(quebras):
+    """(início, fim) de cada classe; None nas pontas abertas"""
+    limites = [None] + list(quebras) + [None]
+    return list(zip(limites[:-1], limites[1:]))
+
+
+class QuebrasMemoizadas:
+    """Quebras por (estado de filtro, métrica, método) em um cache LRU compartilhado"""
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        self.cache = CacheLRU(capacidade)
+
+    def quebras(self, chave_filtro, metrica, metodo, valores):
+        """Quebras em cache; `valores` só é usado quando a combinação ainda não foi calculada"""
+        def construir():
+            quebras = calcular_quebras(valores, metodo)
+            quebras.setflags(write=False)
+            return quebras
+        return self.cache.obter((chave_filtro, metrica, metodo), construir)
+
+    def invalidar(self, alteracao):
+        """Descarta as quebras dos estados de filtro afetados por uma atualização dos dados"""
+        self.cache.descartar(lambda chave: alteracao.afeta(chave[0]))
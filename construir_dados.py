@@ -0,0 +1,48 @@
+"""
+Gera o artefato colunar usado pelo app (`dados/votacao.arrow`).
+
+Executa uma única vez o processamento que antes rodava em cada worker: leitura
+do CSV, correção das coordenadas e atribuição de bairros. O resultado é gravado
+com textos como categorias e votos em inteiros estreitos. Também grava as
+geometrias simplificadas e já serializadas dos limites (`dados/geometrias/`),
+para que o app não precise de geopandas nem shapely em execução. As etapas
+rodam no pipeline de carga.py (downloads das camadas, se preciso, em paralelo
+com a leitura do CSV).
+
+    python construir_dados.py
+    python construir_dados.py --csv outro_arquivo.csv --saida dados/outro.arrow
+"""
+import argparse
+import time
+
+from carga import carga_inicial
+from dados import ARQUIVO_ARTEFATO, ARQUIVO_CSV, memoria_dataframe
+from geometrias import CAMADAS_GEOMETRIAS, DIRETORIO_GEOMETRIAS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o artefato colunar de votação usado pelo app.")
+    parser.add_argument('--csv', default=ARQUIVO_CSV, help="CSV de votação de origem")
+    parser.add_argument('--saida', default=ARQUIVO_ARTEFATO, help="Arquivo Arrow de saída")
+    parser.add_argument('--bairro-mais-proximo', action='store_true',
+                        help="Atribui o bairro mais próximo aos locais fora de qualquer polígono")
+    parser.add_argument('--geometrias', default=DIRETORIO_GEOMETRIAS,
+                        help="Diretório das geometrias pré-serializadas")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    pipeline = carga_inicial(args.csv, args.saida, args.bairro_mais_proximo, args.geometrias,
+                             reconstruir_geometrias=True)
+    df, _, _, gravado = pipeline.resultados['votacao']
+    if not gravado:
+        raise SystemExit(f"Não foi possível gravar o artefato em {args.saida}")
+    print(f"{len(df)} linhas gravadas em {args.saida} ({memoria_dataframe(df) / 1e6:.1f} MB em memória)")
+    for camada in CAMADAS_GEOMETRIAS:
+        geometrias = pipeline.resultados[f'geometrias_{camada}']
+        print(f"geometrias '{camada}': {len(geometrias)} feições, {geometrias.bytes_geometria() / 1e3:.0f} KB "
+              f"no nível padrão")
+    print(f"\n{pipeline.resumo()}\ntotal: {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Correção vetorizada das coordenadas dos locais de votação.
+
+Os arquivos do TSE chegam com LATITUDE/LONGITUDE corrompidas pelo separador de
+milhar (ex.: `-4.318.172.190.000.000` em vez de `-43.18172190000000`). Este
+módulo repara a coluna inteira de uma vez com operações de string/regex do
+pandas (em memória Arrow), reproduzindo exatamente o resultado da função
+`corrigir_coordenada` original, e confere se os valores caem dentro do
+retângulo envolvente do município do Rio. Os raros textos com sublinhado ou
+caracteres fora do ASCII (que `float()` aceita, como `1_000` ou dígitos de
+outros alfabetos, e as regex do Arrow não reconhecem) passam pela função
+original, valor a valor.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# Retângulo envolvente do município do Rio de Janeiro (com folga)
+LIMITES_RIO = {
+    'lat': (-23.15, -22.70),
+    'lon': (-43.85, -43.05),
+}
+
+# Tudo que `float()` aceita nas colunas de coordenadas
+_REGEX_NUMERO = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+_REGEX_ESPECIAL = r'(?i)[+-]?(?:nan|inf|infinity)'
+# Textos em que as regex acima (só ASCII, sem sublinhado) divergiriam de `float()`
+_REGEX_FORA_ASCII = r'[^\x00-\x7f]|_'
+
+
+@dataclass
+class RelatorioCoordenadas:
+    """Contagem de linhas por situação após a correção"""
+    total: int = 0
+    validas: int = 0
+    reparadas: int = 0
+    descartadas: int = 0
+    fora_limites: int = 0
+    por_coluna: dict = field(default_factory=dict)
+
+    def __str__(self):
+        return (f"{self.total} linhas: {self.validas} válidas, {self.reparadas} reparadas, "
+                f"{self.descartadas} descartadas, {self.fora_limites} fora dos limites")
+
+
+def corrigir_coordenada(coord):
+    """Versão escalar original (mantida como referência e para o benchmark)"""
+    s = str(coord).replace(',', '.').strip()
+    try:
+        return float(s)
+    except ValueError:
+        is_neg = s.startswith('-')
+        digits = ''.join(filter(str.isdigit, s))
+        if not digits: return None
+        # Ajuste para diferentes formatos de coordenadas sem ponto decimal
+        s_clean = f"{'-' if is_neg else ''}{s.replace('-', '').replace('.', '')}"
+        if len(s_clean) > 8: # Provavelmente formato com muitos decimais
+             s_clean = f"{s_clean[:3]}.{s_clean[3:]}"
+        else:
+             s_clean = f"{s_clean[:2]}.{s_clean[2:]}"
+        return pd.to_numeric(s_clean, errors='coerce')
+
+
+def _corrigir_escalar(texto):
+    """`corrigir_coordenada` de um texto já normalizado; retorna (valor, precisou de reparo)"""
+    try:
+        return float(texto), False
+    except ValueError:
+        valor = corrigir_coordenada(texto)
+        return (np.nan if valor is None else float(valor)), any(c.isdigit() for c in texto)
+
+
+def _como_texto(serie):
+    if pd.api.types.is_float_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        # Colunas já numéricas não precisam de reparo
+        return None
+    return serie.astype(str).astype('string[pyarrow]')
+
+
+def _corrigir_valores(texto):
+    """Corrige um vetor de textos; retorna (float64, máscara de reparo) como arrays numpy"""
+    s = texto.reset_index(drop=True).str.replace(',', '.', regex=False).str.strip()
+    valores = np.full(len(s), np.nan)
+    escalar = s.str.contains(_REGEX_FORA_ASCII, regex=True).fillna(False).to_numpy(dtype=bool)
+    valido = (s.str.fullmatch(_REGEX_NUMERO) | s.str.fullmatch(_REGEX_ESPECIAL)).fillna(False).to_numpy(dtype=bool)
+    valido &= ~escalar
+    if valido.any():
+        # Mesma conversão de `float()` (o parser rápido do pandas difere nos últimos bits)
+        valores[valido] = s[valido].astype(object).astype('float64')
+
+    reparar = ~valido & ~escalar & s.str.contains(r'\d', regex=True).fillna(False).to_numpy(dtype=bool)
+    if reparar.any():
+        r = s[reparar]
+        sinal = pd.Series(np.where(r.str.startswith('-'), '-', ''), index=r.index, dtype='string[pyarrow]')
+        limpo = sinal + r.str.replace('-', '', regex=False).str.replace('.', '', regex=False)
+        longo = (limpo.str.len() > 8).to_numpy(dtype=bool)
+        # Muitos dígitos: o ponto decimal vai depois do 3º caractere (ex.: "-22"), senão depois do 2º
+        for mascara, padrao in ((longo, r'(?s)^(.{3})'), (~longo, r'(?s)^(.{0,2})')):
+            if mascara.any():
+                reparado = limpo[mascara].str.replace(padrao, r'\1.', regex=True)
+                valores[reparado.index.to_numpy()] = pd.to_numeric(reparado.astype(object), errors='coerce')
+
+    if escalar.any():
+        posicoes = np.flatnonzero(escalar)
+        corrigidos = [_corrigir_escalar(texto) for texto in s[escalar].astype(object)]
+        valores[posicoes] = [valor for valor, _ in corrigidos]
+        reparar[posicoes] = [reparada for _, reparada in corrigidos]
+    return valores, reparar
+
+
+def corrigir_coordenadas(serie):
+    """
+    Corrige uma coluna de coordenadas inteira.
+    Retorna (valores float64, máscara das linhas que precisaram de reparo).
+    Cada local aparece uma vez por candidato, então só os valores distintos são processados.
+    """
+    texto = _como_texto(serie)
+    if texto is None:
+        return serie.astype('float64'), pd.Series(False, index=serie.index)
+
+    codigos, distintos = pd.factorize(texto, use_na_sentinel=False)
+    valores, reparar = _corrigir_valores(pd.Series(distintos, dtype='string[pyarrow]'))
+    return pd.Series(valores[codigos], index=serie.index), pd.Series(reparar[codigos], index=serie.index)
+
+
+def reparar_coordenadas(df, coluna_lat='LATITUDE', coluna_lon='LONGITUDE', limites=LIMITES_RIO,
+                        descartar_fora_limites=False):
+    """
+    Corrige as colunas de latitude e longitude do DataFrame e remove as linhas
+    sem coordenada utilizável. Retorna (df, RelatorioCoordenadas).
+    Linhas fora do retângulo envolvente só são removidas com `descartar_fora_limites=True`;
+    caso contrário apenas entram na contagem.
+    """
+    relatorio = RelatorioCoordenadas(total=len(df))
+    lat, reparada_lat = corrigir_coordenadas(df[coluna_lat])
+    lon, reparada_lon = corrigir_coordenadas(df[coluna_lon])
+
+    df = df.assign(**{coluna_lat: lat, coluna_lon: lon})
+    sem_coordenada = lat.isna() | lon.isna()
+    reparada = (reparada_lat | reparada_lon) & ~sem_coordenada
+    fora = ~sem_coordenada & ~(lat.between(*limites['lat']) & lon.between(*limites['lon']))
+
+    relatorio.descartadas = int(sem_coordenada.sum())
+    relatorio.reparadas = int(reparada.sum())
+    relatorio.validas = relatorio.total - relatorio.descartadas - relatorio.reparadas
+    relatorio.fora_limites = int(fora.sum())
+    relatorio.por_coluna = {
+        coluna_lat: int((reparada_lat & lat.notna()).sum()),
+        coluna_lon: int((reparada_lon & lon.notna()).sum()),
+    }
+
+    manter = ~sem_coordenada
+    if descartar_fora_limites:
+        manter &= ~fora
+    return df[manter.to_numpy(dtype=bool)], relatorio
@@ -0,0 +1,168 @@
+"""
+Cubo de votos (local × candidato) para as agregações do painel.
+
+O cubo é montado uma vez por conjunto de dados: uma matriz densa de inteiros
+com os votos de cada candidato em cada local de votação, mais vetores que
+ligam cada local à sua zona, bairro, nome e ponto no mapa. Os filtros de modo
+(candidatos), zona e local viram máscaras sobre as linhas do cubo e as
+agregações por ponto/bairro/zona/local são somas agrupadas sobre a parte
+mascarada, sem `pivot_table` por rerun. Funciona para qualquer número de
+candidatos.
+
+Um "local" aqui é a combinação (NR_ZONA, NM_LOCAL_VOTACAO, lat, lon); linhas
+com 0 votos equivalem à ausência do candidato no local.
+"""
+import numpy as np
+import pandas as pd
+
+COLUNA_CANDIDATO = 'NM_VOTAVEL'
+COLUNA_VOTOS = 'QT_VOTOS_TOTAL'
+CHAVE_LOCAL = ['NR_ZONA', 'NM_LOCAL_VOTACAO', 'lat', 'lon']
+CHAVE_PONTO = ['NM_LOCAL_VOTACAO', 'lat', 'lon']
+NIVEIS = ('ponto', 'NOME_BAIRRO', 'NR_ZONA', 'NM_LOCAL_VOTACAO')
+# Atributos de cada local guardados junto do cubo (o endereço alimenta a busca, ver busca.py)
+COLUNAS_DESCRITIVAS = ['NOME_BAIRRO', 'DS_LOCAL_VOTACAO_ENDERECO']
+
+
+class CuboVotos:
+    """Votos densos por (local, candidato) com tabelas de consulta por local"""
+
+    def __init__(self, df):
+        id_local = df.groupby(CHAVE_LOCAL, observed=True, sort=True).ngroup().to_numpy()
+        candidatos = pd.Categorical(df[COLUNA_CANDIDATO])
+        self.candidatos = np.asarray(candidatos.categories, dtype=object)
+        n_locais, n_candidatos = int(id_local.max()) + 1 if len(df) else 0, len(self.candidatos)
+
+        # Soma por célula (local, candidato); exata enquanto os totais couberem em float64
+        celula = id_local * n_candidatos + candidatos.codes
+        soma = np.bincount(celula, weights=df[COLUNA_VOTOS].to_numpy(dtype=float), minlength=n_locais * n_candidatos)
+        self.votos = soma.reshape(n_locais, n_candidatos).astype(np.int64)
+
+        primeira_linha = np.zeros(n_locais, dtype=np.int64)
+        primeira_linha[id_local[::-1]] = np.arange(len(df))[::-1]
+        colunas_locais = CHAVE_LOCAL + [coluna for coluna in COLUNAS_DESCRITIVAS if coluna in df.columns]
+        self.locais = df[colunas_locais].iloc[primeira_linha].reset_index(drop=True)
+
+        self.zona = self.locais['NR_ZONA'].to_numpy()
+        self._codigos = {}
+        self._rotulos = {}
+        self._ordens = {}
+        for nivel in NIVEIS:
+            codigos, rotulos = self._codificar(nivel)
+            self._codigos[nivel] = codigos
+            self._rotulos[nivel] = rotulos
+            self._ordens[nivel] = np.argsort(codigos, kind='stable')
+
+    def partes(self):
+        """
+        Arrays e tabelas do cubo, para gravar no cache compartilhado (ver
+        cache_compartilhado.py). Os rótulos dos grupos viram a posição de um local
+        de cada grupo, para que ao abrir reaproveitem os textos de `locais`.
+        """
+        partes = {'votos': self.votos, 'candidatos': self.candidatos, 'locais': self.locais}
+        for nivel in NIVEIS:
+            codigos = self._codigos[nivel]
+            grupos, primeiros = np.unique(codigos, return_index=True)
+            partes[f'codigos_{nivel}'] = codigos
+            partes[f'ordens_{nivel}'] = self._ordens[nivel]
+            partes[f'primeiros_{nivel}'] = primeiros[grupos >= 0]
+        return partes
+
+    @classmethod
+    def de_partes(cls, partes):
+        """Cubo a partir de `partes()` (arrays possivelmente só leitura, mapeados em memória)"""
+        cubo = cls.__new__(cls)
+        cubo.votos = partes['votos']
+        cubo.candidatos = np.asarray(partes['candidatos'], dtype=object)
+        cubo.locais = partes['locais']
+        cubo.zona = cubo.locais['NR_ZONA'].to_numpy()
+        cubo._codigos = {nivel: partes[f'codigos_{nivel}'] for nivel in NIVEIS}
+        cubo._ordens = {nivel: partes[f'ordens_{nivel}'] for nivel in NIVEIS}
+        cubo._rotulos = {}
+        for nivel in NIVEIS:
+            primeiros = partes[f'primeiros_{nivel}']
+            if nivel == 'ponto':
+                cubo._rotulos[nivel] = cubo.locais[CHAVE_PONTO].iloc[primeiros].reset_index(drop=True)
+            else:
+                cubo._rotulos[nivel] = pd.Index(np.asarray(cubo.locais[nivel].iloc[primeiros]), name=nivel)
+        return cubo
+
+    def _codificar(self, nivel):
+        """Código de grupo de cada local (−1 = sem grupo) e rótulos ordenados dos grupos"""
+        if nivel == 'ponto':
+            codigos = self.locais.groupby(CHAVE_PONTO, observed=True, sort=True).ngroup().to_numpy()
+            rotulos = self.locais[CHAVE_PONTO].iloc[np.unique(codigos, return_index=True)[1]].reset_index(drop=True)
+            return codigos, rotulos
+        codigos, rotulos = pd.factorize(self.locais[nivel], sort=True)
+        return codigos, pd.Index(np.asarray(rotulos), name=nivel)
+
+    @property
+    def n_locais(self):
+        return self.votos.shape[0]
+
+    def indices_candidatos(self, candidatos=None):
+        """Posições das colunas dos candidatos pedidos (todos se None)"""
+        if candidatos is None:
+            return np.arange(len(self.candidatos))
+        posicoes = {nome: i for i, nome in enumerate(self.candidatos)}
+        return np.array([posicoes[c] for c in candidatos if c in posicoes], dtype=np.int64)
+
+    def mascara(self, zona=None, nomes_locais=None):
+        """Máscara booleana dos locais que passam nos filtros de zona e de nome de local"""
+        mascara = np.ones(self.n_locais, dtype=bool)
+        if zona is not None:
+            mascara &= self.zona == zona
+        if nomes_locais:
+            mascara &= self.locais['NM_LOCAL_VOTACAO'].isin(nomes_locais).to_numpy()
+        return mascara
+
+    def com_votos(self, mascara=None, candidatos=None):
+        """Máscara dos locais (dentro de `mascara`) onde algum dos candidatos teve votos"""
+        presentes = self.votos[:, self.indices_candidatos(candidatos)].sum(axis=1) > 0
+        return presentes if mascara is None else presentes & mascara
+
+    def totais(self, mascara=None, candidatos=None):
+        """Total de votos por candidato (Series indexada pelo nome)"""
+        colunas = self.indices_candidatos(candidatos)
+        votos = self.votos if mascara is None else self.votos[mascara]
+        return pd.Series(votos[:, colunas].sum(axis=0), index=self.candidatos[colunas])
+
+    def agregar(self, nivel, mascara=None, candidatos=None):
+        """
+        Soma os votos dos candidatos por grupo do nível (ponto, bairro, zona ou
+        nome de local). Só aparecem grupos com votos de algum dos candidatos,
+        como no `pivot_table` sobre as linhas filtradas. Para o nível 'ponto' o
+        resultado traz as colunas NM_LOCAL_VOTACAO, lat e lon; nos demais o
+        índice é o rótulo do grupo.
+        """
+        colunas = self.indices_candidatos(candidatos)
+        presentes = self.com_votos(mascara, candidatos)
+        ordem = self._ordens[nivel]
+        selecionados = ordem[presentes[ordem]]
+        codigos = self._codigos[nivel][selecionados]
+        validos = codigos >= 0
+        selecionados, codigos = selecionados[validos], codigos[validos]
+
+        nomes_colunas = pd.Index(self.candidatos[colunas], name=COLUNA_CANDIDATO)
+        if len(selecionados) == 0:
+            somas = np.zeros((0, len(colunas)), dtype=np.int64)
+            grupos = codigos
+        else:
+            inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+            somas = np.add.reduceat(self.votos[selecionados][:, colunas], inicios, axis=0)
+            grupos = codigos[inicios]
+
+        if nivel == 'ponto':
+            resultado = self._rotulos[nivel].iloc[grupos].reset_index(drop=True)
+            votos = pd.DataFrame(somas, columns=nomes_colunas)
+            return pd.concat([resultado, votos], axis=1)
+        return pd.DataFrame(somas, index=self._rotulos[nivel][grupos], columns=nomes_colunas)
+
+    def zonas(self, candidatos=None):
+        """Zonas (ordenadas) com votos de algum dos candidatos"""
+        return sorted(np.unique(self.zona[self.com_votos(None, candidatos)]).tolist())
+
+    def nomes_locais(self, mascara=None, candidatos=None):
+        """Nomes de local (ordenados) com votos de algum dos candidatos dentro da máscara"""
+        nomes = self.locais['NM_LOCAL_VOTACAO'][self.com_votos(mascara, candidatos)]
+        return sorted(pd.unique(nomes.astype(object)))
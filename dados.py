@@ -0,0 +1,296 @@
+"""
+Carga e pré-processamento dos dados de votação.
+
+Há dois caminhos:
+- `preparar_votacao`: lê o CSV, corrige as coordenadas e atribui os bairros
+  (o processamento completo, usado pelo comando de build e como alternativa);
+- `abrir_artefato`: abre o arquivo colunar gerado por `construir_dados.py`
+  (Arrow IPC sem compressão, mapeado em memória) com textos como categorias e
+  votos em inteiros estreitos, sem refazer nenhuma etapa.
+
+O CSV é processado em blocos de ~`TAMANHO_BLOCO` bytes terminados em fim de
+linha. O início, o fim, o hash do conteúdo e o número de linhas resultantes de
+cada bloco ficam nos metadados do artefato, o que permite reprocessar só os
+blocos novos ou alterados (ver atualizacao.py).
+
+A leitura dos blocos e a correção das coordenadas (`ler_blocos`) não dependem
+da camada de bairros, que só entra na atribuição (`atribuir_bairros`): na carga
+a frio as duas coisas correm em paralelo (ver carga.py).
+
+A atribuição de bairros (shapely) só é importada no caminho de processamento
+completo, para que abrir o artefato não carregue as bibliotecas geográficas.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import mmap
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from coordenadas import reparar_coordenadas
+from fronteiras import versao_camada
+
+DIRETORIO_BASE = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_CSV = os.path.join(DIRETORIO_BASE, 'votacao_com_coordenadas.csv')
+ARQUIVO_ARTEFATO = os.path.join(DIRETORIO_BASE, 'dados', 'votacao.arrow')
+CHAVE_METADADOS = b'painel'
+
+COLUNAS_CATEGORICAS = ['NM_VOTAVEL', 'NM_LOCAL_VOTACAO', 'DS_LOCAL_VOTACAO_ENDERECO', 'NM_MUNICIPIO', 'NOME_BAIRRO']
+TIPOS_INTEIROS = {'NR_ZONA': 'int16', 'QT_VOTOS_TOTAL': 'int32'}
+TAMANHO_BLOCO = 256 * 1024  # bytes por bloco do CSV (arredondado para o fim da linha)
+
+
+def ler_votacao_csv(caminho=ARQUIVO_CSV):
+    """Lê o CSV de votação do TSE (caminho ou arquivo aberto) já com os nomes de coluna limpos"""
+    # Coordenadas sempre como texto: a conversão fica com coordenadas.py, igual em qualquer trecho do arquivo
+    df = pd.read_csv(caminho, sep=';', encoding='utf-8-sig', on_bad_lines='skip',
+                     dtype={'LATITUDE': str, 'LONGITUDE': str})
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    df.columns = [col.strip() for col in df.columns]
+    return df
+
+
+def corrigir_coordenadas(df):
+    """Corrige as coordenadas (descartando linhas sem coordenada) e renomeia para lat/lon"""
+    # Corrige a coluna inteira de uma vez e descarta linhas sem coordenada (ver coordenadas.py)
+    df, _ = reparar_coordenadas(df)
+    return df.rename(columns={'LATITUDE': 'lat', 'LONGITUDE': 'lon'})
+
+
+def atribuir_bairros(df, gdf_bairros, vizinho_mais_proximo=False):
+    """Associa cada linha (já com lat/lon) a um bairro"""
+    # Cada coordenada distinta é resolvida uma única vez e o resultado fica em disco (ver atribuicao_bairros.py)
+    from atribuicao_bairros import IndiceBairros
+
+    indice_bairros = IndiceBairros(gdf_bairros.to_crs("EPSG:4326"), versao=versao_camada('bairros'))
+    nomes_bairros = indice_bairros.atribuir(df['lat'], df['lon'], vizinho_mais_proximo=vizinho_mais_proximo)
+    return df.assign(NOME_BAIRRO=nomes_bairros)
+
+
+def preparar_votacao(df, gdf_bairros, vizinho_mais_proximo=False):
+    """
+    Corrige as coordenadas (descartando linhas sem coordenada), renomeia para
+    lat/lon e associa cada linha a um bairro.
+    """
+    return atribuir_bairros(corrigir_coordenadas(df), gdf_bairros, vizinho_mais_proximo)
+
+
+def _hash(conteudo):
+    return hashlib.blake2b(conteudo, digest_size=16).hexdigest()
+
+
+@contextlib.contextmanager
+def _conteudo(caminho):
+    """Conteúdo do arquivo mapeado em memória (bytes vazios para arquivo vazio)"""
+    with open(caminho, 'rb') as arquivo:
+        if os.fstat(arquivo.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as conteudo:
+            yield conteudo
+
+
+def blocos_csv(caminho=ARQUIVO_CSV, inicio=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Blocos do CSV a partir do byte `inicio` (padrão: logo após o cabeçalho), cada um
+    com ~`tamanho_bloco` bytes e terminado em fim de linha; o último vai até o fim do
+    arquivo. Retorna dicts com 'inicio', 'fim' e 'hash'.
+    """
+    blocos = []
+    with _conteudo(caminho) as conteudo:
+        tamanho = len(conteudo)
+        if inicio is None:
+            inicio = conteudo.find(b'\n') + 1 if tamanho else 0
+        while inicio < tamanho:
+            fim = conteudo.find(b'\n', min(inicio + tamanho_bloco, tamanho) - 1) + 1 or tamanho
+            blocos.append({'inicio': inicio, 'fim': fim, 'hash': _hash(conteudo[inicio:fim])})
+            inicio = fim
+    return blocos
+
+
+def hashes_trechos(caminho, trechos):
+    """Hash do conteúdo atual de cada trecho (início, fim) do arquivo; None se passar do fim"""
+    with _conteudo(caminho) as conteudo:
+        return [_hash(conteudo[inicio:fim]) if fim <= len(conteudo) else None for inicio, fim in trechos]
+
+
+def termina_linha(caminho, posicao):
+    """O byte anterior a `posicao` é uma quebra de linha?"""
+    with _conteudo(caminho) as conteudo:
+        return 0 < posicao <= len(conteudo) and conteudo[posicao - 1:posicao] == b'\n'
+
+
+def ler_trecho_csv(caminho, inicio, fim):
+    """Linhas do CSV entre os bytes `inicio` e `fim`, lidas com o cabeçalho do arquivo"""
+    with _conteudo(caminho) as conteudo:
+        trecho = conteudo[:conteudo.find(b'\n') + 1] + conteudo[inicio:fim]
+    return ler_votacao_csv(io.BytesIO(trecho))
+
+
+def ler_blocos(caminho, blocos):
+    """
+    Linhas dos blocos dados com as coordenadas já corrigidas (ainda sem bairro), com a
+    posição do bloco de origem em '_bloco'. None se não houver blocos.
+    """
+    partes = [ler_trecho_csv(caminho, bloco['inicio'], bloco['fim']).assign(_bloco=i) for i, bloco in enumerate(blocos)]
+    if not partes:
+        return None
+    return corrigir_coordenadas(pd.concat(partes, ignore_index=True))
+
+
+def contar_blocos(df, blocos):
+    """Tira a coluna '_bloco' e devolve cópias dos blocos com o número de linhas de cada um em 'linhas'"""
+    linhas = np.bincount(df['_bloco'].to_numpy(), minlength=len(blocos))
+    blocos = [{**bloco, 'linhas': int(n)} for bloco, n in zip(blocos, linhas)]
+    return df.drop(columns='_bloco'), blocos
+
+
+def preparar_blocos(caminho, blocos, gdf_bairros, vizinho_mais_proximo=False):
+    """
+    Processamento completo (`preparar_votacao`) só das linhas dos blocos dados.
+    Retorna o DataFrame (na ordem dos blocos) e cópias dos blocos com o número de
+    linhas que cada um gerou em 'linhas'.
+    """
+    df = ler_blocos(caminho, blocos)
+    if df is None:
+        return None, []
+    return contar_blocos(atribuir_bairros(df, gdf_bairros, vizinho_mais_proximo), blocos)
+
+
+def concatenar_votacao(partes):
+    """Junta partes já compactadas (ou não) unindo as categorias, sem passar por textos"""
+    partes = [parte for parte in partes if parte is not None and len(parte)]
+    if len(partes) == 1:
+        return compactar_tipos(partes[0])
+    colunas = {}
+    for coluna in partes[0].columns:
+        if coluna in COLUNAS_CATEGORICAS:
+            # Colunas só com nulos chegam do CSV como float: as categorias precisam ser textos
+            categorias = [parte[coluna] if isinstance(parte[coluna].dtype, pd.CategoricalDtype)
+                          else parte[coluna].astype(object).astype('category') for parte in partes]
+            categorias = [c.cat.set_categories(c.cat.categories.astype(object)) for c in categorias]
+            colunas[coluna] = pd.api.types.union_categoricals(categorias, sort_categories=True, ignore_order=True)
+        else:
+            colunas[coluna] = np.concatenate([parte[coluna].to_numpy() for parte in partes])
+    return compactar_tipos(pd.DataFrame(colunas))
+
+
+def compactar_tipos(df):
+    """Converte textos repetidos em categorias (ordenadas) e contagens em inteiros estreitos"""
+    df = df.reset_index(drop=True)
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype('category')
+    for coluna, tipo in TIPOS_INTEIROS.items():
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
+
+
+def assinatura_csv(caminho=ARQUIVO_CSV):
+    """Tamanho e data de modificação do CSV (mudam a cada gravação)"""
+    estado = os.stat(caminho)
+    return {'tamanho': estado.st_size, 'mtime': int(estado.st_mtime)}
+
+
+def versao_dados(blocos, vizinho_mais_proximo=False):
+    """
+    Identificador do conteúdo dos dados: o mesmo em qualquer processo que tenha
+    processado o mesmo CSV com a mesma camada de bairros.
+    """
+    partes = [bloco['hash'] for bloco in blocos] + [versao_camada('bairros') or '', str(vizinho_mais_proximo)]
+    return _hash('|'.join(partes).encode())
+
+
+def gravar_artefato(df, blocos, assinatura, caminho_saida=ARQUIVO_ARTEFATO, vizinho_mais_proximo=False):
+    """Grava o DataFrame compactado no artefato colunar, com os blocos do CSV de onde veio"""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = {
+        'csv': assinatura,
+        'blocos': blocos,
+        'versao_bairros': versao_camada('bairros'),
+        'vizinho_mais_proximo': vizinho_mais_proximo,
+        'linhas': len(df),
+        'data_build': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    tabela = tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}), CHAVE_METADADOS: json.dumps(metadados).encode(),
+    })
+
+    os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
+    temporario = f"{caminho_saida}.tmp-{os.getpid()}"
+    # Sem compressão para que o arquivo possa ser mapeado em memória diretamente; a troca
+    # é atômica e processos com o arquivo anterior mapeado continuam lendo a versão antiga
+    with pa.OSFile(temporario, 'wb') as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    os.replace(temporario, caminho_saida)
+
+
+def construir_artefato(caminho_csv=ARQUIVO_CSV, caminho_saida=ARQUIVO_ARTEFATO, gdf_bairros=None,
+                       vizinho_mais_proximo=False):
+    """Roda o processamento completo e grava o artefato colunar; retorna o DataFrame gravado"""
+    if gdf_bairros is None:
+        from fronteiras import carregar_camada
+        gdf_bairros = carregar_camada('bairros')
+
+    assinatura = assinatura_csv(caminho_csv)
+    df, blocos = preparar_blocos(caminho_csv, blocos_csv(caminho_csv), gdf_bairros, vizinho_mais_proximo)
+    df = compactar_tipos(df)
+    gravar_artefato(df, blocos, assinatura, caminho_saida, vizinho_mais_proximo)
+    return df
+
+
+def ler_metadados_artefato(caminho=ARQUIVO_ARTEFATO):
+    """Metadados gravados pelo build (None se o artefato não existir)"""
+    if not os.path.exists(caminho):
+        return None
+    with pa.memory_map(caminho) as origem:
+        esquema = pa.ipc.open_file(origem).schema
+    return json.loads((esquema.metadata or {}).get(CHAVE_METADADOS, b'{}'))
+
+
+def artefato_atualizado(caminho=ARQUIVO_ARTEFATO, caminho_csv=ARQUIVO_CSV, vizinho_mais_proximo=False):
+    """O artefato existe e foi gerado a partir do CSV e da camada de bairros atuais?"""
+    metadados = ler_metadados_artefato(caminho)
+    if not metadados:
+        return False
+    return (metadados.get('csv') == assinatura_csv(caminho_csv)
+            and metadados.get('versao_bairros') == versao_camada('bairros')
+            and metadados.get('vizinho_mais_proximo') == vizinho_mais_proximo)
+
+
+def artefato_compativel(caminho=ARQUIVO_ARTEFATO, vizinho_mais_proximo=False):
+    """
+    O artefato foi gerado com a camada de bairros atual e guarda os blocos do CSV?
+    Nesse caso ele serve de ponto de partida mesmo que o CSV tenha mudado depois:
+    só os blocos alterados são reprocessados (ver atualizacao.py).
+    """
+    metadados = ler_metadados_artefato(caminho)
+    return bool(metadados) and 'blocos' in metadados \
+        and metadados.get('versao_bairros') == versao_camada('bairros') \
+        and metadados.get('vizinho_mais_proximo') == vizinho_mais_proximo
+
+
+def mapear_artefato(caminho=ARQUIVO_ARTEFATO):
+    """Tabela Arrow do artefato mapeada em memória, sem ler nem copiar as colunas"""
+    return pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+
+
+def tabela_para_pandas(tabela):
+    """DataFrame de uma tabela do artefato; colunas numéricas sem nulos não são copiadas"""
+    return tabela.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def abrir_artefato(caminho=ARQUIVO_ARTEFATO):
+    """Abre o artefato mapeado em memória; colunas numéricas sem nulos não são copiadas"""
+    return tabela_para_pandas(mapear_artefato(caminho))
+
+
+def memoria_dataframe(df):
+    """Bytes ocupados pelas colunas do DataFrame (textos contados por completo)"""
+    return int(np.sum(df.memory_usage(index=True, deep=True)))
@@ -0,0 +1,288 @@
+"""
+Superfície contínua de densidade de votos, alternativa à mancha por bairro.
+
+A mancha por bairro depende do tamanho de cada polígono: um foco de sinergia
+dividido entre dois bairros se dilui, e locais que o `sjoin` não atribuiu a
+nenhum bairro somem do mapa. Aqui os votos de cada candidato são espalhados por
+um núcleo gaussiano (largura de banda configurável) sobre uma grade fixa de
+pixels que cobre o município, e a sinergia e a força conjunta são calculadas
+pixel a pixel a partir das duas superfícies, como na mancha por bairro (ver
+indicadores.py).
+
+A convolução é separável (o núcleo 2D é o produto de dois núcleos 1D,
+truncados em `DESVIOS_NUCLEO` desvios) e cada eixo é convoluído por FFT. Como a
+densidade é linear nos votos, a superfície de uma sessão é atualizada pela
+diferença entre a máscara de locais anterior e a nova: só os locais que
+entraram ou saíram são rasterizados (com sinal) e convoluídos, dentro da caixa
+que os contém mais o raio do núcleo, e o resultado é somado à superfície. Ao
+trocar de zona só a região das duas zonas é refeita, sem voltar à grade toda.
+
+Cada superfície pintada vira um PNG RGBA recortado à área com valor, guardado
+em um cache LRU por (estado de filtro, superfície, banda) compartilhado entre
+sessões e exibido no mapa como um `BitmapLayer`.
+"""
+import base64
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+from filtros import CacheLRU
+from grade import METROS_POR_GRAU_LATITUDE, METROS_POR_GRAU_LONGITUDE
+from metricas import metricas_par
+
+TAMANHO_PIXEL = 100  # metros, lado de cada pixel da grade
+BANDAS = (250, 500, 1000, 2000)  # metros, desvio padrão do núcleo gaussiano
+BANDA_PADRAO = 500
+DESVIOS_NUCLEO = 3  # o núcleo é truncado em ±3 desvios
+# Abaixo dessa fração do total máximo o pixel fica transparente na sinergia e na força conjunta:
+# a razão entre duas caudas de núcleo quase nulas é ruído
+LIMIAR_SINERGIA = 0.02
+SINERGIA = 'Sinergia'
+FORCA_CONJUNTA = 'Forca_Conjunta'
+CAPACIDADE_RASTERS = 64  # PNGs de ~dezenas de KB cada
+
+
+def nucleo_gaussiano(banda, tamanho_pixel=TAMANHO_PIXEL, desvios=DESVIOS_NUCLEO):
+    """Núcleo 1D normalizado (soma 1), com um valor por pixel até `desvios` desvios do centro"""
+    sigma = banda / tamanho_pixel
+    raio = max(1, int(np.ceil(desvios * sigma)))
+    x = np.arange(-raio, raio + 1)
+    nucleo = np.exp(-0.5 * (x / sigma) ** 2)
+    return nucleo / nucleo.sum()
+
+
+def _tamanho_fft(n):
+    """Menor tamanho ≥ n da forma 2^a·3^b·5^c, em que a FFT é mais rápida"""
+    melhor = 1 << (n - 1).bit_length()
+    potencia5 = 1
+    while potencia5 < melhor:
+        potencia35 = potencia5
+        while potencia35 < melhor:
+            tamanho = potencia35 << max(0, (n - 1) // potencia35).bit_length()
+            melhor = min(melhor, tamanho)
+            potencia35 *= 3
+        potencia5 *= 5
+    return melhor
+
+
+def _convoluir_eixo(grades, nucleo, eixo):
+    """Convolução linear (sem dar a volta) ao longo de `eixo`, do mesmo tamanho da entrada"""
+    n, raio = grades.shape[eixo], len(nucleo) // 2
+    tamanho = _tamanho_fft(n + len(nucleo) - 1)
+    espectro = np.fft.rfft(grades, tamanho, axis=eixo)
+    formato = [1] * grades.ndim
+    formato[eixo] = -1
+    espectro *= np.fft.rfft(nucleo, tamanho).reshape(formato)
+    return np.take(np.fft.irfft(espectro, tamanho, axis=eixo), np.arange(raio, raio + n), axis=eixo)
+
+
+def convoluir(grades, nucleo):
+    """Convolução separável das grades (..., linhas, colunas) pelo núcleo 2D `nucleo ⊗ nucleo`"""
+    return _convoluir_eixo(_convoluir_eixo(grades, nucleo, -1), nucleo, -2)
+
+
+def codificar_png(rgba):
+    """PNG RGBA de 8 bits (sem filtro por linha) a partir de uma matriz (linhas, colunas, 4) uint8"""
+    altura, largura = rgba.shape[:2]
+    linhas = np.concatenate([np.zeros((altura, 1), dtype=np.uint8), rgba.reshape(altura, -1)], axis=1)
+
+    def bloco(tipo, dados):
+        return struct.pack('>I', len(dados)) + tipo + dados + struct.pack('>I', zlib.crc32(tipo + dados))
+
+    return (b'\x89PNG\r\n\x1a\n' + bloco(b'IHDR', struct.pack('>IIBBBBB', largura, altura, 8, 6, 0, 0, 0))
+            + bloco(b'IDAT', zlib.compress(linhas.tobytes(), 6)) + bloco(b'IEND', b''))
+
+
+@dataclass(frozen=True)
+class RasterDensidade:
+    """Superfície pintada: PNG, limites [oeste, sul, leste, norte] e o valor máximo da escala"""
+    png: bytes
+    limites: tuple
+    maximo: float
+
+    @property
+    def imagem(self):
+        """PNG como data URI, para o `image` do BitmapLayer"""
+        return 'data:image/png;base64,' + base64.b64encode(self.png).decode('ascii')
+
+
+class GradeDensidade:
+    """
+    Pixel de cada local na grade sobre os limites do município e os votos por local
+    (`pesos`, uma coluna por candidato; a sinergia usa as duas primeiras).
+    Compartilhada entre sessões; não deve ser modificada.
+    """
+
+    def __init__(self, limites, lat, lon, pesos, banda=BANDA_PADRAO, tamanho_pixel=TAMANHO_PIXEL):
+        oeste, sul, leste, norte = limites
+        self.banda = banda
+        self.tamanho_pixel = tamanho_pixel
+        self.nucleo = nucleo_gaussiano(banda, tamanho_pixel)
+        self.raio = len(self.nucleo) // 2
+        self.colunas = list(pesos.columns)
+        self.pesos = pesos.to_numpy(dtype=float)
+
+        # Pixels quadrados de `tamanho_pixel` metros na projeção equiretangular local (linha 0 ao norte)
+        cosseno = float(np.cos(np.radians((sul + norte) / 2)))
+        self.graus_lon = tamanho_pixel / (METROS_POR_GRAU_LONGITUDE * cosseno)
+        self.graus_lat = tamanho_pixel / METROS_POR_GRAU_LATITUDE
+        self.n_colunas = max(1, int(np.ceil((leste - oeste) / self.graus_lon)))
+        self.n_linhas = max(1, int(np.ceil((norte - sul) / self.graus_lat)))
+        self.oeste, self.norte = oeste, norte
+
+        coluna = np.floor((np.asarray(lon, dtype=float) - oeste) / self.graus_lon).astype(np.int64)
+        linha = np.floor((norte - np.asarray(lat, dtype=float)) / self.graus_lat).astype(np.int64)
+        self.dentro = (coluna >= 0) & (coluna < self.n_colunas) & (linha >= 0) & (linha < self.n_linhas)
+        self.pixel = np.where(self.dentro, linha * self.n_colunas + coluna, -1)
+
+    @property
+    def formato(self):
+        return self.n_linhas, self.n_colunas
+
+    def limites_pixels(self, linhas, colunas):
+        """[oeste, sul, leste, norte] do retângulo de pixels `linhas` × `colunas` (slices)"""
+        return (float(self.oeste + colunas.start * self.graus_lon), float(self.norte - linhas.stop * self.graus_lat),
+                float(self.oeste + colunas.stop * self.graus_lon), float(self.norte - linhas.start * self.graus_lat))
+
+    def janela(self, locais):
+        """
+        Caixa de pixels (slice das linhas, slice das colunas) que contém os locais mais o
+        raio do núcleo, ou None se nenhum deles cai na grade.
+        """
+        locais = locais[self.dentro[locais]]
+        if not len(locais):
+            return None
+        linhas, colunas = np.divmod(self.pixel[locais], self.n_colunas)
+        return (slice(max(0, linhas.min() - self.raio), min(self.n_linhas, linhas.max() + self.raio + 1)),
+                slice(max(0, colunas.min() - self.raio), min(self.n_colunas, colunas.max() + self.raio + 1)))
+
+    def densidade(self, locais, sinal=1):
+        """
+        Superfícies (candidatos, linhas, colunas) dos locais dados, em votos por pixel
+        vezes `sinal`. Só a janela dos locais é convoluída; devolve (superfícies da
+        janela, janela), ou None se nenhum local cai na grade.
+        """
+        janela = self.janela(locais)
+        if janela is None:
+            return None
+        locais = locais[self.dentro[locais]]
+        linhas, colunas = np.divmod(self.pixel[locais], self.n_colunas)
+        altura, largura = (fatia.stop - fatia.start for fatia in janela)
+        pixel = (linhas - janela[0].start) * largura + (colunas - janela[1].start)
+        grades = np.stack([np.bincount(pixel, weights=sinal * self.pesos[locais, j], minlength=altura * largura)
+                           .reshape(altura, largura) for j in range(len(self.colunas))])
+        return convoluir(grades, self.nucleo), janela
+
+
+def _area(janela):
+    return 0 if janela is None else (janela[0].stop - janela[0].start) * (janela[1].stop - janela[1].start)
+
+
+class SuperficiesDensidade:
+    """Superfícies de densidade de cada candidato para a máscara de locais atual de uma sessão"""
+
+    def __init__(self, grade):
+        self.grade = grade
+        self.mascara = np.zeros(len(grade.pesos), dtype=bool)
+        self.superficies = np.zeros((len(grade.colunas), *grade.formato))
+
+    def atualizar(self, mascara):
+        """
+        Passa para a nova máscara de locais somando os núcleos dos que entraram e
+        subtraindo os dos que saíram, cada grupo na sua janela. Quando a janela dos
+        locais da nova máscara é menor que as duas juntas (de uma zona para outra,
+        por exemplo), a superfície é refeita só com eles. Retorna o número de locais
+        alterados.
+        """
+        mascara = np.asarray(mascara, dtype=bool)
+        entraram = np.flatnonzero(mascara & ~self.mascara)
+        sairam = np.flatnonzero(self.mascara & ~mascara)
+        selecionados = np.flatnonzero(mascara)
+        grade = self.grade
+        if _area(grade.janela(selecionados)) < _area(grade.janela(entraram)) + _area(grade.janela(sairam)):
+            # Refazer do zero também descarta o resíduo de arredondamento das somas e subtrações
+            self.superficies[:] = 0
+            grupos = ((selecionados, 1),)
+        else:
+            grupos = ((entraram, 1), (sairam, -1))
+        for locais, sinal in grupos:
+            resultado = grade.densidade(locais, sinal)
+            if resultado is not None:
+                delta, (linhas, colunas) = resultado
+                self.superficies[:, linhas, colunas] += delta
+        self.mascara = mascara.copy()
+        return len(entraram) + len(sairam)
+
+    def superficie(self, nome):
+        """
+        Superfície pedida: os votos por pixel de um candidato, a Sinergia ou a
+        Forca_Conjunta (NaN onde o total dos candidatos é desprezível).
+        """
+        if nome in self.grade.colunas:
+            return np.clip(self.superficies[self.grade.colunas.index(nome)], 0, None)
+        if nome not in (SINERGIA, FORCA_CONJUNTA):
+            raise KeyError(nome)
+        par = metricas_par(*np.clip(self.superficies, 0, None)[:2])
+        valores = par.sinergia if nome == SINERGIA else par.forca_conjunta
+        valores[par.total < LIMIAR_SINERGIA * (par.total.max() or 1)] = np.nan
+        return valores
+
+
+def pintar(superficie, rgb, alfa_maximo=220):
+    """
+    Matriz RGBA (linhas, colunas, 4) da superfície: a cor base com alfa proporcional
+    ao valor / máximo; zero e NaN ficam transparentes. Retorna (rgba, máximo).
+    """
+    valores = np.nan_to_num(superficie, nan=0.0)
+    maximo = float(valores.max()) if valores.size else 0.0
+    rgba = np.zeros((*valores.shape, 4), dtype=np.uint8)
+    rgba[..., :3] = rgb
+    rgba[..., 3] = (valores / (maximo or 1) * alfa_maximo).astype(np.uint8)
+    return rgba, maximo
+
+
+def recortar(rgba):
+    """Slices (linhas, colunas) do menor retângulo com algum pixel visível (None se nenhum)"""
+    visiveis = rgba[..., 3] > 0
+    linhas, colunas = np.flatnonzero(visiveis.any(axis=1)), np.flatnonzero(visiveis.any(axis=0))
+    if not len(linhas):
+        return None
+    return slice(linhas[0], linhas[-1] + 1), slice(colunas[0], colunas[-1] + 1)
+
+
+class DensidadeMemoizada:
+    """
+    Grades por largura de banda e superfícies já pintadas por (estado de filtro,
+    superfície, banda, cor), em um cache LRU compartilhado entre sessões.
+    """
+
+    def __init__(self, limites, lat, lon, pesos, capacidade=CAPACIDADE_RASTERS):
+        self.limites = limites
+        self._locais = (lat, lon, pesos)
+        self._grades = {}
+        self._trava = threading.Lock()
+        self.cache = CacheLRU(capacidade)
+
+    def grade(self, banda=BANDA_PADRAO):
+        with self._trava:
+            if banda not in self._grades:
+                self._grades[banda] = GradeDensidade(self.limites, *self._locais, banda=banda)
+            return self._grades[banda]
+
+    def raster(self, chave_filtro, nome, banda, rgb, superficies, mascara):
+        """
+        PNG da superfície `nome` em cache; na primeira vez as superfícies da sessão
+        (`SuperficiesDensidade` da grade desta banda) passam para `mascara` e são pintadas.
+        Retorna None quando nenhum pixel tem valor.
+        """
+        def construir():
+            superficies.atualizar(mascara)
+            rgba, maximo = pintar(superficies.superficie(nome), rgb)
+            janela = recortar(rgba)
+            if janela is None:
+                return None
+            return RasterDensidade(codificar_png(rgba[janela]), superficies.grade.limites_pixels(*janela), maximo)
+        return self.cache.obter((chave_filtro, nome, banda, tuple(rgb)), construir)
@@ -0,0 +1,156 @@
+"""
+Cores, raios e tooltips das camadas do mapa calculados de forma vetorizada.
+
+Substitui os `apply` linha a linha (get_color, get_mancha_color_sinergia e os
+lambdas de tooltip) por operações sobre colunas inteiras: os canais RGBA saem
+de uma matriz numpy, as classes da mancha de sinergia são obtidas com uma
+busca binária nas quebras e os tooltips são montados concatenando colunas de
+texto. Os valores produzidos são idênticos aos da implementação linha a linha,
+inclusive o truncamento de `int()` no canal alfa e a formatação `:.1%`.
+"""
+import numpy as np
+import pandas as pd
+
+from metricas import diferenca_relativa
+
+MODOS_COR = ("Sinergia (Relativa %)", "Sinergia (Absoluta)", "Magnitude da Vitória", "Volume de Votos (Ponderado)")
+RGB_EMPATE = [128, 128, 128]
+RGB_VOLUME = [0, 0, 255]
+
+# Mancha de sinergia: cor fora da escala e alfas por classe (até p25, p50, p75, p90, p95, p99, acima)
+RGBA_SEM_VALOR = [200, 200, 200, 5]
+RGB_SINERGIA = [30, 144, 255]
+ALFAS_SINERGIA = np.array([10, 25, 50, 100, 160, 200, 255])
+
+
+def _rgba(rgb, alfa):
+    """Matriz (n, 4) de inteiros a partir de uma cor base (3,) ou (n, 3) e do canal alfa"""
+    alfa = np.asarray(alfa, dtype=np.int64)
+    cores = np.empty((len(alfa), 4), dtype=np.int64)
+    cores[:, :3] = rgb
+    cores[:, 3] = alfa
+    return cores
+
+
+def _texto(serie):
+    return pd.Series(serie, copy=False).astype(str).astype(object).reset_index(drop=True)
+
+
+def _inteiro(valores):
+    """Mesmo texto de `int(x)` para cada valor"""
+    return _texto(np.asarray(valores).astype(np.int64))
+
+
+def _percentual(valores):
+    """Mesmo texto de `f"{x:.1%}"` para cada valor"""
+    textos = np.char.mod('%.1f%%', np.asarray(valores, dtype=float) * 100)
+    return pd.Series(textos, dtype=object)
+
+
+def _maximo_ou_um(valores):
+    maximo = np.max(valores) if len(valores) else 0
+    return maximo or 1
+
+
+def estilizar_pontos_candidato(nomes, votos, rgb):
+    """
+    Pontos de um único candidato: alfa e raio proporcionais aos votos.
+    Retorna (cores (n, 4), raios, tooltips).
+    """
+    votos = np.asarray(votos)
+    maximo = _maximo_ou_um(votos)
+    cores = _rgba(rgb, (50 + (votos / maximo) * 205).astype(np.int64))
+    raios = 100 + (votos / maximo * 400)
+    tooltips = "<b>" + _texto(nomes) + "</b><br>Votos: " + _texto(votos)
+    return cores, raios, tooltips
+
+
+def cores_pontos_comparativo(diferenca, total, modo, rgb_a, rgb_b):
+    """
+    Cor de cada ponto na comparação entre dois candidatos: a cor base indica o
+    vencedor (cinza no empate) e o alfa depende do modo de "Colorir pontos por".
+    """
+    diferenca = np.asarray(diferenca)
+    total = np.asarray(total)
+    max_abs_diff = _maximo_ou_um(np.abs(diferenca))
+    max_total_votos = _maximo_ou_um(total)
+
+    # 0 = empate, 1 = candidato A à frente, 2 = candidato B à frente
+    paleta = np.array([RGB_EMPATE, rgb_a, rgb_b])
+    base = paleta[np.sign(diferenca).astype(np.int64) % 3]
+
+    if modo == "Sinergia (Relativa %)":
+        alfa = 100 + (1 - diferenca_relativa(diferenca, total)) * 155
+    elif modo == "Sinergia (Absoluta)":
+        alfa = 100 + (1 - (np.abs(diferenca) / max_abs_diff)) * 155
+    elif modo == "Magnitude da Vitória":
+        alfa = 100 + (np.abs(diferenca) / max_abs_diff) * 155
+    elif modo == "Volume de Votos (Ponderado)":
+        base = RGB_VOLUME
+        alfa = 50 + (total / max_total_votos) * 205
+    else:
+        alfa = np.full(len(diferenca), 128)
+    return _rgba(base, np.asarray(alfa).astype(np.int64))
+
+
+def estilizar_pontos_comparativo(nomes, votos_a, votos_b, rotulo_a, rotulo_b, modo, rgb_a, rgb_b):
+    """
+    Pontos da comparação entre dois candidatos.
+    Retorna (cores (n, 4), raios, tooltips).
+    """
+    votos_a, votos_b = np.asarray(votos_a), np.asarray(votos_b)
+    diferenca = votos_a - votos_b
+    total = votos_a + votos_b
+    max_total_votos = _maximo_ou_um(total)
+
+    cores = cores_pontos_comparativo(diferenca, total, modo, rgb_a, rgb_b)
+    raios = 100 + (total / max_total_votos * 400)
+    tooltips = ("<b>" + _texto(nomes) + f"</b><br>{rotulo_a}: " + _texto(votos_a)
+                + f"<br>{rotulo_b}: " + _texto(votos_b)
+                + "<br><b>Diferença: " + _texto(diferenca) + "</b><br>Total: " + _texto(total))
+    return cores, raios, tooltips
+
+
+def estilizar_mancha_candidato(nomes, votos, rgb):
+    """
+    Mancha de um único candidato: alfa proporcional à intensidade (votos / máximo).
+    Retorna (intensidade, cores (n, 4), tooltips).
+    """
+    votos = np.asarray(votos)
+    intensidade = votos / _maximo_ou_um(votos)
+    cores = _rgba(rgb, (50 + intensidade * 205).astype(np.int64))
+    tooltips = ("<b>Bairro: " + _texto(nomes) + "</b><br>Votos: " + _inteiro(votos)
+                + "<br>Força Eleitoral: " + _percentual(intensidade))
+    return intensidade, cores, tooltips
+
+
+def paleta_classes(rgb=RGB_SINERGIA, alfas=ALFAS_SINERGIA):
+    """Cor RGBA de cada classe da mancha, da mais fraca para a mais forte"""
+    return _rgba(rgb, alfas)
+
+
+def cores_mancha_classes(valores, quebras, rgb=RGB_SINERGIA, alfas=ALFAS_SINERGIA):
+    """
+    Classifica cada bairro pelas quebras crescentes (ver classificacao.py) e devolve a
+    cor: cinza quase invisível para valores ≤ 0, a cor base com alfa crescente por classe.
+    """
+    valores = np.asarray(valores, dtype=float)
+    classes = np.searchsorted(np.asarray(quebras, dtype=float), valores, side='left')
+    cores = paleta_classes(rgb, alfas)[classes]
+    cores[valores <= 0] = RGBA_SEM_VALOR
+    return cores
+
+
+def cores_mancha_sinergia(valores, quebras):
+    """Mancha de sinergia: classes p25…p99 (ou outras quebras) em tons de azul"""
+    return cores_mancha_classes(valores, quebras)
+
+
+def tooltips_mancha_sinergia(nomes, votos_a, votos_b, total, sinergia, forca_conjunta, valor, rotulo_a, rotulo_b, rotulo_valor):
+    """Tooltips da mancha de sinergia (um por bairro)"""
+    return ("<b>Bairro: " + _texto(nomes) + f"</b><br>{rotulo_a}: " + _inteiro(votos_a)
+            + f"<br>{rotulo_b}: " + _inteiro(votos_b)
+            + "<br><b>Total: " + _inteiro(total)
+            + "</b><br><b>Sinergia: " + _percentual(sinergia)
+            + "</b><br>Força Conjunta: " + _percentual(forca_conjunta)
+            + f"<br><b>{rotulo_valor}: " + _percentual(valor) + "</b>")
@@ -0,0 +1,143 @@
+"""
+Exportação dos dados do mapa em CSV, JSON, Parquet e GeoJSON.
+
+Os escritores percorrem a tabela em blocos de linhas: cada bloco recebe as
+colunas de contexto (tipo de visualização, candidato, data), é serializado e
+descartado antes do próximo, então a memória usada não cresce com o tamanho da
+exportação. A saída vai para um arquivo temporário que fica em memória até
+`LIMITE_MEMORIA` e passa para o disco acima disso; CSV, JSON e GeoJSON podem
+ser compactados com gzip. A coluna de geometria (objetos shapely) nunca é
+escrita como texto: no GeoJSON as geometrias entram como feições de verdade.
+"""
+import gzip
+import io
+import json
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TAMANHO_BLOCO = 50_000  # linhas por bloco
+LIMITE_MEMORIA = 16 * 1024 * 1024  # bytes mantidos em memória antes de ir para o disco
+COLUNA_GEOMETRIA = 'geometry'
+
+FORMATOS_TABELA = ('CSV', 'JSON', 'Parquet')
+FORMATOS_GEOGRAFICOS = FORMATOS_TABELA + ('GeoJSON',)
+EXTENSOES = {'CSV': 'csv', 'JSON': 'json', 'Parquet': 'parquet', 'GeoJSON': 'geojson'}
+TIPOS_MIME = {
+    'CSV': 'text/csv',
+    'JSON': 'application/json',
+    'Parquet': 'application/vnd.apache.parquet',
+    'GeoJSON': 'application/geo+json',
+}
+
+
+def aceita_gzip(formato):
+    """Parquet já é compactado internamente"""
+    return formato != 'Parquet'
+
+
+def contexto_exportacao(tipo_visualizacao, candidato_selecionado, momento=None):
+    """Colunas constantes acrescentadas a cada linha exportada"""
+    momento = momento or pd.Timestamp.now()
+    return {
+        'Tipo_Visualizacao': tipo_visualizacao,
+        'Candidato': candidato_selecionado if candidato_selecionado != "Visão Geral" else "Ambos",
+        'Data_Exportacao': momento.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def nome_arquivo(prefixo, formato, comprimir=False, momento=None):
+    momento = momento or pd.Timestamp.now()
+    nome = f"{prefixo}_{momento.strftime('%Y%m%d_%H%M%S')}.{EXTENSOES[formato]}"
+    return f"{nome}.gz" if comprimir and aceita_gzip(formato) else nome
+
+
+def tipo_mime(formato, comprimir=False):
+    return 'application/gzip' if comprimir and aceita_gzip(formato) else TIPOS_MIME[formato]
+
+
+def _blocos(df, contexto=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Fatias da tabela (sem a geometria) com as colunas de contexto"""
+    for inicio in range(0, max(len(df), 1), tamanho_bloco):
+        bloco = df.iloc[inicio:inicio + tamanho_bloco].drop(columns=COLUNA_GEOMETRIA, errors='ignore')
+        yield bloco.assign(**contexto) if contexto else bloco
+
+
+def escrever_csv(destino, df, contexto=None, tamanho_bloco=TAMANHO_BLOCO):
+    """CSV em UTF-8 com BOM (abre direto no Excel), escrito bloco a bloco"""
+    texto = io.TextIOWrapper(destino, encoding='utf-8-sig', newline='')
+    for i, bloco in enumerate(_blocos(df, contexto, tamanho_bloco)):
+        bloco.to_csv(texto, header=i == 0, index=False)
+    texto.flush()
+    texto.detach()
+
+
+def escrever_json(destino, df, contexto=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Lista JSON de registros, escrita bloco a bloco"""
+    destino.write(b'[')
+    primeiro = True
+    for bloco in _blocos(df, contexto, tamanho_bloco):
+        registros = bloco.to_json(orient='records', force_ascii=False)[1:-1]
+        if registros:
+            destino.write((registros if primeiro else ',' + registros).encode('utf-8'))
+            primeiro = False
+    destino.write(b']')
+
+
+def escrever_parquet(destino, df, contexto=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Parquet com um row group por bloco"""
+    escritor = None
+    try:
+        for bloco in _blocos(df, contexto, tamanho_bloco):
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabela.schema)
+            escritor.write_table(tabela.cast(escritor.schema))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def escrever_geojson(destino, df, geometrias, contexto=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    FeatureCollection com uma feição por linha. `geometrias` é a lista de
+    geometrias GeoJSON (dicionários) alinhada por posição com as linhas.
+    """
+    if len(geometrias) != len(df):
+        raise ValueError(f"{len(geometrias)} geometrias para {len(df)} linhas")
+    destino.write(b'{"type":"FeatureCollection","features":[')
+    posicao = 0
+    for bloco in _blocos(df, contexto, tamanho_bloco):
+        for registro in json.loads(bloco.to_json(orient='records', force_ascii=False)):
+            feicao = {'type': 'Feature', 'geometry': geometrias[posicao], 'properties': registro}
+            destino.write(((',' if posicao else '') + json.dumps(feicao, ensure_ascii=False)).encode('utf-8'))
+            posicao += 1
+    destino.write(b']}')
+
+
+def exportar(df, formato, contexto=None, comprimir=False, geometrias=None, tamanho_bloco=TAMANHO_BLOCO,
+             limite_memoria=LIMITE_MEMORIA):
+    """
+    Escreve a exportação em um arquivo temporário (em memória até `limite_memoria`,
+    depois em disco) e o devolve posicionado no início.
+    """
+    arquivo = tempfile.SpooledTemporaryFile(max_size=limite_memoria)
+    destino = gzip.GzipFile(fileobj=arquivo, mode='wb') if comprimir and aceita_gzip(formato) else arquivo
+    if formato == 'CSV':
+        escrever_csv(destino, df, contexto, tamanho_bloco)
+    elif formato == 'JSON':
+        escrever_json(destino, df, contexto, tamanho_bloco)
+    elif formato == 'Parquet':
+        escrever_parquet(destino, df, contexto, tamanho_bloco)
+    elif formato == 'GeoJSON':
+        if geometrias is None:
+            raise ValueError("Exportação GeoJSON precisa das geometrias")
+        escrever_geojson(destino, df, geometrias, contexto, tamanho_bloco)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    if destino is not arquivo:
+        destino.close()
+    arquivo.seek(0)
+    return arquivo
@@ -0,0 +1,163 @@
+"""
+Camada de filtros memoizada, compartilhada entre sessões.
+
+Cada combinação (modo de análise, zona, locais selecionados) é resolvida uma
+única vez em uma máscara somente-leitura sobre os locais do cubo de votos; as
+listas de opções dos widgets (zonas e locais disponíveis) também ficam em
+cache. Os caches são LRU com capacidade fixa, então o número de combinações
+guardadas não cresce com a quantidade de usuários.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+CAPACIDADE_PADRAO = 256
+
+
+class CacheLRU:
+    """
+    Cache limitado que descarta o item usado há mais tempo (seguro entre threads).
+    Um valor cuja construção atravessou um `descartar` ou `limpar` é devolvido a quem
+    o pediu, mas não entra no cache: pode ter sido montado com os dados de antes.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+        self._usos = {}  # chave → instante do último uso (time.monotonic), para o despejo entre caches
+        self._trava = threading.Lock()
+        self._geracao = 0  # sobe a cada descartar/limpar
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, construir):
+        """Retorna o valor em cache para a chave, construindo-o na primeira vez"""
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self._usos[chave] = time.monotonic()
+                self.acertos += 1
+                return self._itens[chave]
+            geracao = self._geracao
+        # Constrói fora da trava para não serializar sessões diferentes
+        valor = construir()
+        with self._trava:
+            self.falhas += 1
+            if geracao != self._geracao:
+                return valor
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            self._usos[chave] = time.monotonic()
+            while len(self._itens) > self.capacidade:
+                antiga, _ = self._itens.popitem(last=False)
+                del self._usos[antiga]
+        return valor
+
+    def limpar(self):
+        with self._trava:
+            self._geracao += 1
+            self._itens.clear()
+            self._usos.clear()
+
+    def descartar(self, condicao):
+        """Remove os itens cuja chave satisfaz `condicao`; retorna quantos saíram"""
+        with self._trava:
+            # Construções em andamento não sabem se a chave delas seria descartada: nenhuma entra
+            self._geracao += 1
+            chaves = [chave for chave in self._itens if condicao(chave)]
+            for chave in chaves:
+                del self._itens[chave]
+                del self._usos[chave]
+        return len(chaves)
+
+    def remover(self, chave):
+        """Remove um item (ex.: despejado pelo orçamento de memória); retorna se ele estava no cache"""
+        with self._trava:
+            if chave not in self._itens:
+                return False
+            del self._itens[chave]
+            del self._usos[chave]
+            return True
+
+    def itens(self):
+        """(instante do último uso, chave, valor) de cada item, do usado há mais tempo ao mais recente"""
+        with self._trava:
+            return [(self._usos[chave], chave, valor) for chave, valor in self._itens.items()]
+
+    def __len__(self):
+        return len(self._itens)
+
+
+def _somente_leitura(array):
+    array.setflags(write=False)
+    return array
+
+
+def chave_filtro(candidatos, zona=None, nomes_locais=None):
+    """Chave canônica de um estado de filtro (a ordem dos locais selecionados não importa)"""
+    return (
+        tuple(candidatos) if candidatos is not None else None,
+        zona,
+        tuple(sorted(nomes_locais)) if nomes_locais else (),
+    )
+
+
+class FiltrosMemoizados:
+    """Máscaras e listas de opções do cubo de votos, memoizadas por estado de filtro"""
+
+    def __init__(self, cubo, capacidade=CAPACIDADE_PADRAO):
+        self.cubo = cubo
+        self.opcoes = CacheLRU(capacidade)
+        self.mascaras = CacheLRU(capacidade)
+
+    def zonas(self, candidatos=None):
+        """Zonas com votos dos candidatos do modo (tupla ordenada)"""
+        chave = ('zonas', chave_filtro(candidatos))
+        return self.opcoes.obter(chave, lambda: tuple(self.cubo.zonas(candidatos)))
+
+    def locais(self, candidatos=None, zona=None):
+        """Nomes de local com votos dos candidatos na zona (tupla ordenada)"""
+        chave = ('locais', chave_filtro(candidatos, zona))
+
+        def construir():
+            return tuple(self.cubo.nomes_locais(self.mascara(candidatos, zona), candidatos))
+        return self.opcoes.obter(chave, construir)
+
+    def mascara(self, candidatos=None, zona=None, nomes_locais=None):
+        """Máscara somente-leitura dos locais que passam nos filtros de zona e local"""
+        chave = ('mascara', chave_filtro(candidatos, zona, nomes_locais))
+
+        def construir():
+            return _somente_leitura(self.cubo.mascara(zona=zona, nomes_locais=nomes_locais))
+        return self.mascaras.obter(chave, construir)
+
+    def indices(self, candidatos=None, zona=None, nomes_locais=None):
+        """Posições (somente-leitura) dos locais filtrados que têm votos dos candidatos"""
+        chave = ('indices', chave_filtro(candidatos, zona, nomes_locais))
+
+        def construir():
+            mascara = self.mascara(candidatos, zona, nomes_locais)
+            return _somente_leitura(np.flatnonzero(self.cubo.com_votos(mascara, candidatos)))
+        return self.mascaras.obter(chave, construir)
+
+    def invalidar(self, cubo, alteracao):
+        """
+        Passa a usar o cubo atualizado descartando só os estados de filtro afetados pela
+        `Alteracao` (ver atualizacao.py). As máscaras por zona/local dependem só das
+        posições dos locais: saem todas se os locais mudaram e nenhuma caso contrário.
+        """
+        self.cubo = cubo
+        self.opcoes.descartar(lambda chave: alteracao.afeta(chave[1]))
+        if alteracao.locais_alterados:
+            self.mascaras.limpar()
+        else:
+            self.mascaras.descartar(lambda chave: chave[0] == 'indices' and alteracao.afeta(chave[1]))
+
+    def estatisticas(self):
+        """Contadores de uso dos caches (para diagnóstico)"""
+        return {
+            nome: {'itens': len(cache), 'acertos': cache.acertos, 'falhas': cache.falhas}
+            for nome, cache in (('opcoes', self.opcoes), ('mascaras', self.mascaras))
+        }
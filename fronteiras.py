@@ -0,0 +1,225 @@
+"""
+Armazenamento local e versionado das camadas de limites usadas pelo painel.
+
+As camadas de bairros (ArcGIS da prefeitura do Rio) e dos polígonos dos
+municípios (o arquivo de municípios do estado inteiro) ficam gravados em
+GeoParquet em `dados/fronteiras/`, junto de um manifesto com o hash do conteúdo
+baixado, a data da busca e a versão do formato gravado (`FORMATO_CAMADAS`). Por
+padrão tudo é lido do disco; a rede só é usada quando a atualização é pedida
+explicitamente, quando a camada ainda não existe ou quando a cópia gravada é de
+outro formato. Cada download tem prazo e novas tentativas (com espera crescente)
+e, se a atualização falhar, a última cópia boa gravada continua sendo usada. As
+duas camadas são buscadas em paralelo.
+O geopandas só é importado quando uma camada é de fato lida ou gravada; o
+manifesto (versões das camadas) é consultado sem ele.
+
+Uso pela linha de comando:
+    python fronteiras.py              # mostra o manifesto atual
+    python fronteiras.py --atualizar  # baixa novamente as duas camadas
+    python fronteiras.py --origem bairros=bairros.geojson  # importa de um arquivo local
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+
+# --- CONSTANTES ---
+URL_GEOJSON_ESTADO_RIO = "https://raw.githubusercontent.com/tbrugz/geodata-br/master/geojson/geojs-33-mun.json"
+URL_GEOJSON_BAIRROS_RIO = "https://pgeo3.rio.rj.gov.br/arcgis/rest/services/Cartografia/Limites_administrativos/MapServer/4/query?where=1%3D1&outFields=*&outSR=4326&f=geojson"
+NOME_MUNICIPIO_RIO = 'Rio de Janeiro'
+COLUNA_NOME_MUNICIPIO = 'name'  # nome de cada polígono da camada 'municipio'
+CRS_PADRAO = "EPSG:4326"
+
+DIRETORIO_FRONTEIRAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'fronteiras')
+ARQUIVO_MANIFESTO = 'manifesto.json'
+TEMPO_LIMITE_DOWNLOAD = 30  # segundos por tentativa, do pedido ao fim da leitura
+TENTATIVAS_DOWNLOAD = 3
+ESPERA_ENTRE_TENTATIVAS = 1.0  # segundos; dobra a cada nova tentativa
+TAMANHO_LEITURA = 1024 * 1024  # bytes lidos por vez (o prazo é conferido entre leituras)
+
+CAMADAS = {
+    'bairros': URL_GEOJSON_BAIRROS_RIO,
+    'municipio': URL_GEOJSON_ESTADO_RIO,
+}
+# Versão do que `_preparar_camada` grava em cada camada; sobe a cada mudança, e as cópias de outra
+# versão são baixadas de novo (manifestos sem o campo são da versão 1)
+FORMATO_CAMADAS = {
+    'bairros': 1,
+    'municipio': 2,  # 2: todos os municípios do estado (a versão 1 guardava só o Rio)
+}
+# Camada de divisões internas de cada município que tem uma (os demais ficam só com o contorno)
+SUBMUNICIPAIS = {NOME_MUNICIPIO_RIO: 'bairros'}
+
+logger = logging.getLogger(__name__)
+# O manifesto é relido e regravado por camada: duas camadas gravadas em paralelo não podem se sobrepor
+_trava_manifesto = threading.Lock()
+
+
+def _caminho_camada(camada, diretorio):
+    return os.path.join(diretorio, f"{camada}.parquet")
+
+
+def ler_manifesto(diretorio=DIRETORIO_FRONTEIRAS):
+    """Lê o manifesto das camadas gravadas (dicionário vazio se não existir)"""
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_manifesto(manifesto, diretorio):
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def _ler_com_prazo(url, tempo_limite):
+    prazo = time.monotonic() + tempo_limite
+    with urllib.request.urlopen(url, timeout=tempo_limite) as resposta:
+        partes = []
+        while parte := resposta.read(TAMANHO_LEITURA):
+            partes.append(parte)
+            if time.monotonic() > prazo:
+                raise TimeoutError(f"download de {url} passou de {tempo_limite} s")
+    return b''.join(partes)
+
+
+def _baixar(url, tentativas=TENTATIVAS_DOWNLOAD, tempo_limite=TEMPO_LIMITE_DOWNLOAD):
+    """
+    Baixa o conteúdo bruto de uma URL. Falhas de rede, prazo estourado e respostas 5xx
+    ou 429 são tentadas de novo; os demais erros HTTP sobem na hora.
+    """
+    for tentativa in range(tentativas):
+        try:
+            return _ler_com_prazo(url, tempo_limite)
+        except urllib.error.HTTPError as erro:
+            if (erro.code < 500 and erro.code != 429) or tentativa == tentativas - 1:
+                raise
+        except OSError:
+            if tentativa == tentativas - 1:
+                raise
+        time.sleep(ESPERA_ENTRE_TENTATIVAS * 2 ** tentativa)
+
+
+def _preparar_camada(camada, conteudo):
+    """Converte o GeoJSON baixado no GeoDataFrame que será gravado"""
+    import geopandas as gpd
+
+    gdf = gpd.read_file(BytesIO(conteudo))
+    if gdf.crs is None:
+        gdf = gdf.set_crs(CRS_PADRAO)
+    # A camada 'municipio' guarda os 92 polígonos do estado; o painel recorta o município aberto
+    return gdf.to_crs(CRS_PADRAO)
+
+
+def atualizar_camada(camada, diretorio=DIRETORIO_FRONTEIRAS, conteudo=None):
+    """
+    Baixa (ou recebe em `conteudo`) uma camada, grava em GeoParquet e registra
+    o hash SHA-256 do conteúdo original e a data da busca no manifesto.
+    """
+    if camada not in CAMADAS:
+        raise ValueError(f"Camada desconhecida: {camada}")
+    if conteudo is None:
+        conteudo = _baixar(CAMADAS[camada])
+
+    gdf = _preparar_camada(camada, conteudo)
+    if gdf.empty:
+        raise ValueError(f"A camada '{camada}' baixada não contém feições utilizáveis")
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _caminho_camada(camada, diretorio)
+    temporario = f"{caminho}.tmp"
+    gdf.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho)
+
+    with _trava_manifesto:
+        manifesto = ler_manifesto(diretorio)
+        manifesto[camada] = {
+            'arquivo': os.path.basename(caminho),
+            'origem': CAMADAS[camada],
+            'sha256': hashlib.sha256(conteudo).hexdigest(),
+            'data_busca': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'feicoes': int(len(gdf)),
+            'formato': FORMATO_CAMADAS[camada],
+        }
+        _gravar_manifesto(manifesto, diretorio)
+    return gdf
+
+
+def _formato(registro):
+    return registro.get('formato', 1)
+
+
+def carregar_camada(camada, atualizar=False, diretorio=DIRETORIO_FRONTEIRAS):
+    """
+    Carrega uma camada do disco, baixando-a apenas se pedido, se ainda não existir ou
+    se foi gravada em outro formato. Se a atualização falhar, segue com a última cópia
+    boa gravada.
+    """
+    caminho = _caminho_camada(camada, diretorio)
+    registro = ler_manifesto(diretorio).get(camada)
+    existe = registro is not None and os.path.exists(caminho)
+    if atualizar or not existe or _formato(registro) != FORMATO_CAMADAS.get(camada):
+        try:
+            return atualizar_camada(camada, diretorio)
+        except (OSError, ValueError, RuntimeError) as erro:
+            if not existe:
+                raise
+            logger.warning("Falha ao atualizar a camada '%s' (%s); usando a cópia local de %s",
+                           camada, erro, registro.get('data_busca'))
+    import geopandas as gpd
+
+    return gpd.read_parquet(caminho)
+
+
+def carregar_fronteiras(atualizar=False, diretorio=DIRETORIO_FRONTEIRAS):
+    """
+    Retorna (gdf_municipio, gdf_bairros) a partir do armazenamento local.
+    Com `atualizar=True` as duas camadas são baixadas novamente, em paralelo.
+    """
+    with ThreadPoolExecutor(2) as executor:
+        municipio = executor.submit(carregar_camada, 'municipio', atualizar, diretorio)
+        bairros = executor.submit(carregar_camada, 'bairros', atualizar, diretorio)
+        return municipio.result(), bairros.result()
+
+
+def versao_camada(camada, diretorio=DIRETORIO_FRONTEIRAS):
+    """Hash do conteúdo e formato da camada gravada (None se ainda não houver)"""
+    registro = ler_manifesto(diretorio).get(camada)
+    if registro is None or 'sha256' not in registro:
+        return None
+    return f"{registro['sha256']}-f{_formato(registro)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerencia o cache local das camadas de limites.")
+    parser.add_argument('--atualizar', action='store_true', help="Baixa novamente todas as camadas")
+    parser.add_argument('--origem', action='append', default=[], metavar='CAMADA=ARQUIVO',
+                        help="Importa uma camada de um arquivo GeoJSON local em vez da rede")
+    parser.add_argument('--diretorio', default=DIRETORIO_FRONTEIRAS, help="Diretório do cache")
+    args = parser.parse_args()
+
+    for origem in args.origem:
+        camada, _, arquivo = origem.partition('=')
+        with open(arquivo, 'rb') as f:
+            atualizar_camada(camada, args.diretorio, conteudo=f.read())
+    if args.atualizar:
+        with ThreadPoolExecutor(len(CAMADAS)) as executor:
+            for futuro in [executor.submit(atualizar_camada, camada, args.diretorio) for camada in CAMADAS]:
+                futuro.result()
+    print(json.dumps(ler_manifesto(args.diretorio), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""
+Geometrias dos limites preparadas uma única vez para as camadas GeoJSON do mapa.
+
+Passar um GeoDataFrame para o `GeoJsonLayer` faz o pydeck converter todos os
+polígonos (via `__geo_interface__`) a cada rerun, vértice por vértice, mesmo
+quando só as cores mudaram. Aqui cada camada é simplificada em alguns níveis de
+tolerância, preservando a topologia (bairros vizinhos continuam compartilhando
+a mesma fronteira quando `shapely.coverage_simplify` está disponível), e as
+geometrias já convertidas para dicionários GeoJSON ficam em cache. A cada rerun
+só os atributos de cada feição (cor, tooltip) são anexados.
+
+O build (`construir_dados.py`) grava essas geometrias já serializadas em
+`dados/geometrias/<camada>.arrow`, junto dos atributos da camada e do hash da
+versão de origem. Com esse arquivo atualizado o app abre as camadas sem
+importar geopandas nem shapely; só a preparação a partir do GeoDataFrame
+(caminho de build) usa o shapely, importado dentro das funções.
+
+A camada 'municipio' tem os polígonos de todos os municípios do estado; o mapa
+de um município só decodifica o polígono dele (as feições são recortadas na
+tabela Arrow, antes do JSON) e a camada de divisões internas, se o município
+tiver uma (ver `SUBMUNICIPAIS` em fronteiras.py).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from busca import normalizar
+from cache_compartilhado import trava
+from fronteiras import COLUNA_NOME_MUNICIPIO, SUBMUNICIPAIS, carregar_camada, versao_camada
+
+# Tolerância em graus (EPSG:4326); 0.0001° ≈ 11 m no Rio de Janeiro
+TOLERANCIAS = {
+    'completa': 0.0,
+    'media': 0.00005,
+    'baixa': 0.0002,
+}
+NIVEL_PADRAO = 'media'
+NIVEL_COMPLETO = 'completa'  # sem simplificação, usado nas exportações
+# Casas decimais das coordenadas simplificadas (6 casas ≈ 0,1 m)
+CASAS_DECIMAIS = 6
+
+DIRETORIO_GEOMETRIAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'geometrias')
+CHAVE_METADADOS = b'geometrias'
+PREFIXO_COLUNA = 'geojson_'
+# Camadas de limites usadas pelo mapa e a coluna com o nome de cada feição
+CAMADAS_GEOMETRIAS = {'municipio': COLUNA_NOME_MUNICIPIO, 'bairros': 'nome'}
+
+
+def simplificar(geometrias, tolerancia):
+    """
+    Simplifica preservando a topologia; com `coverage_simplify` (GEOS ≥ 3.12) as
+    fronteiras compartilhadas entre polígonos vizinhos são simplificadas juntas.
+    """
+    import shapely
+
+    if tolerancia <= 0:
+        return geometrias
+    if hasattr(shapely, 'coverage_simplify'):
+        try:
+            return shapely.coverage_simplify(geometrias, tolerancia)
+        except (shapely.errors.GEOSException, NotImplementedError):
+            pass
+    return shapely.simplify(geometrias, tolerancia, preserve_topology=True)
+
+
+def _arredondar(geometrias, casas=CASAS_DECIMAIS):
+    import shapely
+
+    return shapely.transform(geometrias, lambda coordenadas: np.round(coordenadas, casas))
+
+
+def _para_geojson(geometrias):
+    import shapely
+
+    return [json.loads(texto) if texto is not None else None for texto in shapely.to_geojson(geometrias)]
+
+
+class GeometriasSimplificadas:
+    """Geometrias de uma camada em vários níveis de simplificação, já no formato GeoJSON"""
+
+    def __init__(self, gdf, coluna_nome=None, tolerancias=TOLERANCIAS):
+        import shapely
+
+        self.coluna_nome = coluna_nome
+        self.atributos = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+        geometrias = gdf.to_crs("EPSG:4326").geometry.to_numpy()
+        self.feicoes = {}
+        self.vertices = {}
+        for nivel, tolerancia in tolerancias.items():
+            simplificadas = simplificar(geometrias, tolerancia)
+            if tolerancia > 0:
+                simplificadas = _arredondar(simplificadas)
+            self.feicoes[nivel] = _para_geojson(simplificadas)
+            self.vertices[nivel] = int(shapely.get_num_coordinates(simplificadas).sum())
+
+    @classmethod
+    def abrir(cls, caminho, selecao=None):
+        """
+        Lê as geometrias gravadas por `gravar` (sem geopandas nem shapely). `selecao`
+        recebe os atributos e devolve a máscara das feições a ler; as demais nem são
+        decodificadas.
+        """
+        tabela = pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+        metadados = json.loads(tabela.schema.metadata[CHAVE_METADADOS])
+        colunas_geometria = [PREFIXO_COLUNA + nivel for nivel in metadados['niveis']]
+        atributos = tabela.drop_columns(colunas_geometria).to_pandas()
+        if selecao is not None:
+            mascara = np.asarray(selecao(atributos), dtype=bool)
+            tabela = tabela.filter(pa.array(mascara))
+            atributos = atributos[mascara].reset_index(drop=True)
+        geometrias = cls.__new__(cls)
+        geometrias.coluna_nome = metadados['coluna_nome']
+        geometrias.vertices = metadados['vertices'] if selecao is None else {}
+        geometrias.feicoes = {
+            nivel: [json.loads(texto) if texto is not None else None
+                    for texto in tabela.column(PREFIXO_COLUNA + nivel).to_pylist()]
+            for nivel in metadados['niveis']
+        }
+        geometrias.atributos = atributos
+        return geometrias
+
+    @classmethod
+    def vazia(cls, coluna_nome=None, niveis=tuple(TOLERANCIAS)):
+        """Camada sem feições (município sem divisões internas), com as mesmas colunas e níveis"""
+        geometrias = cls.__new__(cls)
+        geometrias.coluna_nome = coluna_nome
+        geometrias.vertices = {nivel: 0 for nivel in niveis}
+        geometrias.feicoes = {nivel: [] for nivel in niveis}
+        geometrias.atributos = pd.DataFrame({coluna_nome: pd.Series(dtype=object)} if coluna_nome else {})
+        return geometrias
+
+    def recortar(self, mascara):
+        """Só as feições da máscara (alinhada por posição com os atributos)"""
+        mascara = np.asarray(mascara, dtype=bool)
+        geometrias = type(self).__new__(type(self))
+        geometrias.coluna_nome = self.coluna_nome
+        geometrias.vertices = {}
+        geometrias.feicoes = {nivel: [g for g, manter in zip(feicoes, mascara) if manter]
+                              for nivel, feicoes in self.feicoes.items()}
+        geometrias.atributos = self.atributos[mascara].reset_index(drop=True)
+        return geometrias
+
+    def gravar(self, caminho, versao=None):
+        """Grava atributos e geometrias GeoJSON (uma coluna de texto por nível) em Arrow IPC"""
+        colunas = {
+            PREFIXO_COLUNA + nivel: pa.array([json.dumps(g) if g is not None else None for g in geometrias], pa.string())
+            for nivel, geometrias in self.feicoes.items()
+        }
+        tabela = pa.Table.from_pandas(self.atributos, preserve_index=False)
+        for nome, coluna in colunas.items():
+            tabela = tabela.append_column(nome, coluna)
+        metadados = {'versao': versao, 'coluna_nome': self.coluna_nome, 'niveis': list(self.feicoes),
+                     'vertices': self.vertices}
+        tabela = tabela.replace_schema_metadata({
+            **(tabela.schema.metadata or {}), CHAVE_METADADOS: json.dumps(metadados).encode(),
+        })
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with pa.OSFile(temporario, 'wb') as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        os.replace(temporario, caminho)
+
+    @property
+    def nomes(self):
+        return self.atributos[self.coluna_nome].to_numpy() if self.coluna_nome else None
+
+    def __len__(self):
+        return len(next(iter(self.feicoes.values())))
+
+    @property
+    def niveis(self):
+        return tuple(self.feicoes)
+
+    def registros(self, nivel=NIVEL_PADRAO, propriedades=None):
+        """
+        Feições do nível no formato que o pydeck gera a partir de um GeoDataFrame
+        (uma lista de registros com os atributos e a chave 'geometry'), para que os
+        acessores do `GeoJsonLayer` ('cor', '{tooltip}') continuem funcionando.
+        `propriedades` é um DataFrame alinhado por posição com as feições (ou None);
+        as geometrias são compartilhadas entre chamadas e não devem ser modificadas.
+        """
+        geometrias = self.feicoes[nivel]
+        if propriedades is None:
+            return [{'geometry': geometria} for geometria in geometrias]
+        if len(propriedades) != len(geometrias):
+            raise ValueError(f"{len(propriedades)} linhas de atributos para {len(geometrias)} feições")
+        registros = propriedades.to_dict(orient='records')
+        for registro, geometria in zip(registros, geometrias):
+            registro['geometry'] = geometria
+        return registros
+
+    def limites(self, nivel=NIVEL_PADRAO):
+        """[oeste, sul, leste, norte] de todas as feições do nível, em graus (None sem feições)"""
+        def pontos(coordenadas):
+            if isinstance(coordenadas[0], (int, float)):
+                yield coordenadas[:2]
+                return
+            for parte in coordenadas:
+                yield from pontos(parte)
+
+        def coordenadas(geometria):
+            if geometria['type'] == 'GeometryCollection':
+                for parte in geometria['geometries']:
+                    yield from coordenadas(parte)
+            else:
+                yield from pontos(geometria['coordinates'])
+
+        todas = np.array([ponto for geometria in self.feicoes[nivel] if geometria is not None
+                          for ponto in coordenadas(geometria)], dtype=float)
+        if len(todas) == 0:
+            return None
+        return tuple(float(valor) for valor in (*todas.min(axis=0), *todas.max(axis=0)))
+
+    def bytes_geometria(self, nivel=NIVEL_PADRAO):
+        """Tamanho das geometrias do nível serializadas em JSON (sem atributos)"""
+        return len(json.dumps(self.feicoes[nivel]))
+
+
+def caminho_geometrias(camada, diretorio=DIRETORIO_GEOMETRIAS):
+    return os.path.join(diretorio, f"{camada}.arrow")
+
+
+def versao_gravada(caminho):
+    """Versão da camada de origem registrada no arquivo (None se não existir)"""
+    if not os.path.exists(caminho):
+        return None
+    with pa.memory_map(caminho) as origem:
+        esquema = pa.ipc.open_file(origem).schema
+    return json.loads((esquema.metadata or {}).get(CHAVE_METADADOS, b'{}')).get('versao')
+
+
+def geometrias_atualizadas(camada, diretorio=DIRETORIO_GEOMETRIAS):
+    """As geometrias gravadas vieram da versão atual da camada?"""
+    versao = versao_camada(camada)
+    return versao is not None and versao_gravada(caminho_geometrias(camada, diretorio)) == versao
+
+
+def construir_geometrias(camada, diretorio=DIRETORIO_GEOMETRIAS, gdf=None):
+    """
+    Caminho de build: prepara as geometrias a partir da camada em GeoParquet (ou do
+    GeoDataFrame `gdf` já carregado) e as grava
+    """
+    gdf = carregar_camada(camada) if gdf is None else gdf
+    geometrias = GeometriasSimplificadas(gdf, coluna_nome=CAMADAS_GEOMETRIAS[camada])
+    geometrias.gravar(caminho_geometrias(camada, diretorio), versao=versao_camada(camada))
+    return geometrias
+
+
+def preparar_geometrias(camada, gdf=None, diretorio=DIRETORIO_GEOMETRIAS):
+    """
+    Geometrias da versão atual da camada: sob uma trava entre processos, a primeira
+    réplica do host as prepara (importando geopandas e shapely) a partir de `gdf` ou
+    da camada em GeoParquet e grava; as demais abrem o arquivo gravado.
+    """
+    with trava(f'geometrias-{camada}'):
+        if geometrias_atualizadas(camada, diretorio):
+            return GeometriasSimplificadas.abrir(caminho_geometrias(camada, diretorio))
+        gdf = carregar_camada(camada) if gdf is None else gdf
+        geometrias = GeometriasSimplificadas(gdf, coluna_nome=CAMADAS_GEOMETRIAS[camada])
+        versao = versao_camada(camada)
+        if versao is not None:
+            try:
+                geometrias.gravar(caminho_geometrias(camada, diretorio), versao=versao)
+            except OSError:
+                pass  # sem onde gravar: fica só neste processo
+        return geometrias
+
+
+def carregar_geometrias_camada(camada, diretorio=DIRETORIO_GEOMETRIAS):
+    """
+    Abre as geometrias pré-serializadas se foram gravadas a partir da versão atual da
+    camada; senão as prepara (ver `preparar_geometrias`).
+    """
+    if geometrias_atualizadas(camada, diretorio):
+        return GeometriasSimplificadas.abrir(caminho_geometrias(camada, diretorio))
+    return preparar_geometrias(camada, diretorio=diretorio)
+
+
+def carregar_divisoes_municipio(municipio, diretorio=DIRETORIO_GEOMETRIAS):
+    """
+    Divisões internas do município (a camada dele em `SUBMUNICIPAIS`), ou uma camada vazia
+    se ele não tiver uma. Os nomes são comparados sem acentos nem caixa (os dados trazem
+    'RIO DE JANEIRO').
+    """
+    chave = normalizar(municipio)
+    camada = next((camada for nome, camada in SUBMUNICIPAIS.items() if normalizar(nome) == chave), None)
+    if camada is None:
+        return GeometriasSimplificadas.vazia(CAMADAS_GEOMETRIAS['bairros'])
+    return carregar_geometrias_camada(camada, diretorio)
+
+
+def carregar_geometrias_municipio(municipio, diretorio=DIRETORIO_GEOMETRIAS):
+    """
+    (contorno, divisões internas) do município: o polígono dele na camada 'municipio'
+    e as divisões de `carregar_divisoes_municipio`. Os nomes são comparados sem acentos
+    nem caixa.
+    """
+    chave = normalizar(municipio)
+
+    def selecao(atributos):
+        return atributos[COLUNA_NOME_MUNICIPIO].map(normalizar) == chave
+    if geometrias_atualizadas('municipio', diretorio):
+        contorno = GeometriasSimplificadas.abrir(caminho_geometrias('municipio', diretorio), selecao)
+    else:
+        contorno = preparar_geometrias('municipio', diretorio=diretorio)
+        contorno = contorno.recortar(selecao(contorno.atributos))
+    return contorno, carregar_divisoes_municipio(municipio, diretorio)
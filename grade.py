@@ -0,0 +1,154 @@
+"""
+Pirâmide de grades para a visualização "Pontos" com muitos locais.
+
+Com dados estaduais ou de várias eleições a camada de pontos passa de centenas
+de milhares de registros (cor, raio e tooltip cada um), o que pesa tanto na
+serialização do pydeck quanto no navegador. Aqui os locais do cubo são
+atribuídos uma única vez a células quadradas de vários tamanhos (250 m, 500 m,
+1 km, ... cada nível com o dobro do lado do anterior, de modo que cada célula
+contém exatamente quatro do nível abaixo) e o mapa recebe as somas por célula
+do nível que cabe na visão atual. Abaixo de `LIMITE_PONTOS` os locais continuam
+sendo enviados como pontos.
+
+As somas por célula (votos de cada candidato, `Sinergia_Peso` e número de
+locais) ficam na sessão e são atualizadas pela diferença entre a máscara de
+locais anterior e a nova: ao mudar um filtro só os locais que entraram ou saíram
+são somados ou subtraídos, em todos os níveis, sem voltar às linhas originais.
+"""
+import numpy as np
+import pandas as pd
+
+TAMANHO_CELULA_BASE = 250  # metros, lado das células do nível 0
+NIVEIS_GRADE = 7  # 250 m … 16 km
+LIMITE_PONTOS = 5_000  # até esse número de pontos o mapa recebe os locais
+LIMITE_CELULAS = 5_000  # máximo de células ocupadas no nível escolhido
+PIXELS_POR_CELULA = 4  # lado mínimo de uma célula na tela
+
+METROS_POR_GRAU_LATITUDE = 110_574
+METROS_POR_GRAU_LONGITUDE = 111_320  # no equador; multiplicado pelo cosseno da latitude
+METROS_POR_PIXEL_ZOOM_0 = 156_543.03392  # Web Mercator, no equador
+
+
+def metros_por_pixel(zoom, latitude):
+    """Resolução do mapa (Web Mercator) no zoom e latitude dados"""
+    return METROS_POR_PIXEL_ZOOM_0 * np.cos(np.radians(latitude)) / 2 ** zoom
+
+
+class PiramideGrade:
+    """
+    Célula de cada local em cada nível da pirâmide e os pesos somados por célula.
+    Compartilhada entre sessões; não deve ser modificada.
+    """
+
+    def __init__(self, lat, lon, pesos, tamanho_base=TAMANHO_CELULA_BASE, niveis=NIVEIS_GRADE):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        pesos = pd.DataFrame(pesos).reset_index(drop=True)
+        self.inteiros = [coluna for coluna in pesos if pd.api.types.is_integer_dtype(pesos[coluna])]
+        self.pesos = pesos.astype(float)
+        self.tamanho_base = tamanho_base
+        self.niveis = niveis
+
+        # Projeção equiretangular local: suficiente para células de até alguns km
+        self.origem = (float(lon.min()), float(lat.min())) if len(lat) else (0.0, 0.0)
+        self.cosseno = float(np.cos(np.radians(lat.mean()))) if len(lat) else 1.0
+        x = (lon - self.origem[0]) * METROS_POR_GRAU_LONGITUDE * self.cosseno
+        y = (lat - self.origem[1]) * METROS_POR_GRAU_LATITUDE
+        coluna = np.floor(x / tamanho_base).astype(np.int64)
+        linha = np.floor(y / tamanho_base).astype(np.int64)
+
+        self.celulas = []  # por nível: índice da célula de cada local
+        self.posicoes = []  # por nível: (coluna, linha) de cada célula
+        for nivel in range(niveis):
+            coluna_nivel, linha_nivel = coluna >> nivel, linha >> nivel
+            chave = coluna_nivel * (int(linha_nivel.max(initial=0)) + 1) + linha_nivel
+            _, primeira, celula = np.unique(chave, return_index=True, return_inverse=True)
+            self.celulas.append(celula.ravel())
+            self.posicoes.append(np.column_stack([coluna_nivel[primeira], linha_nivel[primeira]]))
+
+    @property
+    def colunas(self):
+        return list(self.pesos.columns)
+
+    def tamanho_celula(self, nivel):
+        """Lado das células do nível, em metros"""
+        return self.tamanho_base * 2 ** nivel
+
+    def n_celulas(self, nivel):
+        return len(self.posicoes[nivel])
+
+    def poligonos(self, nivel, celulas):
+        """Quatro vértices [lon, lat] de cada célula pedida"""
+        lado = self.tamanho_celula(nivel)
+        x0, y0 = (self.posicoes[nivel][celulas] * lado).T
+        graus_lon = lado / (METROS_POR_GRAU_LONGITUDE * self.cosseno)
+        graus_lat = lado / METROS_POR_GRAU_LATITUDE
+        lon0 = self.origem[0] + x0 / (METROS_POR_GRAU_LONGITUDE * self.cosseno)
+        lat0 = self.origem[1] + y0 / METROS_POR_GRAU_LATITUDE
+        cantos = np.stack([
+            np.column_stack([lon0, lat0]), np.column_stack([lon0 + graus_lon, lat0]),
+            np.column_stack([lon0 + graus_lon, lat0 + graus_lat]), np.column_stack([lon0, lat0 + graus_lat]),
+        ], axis=1)
+        return np.round(cantos, 6).tolist()
+
+
+class SomasGrade:
+    """Somas por célula de todos os níveis para a máscara de locais atual de uma sessão"""
+
+    def __init__(self, piramide):
+        self.piramide = piramide
+        self.mascara = np.zeros(len(piramide.pesos), dtype=bool)
+        self.somas = [np.zeros((piramide.n_celulas(k), len(piramide.colunas))) for k in range(piramide.niveis)]
+        self.contagens = [np.zeros(piramide.n_celulas(k), dtype=np.int64) for k in range(piramide.niveis)]
+        self._pesos = piramide.pesos.to_numpy()
+
+    def atualizar(self, mascara):
+        """
+        Passa para a nova máscara de locais somando os que entraram e subtraindo os
+        que saíram. Retorna o número de locais alterados.
+        """
+        mascara = np.asarray(mascara, dtype=bool)
+        entraram = np.flatnonzero(mascara & ~self.mascara)
+        sairam = np.flatnonzero(self.mascara & ~mascara)
+        for nivel in range(self.piramide.niveis):
+            for locais, sinal in ((entraram, 1), (sairam, -1)):
+                if len(locais):
+                    self._acumular(nivel, locais, sinal)
+        self.mascara = mascara.copy()
+        return len(entraram) + len(sairam)
+
+    def _acumular(self, nivel, locais, sinal):
+        celulas = self.piramide.celulas[nivel][locais]
+        n_celulas = self.piramide.n_celulas(nivel)
+        if len(locais) < n_celulas:
+            # Poucos locais alterados: custo proporcional à mudança
+            np.add.at(self.somas[nivel], celulas, sinal * self._pesos[locais])
+            np.add.at(self.contagens[nivel], celulas, sinal)
+            return
+        for j in range(self._pesos.shape[1]):
+            self.somas[nivel][:, j] += sinal * np.bincount(celulas, weights=self._pesos[locais, j], minlength=n_celulas)
+        self.contagens[nivel] += sinal * np.bincount(celulas, minlength=n_celulas)
+
+    def celulas_ocupadas(self, nivel):
+        return int(np.count_nonzero(self.contagens[nivel]))
+
+    def escolher_nivel(self, zoom, latitude, limite=LIMITE_CELULAS, pixels_por_celula=PIXELS_POR_CELULA):
+        """
+        Nível mais fino cujas células aparecem com pelo menos `pixels_por_celula` de lado
+        na visão atual e que não passa de `limite` células ocupadas.
+        """
+        lado_minimo = pixels_por_celula * metros_por_pixel(zoom, latitude)
+        for nivel in range(self.piramide.niveis):
+            if self.piramide.tamanho_celula(nivel) >= lado_minimo and self.celulas_ocupadas(nivel) <= limite:
+                return nivel
+        return self.piramide.niveis - 1
+
+    def tabela(self, nivel):
+        """Células ocupadas do nível: polígono, número de locais e somas de cada peso"""
+        ocupadas = np.flatnonzero(self.contagens[nivel])
+        tabela = pd.DataFrame(self.somas[nivel][ocupadas], columns=self.piramide.colunas)
+        for coluna in self.piramide.inteiros:
+            tabela[coluna] = tabela[coluna].round().astype(np.int64)
+        tabela.insert(0, 'locais', self.contagens[nivel][ocupadas])
+        tabela.insert(0, 'poligono', self.piramide.poligonos(nivel, ocupadas))
+        return tabela
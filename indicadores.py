@@ -0,0 +1,79 @@
+"""
+Indicadores do painel que não dependem do Streamlit: candidatos de cada modo de
+análise, configuração das tabelas da análise detalhada e a sinergia por bairro
+com o seu ranking. São usados pelo app e pela API de agregados (ver api.py),
+para que as duas interfaces sirvam exatamente os mesmos números.
+"""
+from analise import ORDEM_INDICE
+from metricas import metricas_candidatos
+
+NOME_FERNANDO = 'FERNANDO CESAR CAMPOS PAES'
+NOME_INDIA = 'AMANDA BRANDAO ARMELAU'
+# Candidatos considerados em cada modo de análise (None = todos)
+CANDIDATOS_POR_MODO = {
+    "Visão Geral": None,
+    "Apenas Fernando Paes": [NOME_FERNANDO],
+    "Apenas Índia Armelau": [NOME_INDIA],
+}
+# Locais fora de qualquer polígono recebem o bairro mais próximo em vez de ficarem sem bairro
+BAIRRO_MAIS_PROXIMO = False
+
+# Tabela da análise detalhada: colunas de votos e opções de ordenação
+COLUNAS_VOTOS_ANALISE = {NOME_FERNANDO: "Votos F. Paes", NOME_INDIA: "Votos Í. Armelau"}
+COLUNA_DIFERENCA_ANALISE = "Diferença (Paes - Armelau)"
+OPCOES_ORDENACAO = {
+    "Padrão (Alfabética)": (ORDEM_INDICE, True),
+    "Mais Votos (F. Paes)": ("Votos F. Paes", False),
+    "Mais Votos (Í. Armelau)": ("Votos Í. Armelau", False),
+    "Maior Volume Total de Votos": ("Total de Votos", False),
+    "Maior Vantagem (F. Paes)": ("Diferença (Paes - Armelau)", False),
+    "Maior Vantagem (Í. Armelau)": ("Diferença (Paes - Armelau)", True),
+}
+
+def sinergia_bairros(agregado):
+    """
+    Acrescenta aos votos por bairro (`cubo.agregar('NOME_BAIRRO', ...)`) o total dos dois
+    candidatos, a diferença absoluta, a Sinergia e a Forca_Conjunta, e, entre todos os
+    candidatos agregados, a Margem (1º − 2º, sobre o total) e o Numero_Efetivo de
+    candidatos. Modifica `agregado`.
+    """
+    if NOME_FERNANDO not in agregado: agregado[NOME_FERNANDO] = 0
+    if NOME_INDIA not in agregado: agregado[NOME_INDIA] = 0
+
+    # SINERGIA: quanto mais equilibrados os votos, maior a sinergia; força conjunta = sinergia + volume
+    candidatos = list(agregado.columns)
+    metricas = metricas_candidatos(agregado.to_numpy(),
+                                   par=(candidatos.index(NOME_FERNANDO), candidatos.index(NOME_INDIA)))
+    par = metricas.par
+    agregado['Total_Votos'] = par.total
+    agregado['Diferenca_Absoluta'] = par.diferenca_absoluta
+    agregado['Sinergia'] = par.sinergia
+    agregado['Forca_Conjunta'] = par.forca_conjunta
+    agregado['Margem'] = metricas.margem
+    agregado['Numero_Efetivo'] = metricas.numero_efetivo
+    return agregado
+
+
+def criar_ranking_sinergia(df_bairros, tipo_mancha):
+    """Cria ranking de sinergia por bairro"""
+    if df_bairros.empty:
+        return None, None
+
+    # Prepara dados para ranking
+    ranking_data = df_bairros[['nome', 'Sinergia', 'Forca_Conjunta', 'Total_Votos', NOME_FERNANDO, NOME_INDIA,
+                               'Margem', 'Numero_Efetivo']]
+    ranking_data = ranking_data[ranking_data['Total_Votos'] > 0]  # Remove bairros sem votos
+
+    if ranking_data.empty:
+        return None, None
+
+    # Define coluna para ranking baseado no tipo
+    coluna_ranking = 'Sinergia' if tipo_mancha == 'Apenas Sinergia' else 'Forca_Conjunta'
+
+    # Top 5 maior
+    top_5_maior = ranking_data.nlargest(5, coluna_ranking)
+
+    # Top 5 menor
+    top_5_menor = ranking_data.nsmallest(5, coluna_ranking)
+
+    return top_5_maior, top_5_menor
@@ -0,0 +1,141 @@
+"""
+Instrumentação opcional de cada rerun do painel.
+
+Ativada pela variável de ambiente `PAINEL_DEBUG=1` ou pelo parâmetro `?debug=1`
+na URL. Quando ativa, cada etapa do rerun (carga em cache, filtros,
+agregações, estilos, ranking, tabela e envio do mapa) é cronometrada junto com
+o pico de memória alocada (tracemalloc) e o tamanho dos payloads enviados ao
+navegador. O resultado aparece em um painel recolhível e é emitido como uma
+linha JSON por rerun no logger `painel.desempenho`, para agregação entre
+réplicas. Desativada, cada chamada é um no-op.
+
+O tracemalloc é global ao processo: com a instrumentação ligada em mais de uma
+sessão ao mesmo tempo os picos de memória se misturam.
+"""
+import contextlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+
+VARIAVEL_AMBIENTE = 'PAINEL_DEBUG'
+PARAMETRO_URL = 'debug'
+NOME_LOGGER = 'painel.desempenho'
+VALORES_ATIVOS = ('1', 'true', 'sim', 'on')
+
+# Quantas vezes cada função em cache (st.cache_resource) realmente executou neste processo
+_execucoes = {}
+_trava = threading.Lock()
+
+
+def registrar_execucao(nome):
+    """Chamado dentro das funções em cache: só roda quando o cache falha"""
+    with _trava:
+        _execucoes[nome] = _execucoes.get(nome, 0) + 1
+
+
+def _execucoes_de(nome):
+    with _trava:
+        return _execucoes.get(nome, 0)
+
+
+def instrumentacao_ativa(parametros_url=None):
+    """Ativa pela variável de ambiente ou pelo parâmetro ?debug=1"""
+    if os.environ.get(VARIAVEL_AMBIENTE, '').lower() in VALORES_ATIVOS:
+        return True
+    valor = (parametros_url or {}).get(PARAMETRO_URL, '')
+    return str(valor).lower() in VALORES_ATIVOS
+
+
+def _logger():
+    logger = logging.getLogger(NOME_LOGGER)
+    if not logger.handlers:
+        manipulador = logging.StreamHandler()
+        manipulador.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(manipulador)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def tamanho_dataframe(df):
+    """Bytes do DataFrame (ou Styler) serializado em Arrow, como o st.dataframe envia ao navegador"""
+    if not isinstance(df, pd.DataFrame):
+        df = df.data
+    tabela = pa.Table.from_pandas(df)
+    destino = pa.BufferOutputStream()
+    with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return destino.tell()
+
+
+class Instrumentacao:
+    """Tempos, memória e payloads de um rerun"""
+
+    def __init__(self, ativa=False, sessao=None):
+        self.ativa = ativa
+        self.sessao = sessao
+        self.etapas = []
+        self.payloads = {}
+        self._inicio = time.perf_counter()
+        if ativa and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def etapa(self, nome, funcao_cache=None, **detalhes):
+        """
+        Context manager que cronometra uma etapa. Com `funcao_cache`, informa se a
+        função em cache executou (falha) ou não (acerto) durante a etapa.
+        """
+        if not self.ativa:
+            return contextlib.nullcontext()
+        return self._medir(nome, funcao_cache, detalhes)
+
+    @contextlib.contextmanager
+    def _medir(self, nome, funcao_cache, detalhes):
+        execucoes = _execucoes_de(funcao_cache) if funcao_cache else None
+        memoria_inicial, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            registro = {'etapa': nome, 'ms': round((time.perf_counter() - inicio) * 1000, 2)}
+            _, pico = tracemalloc.get_traced_memory()
+            registro['pico_memoria_mb'] = round((pico - memoria_inicial) / 2**20, 2)
+            if funcao_cache:
+                registro['cache'] = 'falha' if _execucoes_de(funcao_cache) > execucoes else 'acerto'
+            registro.update(detalhes)
+            self.etapas.append(registro)
+
+    def payload(self, nome, medir):
+        """Registra o tamanho (bytes) de um payload; `medir` só é chamado com a instrumentação ativa"""
+        if self.ativa:
+            self.payloads[nome] = self.payloads.get(nome, 0) + int(medir())
+
+    def tabela(self):
+        return pd.DataFrame(self.etapas, columns=['etapa', 'ms', 'pico_memoria_mb', 'cache'])
+
+    def registro(self):
+        """Resumo do rerun no formato emitido no log"""
+        return {
+            'evento': 'rerun',
+            'data': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'sessao': self.sessao,
+            'total_ms': round((time.perf_counter() - self._inicio) * 1000, 2),
+            'etapas': self.etapas,
+            'payloads_bytes': self.payloads,
+        }
+
+    def emitir_log(self, registro=None):
+        """Uma linha JSON por rerun no logger `painel.desempenho`"""
+        if self.ativa:
+            _logger().info(json.dumps(registro or self.registro(), ensure_ascii=False, default=str))
@@ -0,0 +1,276 @@
+"""
+Contabilidade da memória do painel e modo de orçamento.
+
+Com muitas sessões ao mesmo tempo a memória de uma réplica é a soma de três
+partes: os dados compartilhados (artefato, cubo, geometrias, índice de busca,
+grades), os caches derivados por estado de filtro (máscaras, tabelas da
+análise, quebras, superfícies de densidade) e o que cada sessão guarda (somas
+da grade, superfícies da densidade e os frames do último rerun). Aqui cada
+parte é medida percorrendo os objetos e somando os buffers numpy/pandas/Arrow
+que eles referenciam, cada buffer uma única vez: um frame de sessão que é só
+uma vista de colunas do cubo não conta nada além do próprio cabeçalho, e uma
+tabela aberta do cache compartilhado conta como memória mapeada (páginas do
+sistema operacional, divididas entre as réplicas) e não como memória privada.
+
+Com `PAINEL_ORCAMENTO_MEMORIA_MB` definido, sempre que a memória privada
+contabilizada passa do orçamento os itens usados há mais tempo nos caches
+derivados saem, do mais frio para o mais quente entre todos os caches, até
+voltar para dentro do orçamento; os dados compartilhados e as sessões não são
+despejados (um item despejado é só refeito na próxima vez em que for pedido).
+Sem a variável o uso é só contabilizado e informado.
+
+A medição completa percorre os dados e todos os caches (dezenas de
+milissegundos, quase tudo nas geometrias e no índice de busca); ela roda no
+máximo a cada `INTERVALO_CONTABILIZACAO` segundos por processo, e entre uma e
+outra cada rerun só mede a própria sessão, descontando os buffers contados na
+última medição completa.
+"""
+import mmap
+import os
+import sys
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+VARIAVEL_ORCAMENTO = 'PAINEL_ORCAMENTO_MEMORIA_MB'
+ORCAMENTO_MEMORIA_MB = float(os.environ.get(VARIAVEL_ORCAMENTO, '0') or 0)  # 0: só contabiliza
+INTERVALO_CONTABILIZACAO = 2.0  # segundos entre duas medições completas
+SESSAO_INATIVA = 30 * 60  # segundos sem rerun até a sessão sair da conta
+PROFUNDIDADE_MAXIMA = 8  # níveis de atributos percorridos dentro de cada objeto
+DADOS, CACHES, SESSOES = 'dados', 'caches', 'sessoes'
+
+
+@dataclass
+class Pegada:
+    """Bytes privados (só deste processo) e mapeados (páginas de arquivos, divididas entre réplicas)"""
+    privados: int = 0
+    mapeados: int = 0
+
+    def __add__(self, outra):
+        return Pegada(self.privados + outra.privados, self.mapeados + outra.mapeados)
+
+    def mb(self):
+        return {'privados_mb': round(self.privados / 2**20, 2), 'mapeados_mb': round(self.mapeados / 2**20, 2)}
+
+
+def _raiz(array):
+    """Array que é dono do buffer de `array` e o objeto externo por trás dele (mmap, Arrow), se houver"""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array, array.base
+
+
+class MedidorBytes:
+    """Soma os bytes dos objetos medidos, sem contar duas vezes o mesmo buffer ou objeto"""
+
+    def __init__(self, excluir=(), vistos=()):
+        self._vistos = set(vistos)
+        self._excluidos = {id(objeto) for objeto in excluir}
+
+    def _novo(self, objeto):
+        if id(objeto) in self._vistos:
+            return False
+        self._vistos.add(id(objeto))
+        return True
+
+    def medir(self, objeto, profundidade=0):
+        """Pegada dos buffers alcançáveis a partir de `objeto` ainda não medidos por este medidor"""
+        if objeto is None or isinstance(objeto, (bool, int, float, type)) or callable(objeto):
+            return Pegada()
+        if id(objeto) in self._excluidos or profundidade > PROFUNDIDADE_MAXIMA:
+            return Pegada()
+        if isinstance(objeto, np.ndarray):
+            # Só o dono do buffer é marcado: uma vista temporária (ex.: de uma coluna) pode ter o id
+            # reaproveitado pela vista da coluna seguinte
+            return self._array(objeto)
+        if not self._novo(objeto):
+            return Pegada()
+        if isinstance(objeto, str):
+            return Pegada(sys.getsizeof(objeto))
+        if isinstance(objeto, (bytes, bytearray)):
+            return Pegada(len(objeto))
+        if isinstance(objeto, (pa.Table, pa.RecordBatch, pa.Array, pa.ChunkedArray)):
+            return Pegada(mapeados=objeto.nbytes)
+        if isinstance(objeto, pd.DataFrame):
+            pegada = self.medir(objeto.index, profundidade + 1)
+            for posicao in range(objeto.shape[1]):
+                pegada += self._extensao(objeto.iloc[:, posicao].array, profundidade)
+            return pegada
+        if isinstance(objeto, pd.RangeIndex):
+            return Pegada()  # sem buffer: `.array` materializaria os valores
+        if isinstance(objeto, (pd.Series, pd.Index)):
+            return self._extensao(objeto.array, profundidade)
+        if isinstance(objeto, dict):
+            return sum((self.medir(valor, profundidade + 1) for valor in objeto.values()), Pegada())
+        if isinstance(objeto, (list, tuple, set, frozenset)):
+            return sum((self.medir(valor, profundidade + 1) for valor in objeto), Pegada(sys.getsizeof(objeto)))
+        atributos = getattr(objeto, '__dict__', None)
+        if atributos is None:
+            return Pegada()
+        return self.medir(atributos, profundidade + 1)
+
+    def _array(self, array):
+        raiz, dono = _raiz(array)
+        if not self._novo(raiz):
+            return Pegada()
+        if dono is not None and not isinstance(dono, (bytes, bytearray)):
+            # Buffer de um mmap ou de um buffer Arrow (artefato e cache compartilhado mapeados)
+            return Pegada(mapeados=raiz.nbytes)
+        pegada = Pegada(raiz.nbytes)
+        if raiz.dtype == object:
+            pegada += Pegada(sum(sys.getsizeof(valor) for valor in raiz.ravel()))
+        return pegada
+
+    def _extensao(self, array, profundidade):
+        """Coluna pandas: numpy, categórica (códigos + categorias) ou outra extensão"""
+        if isinstance(array, pd.Categorical):
+            return self.medir(array.codes, profundidade + 1) + self.medir(array.categories, profundidade + 1)
+        numpy = getattr(array, '_ndarray', None)
+        if isinstance(numpy, np.ndarray):
+            return self.medir(numpy, profundidade + 1)
+        if not self._novo(array):
+            return Pegada()
+        return Pegada(int(array.nbytes))
+
+
+def rss_processo():
+    """Memória residente do processo em bytes (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MonitorMemoria:
+    """
+    Dados compartilhados, caches derivados e sessões registrados no processo, com a
+    última medição de cada parte e o despejo dos itens frios acima do orçamento.
+    Compartilhado entre sessões; seguro entre threads.
+    """
+
+    def __init__(self, orcamento_mb=ORCAMENTO_MEMORIA_MB, intervalo=INTERVALO_CONTABILIZACAO):
+        self.orcamento = int(orcamento_mb * 2**20) if orcamento_mb else None
+        self.intervalo = intervalo
+        self._dados = {}  # nome → referência fraca (ou o próprio objeto, se não aceita referência fraca)
+        self._caches = {}  # nome → referência fraca a um CacheLRU
+        self._sessoes = {}  # id → (instante do último rerun, Pegada)
+        self._trava = threading.Lock()
+        self._ultima = -float('inf')
+        self._vistos = frozenset()  # ids dos objetos e buffers contados na última medição completa
+        self.medicao = {DADOS: {}, CACHES: {}}
+        self.despejados = 0
+
+    @staticmethod
+    def _referencia(objeto):
+        try:
+            return weakref.ref(objeto)
+        except TypeError:
+            return lambda: objeto
+
+    def registrar_dados(self, nome, objeto):
+        """Estrutura compartilhada entre sessões (substitui a anterior com o mesmo nome)"""
+        with self._trava:
+            self._dados[nome] = self._referencia(objeto)
+
+    def registrar_cache(self, nome, cache):
+        """CacheLRU de valores derivados, despejável acima do orçamento"""
+        with self._trava:
+            self._caches[nome] = weakref.ref(cache)
+
+    def _vivos(self, referencias):
+        vivos = {nome: referencia() for nome, referencia in referencias.items()}
+        return {nome: objeto for nome, objeto in vivos.items() if objeto is not None}
+
+    def contabilizar(self, sessao, objetos_sessao, forcar=False):
+        """
+        Mede os objetos da sessão (frames do rerun, estado da sessão) descontando o que
+        já é dos dados ou dos caches e, no máximo a cada `intervalo` segundos (ou com
+        `forcar`), refaz a medição dos dados e dos caches e aplica o orçamento.
+        Retorna o resumo de `estado()`.
+        """
+        agora = time.monotonic()
+        with self._trava:
+            completa = forcar or agora - self._ultima >= self.intervalo
+            if completa:
+                self._ultima = agora
+            dados, caches = self._vivos(self._dados), self._vivos(self._caches)
+            vistos = self._vistos
+        if not completa:
+            # Entre medições completas, só a sessão, contra os buffers já contados nos dados e caches
+            pegada_sessao = MedidorBytes(excluir=caches.values(), vistos=vistos).medir(objetos_sessao)
+            with self._trava:
+                self._sessoes[sessao] = (agora, pegada_sessao)
+            return self.estado()
+
+        # Os dados são medidos sem os caches que algumas estruturas carregam (ex.: a análise)
+        medidor = MedidorBytes(excluir=caches.values())
+        medicao_dados = {nome: medidor.medir(objeto) for nome, objeto in dados.items()}
+        itens_caches = {nome: cache.itens() for nome, cache in caches.items()}
+        medicao_caches = {nome: {chave: medidor.medir(valor) for _, chave, valor in itens}
+                          for nome, itens in itens_caches.items()}
+        vistos = frozenset(medidor._vistos)
+        pegada_sessao = medidor.medir(objetos_sessao)
+        with self._trava:
+            self._sessoes[sessao] = (agora, pegada_sessao)
+            for antiga in [s for s, (instante, _) in self._sessoes.items() if agora - instante > SESSAO_INATIVA]:
+                del self._sessoes[antiga]
+            self.medicao[DADOS] = medicao_dados
+            self.medicao[CACHES] = medicao_caches
+            self._vistos = vistos
+        if self.orcamento is not None:
+            self._aplicar_orcamento(caches, itens_caches)
+        return self.estado()
+
+    def _aplicar_orcamento(self, caches, itens_caches):
+        """Despeja os itens mais frios entre todos os caches até a memória privada caber no orçamento"""
+        with self._trava:
+            excesso = self._total().privados - self.orcamento
+            if excesso <= 0:
+                return
+            candidatos = sorted(
+                ((instante, nome, chave, self.medicao[CACHES][nome].get(chave, Pegada()).privados)
+                 for nome, itens in itens_caches.items() for instante, chave, _ in itens),
+                key=lambda candidato: candidato[0],
+            )
+        for _, nome, chave, tamanho in candidatos:
+            if excesso <= 0:
+                break
+            if caches[nome].remover(chave):
+                with self._trava:
+                    self.medicao[CACHES][nome].pop(chave, None)
+                    self.despejados += 1
+                excesso -= tamanho
+
+    def _total(self):
+        partes = [*self.medicao[DADOS].values(),
+                  *(pegada for itens in self.medicao[CACHES].values() for pegada in itens.values()),
+                  *(pegada for _, pegada in self._sessoes.values())]
+        return sum(partes, Pegada())
+
+    def estado(self):
+        """Uso contabilizado por parte, orçamento e memória residente do processo"""
+        with self._trava:
+            total = self._total()
+            return {
+                'orcamento_mb': round(self.orcamento / 2**20, 1) if self.orcamento else None,
+                'total': total.mb(),
+                DADOS: {nome: pegada.mb() for nome, pegada in self.medicao[DADOS].items()},
+                CACHES: {nome: {'itens': len(itens), **sum(itens.values(), Pegada()).mb()}
+                         for nome, itens in self.medicao[CACHES].items()},
+                SESSOES: {'ativas': len(self._sessoes),
+                          **sum((pegada for _, pegada in self._sessoes.values()), Pegada()).mb()},
+                'itens_despejados': self.despejados,
+                'rss_processo_mb': round(rss_processo() / 2**20, 1) if rss_processo() else None,
+                'arrow_alocado_mb': round(pa.total_allocated_bytes() / 2**20, 2),
+            }
+
+    def sessao(self, sessao):
+        """Pegada da última medição da sessão"""
+        with self._trava:
+            return self._sessoes.get(sessao, (None, Pegada()))[1]
@@ -0,0 +1,187 @@
+"""
+Métricas eleitorais por grupo em um único núcleo vetorizado.
+
+A sinergia entre dois candidatos aparecia escrita à mão em vários lugares (o
+Sinergia_Peso dos pontos e da grade, a Sinergia e a Forca_Conjunta dos bairros,
+a diferença relativa dos pontos e a "Diferença (%)" da análise detalhada), cada
+um com o seu épsilon e com colunas intermediárias de DataFrame refeitas a cada
+rerun. Aqui todas saem de uma matriz contígua de votos (grupo × candidato), em
+qualquer nível de agrupamento: a matriz já somada (ex.: `cubo.agregar`) ou os
+votos por local com o código do grupo de cada local, somados aqui mesmo. As
+contas reaproveitam os intermediários (total, diferença, diferença relativa) e
+devolvem arrays numpy, sem DataFrames no meio.
+
+Para N candidatos o núcleo calcula também o total, a participação de cada
+candidato, o vencedor, a margem (1º − 2º, sobre o total) e o número efetivo de
+candidatos (1 / Σ participação², de Laakso e Taagepera). A sinergia por bairro
+(indicadores.py, no painel e na API) e os totais da API saem daqui.
+
+`metricas_candidatos_referencia` faz as mesmas contas grupo a grupo em Python
+puro, seguindo as fórmulas ao pé da letra; é lenta e serve só para conferir o
+núcleo (ver tests/test_metricas.py e benchmarks/metricas.py, que comparam os dois).
+"""
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+EPSILON = 1e-9  # evita divisão por zero na diferença relativa e na sinergia
+
+
+@dataclass
+class MetricasPar:
+    """Comparação entre dois candidatos (A e B) em cada grupo"""
+    total: np.ndarray  # A + B
+    diferenca: np.ndarray  # A − B
+    diferenca_absoluta: np.ndarray
+    diferenca_relativa: np.ndarray  # |A − B| / (A + B), 0 sem votos
+    diferenca_percentual: np.ndarray  # diferença relativa × 100 ("Diferença (%)" da análise)
+    sinergia: np.ndarray  # 1 − diferença relativa: 1 no empate, 0 quando só um dos dois tem votos
+    sinergia_peso: np.ndarray  # total × √sinergia
+    forca_conjunta: np.ndarray  # sinergia × total / maior total entre os grupos
+
+
+@dataclass
+class MetricasCandidatos:
+    """Métricas de N candidatos em cada grupo, mais a comparação do par escolhido"""
+    votos: np.ndarray  # (grupos, candidatos), inteiros
+    total: np.ndarray
+    participacao: np.ndarray  # (grupos, candidatos): votos / total, 0 sem votos
+    vencedor: np.ndarray  # coluna do mais votado (o primeiro no empate), −1 sem votos
+    margem: np.ndarray  # (1º − 2º) / total, 0 sem votos
+    numero_efetivo: np.ndarray  # 1 / Σ participação², 0 sem votos
+    par: MetricasPar = None
+
+
+def metricas_par(votos_a, votos_b):
+    """Métricas da comparação entre dois candidatos; arrays de qualquer formato (inteiros ou superfícies)"""
+    votos_a, votos_b = np.asarray(votos_a), np.asarray(votos_b)
+    total = votos_a + votos_b
+    diferenca = votos_a - votos_b
+    diferenca_absoluta = np.abs(diferenca)
+    relativa = diferenca_absoluta / (total + EPSILON)
+    sinergia = 1 - relativa
+    maximo = (np.max(total) if total.size else 0) or 1
+    return MetricasPar(
+        total=total,
+        diferenca=diferenca,
+        diferenca_absoluta=diferenca_absoluta,
+        diferenca_relativa=np.nan_to_num(relativa, nan=0.0),
+        diferenca_percentual=relativa * 100,
+        sinergia=sinergia,
+        sinergia_peso=total * np.sqrt(sinergia),
+        forca_conjunta=sinergia * (total / maximo),
+    )
+
+
+def somar_por_grupo(votos, codigos, n_grupos=None):
+    """Votos (locais × candidatos) somados por grupo; locais com código negativo ficam de fora"""
+    votos = np.asarray(votos)
+    codigos = np.asarray(codigos)
+    validos = codigos >= 0
+    if not validos.all():
+        votos, codigos = votos[validos], codigos[validos]
+    n_grupos = int(codigos.max()) + 1 if n_grupos is None and len(codigos) else (n_grupos or 0)
+    somas = np.empty((n_grupos, votos.shape[1]), dtype=np.int64)
+    for coluna in range(votos.shape[1]):
+        # Soma em float64, exata enquanto os totais couberem em 2⁵³ (como no cubo)
+        somas[:, coluna] = np.bincount(codigos, weights=votos[:, coluna], minlength=n_grupos)
+    return somas
+
+
+def metricas_candidatos(votos, par=(0, 1), codigos=None, n_grupos=None):
+    """
+    Métricas de cada grupo a partir da matriz de votos (grupos × candidatos) ou, com
+    `codigos`, dos votos por local e do grupo de cada local. `par` são as colunas dos
+    dois candidatos comparados na sinergia (None: sem a comparação).
+    """
+    votos = np.ascontiguousarray(votos, dtype=np.int64)
+    if votos.ndim != 2:
+        raise ValueError(f"A matriz de votos deve ter duas dimensões, não {votos.ndim}")
+    if codigos is not None:
+        votos = somar_por_grupo(votos, codigos, n_grupos)
+    n_candidatos = votos.shape[1]
+    total = votos.sum(axis=1)
+    com_votos = total > 0
+    divisor = np.where(com_votos, total, 1).astype(np.float64)
+
+    participacao = votos / divisor[:, None]
+    reais = votos.astype(np.float64)  # Σ votos² estoura int64 com totais na casa dos bilhões
+    quadrados = np.einsum('ij,ij->i', reais, reais)
+    numero_efetivo = np.zeros(len(votos))
+    np.divide(total.astype(np.float64) ** 2, quadrados, out=numero_efetivo, where=com_votos)
+
+    if n_candidatos >= 2:
+        primeiros = np.partition(votos, n_candidatos - 2, axis=1)[:, -2:]
+        margem = (primeiros[:, 1] - primeiros[:, 0]) / divisor
+    else:
+        margem = com_votos.astype(np.float64)
+    vencedor = np.where(com_votos, votos.argmax(axis=1) if n_candidatos else -1, -1)
+
+    return MetricasCandidatos(
+        votos=votos, total=total, participacao=participacao, vencedor=vencedor, margem=margem,
+        numero_efetivo=numero_efetivo,
+        par=metricas_par(votos[:, par[0]], votos[:, par[1]]) if par is not None else None,
+    )
+
+
+def metricas_candidatos_referencia(votos, par=(0, 1)):
+    """Mesmas métricas de `metricas_candidatos`, grupo a grupo em Python puro (lenta; só para conferência)"""
+    linhas = [[int(valor) for valor in linha] for linha in np.asarray(votos).tolist()]
+    totais, participacoes, vencedores, margens, efetivos = [], [], [], [], []
+    for linha in linhas:
+        total = sum(linha)
+        totais.append(total)
+        participacoes.append([valor / total if total else 0.0 for valor in linha])
+        if total == 0:
+            vencedores.append(-1)
+            margens.append(0.0)
+            efetivos.append(0.0)
+            continue
+        maior = max(linha)
+        vencedores.append(linha.index(maior))
+        ordenados = sorted(linha, reverse=True)
+        margens.append((ordenados[0] - ordenados[1]) / total if len(linha) > 1 else 1.0)
+        efetivos.append(1 / sum(participacao ** 2 for participacao in participacoes[-1]))
+
+    resultado = MetricasCandidatos(
+        votos=np.array(linhas, dtype=np.int64).reshape(len(linhas), -1) if linhas else np.asarray(votos, np.int64),
+        total=np.array(totais, dtype=np.int64),
+        participacao=np.array(participacoes, dtype=np.float64).reshape(len(linhas), -1) if linhas
+        else np.zeros(np.shape(votos)),
+        vencedor=np.array(vencedores, dtype=np.int64),
+        margem=np.array(margens, dtype=np.float64),
+        numero_efetivo=np.array(efetivos, dtype=np.float64),
+    )
+    if par is None:
+        return resultado
+
+    a, b = par
+    pares = [(linha[a] + linha[b], linha[a] - linha[b]) for linha in linhas]
+    maior_total = max((total for total, _ in pares), default=0) or 1
+    campos = {nome: [] for nome in MetricasPar.__dataclass_fields__}
+    for total, diferenca in pares:
+        relativa = abs(diferenca) / (total + EPSILON)
+        sinergia = 1 - relativa
+        campos['total'].append(total)
+        campos['diferenca'].append(diferenca)
+        campos['diferenca_absoluta'].append(abs(diferenca))
+        campos['diferenca_relativa'].append(relativa)
+        campos['diferenca_percentual'].append(relativa * 100)
+        campos['sinergia'].append(sinergia)
+        campos['sinergia_peso'].append(total * math.sqrt(sinergia))
+        campos['forca_conjunta'].append(sinergia * (total / maior_total))
+    inteiros = ('total', 'diferenca', 'diferenca_absoluta')
+    resultado.par = MetricasPar(**{nome: np.array(valores, dtype=np.int64 if nome in inteiros else np.float64)
+                                   for nome, valores in campos.items()})
+    return resultado
+
+
+def diferenca_relativa(diferenca, total):
+    """|diferença| / total de votos de cada grupo (0 sem votos)"""
+    return np.nan_to_num(np.abs(diferenca) / (np.asarray(total) + EPSILON), nan=0.0)
+
+
+def sinergia_peso(votos_a, votos_b):
+    """Total de votos ponderado pela sinergia: total × √(1 − |diferença| / total)"""
+    return metricas_par(votos_a, votos_b).sinergia_peso
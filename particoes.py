@@ -0,0 +1,286 @@
+"""
+Partições do conjunto de dados por município (NM_MUNICIPIO).
+
+O artefato guarda as linhas do estado inteiro, mas uma sessão só olha um
+município por vez. Aqui cada município vira uma partição aberta no primeiro
+acesso: as linhas dele são recortadas da tabela Arrow mapeada (sem converter o
+resto do estado para pandas) e viram um cubo de votos próprio, gravado uma vez
+por host no cache compartilhado sob `<versao_dados>/<município>`. As partições
+abertas ficam em um cache LRU com `PAINEL_PARTICOES_ABERTAS` lugares; a usada há
+mais tempo sai quando outra é aberta. As estruturas montadas sobre o cubo de um
+município (filtros, grade, densidade, busca, análise) ficam penduradas na própria
+partição: saem da memória junto com ela.
+
+Um catálogo pequeno, montado uma vez por versão dos dados em uma única
+passada vetorizada sobre a tabela, resume cada município: linhas, zonas,
+extensão dos locais (para enquadrar o mapa), votos por candidato e um digest
+das linhas. Os totais do estado saem dos votos do catálogo, sem percorrer as
+linhas nem abrir partições. O digest é a soma (módulo 2⁶⁴) de um hash por
+linha, então não depende da ordem das linhas no CSV: numa atualização só os
+municípios cujo digest mudou têm a partição refeita e os caches descartados.
+"""
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from atualizacao import Alteracao, alteracao_cubos
+from busca import normalizar
+from cubo import COLUNA_CANDIDATO, COLUNA_VOTOS, CuboVotos
+from dados import tabela_para_pandas
+from filtros import CacheLRU
+
+COLUNA_MUNICIPIO = 'NM_MUNICIPIO'
+MUNICIPIO_PADRAO = 'RIO DE JANEIRO'  # aberto por padrão no painel, quando existe nos dados
+PARTICOES_ABERTAS = int(os.environ.get('PAINEL_PARTICOES_ABERTAS', '4') or 4)  # partições em memória por processo
+
+_DESLOCAMENTO = np.uint64(0x9E3779B97F4A7C15)
+_MULTIPLICADORES = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+
+def _misturar(valores):
+    """Finalizador do splitmix64: espalha os bits de cada valor uint64"""
+    with np.errstate(over='ignore'):
+        valores = valores + _DESLOCAMENTO
+        valores = (valores ^ (valores >> np.uint64(30))) * _MULTIPLICADORES[0]
+        valores = (valores ^ (valores >> np.uint64(27))) * _MULTIPLICADORES[1]
+    return valores ^ (valores >> np.uint64(31))
+
+
+def _hash_texto(texto):
+    return int.from_bytes(hashlib.blake2b(str(texto).encode(), digest_size=8).digest(), 'little')
+
+
+def _hash_coluna(coluna):
+    """Hash uint64 de cada valor de uma coluna (textos pelo conteúdo, não pelo código do dicionário)"""
+    partes = []
+    for pedaco in coluna.chunks:
+        if pa.types.is_dictionary(pedaco.type):
+            # O último lugar (índice -1) fica com os nulos
+            textos = np.array([_hash_texto(valor) for valor in pedaco.dictionary.to_pylist()] + [0], dtype=np.uint64)
+            partes.append(textos[pedaco.indices.fill_null(-1).to_numpy()])
+        elif pa.types.is_string(pedaco.type) or pa.types.is_large_string(pedaco.type):
+            partes.append(np.array([_hash_texto(valor) for valor in pedaco.to_pylist()], dtype=np.uint64))
+        else:
+            partes.append(np.asarray(pedaco.to_numpy(zero_copy_only=False), dtype=np.float64).view(np.uint64))
+    return np.concatenate(partes) if partes else np.zeros(0, dtype=np.uint64)
+
+
+def _codigos_municipios(tabela):
+    """Código do município de cada linha e os nomes (ordenados) de cada código"""
+    codigos, nomes = pd.factorize(tabela.column(COLUNA_MUNICIPIO).to_pandas(), sort=True)
+    return codigos, np.asarray(nomes, dtype=object)
+
+
+def catalogo_municipios(tabela):
+    """
+    Resumo por município de uma tabela de votação (Arrow): `municipios` (linhas, zonas,
+    extensão dos locais e digest das linhas) e `votos` (votos de cada candidato).
+    """
+    codigos, nomes = _codigos_municipios(tabela)
+    ordem = np.argsort(codigos, kind='stable')
+    inicios = np.flatnonzero(np.r_[True, np.diff(codigos[ordem]) != 0]) if len(ordem) else np.zeros(0, dtype=int)
+
+    # Hash de cada linha combinando as colunas em ordem fixa; o digest do município é a soma deles
+    por_linha = np.zeros(tabela.num_rows, dtype=np.uint64)
+    for nome in sorted(tabela.column_names):
+        por_linha = _misturar(por_linha ^ _hash_coluna(tabela.column(nome)))
+    with np.errstate(over='ignore'):
+        digests = np.add.reduceat(por_linha[ordem], inicios) if len(ordem) else np.zeros(0, dtype=np.uint64)
+
+    linhas = pd.DataFrame({
+        'codigo': codigos,
+        'zona': tabela.column('NR_ZONA').to_numpy(),
+        'lat': tabela.column('lat').to_numpy(),
+        'lon': tabela.column('lon').to_numpy(),
+    })
+    resumo = linhas.groupby('codigo').agg(linhas=('zona', 'size'), zonas=('zona', 'nunique'), oeste=('lon', 'min'),
+                                          sul=('lat', 'min'), leste=('lon', 'max'), norte=('lat', 'max'))
+    municipios = resumo.reset_index(drop=True)
+    municipios.insert(0, 'municipio', nomes[resumo.index])
+    municipios['digest'] = [f'{int(digest):016x}' for digest in digests]
+
+    votos = pd.DataFrame({
+        'codigo': codigos,
+        'candidato': tabela.column(COLUNA_CANDIDATO).to_pandas(),
+        'votos': tabela.column(COLUNA_VOTOS).to_numpy(zero_copy_only=False),
+    }).groupby(['codigo', 'candidato'], observed=True)['votos'].sum().reset_index()
+    votos.insert(0, 'municipio', nomes[votos.pop('codigo')])
+    votos['candidato'] = votos['candidato'].astype(str)
+    votos['votos'] = votos['votos'].astype(np.int64)
+    return {'municipios': municipios, 'votos': votos}
+
+
+def linhas_municipio(tabela, municipio):
+    """DataFrame só com as linhas do município, recortadas da tabela Arrow antes da conversão"""
+    df = tabela_para_pandas(tabela.filter(pc.equal(tabela.column(COLUNA_MUNICIPIO), municipio)))
+    for coluna in df.columns:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].cat.remove_unused_categories()
+    return df
+
+
+def identificador_municipio(municipio):
+    """Nome do município usado nas pastas do cache compartilhado ('RIO DE JANEIRO' → 'rio-de-janeiro')"""
+    return normalizar(municipio).replace(' ', '-')
+
+
+@dataclass
+class ParticaoMunicipio:
+    """
+    Cubo de votos de um município, com a versão usada como chave no cache compartilhado,
+    e as estruturas derivadas dele (montadas no primeiro uso e descartadas com a partição)
+    """
+    municipio: str
+    versao_dados: str  # '<versao_dados>/<município>' (ver `versao_dados` em dados.py)
+    digest: str
+    cubo: CuboVotos
+    derivados: dict = field(default_factory=dict, repr=False)  # nome → estrutura (ex.: 'filtros', 'grade')
+    _trava: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _travas: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def derivado(self, nome, construir):
+        """Estrutura derivada `nome`, montada uma única vez por `construir` (as sessões esperam a primeira)"""
+        with self._trava:
+            trava = self._travas.setdefault(nome, threading.Lock())
+        with trava:
+            if nome not in self.derivados:
+                self.derivados[nome] = construir()
+            return self.derivados[nome]
+
+    def descartar(self, *nomes):
+        """Descarta estruturas derivadas; são montadas de novo no próximo uso"""
+        with self._trava:
+            for nome in nomes:
+                self.derivados.pop(nome, None)
+
+    def herdar(self, anterior):
+        """Recebe as estruturas derivadas da partição da versão anterior que ainda não tem"""
+        with self._trava:
+            for nome, estrutura in anterior.derivados.items():
+                self.derivados.setdefault(nome, estrutura)
+
+
+class ParticoesMunicipios:
+    """
+    Catálogo dos municípios da versão atual dos dados e as partições abertas (LRU).
+    Compartilhado entre sessões; seguro entre threads.
+    """
+
+    def __init__(self, votacao, capacidade=PARTICOES_ABERTAS):
+        self.votacao = votacao
+        self.abertas = CacheLRU(capacidade)  # (versao_dados, município) → ParticaoMunicipio
+        self._trava = threading.Lock()
+        self.versao_dados, self._tabela = votacao.versao_atual()
+        self.catalogo = self._montar_catalogo(self.versao_dados, self._tabela)
+
+    def _montar_catalogo(self, versao, tabela):
+        def construir():
+            return catalogo_municipios(tabela)
+        compartilhado = self.votacao.compartilhado
+        partes = construir() if compartilhado is None else compartilhado.obter(versao, 'municipios', construir)
+        return {'municipios': partes['municipios'].set_index('municipio'), 'votos': partes['votos']}
+
+    def municipios(self):
+        """Municípios com votos, em ordem alfabética"""
+        return list(self.catalogo['municipios'].index)
+
+    def resumo(self, municipio):
+        """Linha do catálogo do município (linhas, zonas, extensão dos locais e digest)"""
+        return self.catalogo['municipios'].loc[municipio]
+
+    def limites(self, municipio):
+        """[oeste, sul, leste, norte] dos locais de votação do município, em graus"""
+        resumo = self.resumo(municipio)
+        return tuple(float(resumo[lado]) for lado in ('oeste', 'sul', 'leste', 'norte'))
+
+    def totais_estado(self, candidatos=None):
+        """Votos de cada candidato no estado inteiro, somados dos resumos por município"""
+        votos = self.catalogo['votos']
+        if candidatos is not None:
+            votos = votos[votos['candidato'].isin(candidatos)]
+        return votos.groupby('candidato')['votos'].sum()
+
+    def _montar(self, versao, tabela, municipio):
+        versao_particao = f'{versao}/{identificador_municipio(municipio)}'
+
+        def construir():
+            return CuboVotos(linhas_municipio(tabela, municipio))
+        compartilhado = self.votacao.compartilhado
+        if compartilhado is None:
+            cubo = construir()
+        else:
+            cubo = CuboVotos.de_partes(compartilhado.obter(versao_particao, 'cubo', lambda: construir().partes()))
+        return cubo, versao_particao
+
+    def abrir(self, municipio):
+        """Partição do município na versão atual, montada (ou aberta do cache compartilhado) no primeiro acesso"""
+        with self._trava:
+            versao, tabela, catalogo = self.versao_dados, self._tabela, self.catalogo
+        if municipio not in catalogo['municipios'].index:
+            raise KeyError(f"Município sem votos nos dados: {municipio}")
+
+        def construir():
+            cubo, versao_particao = self._montar(versao, tabela, municipio)
+            return ParticaoMunicipio(municipio, versao_particao, catalogo['municipios'].at[municipio, 'digest'], cubo)
+        return self.abertas.obter((versao, municipio), construir)
+
+    def atualizar(self, alteracao):
+        """
+        Passa para a versão atual dos dados depois de `votacao.atualizar()`: preenche
+        `alteracao.municipios` comparando os digests do catálogo e leva as partições
+        abertas para a nova versão, refazendo só as dos municípios alterados (as
+        demais reaproveitam o cubo). As estruturas derivadas passam para a partição
+        nova, para serem invalidadas pela `Alteracao` do município. Retorna
+        {município: (partição, Alteracao)} das partições abertas; a `Alteracao` de um
+        município que não mudou é vazia.
+        """
+        versao, tabela = self.votacao.versao_atual()
+        if versao == self.versao_dados:
+            alteracao.municipios = set()
+            return {}
+        catalogo = self._montar_catalogo(versao, tabela)
+        antigos, novos = self.catalogo['municipios']['digest'], catalogo['municipios']['digest']
+        alteracao.municipios = {municipio for municipio in antigos.index.union(novos.index)
+                                if antigos.get(municipio) != novos.get(municipio)}
+        with self._trava:
+            abertas = self.abertas.itens()
+            self.versao_dados, self._tabela, self.catalogo = versao, tabela, catalogo
+
+        campos = dict(versao=alteracao.versao, linhas_removidas=alteracao.linhas_removidas,
+                      linhas_novas=alteracao.linhas_novas, blocos_reprocessados=alteracao.blocos_reprocessados)
+        resultado = {}
+        for _, (versao_antiga, municipio), particao in abertas:
+            self.abertas.remover((versao_antiga, municipio))
+            if municipio not in novos.index:
+                continue
+            if municipio in alteracao.municipios:
+                nova = self.abrir(municipio)
+                nova.herdar(particao)
+                resultado[municipio] = nova, alteracao_cubos(particao.cubo, nova.cubo, versao_dados=nova.versao_dados,
+                                                              municipios={municipio}, **campos)
+                continue
+            # Mesmas linhas: o cubo continua valendo e é gravado também sob a nova versão
+            versao_particao = f'{versao}/{identificador_municipio(municipio)}'
+            if self.votacao.compartilhado is not None:
+                self.votacao.compartilhado.obter(versao_particao, 'cubo', particao.cubo.partes)
+            nova = replace(particao, versao_dados=versao_particao)
+            self.abertas.obter((versao, municipio), lambda: nova)
+            resultado[municipio] = nova, Alteracao(versao_dados=versao_particao, municipios=set(), **campos)
+        return resultado
+
+    def estado(self):
+        """Resumo para diagnóstico"""
+        return {
+            'versao_dados': self.versao_dados,
+            'municipios': len(self.catalogo['municipios']),
+            'abertas': [municipio for _, (_, municipio), _ in self.abertas.itens()],
+            'capacidade': self.abertas.capacidade,
+            'acertos': self.abertas.acertos,
+            'falhas': self.abertas.falhas,
+        }
@@ -0,0 +1,92 @@
+"""
+Dados sintéticos dos testes: linhas de votação no formato do CSV do TSE (coordenadas
+com o separador de milhar quebrado), uma camada de bairros em grade sobre o Rio e o
+isolamento do índice de bairros, que nos testes fica só em memória (nada é escrito
+em dados/).
+"""
+import os
+
+import numpy as np
+import pytest
+
+import atribuicao_bairros
+from indicadores import NOME_FERNANDO, NOME_INDIA
+
+CABECALHO = "NM_VOTAVEL;NR_ZONA;NM_LOCAL_VOTACAO;DS_LOCAL_VOTACAO_ENDERECO;NM_MUNICIPIO;QT_VOTOS_TOTAL;LATITUDE;LONGITUDE;"
+CANDIDATOS = (NOME_FERNANDO, NOME_INDIA, "CANDIDATO SINTETICO")
+ZONAS = (4, 14, 119, 161)
+# Retângulo dos locais sintéticos de cada município: (oeste, sul, leste, norte)
+MUNICIPIOS = {
+    "RIO DE JANEIRO": (-43.60, -23.00, -43.20, -22.80),
+    "NITEROI": (-43.10, -22.95, -43.00, -22.88),
+    "SAO GONCALO": (-43.08, -22.86, -42.98, -22.78),
+}
+BAIRROS_POR_LADO = 3  # a camada de bairros cobre o retângulo do Rio em 3 × 3 células
+
+
+def texto_coordenada(valor):
+    """Coordenada no formato quebrado do CSV do TSE (ex.: -22.9482419 → "-229.482.419")"""
+    return '-' + f"{round(abs(valor) * 1e7):,}".replace(',', '.')
+
+
+def linhas_votacao(locais_por_municipio=20, municipios=("RIO DE JANEIRO",), semente=0):
+    """Linhas do CSV (sem o cabeçalho): cada local tem uma linha por candidato"""
+    gerador = np.random.default_rng(semente)
+    linhas = []
+    for municipio in municipios:
+        oeste, sul, leste, norte = MUNICIPIOS[municipio]
+        for i in range(locais_por_municipio):
+            zona = ZONAS[i % len(ZONAS)]
+            lat, lon = gerador.uniform(sul, norte), gerador.uniform(oeste, leste)
+            for candidato in CANDIDATOS:
+                votos = int(gerador.integers(0, 300))
+                linhas.append(f"{candidato};{zona};ESCOLA {municipio[:3]} {i:04d};RUA {i};{municipio};{votos};"
+                              f"{texto_coordenada(lat)};{texto_coordenada(lon)};")
+    return linhas
+
+
+def escrever_csv(caminho, linhas, final='\n'):
+    """Grava o CSV e adianta a data de modificação (a assinatura do CSV tem resolução de 1 s)"""
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('\ufeff' + CABECALHO + '\n' + '\n'.join(linhas) + final)
+    anterior = getattr(escrever_csv, 'mtime', 1_700_000_000) + 10
+    escrever_csv.mtime = anterior
+    os.utime(caminho, (anterior, anterior))
+
+
+def camada_bairros():
+    """GeoDataFrame de bairros em grade sobre o retângulo dos locais do Rio"""
+    import geopandas as gpd
+    import shapely
+
+    oeste, sul, leste, norte = MUNICIPIOS["RIO DE JANEIRO"]
+    xs, ys = np.linspace(oeste, leste, BAIRROS_POR_LADO + 1), np.linspace(sul, norte, BAIRROS_POR_LADO + 1)
+    celulas = [shapely.box(xs[i], ys[j], xs[i + 1], ys[j + 1])
+               for i in range(BAIRROS_POR_LADO) for j in range(BAIRROS_POR_LADO)]
+    nomes = [f"BAIRRO {i + 1}" for i in range(len(celulas))]
+    return gpd.GeoDataFrame({'nome': nomes}, geometry=celulas, crs="EPSG:4326")
+
+
+class _IndiceEmMemoria(atribuicao_bairros.IndiceBairros):
+    def __init__(self, gdf_bairros, versao=None, caminho=None, coluna_nome='nome'):
+        super().__init__(gdf_bairros, versao, None, coluna_nome)
+
+
+@pytest.fixture(autouse=True)
+def indice_bairros_em_memoria(monkeypatch):
+    """O índice de bairros não lê nem grava o arquivo de dados/cache"""
+    monkeypatch.setattr(atribuicao_bairros, 'IndiceBairros', _IndiceEmMemoria)
+
+
+@pytest.fixture(scope='session')
+def bairros():
+    return camada_bairros()
+
+
+@pytest.fixture
+def camada_bairros_local(monkeypatch, bairros):
+    """`fronteiras.carregar_camada('bairros')` devolve a camada sintética"""
+    import fronteiras
+
+    monkeypatch.setattr(fronteiras, 'carregar_camada', lambda camada, *args, **kwargs: bairros)
+    return bairros
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analise import (COLUNA_DIFERENCA_PERCENTUAL, COLUNA_TOTAL, NIVEIS_ANALISE, ORDEM_INDICE, TAMANHO_PAGINA,
+                     AnaliseMemoizada, TabelaOrdenada, montar_tabela, n_paginas)
+from atualizacao import Alteracao
+from cache_compartilhado import CacheCompartilhado
+from cubo import CuboVotos
+from filtros import chave_filtro
+from indicadores import COLUNA_DIFERENCA_ANALISE, COLUNAS_VOTOS_ANALISE, NOME_FERNANDO, NOME_INDIA, OPCOES_ORDENACAO
+
+ROTULO_FERNANDO, ROTULO_INDIA = COLUNAS_VOTOS_ANALISE[NOME_FERNANDO], COLUNAS_VOTOS_ANALISE[NOME_INDIA]
+FILTROS = [
+    ((NOME_FERNANDO, NOME_INDIA), None, ()),
+    ((NOME_FERNANDO, NOME_INDIA), 14, ()),
+    ((NOME_INDIA,), None, ()),  # a coluna do outro candidato entra zerada
+    (None, 4, ('ESCOLA 3', 'ESCOLA 17', 'ESCOLA 40')),
+]
+
+
+@pytest.fixture(scope='module')
+def votacao():
+    # Poucos votos por linha: muitos empates, que testam a estabilidade das ordens
+    n = 3000
+    gerador = np.random.default_rng(0)
+    local = gerador.integers(0, 240, n)
+    return pd.DataFrame({
+        'NM_VOTAVEL': np.asarray([NOME_FERNANDO, NOME_INDIA, "OUTRO"])[gerador.integers(0, 3, n)],
+        'NR_ZONA': np.asarray([4, 14, 119, 161])[local % 4],
+        'NM_LOCAL_VOTACAO': [f"ESCOLA {i}" for i in local % 60],
+        'NOME_BAIRRO': [f"BAIRRO {i:02d}" for i in local % 23],
+        'lat': -22.9 + local * 1e-4,
+        'lon': -43.2 - local * 1e-4,
+        'QT_VOTOS_TOTAL': gerador.integers(1, 6, n),
+    })
+
+
+@pytest.fixture(scope='module')
+def cubo(votacao):
+    return CuboVotos(votacao)
+
+
+def _analise_original(votacao, nivel_col, candidatos, zona, nomes_locais, ordenacao):
+    """Tabela da análise como era montada antes: `pivot_table` das linhas filtradas e `sort_values`"""
+    filtrado = votacao
+    if candidatos is not None:
+        filtrado = filtrado[filtrado['NM_VOTAVEL'].isin(candidatos)]
+    if zona is not None:
+        filtrado = filtrado[filtrado['NR_ZONA'] == zona]
+    if nomes_locais:
+        filtrado = filtrado[filtrado['NM_LOCAL_VOTACAO'].isin(nomes_locais)]
+    tabela = filtrado.pivot_table(index=nivel_col, columns='NM_VOTAVEL', values='QT_VOTOS_TOTAL',
+                                  aggfunc='sum').fillna(0).astype(int)
+    for candidato in (NOME_FERNANDO, NOME_INDIA):
+        if candidato not in tabela.columns:
+            tabela[candidato] = 0
+    tabela = tabela[[NOME_FERNANDO, NOME_INDIA]].rename(columns=COLUNAS_VOTOS_ANALISE)
+    tabela[COLUNA_TOTAL] = tabela[ROTULO_FERNANDO] + tabela[ROTULO_INDIA]
+    tabela[COLUNA_DIFERENCA_ANALISE] = tabela[ROTULO_FERNANDO] - tabela[ROTULO_INDIA]
+    tabela[COLUNA_DIFERENCA_PERCENTUAL] = (tabela[COLUNA_DIFERENCA_ANALISE].abs()
+                                           / (tabela[COLUNA_TOTAL] + 1e-9)) * 100
+    coluna, ascendente = OPCOES_ORDENACAO[ordenacao]
+    # Ordem estável: o quicksort padrão do `sort_values` não fixa a ordem dos empates
+    if coluna == ORDEM_INDICE:
+        return tabela.sort_index(ascending=ascendente, kind='stable')
+    return tabela.sort_values(coluna, ascending=ascendente, kind='stable')
+
+
+def _comparar(obtida, esperada):
+    pd.testing.assert_frame_equal(obtida[esperada.columns], esperada, check_dtype=False, check_names=False,
+                                  check_index_type=False, check_column_type=False)
+
+
+@pytest.mark.parametrize('candidatos, zona, nomes_locais', FILTROS)
+def test_niveis_e_ordens_iguais_aos_da_tabela_original(votacao, cubo, candidatos, zona, nomes_locais):
+    analise = AnaliseMemoizada(cubo, COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE, OPCOES_ORDENACAO)
+    mascara = cubo.mascara(zona, nomes_locais)
+    tabelas = analise.tabelas(chave_filtro(candidatos, zona, nomes_locais), mascara, candidatos)
+    assert set(tabelas) == set(NIVEIS_ANALISE.values())
+    for nivel_col, tabela in tabelas.items():
+        for ordenacao in OPCOES_ORDENACAO:
+            esperada = _analise_original(votacao, nivel_col, candidatos, zona, nomes_locais, ordenacao)
+            linhas = tabela.linhas(ordenacao)
+            assert len(linhas) == len(esperada)
+            _comparar(tabela.tabela.iloc[linhas], esperada)
+
+
+def test_busca_restringe_a_ordem(cubo):
+    tabela = TabelaOrdenada(montar_tabela(cubo.agregar('NOME_BAIRRO', candidatos=[NOME_FERNANDO, NOME_INDIA]),
+                                          COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE), OPCOES_ORDENACAO)
+    selecionadas = tabela.tabela.index.isin(['BAIRRO 03', 'BAIRRO 07', 'BAIRRO 11'])
+    for ordenacao in OPCOES_ORDENACAO:
+        completa = tabela.linhas(ordenacao)
+        # Mesma ordem relativa da tabela inteira, só com as linhas encontradas
+        assert list(tabela.linhas(ordenacao, selecionadas)) == [i for i in completa if selecionadas[i]]
+    assert len(tabela.linhas("Padrão (Alfabética)", np.zeros(len(tabela), dtype=bool))) == 0
+
+
+def test_paginas():
+    n_linhas = 2 * TAMANHO_PAGINA + 7
+    agregado = pd.DataFrame({NOME_FERNANDO: np.arange(n_linhas), NOME_INDIA: np.arange(n_linhas)[::-1]},
+                            index=pd.Index([f"LOCAL {i:03d}" for i in range(n_linhas)]))
+    tabela = TabelaOrdenada(montar_tabela(agregado, COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE),
+                            OPCOES_ORDENACAO)
+    linhas = tabela.linhas("Mais Votos (F. Paes)")
+    assert n_paginas(len(linhas)) == 3
+    paginas = [tabela.pagina(linhas, pagina) for pagina in range(3)]
+    assert [len(pagina) for pagina in paginas] == [TAMANHO_PAGINA, TAMANHO_PAGINA, 7]
+    # As páginas juntas são a tabela inteira na ordem pedida
+    assert list(pd.concat(paginas)[ROTULO_FERNANDO]) == list(range(n_linhas))[::-1]
+    # Página além do fim: vazia, sem erro
+    vazia = tabela.pagina(linhas, 3)
+    assert len(vazia) == 0 and list(vazia.columns) == list(tabela.tabela.columns)
+    assert n_paginas(0) == 1 and n_paginas(TAMANHO_PAGINA) == 1 and n_paginas(TAMANHO_PAGINA + 1) == 2
+
+
+def test_memoizada_por_estado_de_filtro(cubo):
+    analise = AnaliseMemoizada(cubo, COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE, OPCOES_ORDENACAO)
+    candidatos = (NOME_FERNANDO, NOME_INDIA)
+    zona_4, zona_14 = chave_filtro(candidatos, 4), chave_filtro(candidatos, 14)
+    tabelas = analise.tabelas(zona_4, cubo.mascara(4), candidatos)
+    assert analise.tabelas(zona_4, None, candidatos) is tabelas  # a máscara nem é usada de novo
+    analise.tabelas(zona_14, cubo.mascara(14), candidatos)
+    for tabela in tabelas.values():
+        for ordem in tabela.ordens.values():
+            assert not ordem.flags.writeable
+
+    analise.invalidar(cubo, Alteracao(versao=1, zonas={14}, candidatos={NOME_FERNANDO}, locais={'ESCOLA 1'}))
+    assert analise.tabelas(zona_4, None, candidatos) is tabelas
+    assert len(analise.cache) == 1
+
+
+def test_tabelas_do_cache_compartilhado(tmp_path, cubo):
+    candidatos = (NOME_FERNANDO, NOME_INDIA)
+    chave = chave_filtro(candidatos, 119)
+    locais = AnaliseMemoizada(cubo, COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE, OPCOES_ORDENACAO)
+    compartilhadas = [
+        AnaliseMemoizada(cubo, COLUNAS_VOTOS_ANALISE, COLUNA_DIFERENCA_ANALISE, OPCOES_ORDENACAO,
+                         compartilhado=CacheCompartilhado(str(tmp_path)), versao='v1')
+        for _ in range(2)
+    ]
+    esperadas = locais.tabelas(chave, cubo.mascara(119), candidatos)
+    for analise in compartilhadas:
+        tabelas = analise.tabelas(chave, cubo.mascara(119), candidatos)
+        for nivel_col, esperada in esperadas.items():
+            for ordenacao in OPCOES_ORDENACAO:
+                linhas = tabelas[nivel_col].linhas(ordenacao)
+                np.testing.assert_array_equal(linhas, esperada.linhas(ordenacao))
+                _comparar(tabelas[nivel_col].pagina(linhas, 0), esperada.pagina(linhas, 0))
+    assert [a.compartilhado.construidas for a in compartilhadas] == [1, 0]
+    assert compartilhadas[1].compartilhado.abertas == 1
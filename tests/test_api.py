@@ -0,0 +1,192 @@
+import gzip
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import api
+from analise import COLUNA_TOTAL
+from atualizacao import AtualizadorVotacao
+from conftest import escrever_csv, linhas_votacao
+from dados import assinatura_csv, blocos_csv, compactar_tipos, preparar_blocos
+from indicadores import NOME_FERNANDO, NOME_INDIA
+
+MUNICIPIOS = ("NITEROI", "RIO DE JANEIRO")
+
+
+@pytest.fixture
+def csv(tmp_path):
+    caminho = str(tmp_path / 'votacao.csv')
+    linhas = linhas_votacao(120, MUNICIPIOS)
+    escrever_csv(caminho, linhas)
+    return caminho, linhas
+
+
+@pytest.fixture
+def servico(csv, camada_bairros_local, monkeypatch):
+    caminho, _ = csv
+    atributos = pd.DataFrame({'nome': camada_bairros_local['nome']})
+    monkeypatch.setattr(api, 'carregar_divisoes_municipio', lambda municipio: SimpleNamespace(atributos=atributos))
+    df, blocos = preparar_blocos(caminho, blocos_csv(caminho), camada_bairros_local)
+    return api.ServicoAgregados(AtualizadorVotacao(compactar_tipos(df), blocos, assinatura_csv(caminho), caminho))
+
+
+@pytest.fixture
+def pedir(servico):
+    """GET (ou outro método) no servidor de teste: (status, cabeçalhos, corpo)"""
+    servidor = api.criar_servidor(porta=0, servico=servico)
+    threading.Thread(target=servidor.serve_forever, args=(0.01,), daemon=True).start()
+    base = f'http://127.0.0.1:{servidor.server_address[1]}'
+
+    def pedir(caminho, metodo='GET', **cabecalhos):
+        requisicao = urllib.request.Request(base + caminho, method=metodo,
+                                            headers={nome.replace('_', '-'): valor for nome, valor in cabecalhos.items()})
+        try:
+            with urllib.request.urlopen(requisicao) as resposta:
+                return resposta.status, resposta.headers, resposta.read()
+        except urllib.error.HTTPError as erro:
+            return erro.code, erro.headers, erro.read()
+    yield pedir
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _json(corpo):
+    return pd.DataFrame(json.loads(corpo))
+
+
+def _cubo(servico, municipio='RIO DE JANEIRO'):
+    return servico.particoes.abrir(municipio).cubo
+
+
+def test_raiz_e_municipios(pedir):
+    status, _, corpo = pedir('/')
+    assert status == 200 and '/totais' in json.loads(corpo)['rotas']
+    status, _, corpo = pedir('/municipios')
+    assert list(_json(corpo)['identificador']) == ['niteroi', 'rio-de-janeiro']
+
+
+def test_totais(pedir, servico):
+    status, cabecalhos, corpo = pedir('/totais')
+    assert status == 200 and cabecalhos['Content-Type'].startswith('application/json')
+    totais = _json(corpo).set_index('candidato')
+    esperado = _cubo(servico).totais()
+    assert totais['votos'].to_dict() == esperado.to_dict()
+    assert totais['participacao'].sum() == pytest.approx(1)
+
+    # Município pelo identificador, modo de um candidato e zona
+    totais = _json(pedir('/api/totais?municipio=niteroi&modo=paes&zona=14')[2])
+    cubo = _cubo(servico, 'NITEROI')
+    assert list(totais['candidato']) == [NOME_FERNANDO]
+    assert list(totais['votos']) == list(cubo.totais(cubo.mascara(zona=14), [NOME_FERNANDO]))
+
+
+def test_tabela(pedir, servico):
+    cubo = _cubo(servico)
+    tabela = _json(pedir('/tabela?nivel=zona&ordenacao=total')[2])
+    assert tabela[COLUNA_TOTAL].is_monotonic_decreasing
+    por_zona = cubo.agregar('NR_ZONA', candidatos=[NOME_FERNANDO, NOME_INDIA]).sum(axis=1)
+    assert tabela.set_index('NR_ZONA')[COLUNA_TOTAL].sort_index().to_dict() == por_zona.to_dict()
+
+    completa = _json(pedir('/tabela?nivel=local&ordenacao=alfabetica')[2])
+    pagina = _json(pedir('/tabela?nivel=local&ordenacao=alfabetica&pagina=2&tamanho=7')[2])
+    pd.testing.assert_frame_equal(pagina, completa.iloc[7:14].reset_index(drop=True))
+    ultima = -(-len(completa) // 7)
+    assert len(_json(pedir(f'/tabela?nivel=local&pagina={ultima}&tamanho=7')[2])) == len(completa) - 7 * (ultima - 1)
+    assert pedir(f'/tabela?nivel=local&pagina={ultima + 1}&tamanho=7')[2] == b'[]'
+
+
+def test_ranking(pedir):
+    ranking = _json(pedir('/ranking?metrica=sinergia')[2])
+    assert set(ranking['grupo']) == {'maior', 'menor'}
+    maior = ranking[ranking['grupo'] == 'maior']
+    assert len(maior) <= 5 and maior['Sinergia'].is_monotonic_decreasing
+    assert list(maior['posicao']) == list(range(1, len(maior) + 1))
+    assert (ranking['Total_Votos'] > 0).all()
+
+
+@pytest.mark.parametrize('caminho', [
+    '/totais?modo=outro', '/totais?zona=abc', '/totais?municipio=atlantida', '/tabela?nivel=estado',
+    '/tabela?ordenacao=aleatoria', '/tabela?pagina=0', '/tabela?pagina=1&tamanho=5000', '/ranking?modo=paes',
+    '/ranking?metrica=votos', '/totais?formato=xml',
+])
+def test_parametro_invalido(pedir, caminho):
+    status, cabecalhos, corpo = pedir(caminho)
+    assert status == 400
+    assert cabecalhos['Cache-Control'] == 'no-store'
+    assert json.loads(corpo)['erro']
+
+
+@pytest.mark.parametrize('caminho', ['/nada', '/api/nada', '/totais/extra'])
+def test_rota_desconhecida(pedir, caminho):
+    status, _, corpo = pedir(caminho)
+    assert status == 404 and 'rota desconhecida' in json.loads(corpo)['erro']
+
+
+def test_negociacao_csv_json(pedir):
+    _, cabecalhos_json, corpo_json = pedir('/totais')
+    _, cabecalhos, corpo = pedir('/totais', Accept='text/csv')
+    assert cabecalhos['Content-Type'].startswith('text/csv')
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(corpo), encoding='utf-8-sig'), _json(corpo_json))
+    assert pedir('/totais?formato=csv')[2] == corpo
+    # O parâmetro vence o cabeçalho
+    assert pedir('/totais?formato=json', Accept='text/csv')[1]['Content-Type'].startswith('application/json')
+    assert cabecalhos['ETag'] != cabecalhos_json['ETag']
+
+
+def test_etag_com_e_sem_gzip(pedir):
+    _, simples, corpo = pedir('/ranking')
+    _, comprimida, corpo_gzip = pedir('/ranking', Accept_Encoding='gzip')
+    assert comprimida['Content-Encoding'] == 'gzip' and 'Content-Encoding' not in simples
+    assert gzip.decompress(corpo_gzip) == corpo
+    for cabecalhos in (simples, comprimida):
+        assert cabecalhos['Vary'] == 'Accept, Accept-Encoding'
+    # Cada representação tem o seu ETag, o mesmo a cada resposta
+    assert simples['ETag'] != comprimida['ETag']
+    assert pedir('/ranking')[1]['ETag'] == simples['ETag']
+    assert pedir('/ranking', Accept_Encoding='gzip')[1]['ETag'] == comprimida['ETag']
+    assert pedir('/ranking', Accept_Encoding='gzip', If_None_Match=simples['ETag'])[0] == 200
+
+
+def test_304(pedir):
+    _, cabecalhos, _ = pedir('/totais')
+    etag, data = cabecalhos['ETag'], cabecalhos['Last-Modified']
+    for condicao in ({'If_None_Match': etag}, {'If_None_Match': f'"outro", W/{etag}'}, {'If_None_Match': '*'},
+                     {'If_Modified_Since': data}):
+        status, cabecalhos, corpo = pedir('/totais', **condicao)
+        assert (status, corpo) == (304, b'')
+        assert cabecalhos['ETag'] == etag
+    assert pedir('/totais', If_None_Match='"outro"')[0] == 200
+    assert pedir('/totais', If_Modified_Since=formatdate(1_000_000_000, usegmt=True))[0] == 200
+    assert pedir('/totais', If_Modified_Since='ontem')[0] == 200
+    # If-None-Match tem precedência sobre a data
+    assert pedir('/totais', If_None_Match='"outro"', If_Modified_Since=data)[0] == 200
+
+
+def test_head_sem_corpo(pedir):
+    _, cabecalhos, corpo = pedir('/totais')
+    status, cabecalhos_head, corpo_head = pedir('/totais', metodo='HEAD')
+    assert (status, corpo_head) == (200, b'')
+    assert cabecalhos_head['ETag'] == cabecalhos['ETag']
+    assert cabecalhos_head['Content-Length'] == str(len(corpo))
+
+
+def test_csv_alterado_troca_so_as_respostas_afetadas(pedir, csv):
+    caminho, linhas = csv
+    _, rio, _ = pedir('/totais')
+    _, niteroi, _ = pedir('/totais?municipio=niteroi')
+    linha = next(i for i, texto in enumerate(linhas) if ';NITEROI;' in texto)
+    campos = linhas[linha].split(';')
+    campos[5] = str(int(campos[5]) + 1)
+    escrever_csv(caminho, linhas[:linha] + [';'.join(campos)] + linhas[linha + 1:])
+
+    status, cabecalhos, _ = pedir('/totais?municipio=niteroi', If_None_Match=niteroi['ETag'])
+    assert status == 200 and cabecalhos['ETag'] != niteroi['ETag']
+    assert cabecalhos['Last-Modified'] != niteroi['Last-Modified']
+    assert pedir('/totais', If_None_Match=rio['ETag'])[0] == 304
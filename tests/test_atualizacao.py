@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import atualizacao
+import dados
+from atualizacao import Alteracao, AtualizadorVotacao
+from cache_compartilhado import CacheCompartilhado
+from conftest import escrever_csv, linhas_votacao
+from cubo import CuboVotos
+from dados import assinatura_csv, blocos_csv, compactar_tipos, construir_artefato, ler_metadados_artefato, preparar_blocos
+from filtros import chave_filtro
+from indicadores import NOME_FERNANDO, NOME_INDIA
+
+LOCAIS = 2500  # ~800 KB de CSV: alguns blocos de `TAMANHO_BLOCO`
+
+
+def _reconstruir(caminho, bairros):
+    """Cubo do processamento completo do CSV atual"""
+    df, _ = preparar_blocos(caminho, blocos_csv(caminho), bairros)
+    return CuboVotos(compactar_tipos(df))
+
+
+def _conferir(atualizador, caminho, bairros):
+    """O cubo do atualizador é o mesmo do processamento completo"""
+    esperado = _reconstruir(caminho, bairros)
+    cubo = atualizador.cubo
+    pd.testing.assert_series_equal(cubo.totais(), esperado.totais())
+    for nivel in ('NR_ZONA', 'NM_LOCAL_VOTACAO', 'NOME_BAIRRO'):
+        pd.testing.assert_frame_equal(cubo.agregar(nivel), esperado.agregar(nivel))
+    np.testing.assert_array_equal(cubo.votos, esperado.votos)
+    assert cubo.locais[['NR_ZONA', 'NM_LOCAL_VOTACAO']].astype(str).equals(
+        esperado.locais[['NR_ZONA', 'NM_LOCAL_VOTACAO']].astype(str))
+
+
+@pytest.fixture
+def csv(tmp_path):
+    caminho = str(tmp_path / 'votacao.csv')
+    linhas = linhas_votacao(LOCAIS)
+    escrever_csv(caminho, linhas)
+    return caminho, linhas
+
+
+@pytest.fixture
+def atualizador(csv, camada_bairros_local):
+    caminho, _ = csv
+    df, blocos = preparar_blocos(caminho, blocos_csv(caminho), camada_bairros_local)
+    atualizador = AtualizadorVotacao(compactar_tipos(df), blocos, assinatura_csv(caminho), caminho)
+    atualizador.cubo  # com o cubo montado a `Alteracao` traz as diferenças por célula
+    return atualizador
+
+
+def test_csv_sem_mudanca(atualizador, csv, bairros):
+    assert len(atualizador.blocos) > 2
+    assert atualizador.atualizar() is None
+    _conferir(atualizador, csv[0], bairros)
+
+
+def test_linhas_acrescentadas(atualizador, csv, bairros):
+    caminho, linhas = csv
+    novas = linhas_votacao(5, semente=1)
+    novas = [linha.replace('ESCOLA RIO', 'ESCOLA NOVA') for linha in novas] + linhas[:3]  # locais novos e repetidos
+    escrever_csv(caminho, linhas + novas)
+
+    alteracao = atualizador.atualizar()
+    assert alteracao.linhas_novas == len(novas)
+    assert alteracao.linhas_removidas == 0
+    assert alteracao.blocos_reprocessados == 1
+    assert alteracao.locais_alterados
+    assert 'ESCOLA NOVA 0000' in alteracao.locais
+    assert 'ESCOLA RIO 0000' in alteracao.locais  # votos somados ao local que já existia
+    _conferir(atualizador, caminho, bairros)
+
+
+def test_linha_do_meio_editada(atualizador, csv, bairros):
+    caminho, linhas = csv
+    meio = len(linhas) // 2
+    candidato, zona, local, _, municipio, votos, *resto = linhas[meio].split(';')
+    linhas = list(linhas)
+    linhas[meio] = ';'.join([candidato, zona, local, _, municipio, str(int(votos) + 1000), *resto])
+    escrever_csv(caminho, linhas)
+
+    alteracao = atualizador.atualizar()
+    assert 0 < alteracao.blocos_reprocessados < len(atualizador.blocos)
+    assert alteracao.linhas_novas == alteracao.linhas_removidas
+    assert (alteracao.zonas, alteracao.candidatos, alteracao.locais) == ({int(zona)}, {candidato}, {local})
+    assert not alteracao.locais_alterados
+    _conferir(atualizador, caminho, bairros)
+
+
+def test_sem_quebra_de_linha_no_fim(atualizador, csv, bairros):
+    caminho, linhas = csv
+    # Mesmo conteúdo sem a quebra final: o último bloco muda, os votos não
+    escrever_csv(caminho, linhas, final='')
+    assert atualizador.atualizar() is None
+    assert atualizador.assinatura == assinatura_csv(caminho)
+    _conferir(atualizador, caminho, bairros)
+
+    # A última linha (sem quebra) é completada e outras são acrescentadas depois dela
+    ultima = linhas[-1].split(';')
+    ultima[5] = str(int(ultima[5]) + 7)
+    acrescimo = linhas_votacao(2, semente=2)
+    escrever_csv(caminho, linhas[:-1] + [';'.join(ultima)] + acrescimo, final='')
+    alteracao = atualizador.atualizar()
+    assert alteracao.blocos_reprocessados == 1
+    assert ultima[2] in alteracao.locais
+    _conferir(atualizador, caminho, bairros)
+
+
+def test_linha_incompleta_completada_depois(atualizador, csv, bairros):
+    caminho, linhas = csv
+    extra = linhas_votacao(1, semente=3)[0]
+    escrever_csv(caminho, linhas + [extra[:len(extra) // 3]], final='')  # gravação no meio da linha
+    atualizador.atualizar()
+    escrever_csv(caminho, linhas + [extra])
+    atualizador.atualizar()
+    _conferir(atualizador, caminho, bairros)
+
+
+def test_alteracao_afeta():
+    alteracao = Alteracao(versao=1, zonas={14}, candidatos={NOME_FERNANDO}, locais={'ESCOLA A'})
+    assert alteracao.afeta(chave_filtro(None))
+    assert alteracao.afeta(chave_filtro([NOME_FERNANDO, NOME_INDIA], 14, ['ESCOLA B', 'ESCOLA A']))
+    # Zona
+    assert not alteracao.afeta(chave_filtro(None, 4))
+    assert alteracao.afeta(chave_filtro(None, 14))
+    # Candidato
+    assert not alteracao.afeta(chave_filtro([NOME_INDIA]))
+    assert not alteracao.afeta(chave_filtro([NOME_INDIA], 14, ['ESCOLA A']))
+    assert alteracao.afeta(chave_filtro([NOME_INDIA, NOME_FERNANDO]))
+    # Local
+    assert not alteracao.afeta(chave_filtro(None, None, ['ESCOLA B']))
+    assert alteracao.afeta(chave_filtro(None, None, ['ESCOLA A']))
+    assert alteracao.afeta(chave_filtro(None, None, []))  # nenhum local selecionado: todos
+
+
+def test_alteracao_vazia_nao_afeta_nada():
+    assert not Alteracao(versao=1).afeta(chave_filtro(None))
+    assert Alteracao(versao=1, locais_alterados=True).afeta(chave_filtro(None))
+
+
+def test_alteracao_da_edicao_afeta_so_o_filtro_dela(atualizador, csv):
+    caminho, linhas = csv
+    candidato, zona, local, *resto = linhas[1].split(';')
+    resto[2] = str(int(resto[2]) + 1)
+    escrever_csv(caminho, [linhas[0], ';'.join([candidato, zona, local, *resto])] + linhas[2:])
+    alteracao = atualizador.atualizar()
+
+    outra_zona = next(z for z in (4, 14, 119, 161) if z != int(zona))
+    outro_candidato = next(c for c in atualizador.cubo.candidatos if c != candidato)
+    assert alteracao.afeta(chave_filtro([candidato], int(zona), [local]))
+    assert not alteracao.afeta(chave_filtro(None, outra_zona))
+    assert not alteracao.afeta(chave_filtro([outro_candidato]))
+    assert not alteracao.afeta(chave_filtro(None, None, ['OUTRO LOCAL']))
+
+
+@pytest.mark.parametrize('camada_mudou', [False, True])
+def test_artefato_de_outra_replica_so_com_a_mesma_camada_de_bairros(tmp_path, csv, camada_bairros_local,
+                                                                     monkeypatch, camada_mudou):
+    caminho, linhas = csv
+    artefato = str(tmp_path / 'artefato' / 'votacao.arrow')
+    versao = {'bairros': 'v1'}
+    for modulo in (dados, atualizacao):
+        monkeypatch.setattr(modulo, 'versao_camada', lambda camada: versao[camada])
+    construir_artefato(caminho, artefato, camada_bairros_local)
+    atualizador = AtualizadorVotacao.do_artefato(artefato, caminho,
+                                                 compartilhado=CacheCompartilhado(str(tmp_path / 'compartilhado')))
+
+    # Outra réplica, ainda com a camada antiga, processa o acréscimo e publica o artefato
+    escrever_csv(caminho, linhas + linhas_votacao(3, semente=4))
+    construir_artefato(caminho, artefato, camada_bairros_local)
+    if camada_mudou:
+        versao['bairros'] = 'v2'
+    chamadas = []
+    preparar = atualizacao.preparar_blocos
+    monkeypatch.setattr(atualizacao, 'preparar_blocos', lambda *args: chamadas.append(args) or preparar(*args))
+
+    assert atualizador.atualizar() is not None
+    assert bool(chamadas) == camada_mudou  # com a mesma camada o artefato publicado é aberto como está
+    assert ler_metadados_artefato(artefato)['versao_bairros'] == versao['bairros']
+    _conferir(atualizador, caminho, camada_bairros_local)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from busca import CAMPOS_BUSCA, IndiceBusca, normalizar
+
+PALAVRAS = ["ESCOLA", "MUNICIPAL", "COLÉGIO", "SÃO", "JOSÉ", "ÍNDIA", "CONCEIÇÃO", "RUA", "D'ÁVILA", "DAS", "E",
+            "4", "14", "Nº"]
+BAIRROS = ["COPACABANA", "SÃO CRISTÓVÃO", "MARÉ", "GÁVEA", "MÉIER", "IRAJÁ"]
+ZONAS = [4, 14, 40, 119, 161]
+CONSULTAS = ["4", "1", "14", "a", "e", "sa", "SÃ", "ão", "o j", "india", "ÍNDIA", "sao jose", "escola 4", "d avila",
+             "rua", "xyz", "", "  "]
+
+
+def _locais(n=400, semente=0):
+    gerador = np.random.default_rng(semente)
+
+    def frases(n_palavras):
+        return [" ".join(linha) for linha in np.asarray(PALAVRAS)[gerador.integers(0, len(PALAVRAS), (n, n_palavras))]]
+
+    return pd.DataFrame({
+        'NR_ZONA': np.asarray(ZONAS)[gerador.integers(0, len(ZONAS), n)],
+        'NM_LOCAL_VOTACAO': [f"{nome} {i}" for i, nome in enumerate(frases(3))],
+        'DS_LOCAL_VOTACAO_ENDERECO': frases(2),
+        'NOME_BAIRRO': np.asarray(BAIRROS)[gerador.integers(0, len(BAIRROS), n)],
+    })
+
+
+def _varredura(locais, consulta, zona=None, campos=CAMPOS_BUSCA, trechos_curtos=True):
+    """
+    `str.contains` sobre os textos normalizados, termo a termo; sem `trechos_curtos`
+    os termos de uma ou duas letras valem só como início de palavra
+    """
+    mascara = np.ones(len(locais), dtype=bool) if zona is None else locais['NR_ZONA'].to_numpy() == zona
+    for termo in normalizar(consulta).split():
+        presente = np.zeros(len(locais), dtype=bool)
+        for campo in campos:
+            textos = locais[campo].astype(str).map(normalizar)
+            if trechos_curtos or len(termo) >= 3:
+                presente |= textos.str.contains(termo, regex=False).to_numpy()
+            else:
+                presente |= textos.map(lambda texto: any(p.startswith(termo) for p in texto.split())).to_numpy()
+        mascara &= presente
+    return np.flatnonzero(mascara)
+
+
+@pytest.fixture(scope='module')
+def locais():
+    return _locais()
+
+
+@pytest.fixture(scope='module')
+def indice(locais):
+    return IndiceBusca(locais)
+
+
+@pytest.mark.parametrize('zona', [None, 4, 14, 999])
+@pytest.mark.parametrize('campo', CAMPOS_BUSCA)
+def test_tabela_da_analise_busca_trechos_como_str_contains(locais, indice, campo, zona):
+    for consulta in CONSULTAS:
+        esperado = _varredura(locais, consulta, zona, [campo])
+        np.testing.assert_array_equal(indice.buscar(consulta, zona, campos=[campo], trechos_curtos=True), esperado,
+                                      err_msg=consulta)
+
+
+@pytest.mark.parametrize('zona', [None, 40])
+def test_termos_curtos_por_prefixo(locais, indice, zona):
+    for consulta in CONSULTAS:
+        np.testing.assert_array_equal(indice.buscar(consulta, zona), _varredura(locais, consulta, zona,
+                                                                                trechos_curtos=False),
+                                      err_msg=consulta)
+
+
+def test_zona_curta_encontra_zonas_que_a_contem(locais, indice):
+    # Como o `str.contains` da tabela antiga: "4" encontra as zonas 4, 14 e 40
+    zonas = set(locais['NR_ZONA'].iloc[indice.buscar("4", campos=['NR_ZONA'], trechos_curtos=True)])
+    assert zonas == {4, 14, 40}
+    assert set(locais['NR_ZONA'].iloc[indice.buscar("4", campos=['NR_ZONA'])]) == {4, 40}
+
+
+def test_indice_do_cache_compartilhado(locais, indice):
+    reaberto = IndiceBusca.de_partes(indice.partes())
+    for consulta in CONSULTAS:
+        for trechos_curtos in (False, True):
+            np.testing.assert_array_equal(reaberto.buscar(consulta, 14, trechos_curtos=trechos_curtos),
+                                          indice.buscar(consulta, 14, trechos_curtos=trechos_curtos))
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_compartilhado import VERSOES_MANTIDAS, CacheCompartilhado
+
+N_PROCESSOS = 4
+CHAVE = ('tabelas', 'RIO DE JANEIRO', 4)
+
+
+def _partes():
+    valores = np.arange(10_000, dtype=np.float64)
+    return {
+        'valores': valores,
+        'nomes': np.asarray([f"ESCOLA {i}" for i in range(50)], dtype=object),
+        'tabela': pd.DataFrame({'votos': np.arange(1000, dtype=np.int64), 'lat': np.linspace(-23, -22, 1000)}),
+        'total': float(valores.sum()),
+        'colunas': ['A', 'B'],
+    }
+
+
+def _construir_devagar(registro):
+    def construir():
+        # Registra quem construiu e segura a trava o bastante para os outros processos esperarem por ela
+        with open(os.path.join(registro, str(os.getpid())), 'w'):
+            pass
+        time.sleep(0.3)
+        return _partes()
+    return construir
+
+
+def _processo(diretorio, registro, barreira, fila):
+    cache = CacheCompartilhado(diretorio)
+    barreira.wait()
+    partes = cache.obter(1, CHAVE, _construir_devagar(registro))
+    fila.put({
+        'estado': (cache.construidas, cache.abertas, cache.em_memoria),
+        'valores': partes['valores'].tobytes(),
+        'nomes': partes['nomes'].tolist(),
+        'tabela': partes['tabela'].to_dict('list'),
+        'simples': (partes['total'], partes['colunas']),
+        'so_leitura': not partes['valores'].flags.writeable and not partes['nomes'].flags.writeable,
+    })
+
+
+def test_processos_constroem_uma_vez_e_leem_o_mesmo(tmp_path):
+    diretorio, registro = str(tmp_path / 'cache'), tmp_path / 'construcoes'
+    registro.mkdir()
+    contexto = multiprocessing.get_context('spawn')
+    barreira, fila = contexto.Barrier(N_PROCESSOS), contexto.Queue()
+    processos = [contexto.Process(target=_processo, args=(diretorio, str(registro), barreira, fila))
+                 for _ in range(N_PROCESSOS)]
+    for processo in processos:
+        processo.start()
+    resultados = [fila.get(timeout=30) for _ in processos]
+    for processo in processos:
+        processo.join(timeout=30)
+        assert processo.exitcode == 0
+
+    assert len(os.listdir(registro)) == 1  # um só processo rodou `construir`
+    assert sorted(r['estado'] for r in resultados) == [(0, 1, 0)] * (N_PROCESSOS - 1) + [(1, 0, 0)]
+    esperado = _partes()
+    for resultado in resultados:
+        assert resultado['valores'] == esperado['valores'].tobytes()
+        assert resultado['nomes'] == esperado['nomes'].tolist()
+        assert resultado['tabela'] == esperado['tabela'].to_dict('list')
+        assert resultado['simples'] == (esperado['total'], esperado['colunas'])
+        assert resultado['so_leitura']
+
+
+def test_entrada_aberta_e_mapeada(tmp_path):
+    cache = CacheCompartilhado(str(tmp_path))
+    partes = cache.obter(1, CHAVE, _partes)
+    # Quem construiu também passa a ler a cópia em disco
+    assert cache.construidas == 1 and cache.abertas == 0
+    assert isinstance(partes['valores'].base, np.memmap) or isinstance(partes['valores'], np.memmap)
+    with pytest.raises(ValueError):
+        partes['valores'][0] = 1
+
+    outro = CacheCompartilhado(str(tmp_path))
+    reaberto = outro.obter(1, CHAVE, lambda: pytest.fail("não deveria construir de novo"))
+    assert outro.abertas == 1
+    np.testing.assert_array_equal(reaberto['valores'], partes['valores'])
+    pd.testing.assert_frame_equal(reaberto['tabela'], partes['tabela'])
+    # Outra versão dos dados é outra entrada
+    outro.obter(2, CHAVE, _partes)
+    assert outro.construidas == 1
+
+
+def test_sem_gravar_constroi_em_memoria(tmp_path, monkeypatch):
+    def sem_permissao(*args, **kwargs):
+        raise PermissionError("diretório só leitura")
+
+    monkeypatch.setattr(os, 'makedirs', sem_permissao)
+    cache = CacheCompartilhado(str(tmp_path / 'cache'))
+    partes = cache.obter(1, CHAVE, _partes)
+    assert cache.em_memoria == 1 and cache.construidas == 0
+    assert partes['total'] == _partes()['total']
+    assert not os.path.exists(tmp_path / 'cache')
+
+
+def test_mantem_so_as_ultimas_versoes(tmp_path):
+    cache = CacheCompartilhado(str(tmp_path))
+    versoes = range(1, VERSOES_MANTIDAS + 3)
+    agora = time.time()
+    for versao in versoes:
+        cache.obter(versao, CHAVE, _partes)
+        # Idades explícitas: a resolução do mtime não separaria versões gravadas em sequência
+        os.utime(tmp_path / str(versao), (agora + versao, agora + versao))
+    cache.descartar_versoes_antigas()
+    assert sorted(os.listdir(tmp_path), key=int) == [str(v) for v in versoes[-VERSOES_MANTIDAS:]]
+    # As versões mantidas continuam abrindo sem reconstruir
+    cache.obter(versoes[-1], CHAVE, lambda: pytest.fail("não deveria construir de novo"))
+    cache.descartar_versoes_antigas()
+    assert len(os.listdir(tmp_path)) == VERSOES_MANTIDAS
@@ -0,0 +1,116 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from atualizacao import Alteracao
+from classificacao import (LIMITE_JENKS, METODO_JENKS, METODOS, N_CLASSES, QUEBRA_SEM_VALORES, QuebrasMemoizadas,
+                           calcular_quebras, classificar, intervalos, quebras_jenks)
+from estilos import RGBA_SEM_VALOR, cores_mancha_classes, paleta_classes
+from filtros import chave_filtro
+
+
+def _desvios(valores, classes):
+    """Soma dos desvios quadráticos dentro de cada classe"""
+    return sum(((valores[classes == c] - valores[classes == c].mean()) ** 2).sum() for c in np.unique(classes))
+
+
+def _otimo_forca_bruta(valores, n_classes):
+    """Menor soma dos desvios entre todas as divisões dos valores ordenados em classes contíguas não vazias"""
+    valores = np.sort(valores)
+    melhor = np.inf
+    for cortes in itertools.combinations(range(1, len(valores)), n_classes - 1):
+        classes = np.searchsorted(np.asarray(cortes), np.arange(len(valores)), side='right')
+        melhor = min(melhor, _desvios(valores, classes))
+    return melhor
+
+
+@pytest.mark.parametrize('semente', range(8))
+@pytest.mark.parametrize('n_classes', [2, 3, 4])
+def test_jenks_e_o_otimo_da_forca_bruta(semente, n_classes):
+    gerador = np.random.default_rng(semente)
+    valores = gerador.lognormal(0, 1, int(gerador.integers(n_classes + 1, 11)))
+    quebras = quebras_jenks(valores, n_classes)
+    assert len(quebras) == n_classes - 1 and np.all(np.diff(quebras) > 0)
+    assert _desvios(valores, classificar(valores, quebras)) == pytest.approx(_otimo_forca_bruta(valores, n_classes))
+
+
+def test_jenks_separa_grupos_evidentes():
+    valores = [1, 1.1, 0.9, 10, 10.5, 9.8, 30, 31, 29.5]
+    classes = classificar(valores, quebras_jenks(valores, 3))
+    assert list(classes) == [0, 0, 0, 1, 1, 1, 2, 2, 2]
+
+
+def test_jenks_por_amostra_acima_do_limite():
+    gerador = np.random.default_rng(1)
+    grupos = np.repeat(np.arange(N_CLASSES), 3 * LIMITE_JENKS // N_CLASSES)
+    valores = gerador.permutation(10 * (grupos + 1) + gerador.uniform(-1, 1, len(grupos)))
+    assert len(valores) > LIMITE_JENKS
+
+    quebras = quebras_jenks(valores)
+    assert len(quebras) == N_CLASSES - 1
+    assert np.array_equal(quebras, quebras_jenks(valores[::-1]))  # amostra fixa: não depende da ordem
+    assert valores.min() <= quebras[0] and quebras[-1] < valores.max()
+    # A amostra ainda separa grupos bem distintos: cada quebra cai no topo de um grupo e só
+    # valores desse topo que ficaram fora da amostra passam para a classe de cima
+    assert np.array_equal(np.round(quebras, -1), 10 * np.arange(1, N_CLASSES))
+    assert np.mean(classificar(valores, quebras) == np.rint(valores / 10) - 1) > 0.99
+
+
+def test_jenks_com_valores_iguais():
+    assert np.array_equal(quebras_jenks(np.full(20, 5.0)), np.full(N_CLASSES - 1, 5.0))
+    assert np.all(classificar(np.full(20, 5.0), quebras_jenks(np.full(20, 5.0))) == 0)
+
+
+@pytest.mark.parametrize('valores, esperado', [
+    ([3.0], [3.0] * (N_CLASSES - 1)),
+    ([1.0, 2.0, 3.0], [1, 2, 3, 3, 3, 3]),
+    ([7.0, 1.0, 4.0, 2.0, 6.0, 3.0, 5.0], [1, 2, 3, 4, 5, 6]),  # tantos valores quanto classes
+])
+def test_jenks_com_poucos_valores(valores, esperado):
+    quebras = quebras_jenks(valores)
+    assert np.array_equal(quebras, esperado)
+    # Cada valor distinto fica numa classe só dele
+    classes = classificar(np.sort(valores), quebras)
+    assert len(set(classes)) == len(set(valores))
+
+
+@pytest.mark.parametrize('metodo', METODOS)
+def test_calcular_quebras(metodo):
+    valores = np.r_[np.zeros(10), -np.ones(5), np.random.default_rng(2).lognormal(0, 1, 300)]
+    quebras = calcular_quebras(valores, metodo)
+    assert len(quebras) == N_CLASSES - 1 and np.all(np.diff(quebras) >= 0)
+    assert quebras[0] > 0  # só os valores positivos entram no cálculo
+    assert np.array_equal(calcular_quebras(np.zeros(5), metodo), np.full(N_CLASSES - 1, QUEBRA_SEM_VALORES))
+    with pytest.raises(ValueError):
+        calcular_quebras(valores, "outro")
+
+
+def test_intervalos_batem_com_as_cores_nas_pontas():
+    quebras = np.array([1.0, 2.0, 2.0, 5.0, 8.0, 13.0])  # uma classe vazia (quebras repetidas)
+    paleta = paleta_classes()
+    for classe, (inicio, fim) in enumerate(intervalos(quebras)):
+        # A legenda mostra "início – fim": o fim fica na classe, o início na classe de baixo
+        pontas = ([fim] if fim is not None else []) + ([np.nextafter(inicio, np.inf)] if inicio is not None else [])
+        if inicio is not None and fim is not None and fim <= inicio:
+            assert classe not in classificar(np.r_[quebras, quebras + 0.5], quebras)
+            continue
+        for valor in pontas:
+            assert classificar([valor], quebras)[0] == classe
+            assert cores_mancha_classes([valor], quebras).tolist() == [paleta[classe].tolist()]
+    assert intervalos(quebras)[0][0] is None and intervalos(quebras)[-1][1] is None
+    assert cores_mancha_classes([0.0, -1.0], quebras).tolist() == [RGBA_SEM_VALOR] * 2
+
+
+def test_quebras_memoizadas():
+    memo = QuebrasMemoizadas()
+    valores = np.arange(1, 50, dtype=float)
+    filtro_zona_4, filtro_zona_14 = chave_filtro(None, 4), chave_filtro(None, 14)
+    quebras = memo.quebras(filtro_zona_4, 'Sinergia', METODO_JENKS, valores)
+    assert not quebras.flags.writeable
+    assert memo.quebras(filtro_zona_4, 'Sinergia', METODO_JENKS, None) is quebras  # não recalcula
+    memo.quebras(filtro_zona_14, 'Sinergia', METODO_JENKS, valores)
+
+    memo.invalidar(Alteracao(versao=1, zonas={14}, candidatos={'A'}, locais={'L'}))
+    assert memo.quebras(filtro_zona_4, 'Sinergia', METODO_JENKS, None) is quebras
+    assert len(memo.cache) == 1
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from coordenadas import corrigir_coordenada, corrigir_coordenadas, reparar_coordenadas
+
+CASOS = [
+    '-22.9482419', '-229.482.419', '-4.318.172.190.000.000', '12,5', ' -43.1 ', '+.5', '1e5', 'nan', '-inf',
+    '', 'abc', '1.2.3',
+    # Aceitos por `float()` mas não pelas regex ASCII: seguem o caminho da função original
+    '1_000.5', '-22_9', '1__0', '_1', '٣٤.٥', '-٢٢.٩٥', '-２２.９', '²3', '\xa0-22.5', '-22.9é',
+]
+
+
+def _referencia(texto):
+    valor = corrigir_coordenada(texto)
+    return np.nan if valor is None else float(valor)
+
+
+@pytest.mark.parametrize('texto', CASOS)
+def test_vetorizada_igual_a_original(texto):
+    valores, _ = corrigir_coordenadas(pd.Series([texto, '-22.9'], dtype=object))
+    np.testing.assert_array_equal(valores.to_numpy(), [_referencia(texto), -22.9])
+
+
+def test_mascara_de_reparo():
+    textos = ['-22.9', '-229.482.419', '1_000.5', '-22_9', '٣٤.٥', '²3', 'abc']
+    _, reparadas = corrigir_coordenadas(pd.Series(textos, dtype=object))
+    assert reparadas.tolist() == [False, True, False, False, False, True, False]
+
+
+def test_reparar_coordenadas_descarta_linhas_sem_coordenada():
+    df = pd.DataFrame({'LATITUDE': ['-229.482.419', 'abc', '-22,9'], 'LONGITUDE': ['-43.2', '-43.2', '-4.318.172.190']})
+    corrigido, relatorio = reparar_coordenadas(df)
+    assert len(corrigido) == 2
+    assert (relatorio.validas, relatorio.reparadas, relatorio.descartadas) == (0, 2, 1)
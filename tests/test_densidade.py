@@ -0,0 +1,148 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from densidade import (FORCA_CONJUNTA, SINERGIA, DensidadeMemoizada, GradeDensidade, SuperficiesDensidade,
+                       codificar_png, convoluir, nucleo_gaussiano)
+from filtros import chave_filtro
+
+LIMITES = (-43.40, -23.00, -43.30, -22.92)  # ~10 km × 9 km
+
+
+@pytest.fixture(scope='module')
+def locais():
+    gerador = np.random.default_rng(0)
+    n = 300
+    oeste, sul, leste, norte = LIMITES
+    # Alguns locais fora dos limites: ficam fora da grade
+    lat = gerador.uniform(sul - 0.005, norte, n)
+    lon = gerador.uniform(oeste, leste + 0.005, n)
+    pesos = pd.DataFrame({'A': gerador.integers(0, 500, n), 'B': gerador.integers(0, 500, n)})
+    zona = np.where(lon < (oeste + leste) / 2, 4, 14)
+    return lat, lon, pesos, zona
+
+
+@pytest.fixture(scope='module')
+def grade(locais):
+    lat, lon, pesos, _ = locais
+    return GradeDensidade(LIMITES, lat, lon, pesos, banda=250)
+
+
+def _densidade_completa(grade, mascara):
+    """Superfícies da máscara calculadas de uma vez, sobre a grade toda"""
+    superficies = np.zeros((len(grade.colunas), *grade.formato))
+    resultado = grade.densidade(np.flatnonzero(mascara))
+    if resultado is not None:
+        delta, (linhas, colunas) = resultado
+        superficies[:, linhas, colunas] = delta
+    return superficies
+
+
+def test_atualizar_sequencia_de_mascaras(locais, grade):
+    _, _, pesos, zona = locais
+    n = len(pesos)
+    gerador = np.random.default_rng(1)
+    todos, nenhum = np.ones(n, dtype=bool), np.zeros(n, dtype=bool)
+    alguns = gerador.random(n) < 0.3
+    mascaras = [todos, zona == 4, zona == 14, (zona == 14) | alguns, alguns, alguns & (gerador.random(n) < 0.5),
+                nenhum, zona == 4, todos, todos]
+
+    superficies = SuperficiesDensidade(grade)
+    anterior = nenhum
+    escala = _densidade_completa(grade, todos).max()
+    for mascara in mascaras:
+        alterados = superficies.atualizar(mascara)
+        assert alterados == int(np.sum(mascara != anterior))
+        assert np.allclose(superficies.superficies, _densidade_completa(grade, mascara), rtol=0, atol=1e-9 * escala)
+        anterior = mascara
+
+
+def test_massa_dos_votos(grade):
+    # Um local no centro: o núcleo inteiro cabe na grade e a soma da superfície é o voto dele
+    oeste, sul, leste, norte = LIMITES
+    centro = GradeDensidade(LIMITES, [(sul + norte) / 2], [(oeste + leste) / 2], pd.DataFrame({'A': [120], 'B': [7]}))
+    superficies, _ = centro.densidade(np.array([0]))
+    assert np.allclose(superficies.sum(axis=(1, 2)), [120, 7])
+    assert grade.densidade(np.flatnonzero(~grade.dentro)) is None
+    assert nucleo_gaussiano(500).sum() == pytest.approx(1)
+
+
+def test_convolucao_separavel_igual_a_direta():
+    gerador = np.random.default_rng(2)
+    grades = gerador.random((2, 37, 41))
+    nucleo = nucleo_gaussiano(300)
+    direta = np.stack([
+        np.apply_along_axis(lambda c: np.convolve(c, nucleo, 'same'), 0,
+                            np.apply_along_axis(lambda l: np.convolve(l, nucleo, 'same'), 1, grade))
+        for grade in grades])
+    assert np.allclose(convoluir(grades, nucleo), direta)
+
+
+def test_superficies_derivadas(locais, grade):
+    superficies = SuperficiesDensidade(grade)
+    superficies.atualizar(np.ones(len(locais[2]), dtype=bool))
+    a, b = superficies.superficie('A'), superficies.superficie('B')
+    assert (a >= 0).all() and (b >= 0).all()
+    sinergia = superficies.superficie(SINERGIA)
+    forca = superficies.superficie(FORCA_CONJUNTA)
+    visiveis = ~np.isnan(sinergia)
+    assert visiveis.any() and np.isnan(sinergia).any()
+    assert np.array_equal(visiveis, ~np.isnan(forca))
+    assert ((sinergia[visiveis] >= 0) & (sinergia[visiveis] <= 1 + 1e-12)).all()
+    with pytest.raises(KeyError):
+        superficies.superficie('C')
+
+
+def _decodificar_png(png):
+    """(largura, altura, matriz RGBA) de um PNG RGBA de 8 bits sem filtro, conferindo os CRCs"""
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    posicao, blocos = 8, {}
+    while posicao < len(png):
+        tamanho, = struct.unpack('>I', png[posicao:posicao + 4])
+        tipo, dados = png[posicao + 4:posicao + 8], png[posicao + 8:posicao + 8 + tamanho]
+        crc, = struct.unpack('>I', png[posicao + 8 + tamanho:posicao + 12 + tamanho])
+        assert crc == zlib.crc32(tipo + dados)
+        blocos[tipo] = dados
+        posicao += 12 + tamanho
+    largura, altura, bits, cor, compressao, filtro, entrelacamento = struct.unpack('>IIBBBBB', blocos[b'IHDR'])
+    assert (bits, cor, compressao, filtro, entrelacamento) == (8, 6, 0, 0, 0)
+    assert b'IEND' in blocos
+    linhas = np.frombuffer(zlib.decompress(blocos[b'IDAT']), dtype=np.uint8).reshape(altura, 1 + 4 * largura)
+    assert (linhas[:, 0] == 0).all()  # filtro "nenhum" em todas as linhas
+    return largura, altura, linhas[:, 1:].reshape(altura, largura, 4)
+
+
+@pytest.mark.parametrize('formato', [(1, 1), (3, 5), (40, 17)])
+def test_codificar_png_ida_e_volta(formato):
+    rgba = np.random.default_rng(3).integers(0, 256, (*formato, 4), dtype=np.uint8)
+    largura, altura, decodificada = _decodificar_png(codificar_png(rgba))
+    assert (altura, largura) == formato
+    assert np.array_equal(decodificada, rgba)
+
+
+def test_png_abre_no_pillow():
+    imagem = pytest.importorskip('PIL.Image')
+    rgba = np.random.default_rng(4).integers(0, 256, (6, 9, 4), dtype=np.uint8)
+    with imagem.open(io.BytesIO(codificar_png(rgba))) as png:
+        assert png.mode == 'RGBA'
+        assert np.array_equal(np.asarray(png), rgba)
+
+
+def test_raster_memoizado(locais):
+    lat, lon, pesos, zona = locais
+    memo = DensidadeMemoizada(LIMITES, lat, lon, pesos)
+    grade = memo.grade(250)
+    assert memo.grade(250) is grade
+    superficies = SuperficiesDensidade(grade)
+    raster = memo.raster(chave_filtro(None, 4), SINERGIA, 250, (30, 144, 255), superficies, zona == 4)
+    oeste, sul, leste, norte = raster.limites
+    assert oeste < leste and sul < norte and raster.maximo > 0
+    assert raster.imagem.startswith('data:image/png;base64,')
+    # Em cache: a máscara nem é aplicada de novo
+    assert memo.raster(chave_filtro(None, 4), SINERGIA, 250, (30, 144, 255), superficies, None) is raster
+    vazia = np.zeros(len(pesos), dtype=bool)
+    assert memo.raster(chave_filtro(None, 999), 'A', 250, (30, 144, 255), superficies, vazia) is None
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from benchmarks.estilos import (RGB_A, RGB_B, dados_sinteticos, mancha_apply, pontos_candidato_apply,
+                                pontos_comparativo_apply, sinergia_apply, tooltips_sinergia_apply)
+from estilos import (MODOS_COR, cores_mancha_sinergia, estilizar_mancha_candidato, estilizar_pontos_candidato,
+                     estilizar_pontos_comparativo, tooltips_mancha_sinergia)
+
+
+@pytest.fixture(params=[3000, 1])
+def df(request):
+    return dados_sinteticos(request.param, semente=request.param)
+
+
+def test_pontos_candidato(df):
+    cor, raio, tooltip = pontos_candidato_apply(df)
+    cores, raios, tooltips = estilizar_pontos_candidato(df['nome'], df['a'], RGB_A)
+    assert cores.tolist() == cor
+    np.testing.assert_array_equal(raios, raio)
+    assert list(tooltips) == tooltip
+
+
+@pytest.mark.parametrize('modo', MODOS_COR)
+def test_pontos_comparativo(df, modo):
+    cor, raio, tooltip = pontos_comparativo_apply(df, modo)
+    cores, raios, tooltips = estilizar_pontos_comparativo(df['nome'], df['a'], df['b'], "A", "B", modo, RGB_A, RGB_B)
+    assert cores.tolist() == cor
+    np.testing.assert_array_equal(raios, raio)
+    assert list(tooltips) == tooltip
+
+
+def test_mancha_candidato(df):
+    cor, tooltip = mancha_apply(df)
+    _, cores, tooltips = estilizar_mancha_candidato(df['nome'], df['a'].astype(float), RGB_A)
+    assert cores.tolist() == cor
+    assert list(tooltips) == tooltip
+
+
+def test_mancha_sinergia(df):
+    total = df['a'] + df['b']
+    sinergia = 1 - ((df['a'] - df['b']).abs() / (total + 1e-9))
+    positivos = sinergia[sinergia > 0].to_numpy()
+    quebras = np.percentile(positivos, [25, 50, 75, 90, 95, 99]) if len(positivos) else [0.01] * 6
+    assert cores_mancha_sinergia(sinergia, quebras).tolist() == sinergia_apply(sinergia, quebras)
+    tooltips = tooltips_mancha_sinergia(df['nome'], df['a'], df['b'], total, sinergia, sinergia, sinergia,
+                                        "A", "B", "Sinergia")
+    assert list(tooltips) == tooltips_sinergia_apply(df, total, sinergia)
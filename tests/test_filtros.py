@@ -0,0 +1,62 @@
+import threading
+
+from filtros import CacheLRU
+
+
+def _construir_em_paralelo(cache, chave, valor):
+    """Começa a construir `chave` em outra thread e para no meio da construção"""
+    comecou, liberar = threading.Event(), threading.Event()
+    resultado = {}
+
+    def construir():
+        comecou.set()
+        liberar.wait(5)
+        return valor
+
+    thread = threading.Thread(target=lambda: resultado.setdefault('valor', cache.obter(chave, construir)))
+    thread.start()
+    assert comecou.wait(5)
+    return thread, liberar, resultado
+
+
+def test_lru_descarta_o_usado_ha_mais_tempo():
+    cache = CacheLRU(2)
+    cache.obter('a', lambda: 1)
+    cache.obter('b', lambda: 2)
+    cache.obter('a', lambda: None)
+    cache.obter('c', lambda: 3)
+    assert [chave for _, chave, _ in cache.itens()] == ['a', 'c']
+    assert (cache.acertos, cache.falhas) == (1, 3)
+
+
+def test_construcao_que_atravessa_descartar_nao_entra_no_cache():
+    cache = CacheLRU()
+    thread, liberar, resultado = _construir_em_paralelo(cache, 'resposta', 'dados antigos')
+    cache.descartar(lambda chave: chave == 'resposta')  # atualização no meio da construção
+    liberar.set()
+    thread.join(5)
+
+    assert resultado['valor'] == 'dados antigos'  # quem pediu recebe o que foi montado
+    assert len(cache) == 0
+    assert cache.obter('resposta', lambda: 'dados novos') == 'dados novos'
+    assert cache.obter('resposta', lambda: 'outra') == 'dados novos'
+
+
+def test_construcao_que_atravessa_limpar_nao_entra_no_cache():
+    cache = CacheLRU()
+    thread, liberar, _ = _construir_em_paralelo(cache, 'mascara', 'antiga')
+    cache.limpar()
+    liberar.set()
+    thread.join(5)
+    assert cache.obter('mascara', lambda: 'nova') == 'nova'
+
+
+def test_remover_nao_afeta_construcoes_em_andamento():
+    # O despejo por orçamento de memória não muda os dados: a construção em andamento entra
+    cache = CacheLRU()
+    cache.obter('outra', lambda: 0)
+    thread, liberar, _ = _construir_em_paralelo(cache, 'chave', 1)
+    cache.remover('outra')
+    liberar.set()
+    thread.join(5)
+    assert cache.obter('chave', lambda: 2) == 1
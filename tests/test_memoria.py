@@ -0,0 +1,103 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from cubo import CuboVotos
+from filtros import CacheLRU
+from memoria import CACHES, MedidorBytes, MonitorMemoria, Pegada
+
+MB = 2**20
+
+
+@pytest.fixture
+def cubo():
+    n = 2000
+    gerador = np.random.default_rng(0)
+    return CuboVotos(pd.DataFrame({
+        'NM_VOTAVEL': np.asarray(['A', 'B', 'C'])[gerador.integers(0, 3, n)],
+        'NR_ZONA': gerador.integers(1, 20, n),
+        'NM_LOCAL_VOTACAO': [f"ESCOLA {i % 500}" for i in range(n)],
+        'NOME_BAIRRO': [f"BAIRRO {i % 7}" for i in range(n)],
+        'lat': -22.9 + (np.arange(n) % 500) * 1e-4,
+        'lon': -43.2 - (np.arange(n) % 500) * 1e-4,
+        'QT_VOTOS_TOTAL': gerador.integers(0, 100, n),
+    }))
+
+
+def test_vista_de_coluna_do_cubo_nao_conta(cubo):
+    medidor = MedidorBytes()
+    dados = medidor.medir(cubo)
+    assert dados.privados >= cubo.votos.nbytes
+    # Vistas (fatias, colunas e Series de `locais`) dos buffers já contados
+    assert medidor.medir(cubo.votos[:, 0]) == Pegada()
+    assert medidor.medir(cubo.votos[10:20]) == Pegada()
+    assert medidor.medir(cubo.locais['lat']) == Pegada()
+    assert medidor.medir({'frame': cubo.votos[::2, 1:]}) == Pegada()
+    # Uma cópia conta
+    assert medidor.medir(cubo.votos[:, 0].copy()) == Pegada(cubo.votos[:, 0].nbytes)
+
+
+def test_sessao_com_vistas_do_cubo_so_conta_a_copia(cubo):
+    monitor = MonitorMemoria(orcamento_mb=0)
+    monitor.registrar_dados('cubo', cubo)
+    copia = cubo.votos.sum(axis=1)
+    monitor.contabilizar('sessao', {'vista': cubo.votos[:, 1], 'locais': cubo.locais['lon'], 'soma': copia},
+                         forcar=True)
+    assert monitor.sessao('sessao').privados == copia.nbytes
+    # Entre medições completas a sessão é medida contra os buffers já contados
+    monitor.contabilizar('outra', {'vista': cubo.votos[:, 2]})
+    assert monitor.sessao('outra') == Pegada()
+
+
+def test_memoria_mapeada_nao_e_privada(tmp_path):
+    caminho = str(tmp_path / 'valores.bin')
+    np.arange(1000, dtype=np.float64).tofile(caminho)
+    mapeado = np.memmap(caminho, dtype=np.float64, mode='r')
+    assert MedidorBytes().medir(mapeado) == Pegada(mapeados=8000)
+    assert MedidorBytes().medir(mapeado[100:200]) == Pegada(mapeados=8000)
+
+    tabela = pa.table({'x': np.arange(1000, dtype=np.float64), 'y': np.arange(1000, dtype=np.int64)})
+    assert MedidorBytes().medir(tabela) == Pegada(mapeados=tabela.nbytes)
+    assert MedidorBytes().medir(tabela.column('x').to_numpy()) == Pegada(mapeados=8000)
+    # DataFrame sobre a tabela Arrow (como o do artefato): as colunas sem nulos não são copiadas
+    df = tabela.to_pandas(split_blocks=True, self_destruct=False)
+    assert MedidorBytes().medir(df) == Pegada(mapeados=16000)
+
+
+def test_orcamento_despeja_o_mais_frio_entre_caches(monkeypatch):
+    relogio = itertools.count()
+    monkeypatch.setattr(time, 'monotonic', lambda: float(next(relogio)))
+    mascaras, tabelas = CacheLRU(), CacheLRU()
+    monitor = MonitorMemoria(orcamento_mb=3.5)
+    monitor.registrar_cache('mascaras', mascaras)
+    monitor.registrar_cache('tabelas', tabelas)
+
+    def item():
+        return np.ones(MB // 8)  # 1 MB
+
+    # Do uso mais antigo ao mais recente: m1, t1, m2, t2, m3, t3; depois m1 é usado de novo
+    for chave in ('1', '2', '3'):
+        mascaras.obter(chave, item)
+        tabelas.obter(chave, item)
+    mascaras.obter('1', item)
+
+    estado = monitor.contabilizar('sessao', {}, forcar=True)
+    assert estado['itens_despejados'] == 3  # 6 MB → 3 MB
+    assert [chave for _, chave, _ in mascaras.itens()] == ['3', '1']
+    assert [chave for _, chave, _ in tabelas.itens()] == ['3']
+    assert set(monitor.medicao[CACHES]['mascaras']) == {'3', '1'}
+    assert monitor.estado()['total']['privados_mb'] == 3.0
+
+
+def test_sem_orcamento_nada_sai():
+    cache = CacheLRU()
+    monitor = MonitorMemoria(orcamento_mb=0)
+    monitor.registrar_cache('cache', cache)
+    cache.obter('a', lambda: np.ones(MB))
+    estado = monitor.contabilizar('sessao', {}, forcar=True)
+    assert estado['orcamento_mb'] is None and estado['itens_despejados'] == 0
+    assert estado[CACHES]['cache']['itens'] == 1
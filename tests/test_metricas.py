@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from metricas import (MetricasCandidatos, MetricasPar, diferenca_relativa, metricas_candidatos,
+                      metricas_candidatos_referencia, metricas_par, sinergia_peso, somar_por_grupo)
+
+CAMPOS = [campo for campo in MetricasCandidatos.__dataclass_fields__ if campo != 'par']
+INTEIROS = ('votos', 'total', 'vencedor')
+INTEIROS_PAR = ('total', 'diferenca', 'diferenca_absoluta')
+
+
+def _votos_sorteados(gerador, n_grupos, n_candidatos, maximo):
+    """Matriz com grupos sem votos, empates no primeiro lugar e candidatos zerados"""
+    votos = gerador.integers(0, maximo + 1, size=(n_grupos, n_candidatos))
+    if n_grupos:
+        votos[gerador.random(n_grupos) < 0.1] = 0
+        empatados = gerador.random(n_grupos) < 0.1
+        votos[empatados, -1] = votos[empatados].max(axis=1)
+        votos[gerador.random(votos.shape) < 0.2] = 0
+    return votos
+
+
+def _conferir(obtido, esperado, inteiros):
+    if obtido.shape != esperado.shape:
+        raise AssertionError(f"formas diferentes: {obtido.shape} != {esperado.shape}")
+    if inteiros:
+        np.testing.assert_array_equal(obtido, esperado)
+    else:
+        np.testing.assert_allclose(obtido, esperado, rtol=1e-12, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('n_grupos', [0, 1, 2, 7, 300])
+@pytest.mark.parametrize('n_candidatos', [1, 2, 5])
+@pytest.mark.parametrize('maximo', [1, 100, 10**12])
+def test_nucleo_igual_a_referencia(n_grupos, n_candidatos, maximo):
+    gerador = np.random.default_rng(n_grupos * 100 + n_candidatos)
+    votos = _votos_sorteados(gerador, n_grupos, n_candidatos, maximo)
+    par = (0, n_candidatos - 1)
+    nucleo = metricas_candidatos(votos, par)
+    referencia = metricas_candidatos_referencia(votos, par)
+    for campo in CAMPOS:
+        _conferir(getattr(nucleo, campo), getattr(referencia, campo), campo in INTEIROS)
+    for campo in MetricasPar.__dataclass_fields__:
+        _conferir(getattr(nucleo.par, campo), getattr(referencia.par, campo), campo in INTEIROS_PAR)
+
+
+def test_sem_par():
+    votos = np.array([[3, 1], [0, 0]])
+    assert metricas_candidatos(votos, par=None).par is None
+    assert metricas_candidatos_referencia(votos, par=None).par is None
+
+
+def test_agrupar_no_nucleo_igual_a_agrupar_antes():
+    gerador = np.random.default_rng(0)
+    codigos = gerador.integers(-1, 20, size=200)
+    locais = gerador.integers(0, 1000, size=(200, 3))
+    esperado = np.zeros((20, 3), dtype=np.int64)
+    np.add.at(esperado, codigos[codigos >= 0], locais[codigos >= 0])
+    np.testing.assert_array_equal(somar_por_grupo(locais, codigos, 20), esperado)
+    np.testing.assert_array_equal(metricas_candidatos(locais, codigos=codigos, n_grupos=20).votos, esperado)
+
+
+def test_metricas_de_um_grupo():
+    metricas = metricas_candidatos([[60, 30, 10], [0, 0, 0]], par=(0, 1))
+    np.testing.assert_array_equal(metricas.total, [100, 0])
+    np.testing.assert_array_equal(metricas.vencedor, [0, -1])
+    np.testing.assert_allclose(metricas.participacao[0], [0.6, 0.3, 0.1])
+    np.testing.assert_allclose(metricas.margem, [0.3, 0.0])
+    np.testing.assert_allclose(metricas.numero_efetivo, [1 / 0.46, 0.0])
+    np.testing.assert_allclose(metricas.par.sinergia[0], 2 / 3, rtol=1e-9)
+
+
+def test_atalhos_do_par():
+    a, b = np.array([10, 0, 5, 0]), np.array([30, 0, 5, 7])
+    par = metricas_par(a, b)
+    np.testing.assert_array_equal(sinergia_peso(a, b), par.sinergia_peso)
+    np.testing.assert_array_equal(diferenca_relativa(a - b, a + b), par.diferenca_relativa)
+    np.testing.assert_allclose(par.sinergia, [0.5, 1.0, 1.0, 0.0], atol=1e-9)
+    np.testing.assert_array_equal(par.diferenca_relativa[1], 0.0)
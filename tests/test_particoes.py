@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from atualizacao import AtualizadorVotacao
+from conftest import escrever_csv, linhas_votacao
+from cubo import CuboVotos
+from dados import assinatura_csv, blocos_csv, compactar_tipos, preparar_blocos
+from particoes import PARTICOES_ABERTAS, ParticoesMunicipios, catalogo_municipios
+
+MUNICIPIOS = ("NITEROI", "RIO DE JANEIRO", "SAO GONCALO")
+
+
+@pytest.fixture
+def csv(tmp_path):
+    caminho = str(tmp_path / 'votacao.csv')
+    linhas = linhas_votacao(200, MUNICIPIOS)
+    escrever_csv(caminho, linhas)
+    return caminho, linhas
+
+
+@pytest.fixture
+def votacao(csv, camada_bairros_local):
+    caminho, _ = csv
+    df, blocos = preparar_blocos(caminho, blocos_csv(caminho), camada_bairros_local)
+    return AtualizadorVotacao(compactar_tipos(df), blocos, assinatura_csv(caminho), caminho)
+
+
+def _digests(tabela):
+    return catalogo_municipios(tabela)['municipios'].set_index('municipio')['digest']
+
+
+def test_catalogo(votacao):
+    particoes = ParticoesMunicipios(votacao)
+    assert particoes.municipios() == list(MUNICIPIOS)
+    df = votacao.df
+    for municipio in MUNICIPIOS:
+        linhas = df[df['NM_MUNICIPIO'] == municipio]
+        resumo = particoes.resumo(municipio)
+        assert resumo['linhas'] == len(linhas)
+        assert resumo['zonas'] == linhas['NR_ZONA'].nunique()
+        assert particoes.limites(municipio) == (linhas['lon'].min(), linhas['lat'].min(),
+                                                linhas['lon'].max(), linhas['lat'].max())
+
+
+def test_digest_nao_depende_da_ordem_das_linhas(votacao):
+    tabela = votacao.tabela()
+    embaralhada = tabela.take(np.random.default_rng(0).permutation(tabela.num_rows))
+    pd.testing.assert_series_equal(_digests(tabela), _digests(embaralhada))
+
+
+def test_digest_muda_so_no_municipio_alterado(votacao):
+    df = votacao.df.copy()
+    linha = int(np.flatnonzero(df['NM_MUNICIPIO'] == 'NITEROI')[0])
+    df.loc[linha, 'QT_VOTOS_TOTAL'] += 1
+    antes, depois = _digests(votacao.tabela()), _digests(pa.Table.from_pandas(df, preserve_index=False))
+    assert list(antes.index[antes != depois]) == ['NITEROI']
+
+
+def test_totais_estado_somam_as_particoes(votacao):
+    particoes = ParticoesMunicipios(votacao)
+    soma = sum(particoes.abrir(municipio).cubo.totais() for municipio in MUNICIPIOS)
+    pd.testing.assert_series_equal(particoes.totais_estado(), soma, check_names=False, check_index_type=False)
+    pd.testing.assert_series_equal(particoes.totais_estado(), votacao.cubo.totais(), check_names=False,
+                                   check_index_type=False)
+    candidatos = list(votacao.cubo.candidatos[:2])
+    pd.testing.assert_series_equal(particoes.totais_estado(candidatos), votacao.cubo.totais(candidatos=candidatos),
+                                   check_names=False, check_index_type=False)
+
+
+def test_particao_tem_so_as_linhas_do_municipio(votacao):
+    particao = ParticoesMunicipios(votacao).abrir('NITEROI')
+    df = votacao.df
+    esperado = CuboVotos(df[df['NM_MUNICIPIO'] == 'NITEROI'])
+    np.testing.assert_array_equal(particao.cubo.votos, esperado.votos)
+    with pytest.raises(KeyError):
+        ParticoesMunicipios(votacao).abrir('MUNICIPIO INEXISTENTE')
+
+
+def test_lru_das_particoes_abertas(votacao):
+    assert ParticoesMunicipios(votacao).abertas.capacidade == PARTICOES_ABERTAS
+    particoes = ParticoesMunicipios(votacao, capacidade=2)
+    niteroi = particoes.abrir('NITEROI')
+    particoes.abrir('RIO DE JANEIRO')
+    assert particoes.abrir('NITEROI') is niteroi  # acerto: NITEROI passa a ser a mais recente
+    particoes.abrir('SAO GONCALO')
+    assert particoes.estado()['abertas'] == ['NITEROI', 'SAO GONCALO']
+    assert (particoes.abertas.acertos, particoes.abertas.falhas) == (1, 3)
+    assert particoes.abrir('RIO DE JANEIRO') is not None  # reaberta, agora tirando NITEROI
+    assert particoes.estado()['abertas'] == ['SAO GONCALO', 'RIO DE JANEIRO']
+
+
+def test_atualizar_refaz_so_o_municipio_alterado(votacao, csv):
+    caminho, linhas = csv
+    particoes = ParticoesMunicipios(votacao)
+    antigas = {municipio: particoes.abrir(municipio) for municipio in MUNICIPIOS}
+    for particao in antigas.values():
+        particao.derivado('filtros', object)
+
+    linha = next(i for i, texto in enumerate(linhas) if ';NITEROI;' in texto)
+    campos = linhas[linha].split(';')
+    campos[5] = str(int(campos[5]) + 50)
+    escrever_csv(caminho, linhas[:linha] + [';'.join(campos)] + linhas[linha + 1:])
+    alteracao = votacao.atualizar()
+    resultado = particoes.atualizar(alteracao)
+
+    assert alteracao.municipios == {'NITEROI'}
+    nova, alteracao_niteroi = resultado['NITEROI']
+    assert nova is not antigas['NITEROI'] and nova.digest != antigas['NITEROI'].digest
+    assert (alteracao_niteroi.candidatos, alteracao_niteroi.locais) == ({campos[0]}, {campos[2]})
+    assert nova.derivados['filtros'] is antigas['NITEROI'].derivados['filtros']  # herdado, para a `Alteracao` invalidar
+    df = votacao.df
+    np.testing.assert_array_equal(nova.cubo.votos, CuboVotos(df[df['NM_MUNICIPIO'] == 'NITEROI']).votos)
+    for municipio in ("RIO DE JANEIRO", "SAO GONCALO"):
+        particao, alteracao_municipio = resultado[municipio]
+        assert alteracao_municipio.vazia()
+        assert particao.cubo is antigas[municipio].cubo
+        assert particao.versao_dados.startswith(particoes.versao_dados)
+        assert particoes.abrir(municipio) is particao
+    pd.testing.assert_series_equal(particoes.totais_estado(), votacao.cubo.totais(), check_names=False,
+                                   check_index_type=False)
+    assert particoes.atualizar(alteracao) == {}  # mesma versão: nada a fazer